@@ -0,0 +1,345 @@
+# welding_gun_manager/api_app.py
+"""
+焊枪文件服务 API（FastAPI）
+开发时: python -m uvicorn main_fast:app --reload（main_fast 重新导出本模块的 app）
+生产环境: python serve_api.py --workers 4，或 gunicorn -c gunicorn_conf.py api_app:app
+"""
+import os
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, Header, Request
+from fastapi.responses import FileResponse, Response, JSONResponse, PlainTextResponse
+from pydantic import BaseModel
+from typing import Optional
+
+import anyio
+
+from services.scheduler import shutdown_scheduler
+from services.thumbnail_service import ThumbnailService, is_image_file
+from services.integrity_service import ChecksumManifest, CHECKSUM_ALGORITHM
+from utils.file_utils import copy_stream_hashed
+from models.database import Database
+from services.auth_service import SessionManager, DBRevocationStore, check_user_password, db_role_lookup
+from services.permission_service import Permission, get_policy
+from services.http_cache import CompressionMiddleware, guess_media_type, make_etag, file_etag, not_modified
+from services.metrics import metrics
+
+# 添加上传目录
+UPLOAD_DIR = "uploads"
+os.makedirs(UPLOAD_DIR, exist_ok=True)
+
+# 上传文件的校验清单（uploads/.manifest.json）
+upload_manifest = ChecksumManifest(UPLOAD_DIR)
+
+# 缩略图缓存（按内容哈希，与上传目录分开存放）；首次使用时才创建目录和哈希索引，
+# 导入本模块（如 serve_api 的主进程）不打开数据库
+THUMBNAIL_DIR = os.path.join("cache", "thumbnails")
+_thumbnails = None
+_thumbnails_lock = threading.Lock()
+
+def get_thumbnails():
+    """获取本进程的缩略图服务（首次调用时创建）"""
+    global _thumbnails
+    with _thumbnails_lock:
+        if _thumbnails is None:
+            _thumbnails = ThumbnailService(THUMBNAIL_DIR)
+        return _thumbnails
+
+# API 认证（设置环境变量 WELDING_GUN_API_AUTH=1 启用）：先 POST /api/login 获取令牌，
+# 之后的请求带 Authorization: Bearer <令牌>；令牌和角色在内存中缓存校验，不访问数据库
+DB_PATH = "welding_gun.db"
+API_AUTH_ENABLED = os.environ.get('WELDING_GUN_API_AUTH', '').lower() in ('1', 'true', 'yes')
+sessions = SessionManager(role_lookup=db_role_lookup(DB_PATH), revocations=DBRevocationStore(DB_PATH))
+
+# 同步接口和文件读写所用线程池的大小（anyio 默认 40），决定可同时进行的传输数
+API_THREADS = int(os.environ.get('WELDING_GUN_API_THREADS', '64'))
+
+# 运行指标，由 /metrics 输出（数据库、缓存等模块的指标也在同一注册表中）
+STARTED_AT = time.time()
+REQUEST_SECONDS = metrics.histogram(
+    'welding_gun_api_request_seconds', "API 请求耗时（秒，含响应体发送）", ('method', 'route'))
+REQUESTS = metrics.counter(
+    'welding_gun_api_requests_total', "API 请求数", ('method', 'route', 'status'))
+REQUESTS_IN_FLIGHT = metrics.gauge(
+    'welding_gun_api_requests_in_flight', "正在处理的 API 请求数")
+UPLOAD_SECONDS = metrics.histogram(
+    'welding_gun_api_upload_seconds', "保存上传文件（写盘并计算校验和）耗时（秒）")
+UPLOAD_BYTES = metrics.counter(
+    'welding_gun_api_upload_bytes_total', "上传文件的字节数")
+DOWNLOAD_SECONDS = metrics.histogram(
+    'welding_gun_api_download_seconds', "下载文件发送耗时（秒）")
+DOWNLOAD_BYTES = metrics.counter(
+    'welding_gun_api_download_bytes_total', "下载文件发送的字节数")
+metrics.gauge('welding_gun_api_uptime_seconds', "API 进程运行时长（秒）").set_function(
+    lambda: time.time() - STARTED_AT)
+
+@asynccontextmanager
+async def lifespan(app):
+    """启动时设置线程池大小；关闭时等待后台缩略图任务完成并释放资源"""
+    global _thumbnails
+    anyio.to_thread.current_default_thread_limiter().total_tokens = API_THREADS
+    yield
+    await anyio.to_thread.run_sync(shutdown_scheduler, True)
+    with _thumbnails_lock:
+        if _thumbnails is not None:
+            _thumbnails.close()
+            _thumbnails = None
+
+class RequestStatsMiddleware:
+    """记录请求数、耗时和正在处理的请求数（ASGI），按路由模板（如 /api/download/{filename}）分组"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        
+        status = [500]
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                status[0] = message['status']
+            await send(message)
+        
+        started = time.perf_counter()
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            # 路由在匹配后写入 scope；未匹配的路径不作为标签，避免标签值无限增长
+            route = getattr(scope.get('route'), 'path', 'unmatched')
+            REQUEST_SECONDS.observe(time.perf_counter() - started, method=scope['method'], route=route)
+            REQUESTS.inc(method=scope['method'], route=route, status=status[0])
+
+class MeteredFileResponse(FileResponse):
+    """记录发送耗时和字节数的文件响应"""
+    
+    async def __call__(self, scope, receive, send):
+        sent = [0]
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.body':
+                sent[0] += len(message.get('body', b''))
+            await send(message)
+        
+        started = time.perf_counter()
+        await super().__call__(scope, receive, send_wrapper)
+        DOWNLOAD_SECONDS.observe(time.perf_counter() - started)
+        DOWNLOAD_BYTES.inc(sent[0])
+
+app = FastAPI(title="焊枪文件服务", lifespan=lifespan)
+
+# JSON、CSV、DXF 等文本类响应按 Accept-Encoding 压缩（gzip，安装了 brotli 时优先 br）
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(RequestStatsMiddleware)
+
+class LoginRequest(BaseModel):
+    username: str
+    password: Optional[str] = None
+
+def _bearer_token(authorization):
+    scheme, _, token = (authorization or '').partition(' ')
+    return token.strip() if scheme.lower() == 'bearer' else None
+
+def require_session(authorization: Optional[str] = Header(None)):
+    """校验会话令牌（未启用认证时直接放行）"""
+    if not API_AUTH_ENABLED:
+        return None
+    session = sessions.validate(_bearer_token(authorization))
+    if session is None:
+        raise HTTPException(status_code=401, detail="未登录或会话已过期",
+                            headers={"WWW-Authenticate": "Bearer"})
+    return session
+
+def require_permission(permission):
+    """需要指定权限的依赖（未启用认证时直接放行）"""
+    def dependency(session=Depends(require_session)):
+        if session is not None and not get_policy().allowed(session, permission):
+            raise HTTPException(status_code=403, detail="权限不足")
+        return session
+    return dependency
+
+def cache_control(max_age=0):
+    """Cache-Control 策略：启用认证时只允许客户端缓存；max_age 为 0 时每次都需用 ETag 重新验证"""
+    scope = "private" if API_AUTH_ENABLED else "public"
+    if max_age <= 0:
+        return f"{scope}, no-cache"
+    return f"{scope}, max-age={max_age}"
+
+# 文件列表缓存：(上传目录的修改时间, ETag, 文件列表)，目录未变化时轮询不再列目录
+_file_list = None
+
+@app.post("/api/login")
+def login(request: LoginRequest):
+    """登录并获取会话令牌"""
+    db = Database(DB_PATH)
+    try:
+        # 网络登录不接受免密码账户（如默认的 administrator），需先在本机界面设置密码
+        row = check_user_password(db, request.username, request.password, allow_passwordless=False)
+    finally:
+        db.close()
+    if row is None:
+        raise HTTPException(status_code=401, detail="用户名或密码错误")
+    
+    return {
+        "token": sessions.issue(row),
+        "token_type": "bearer",
+        "expires_in": sessions.ttl,
+        "username": row['username'],
+        "role": row['role']
+    }
+
+@app.post("/api/logout")
+def logout(authorization: Optional[str] = Header(None)):
+    """注销会话令牌"""
+    token = _bearer_token(authorization)
+    if token:
+        sessions.revoke(token)
+    return {"message": "已退出登录"}
+
+@app.post("/api/upload", dependencies=[Depends(require_permission(Permission.UPLOAD_FILES))])
+def upload_file(file: UploadFile = File(...)):
+    """上传文件（同步接口，在线程池中执行，写文件和计算校验和不阻塞事件循环）"""
+    file_location = None
+    recorded = False
+    try:
+        # 生成唯一文件名，避免冲突
+        file_extension = os.path.splitext(file.filename)[1]
+        unique_filename = f"{uuid.uuid4().hex}{file_extension}"
+        
+        file_location = os.path.join(UPLOAD_DIR, unique_filename)
+        
+        # 保存文件，同时计算校验和并登记到清单
+        started = time.perf_counter()
+        with open(file_location, "wb") as buffer:
+            size, digest = copy_stream_hashed(file.file, buffer, CHECKSUM_ALGORITHM)
+        UPLOAD_SECONDS.observe(time.perf_counter() - started)
+        UPLOAD_BYTES.inc(size)
+        upload_manifest.record(unique_filename, size, digest)
+        recorded = True
+        
+        # 图片在后台生成缩略图
+        get_thumbnails().generate_async(file_location)
+        
+        return {
+            "message": "文件上传成功",
+            "original_filename": file.filename,
+            "saved_filename": unique_filename,
+            "file_path": file_location,
+            "size": size,
+            "checksum": {CHECKSUM_ALGORITHM: digest}
+        }
+    except Exception as e:
+        # 写了一半或未登记到清单的文件删除，不出现在文件列表中
+        if file_location is not None and not recorded:
+            try:
+                os.remove(file_location)
+            except OSError:
+                pass
+        raise HTTPException(status_code=500, detail=f"上传失败: {str(e)}")
+
+@app.get("/api/download/{filename}", dependencies=[Depends(require_permission(Permission.DOWNLOAD_FILES))])
+def download_file(filename: str, request: Request):
+    """下载文件（ETag 取自校验清单，客户端已有相同内容时返回 304）"""
+    file_location = os.path.join(UPLOAD_DIR, filename)
+    
+    if not os.path.exists(file_location):
+        raise HTTPException(status_code=404, detail="文件不存在")
+    
+    etag = file_etag(file_location, upload_manifest.get(filename))
+    policy = cache_control(3600)
+    cached = not_modified(request, etag, policy)
+    if cached is not None:
+        return cached
+    
+    # 按扩展名给出内容类型，CSV、DXF 等文本文件可被压缩
+    return MeteredFileResponse(
+        path=file_location,
+        filename=filename,
+        media_type=guess_media_type(filename),
+        headers={"ETag": etag, "Cache-Control": policy}
+    )
+
+@app.get("/api/thumbnail/{filename}", dependencies=[Depends(require_permission(Permission.DOWNLOAD_FILES))])
+def get_thumbnail(filename: str, request: Request, size: str = "medium"):
+    """获取上传图片的缩略图（size: small / medium / large）"""
+    if os.path.basename(filename) != filename:
+        raise HTTPException(status_code=400, detail="文件名无效")
+    thumbnails = get_thumbnails()
+    if size not in thumbnails.sizes:
+        raise HTTPException(status_code=400, detail=f"不支持的尺寸: {size}")
+    
+    file_location = os.path.join(UPLOAD_DIR, filename)
+    if not os.path.exists(file_location):
+        raise HTTPException(status_code=404, detail="文件不存在")
+    if not is_image_file(filename):
+        raise HTTPException(status_code=415, detail="该文件类型没有缩略图")
+    
+    try:
+        thumb_path = thumbnails.get_thumbnail(file_location, size)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"生成缩略图失败: {str(e)}")
+    
+    # 缩略图按内容哈希命名，文件名即可作为 ETag
+    etag = make_etag(os.path.basename(thumb_path))
+    policy = cache_control(86400)
+    cached = not_modified(request, etag, policy)
+    if cached is not None:
+        return cached
+    
+    media_type = 'image/png' if thumb_path.endswith('.png') else 'image/jpeg'
+    return FileResponse(
+        path=thumb_path,
+        media_type=media_type,
+        headers={"ETag": etag, "Cache-Control": policy}
+    )
+
+@app.get("/api/files", dependencies=[Depends(require_permission(Permission.VIEW_GUNS))])
+def list_files(request: Request, response: Response):
+    """获取文件列表（带 ETag，内容未变时返回 304，适合轮询）"""
+    global _file_list
+    try:
+        mtime_ns = os.stat(UPLOAD_DIR).st_mtime_ns
+    except OSError:
+        return {"files": []}
+    
+    if _file_list is None or _file_list[0] != mtime_ns:
+        # 不列出校验清单等隐藏文件
+        files = sorted(name for name in os.listdir(UPLOAD_DIR) if not name.startswith('.'))
+        _file_list = (mtime_ns, make_etag(*files), files)
+    _, etag, files = _file_list
+    
+    policy = cache_control()
+    cached = not_modified(request, etag, policy)
+    if cached is not None:
+        return cached
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = policy
+    return {"files": files}
+
+@app.get("/health")
+def health():
+    """健康检查（不需要登录）：上传目录可写且数据库文件存在时返回 200，否则 503"""
+    checks = {
+        "upload_dir": os.path.isdir(UPLOAD_DIR) and os.access(UPLOAD_DIR, os.W_OK),
+        "database": os.path.exists(DB_PATH),
+    }
+    healthy = all(checks.values())
+    return JSONResponse(
+        status_code=200 if healthy else 503,
+        content={
+            "status": "ok" if healthy else "unavailable",
+            "checks": checks,
+            "pid": os.getpid(),
+            "uptime_s": round(time.time() - STARTED_AT, 1)
+        },
+        headers={"Cache-Control": "no-store"}
+    )
+
+@app.get("/metrics")
+def get_metrics():
+    """本工作进程的运行指标（Prometheus 文本格式，含数据库、缓存、上传下载等）"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
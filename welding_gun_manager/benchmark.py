@@ -0,0 +1,525 @@
+# welding_gun_manager/benchmark.py
+"""
+性能基准测试（无界面）
+
+在临时目录中生成合成数据（数据库焊枪、焊枪文件夹），对热点路径计时：
+- GunController: get_all_guns / search_guns / get_statistics
+- GunFileManager: get_all_guns / create_zip_file / save_file_to_folder
+- 导入模板（Excel/CSV）：导出模板和读取填写后的模板（services.template_service，
+  与 welding_gun_system 的 export_template / import_data 相同）
+- FastAPI 上传/下载接口
+
+结果（吞吐量、延迟分位数、每项的峰值分配内存）写入 JSON，可与上次结果对比。
+每项的内存用 tracemalloc 在计时之外单独调用一次测得，不影响计时；
+进程整体的峰值常驻内存只在报告顶层记录一次。
+
+用法:
+    python benchmark.py                          # 默认 10k 焊枪
+    python benchmark.py --sizes 10k,100k,1m      # 多个规模
+    python benchmark.py --only db,files --compare bench_results.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+import tracemalloc
+from datetime import datetime, timedelta
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if current_dir not in sys.path:
+    sys.path.insert(0, current_dir)
+
+from models.database import Database
+from controllers.gun_controller import GunController
+from file_operations import GunFileManager
+
+try:
+    import resource
+except ImportError:
+    # Windows
+    resource = None
+
+DEFAULT_OUTPUT = 'bench_results.json'
+
+# 所有基准分组
+GROUPS = ('db', 'files', 'templates', 'api')
+
+# 合成数据取值
+GUN_TYPES = ['点焊枪', '弧焊枪', '激光焊枪', '螺柱焊枪']
+GUN_MODELS = ['DW-100', 'HW-200', 'LW-300', 'C型', 'X型', '异型C', '异型X']
+GUN_STATUSES = ['active', 'active', 'active', 'maintenance', 'inactive', 'scrap']
+LOCATIONS = ['生产线A', '生产线B', '生产线C', '维修车间', '实验室', '仓库']
+FILE_TYPES = ['3d', '2d', 'image', 'signature', 'dwg']
+FILE_EXTENSIONS = {'3d': '.step', '2d': '.pdf', 'image': '.jpg', 'signature': '.pdf', 'dwg': '.dwg'}
+
+
+# ========== 统计工具 ==========
+
+class Samples(list):
+    """measure() 的耗时列表（ms），peak_alloc_mb 为单次调用的峰值分配内存"""
+    peak_alloc_mb = None
+
+def peak_rss_mb():
+    """当前进程的峰值常驻内存（MB），平台不支持时返回 None"""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS 返回字节，Linux 返回 KB
+        if sys.platform == 'darwin':
+            return round(peak / (1024 * 1024), 1)
+        return round(peak / 1024, 1)
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return round(getattr(info, 'peak_wset', info.rss) / (1024 * 1024), 1)
+    except Exception:
+        return None
+
+def percentile(sorted_values, pct):
+    """线性插值分位数，sorted_values 须已排序"""
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100
+    lower = int(k)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (k - lower)
+
+def summarize(name, size, samples_ms, items_per_call=1, extra=None):
+    """把多次调用的耗时汇总为一条结果"""
+    ordered = sorted(samples_ms)
+    total_s = sum(samples_ms) / 1000
+    result = {
+        'name': name,
+        'size': size,
+        'iterations': len(samples_ms),
+        'items_per_call': items_per_call,
+        'latency_ms': {
+            'min': round(ordered[0], 3),
+            'mean': round(statistics.mean(ordered), 3),
+            'p50': round(percentile(ordered, 50), 3),
+            'p90': round(percentile(ordered, 90), 3),
+            'p99': round(percentile(ordered, 99), 3),
+            'max': round(ordered[-1], 3),
+        },
+        'throughput_per_s': round(items_per_call * len(samples_ms) / total_s, 1) if total_s else None,
+        'peak_alloc_mb': getattr(samples_ms, 'peak_alloc_mb', None),
+    }
+    if extra:
+        result.update(extra)
+    return result
+
+def measure(func, iterations, warmup=1, memory=True):
+    """
+    重复调用 func 并记录每次耗时
+
+    memory 为 True 时，计时结束后在 tracemalloc 下再调用一次，
+    记录这一次调用的峰值分配内存（tracemalloc 会拖慢调用，因此不与计时混在一起）。
+
+    Returns:
+        tuple: (耗时列表 ms, 最后一次计时调用的返回值)
+    """
+    value = None
+    for _ in range(warmup):
+        value = func()
+    samples = Samples()
+    for _ in range(iterations):
+        start = time.perf_counter()
+        value = func()
+        samples.append((time.perf_counter() - start) * 1000)
+    if memory:
+        samples.peak_alloc_mb = peak_alloc_mb(func)
+    return samples, value
+
+def peak_alloc_mb(func):
+    """在 tracemalloc 下调用一次 func，返回调用期间 Python 分配内存的峰值增量（MB）"""
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        if started:
+            tracemalloc.stop()
+    return round(max(0, peak - baseline) / (1024 * 1024), 2)
+
+def parse_size(text):
+    """解析 10k / 100k / 1m 这样的规模"""
+    text = text.strip().lower()
+    multiplier = 1
+    if text.endswith('k'):
+        multiplier, text = 1000, text[:-1]
+    elif text.endswith('m'):
+        multiplier, text = 1000000, text[:-1]
+    return int(float(text) * multiplier)
+
+
+# ========== 合成数据 ==========
+
+def generate_fleet(db_path, count, seed=42):
+    """生成包含 count 把焊枪的数据库"""
+    rng = random.Random(seed)
+    db = Database(db_path)
+    db.create_tables()
+    conn = db.connect()
+
+    base_date = datetime(2020, 1, 1)
+
+    def rows():
+        for i in range(count):
+            maintenance = base_date + timedelta(days=rng.randint(0, 2000))
+            yield (
+                f"GUN-{i:07d}",
+                rng.choice(GUN_TYPES),
+                rng.choice(GUN_MODELS),
+                f"SN{i:08d}",
+                rng.choice(GUN_STATUSES),
+                rng.choice(LOCATIONS),
+                maintenance.strftime('%Y-%m-%d'),
+                rng.choice(['', '正常使用', '需要维护', '高精度']),
+                maintenance.isoformat(),
+            )
+
+    start = time.perf_counter()
+    conn.executemany('''
+    INSERT INTO guns (name, type, model, serial_number, status, location, last_maintenance, notes, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', rows())
+    conn.commit()
+    elapsed = time.perf_counter() - start
+    print(f"  生成 {count} 把焊枪: {elapsed:.2f}秒")
+    return db
+
+def generate_file_store(base_dir, gun_count, files_per_gun, file_kb, seed=42):
+    """按 GunFileManager 的目录结构生成焊枪文件夹"""
+    rng = random.Random(seed)
+    manager = GunFileManager(base_dir)
+    payload = os.urandom(file_kb * 1024)
+    subfolders = ['3d_models', '2d_drawings', 'images', 'signature_drawings', 'dwg_files']
+    folder_of = dict(zip(FILE_TYPES, subfolders))
+
+    start = time.perf_counter()
+    for i in range(gun_count):
+        folder_name = f"GUN-{i:07d}_20260101_{i % 240000:06d}"
+        folder_path = os.path.join(base_dir, folder_name)
+        for subfolder in subfolders:
+            os.makedirs(os.path.join(folder_path, subfolder), exist_ok=True)
+
+        files = {}
+        for j in range(files_per_gun):
+            file_type = FILE_TYPES[j % len(FILE_TYPES)]
+            filename = f"part_{j}{FILE_EXTENSIONS[file_type]}"
+            with open(os.path.join(folder_path, folder_of[file_type], filename), 'wb') as f:
+                f.write(payload)
+            files.setdefault(file_type, []).append(filename)
+
+        gun_info = {
+            'name': f"GUN-{i:07d}",
+            'weld_type': rng.choice(['钢点焊', '铝点焊', '其他']),
+            'gun_brand': rng.choice(['小原', '森德莱', '日基']),
+            'gun_number': f"GUN-{i:07d}",
+            'status': rng.choice(GUN_STATUSES),
+            'created_at': (datetime(2026, 1, 1) + timedelta(minutes=i)).isoformat(),
+            'folder_name': folder_name,
+            'files': files,
+        }
+        with open(os.path.join(folder_path, 'gun_info.json'), 'w', encoding='utf-8') as f:
+            json.dump(gun_info, f, ensure_ascii=False, indent=2)
+
+    elapsed = time.perf_counter() - start
+    print(f"  生成 {gun_count} 个焊枪文件夹（每个 {files_per_gun} 个文件）: {elapsed:.2f}秒")
+    return manager
+
+
+# ========== 基准分组 ==========
+
+def bench_db(workdir, size, args):
+    """数据库热点：全量加载、搜索、统计"""
+    db = generate_fleet(os.path.join(workdir, f'bench_{size}.db'), size)
+    controller = GunController(db)
+    iterations = max(1, args.iterations if size <= 100000 else args.iterations // 3)
+    results = []
+
+    samples, guns = measure(controller.get_all_guns, iterations)
+    results.append(summarize('gun_controller.get_all_guns', size, samples, len(guns)))
+
+    terms = ['GUN-00012', '生产线B', 'DW', 'not-found']
+    term_iter = iter(terms * iterations * 2)
+    samples, _ = measure(lambda: controller.search_guns(next(term_iter)), iterations)
+    results.append(summarize('gun_controller.search_guns', size, samples))
+
+    samples, _ = measure(controller.get_statistics, iterations)
+    results.append(summarize('gun_controller.get_statistics', size, samples))
+
+    # 虚拟表格滚动：随机位置取一页，按名称排序
+    rng = random.Random(7)
+    samples, _ = measure(lambda: controller.get_guns_page(rng.randrange(size), 65), iterations * 5)
+    results.append(summarize('gun_controller.get_guns_page', size, samples, 65))
+
+    db.close()
+    return results
+
+def bench_files(workdir, size, args):
+    """文件存储热点：扫描焊枪文件夹、打包 ZIP、保存文件"""
+    gun_count = min(size, args.file_guns)
+    base_dir = os.path.join(workdir, f'uploaded_guns_{size}')
+    manager = generate_file_store(base_dir, gun_count, args.files_per_gun, args.file_kb)
+    results = []
+
+    samples, guns = measure(manager.get_all_guns, args.iterations)
+    results.append(summarize('gun_file_manager.get_all_guns', gun_count, samples, len(guns)))
+
+    folders = sorted(g['folder_path'] for g in guns)
+    folder_iter = iter(folders * (args.iterations + 2))
+    folder_bytes = args.files_per_gun * args.file_kb * 1024
+    samples, _ = measure(lambda: manager.create_zip_file(next(folder_iter)), args.iterations)
+    result = summarize('gun_file_manager.create_zip_file', gun_count, samples)
+    result['mb_per_s'] = round(folder_bytes * len(samples) / (sum(samples) / 1000) / (1024 * 1024), 2)
+    results.append(result)
+
+    # 每次保存使用不同文件名，避免同名文件触发时间戳重命名
+    source_dir = os.path.join(workdir, 'source_files')
+    os.makedirs(source_dir, exist_ok=True)
+    payload = os.urandom(args.file_kb * 1024)
+    sources = []
+    # 预热、计时和测内存各用一个文件
+    for i in range(args.iterations + 2):
+        source_file = os.path.join(source_dir, f"drawing_{i}.pdf")
+        with open(source_file, 'wb') as f:
+            f.write(payload)
+        sources.append(source_file)
+    source_iter = iter(sources)
+    samples, _ = measure(lambda: manager.save_file_to_folder(folders[0], next(source_iter), '2d'),
+                         args.iterations)
+    result = summarize('gun_file_manager.save_file_to_folder', gun_count, samples)
+    result['mb_per_s'] = round(args.file_kb * len(samples) / (sum(samples) / 1000) / 1024, 2)
+    results.append(result)
+
+    return results
+
+def bench_templates(workdir, size, args):
+    """导入模板：导出带格式的模板文件；读取已填写 size 行（不超过 --template-rows）的模板"""
+    try:
+        import pandas  # noqa: F401
+    except ImportError:
+        print("  跳过 templates: 未安装 pandas")
+        return []
+    from services.template_service import write_template, read_template_rows
+
+    rows = min(size, args.template_rows)
+    db = generate_fleet(os.path.join(workdir, f'template_{rows}.db'), rows)
+    guns = GunController(db).get_all_guns()
+    db.close()
+    filled = [[gun.type, '小原', gun.serial_number or gun.name, gun.model or '', '500', '200',
+               '150', '4.5', '库卡', 'R30', '否', '0', '0'] for gun in guns]
+
+    extensions = ['csv']
+    try:
+        import openpyxl  # noqa: F401
+        extensions.append('xlsx')
+    except ImportError:
+        print("  跳过 xlsx: 未安装 openpyxl")
+
+    results = []
+    iterations = max(1, args.iterations // 2)
+    for ext in extensions:
+        template_path = os.path.join(workdir, f'template.{ext}')
+        samples, _ = measure(lambda: write_template(template_path), iterations)
+        results.append(summarize(f'template.export_{ext}', 1, samples))
+
+        path = os.path.join(workdir, f'template_{rows}.{ext}')
+        write_template(path, rows=filled)
+        samples, data = measure(lambda: read_template_rows(path), iterations)
+        if len(data) != rows:
+            raise RuntimeError(f"模板读取行数不符: {len(data)} != {rows}")
+        results.append(summarize(f'template.import_{ext}', rows, samples, len(data)))
+
+    return results
+
+def bench_api(workdir, size, args):
+    """FastAPI 上传/下载接口"""
+    try:
+        from fastapi.testclient import TestClient
+    except ImportError:
+        print("  跳过 api: 未安装 fastapi/httpx")
+        return []
+
+    # main_fast 在当前目录下创建 uploads，先切换到临时目录
+    previous_cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        import main_fast
+        client = TestClient(main_fast.app)
+        payload = os.urandom(args.upload_kb * 1024)
+
+        saved = []
+        def upload():
+            response = client.post('/api/upload', files={'file': ('drawing.pdf', payload, 'application/pdf')})
+            response.raise_for_status()
+            saved.append(response.json()['saved_filename'])
+        samples, _ = measure(upload, args.iterations)
+        result = summarize('api.upload', args.upload_kb, samples)
+        result['mb_per_s'] = round(args.upload_kb * len(samples) / (sum(samples) / 1000) / 1024, 2)
+        results = [result]
+
+        def download():
+            response = client.get(f'/api/download/{saved[0]}')
+            response.raise_for_status()
+            return len(response.content)
+        samples, _ = measure(download, args.iterations)
+        result = summarize('api.download', args.upload_kb, samples)
+        result['mb_per_s'] = round(args.upload_kb * len(samples) / (sum(samples) / 1000) / 1024, 2)
+        results.append(result)
+
+        samples, _ = measure(lambda: client.get('/api/files').raise_for_status(), args.iterations)
+        results.append(summarize('api.list_files', len(saved), samples))
+        return results
+    finally:
+        os.chdir(previous_cwd)
+
+BENCHMARKS = {
+    'db': bench_db,
+    'files': bench_files,
+    'templates': bench_templates,
+    'api': bench_api,
+}
+
+
+# ========== 报告 ==========
+
+def git_revision():
+    """当前提交（非 git 目录时返回 None）"""
+    try:
+        proc = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=current_dir,
+                              capture_output=True, text=True, timeout=10)
+        return proc.stdout.strip() or None
+    except Exception:
+        return None
+
+def compare_results(baseline, current, threshold=0.10):
+    """
+    按 (name, size) 对比 p50 延迟
+
+    Returns:
+        list: 变化超过阈值的条目
+    """
+    previous = {(r['name'], r['size']): r for r in baseline.get('results', [])}
+    changes = []
+    for result in current.get('results', []):
+        old = previous.get((result['name'], result['size']))
+        if not old:
+            continue
+        old_p50 = old['latency_ms']['p50']
+        new_p50 = result['latency_ms']['p50']
+        if not old_p50:
+            continue
+        ratio = (new_p50 - old_p50) / old_p50
+        if abs(ratio) > threshold:
+            changes.append({
+                'name': result['name'],
+                'size': result['size'],
+                'baseline_p50_ms': old_p50,
+                'current_p50_ms': new_p50,
+                'delta_pct': round(ratio * 100, 1),
+                'regression': ratio > 0,
+            })
+    return changes
+
+def print_results(report):
+    """打印结果表格"""
+    print("\n" + "=" * 96)
+    print(f"{'基准':40} {'规模':>9} {'p50(ms)':>10} {'p99(ms)':>10} {'吞吐(/s)':>12} {'峰值分配(MB)':>12}")
+    print("=" * 96)
+    for r in report['results']:
+        throughput = r['throughput_per_s'] if r['throughput_per_s'] is not None else '-'
+        print(f"{r['name']:40} {r['size']:>9} {r['latency_ms']['p50']:>10.2f} "
+              f"{r['latency_ms']['p99']:>10.2f} {throughput:>12} {str(r.get('peak_alloc_mb')):>12}")
+
+    changes = report.get('comparison')
+    if changes is not None:
+        print("\n与基线对比 (p50):")
+        if not changes:
+            print("  ✓ 无明显变化")
+        for c in changes:
+            mark = "✗" if c['regression'] else "✓"
+            print(f"  {mark} {c['name']} [{c['size']}]: {c['baseline_p50_ms']:.2f} → "
+                  f"{c['current_p50_ms']:.2f} ms ({c['delta_pct']:+.1f}%)")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="焊接枪管理系统 - 性能基准测试")
+    parser.add_argument('--sizes', default='10k', help="焊枪规模，逗号分隔，如 10k,100k,1m")
+    parser.add_argument('--only', default=','.join(GROUPS), help=f"只运行指定分组: {','.join(GROUPS)}")
+    parser.add_argument('--iterations', type=int, default=10, help="每项计时次数")
+    parser.add_argument('--file-guns', type=int, default=200, help="文件存储中焊枪文件夹数量上限")
+    parser.add_argument('--files-per-gun', type=int, default=5, help="每个焊枪文件夹中的文件数")
+    parser.add_argument('--file-kb', type=int, default=256, help="合成文件大小（KB）")
+    parser.add_argument('--template-rows', type=int, default=10000, help="导入导出的行数上限")
+    parser.add_argument('--upload-kb', type=int, default=1024, help="上传/下载文件大小（KB）")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="JSON 结果输出路径")
+    parser.add_argument('--compare', help="与之前的 JSON 结果对比")
+    parser.add_argument('--fail-on-regression', action='store_true', help="p50 回退超过 10%% 时返回非零退出码")
+    parser.add_argument('--keep', action='store_true', help="保留临时数据目录")
+    args = parser.parse_args(argv)
+
+    sizes = [parse_size(s) for s in args.sizes.split(',') if s.strip()]
+    groups = [g.strip() for g in args.only.split(',') if g.strip()]
+    unknown = [g for g in groups if g not in BENCHMARKS]
+    if unknown:
+        parser.error(f"未知分组: {', '.join(unknown)}")
+
+    report = {
+        'generated_at': datetime.now().isoformat(),
+        'git_revision': git_revision(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'parameters': vars(args),
+        'results': [],
+    }
+
+    workdir = tempfile.mkdtemp(prefix='wgm_bench_')
+    print(f"临时数据目录: {workdir}")
+    try:
+        for size in sizes:
+            for group in groups:
+                # api 与规模无关，只运行一次
+                if group == 'api' and size != sizes[0]:
+                    continue
+                print(f"\n[{group}] 规模 {size}")
+                group_dir = os.path.join(workdir, f'{group}_{size}')
+                os.makedirs(group_dir, exist_ok=True)
+                for result in BENCHMARKS[group](group_dir, size, args):
+                    report['results'].append(result)
+                    print(f"  {result['name']:40} p50 {result['latency_ms']['p50']:.2f} ms")
+    finally:
+        if args.keep:
+            print(f"保留临时数据目录: {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report['peak_rss_mb'] = peak_rss_mb()
+
+    if args.compare and os.path.exists(args.compare):
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            report['comparison'] = compare_results(json.load(f), report)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print_results(report)
+    print(f"\n结果已保存到: {args.output}")
+
+    if args.fail_on_regression and any(c['regression'] for c in report.get('comparison') or []):
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
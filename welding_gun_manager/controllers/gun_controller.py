@@ -4,6 +4,12 @@ from models.entities import WeldingGun
 import json
 
 class GunController:
+    # 允许排序的列（ORDER BY 不能绑定参数，只接受白名单中的列名）
+    SORTABLE_COLUMNS = ('id', 'name', 'type', 'model', 'serial_number', 'status',
+                        'location', 'last_maintenance', 'created_at')
+    # 搜索结果最多显示的行数（结果全部保存在内存中，超过时提示用户缩小条件）
+    SEARCH_RESULT_LIMIT = 1000
+    
     def __init__(self, db=None):
         self.db = db or Database()
     
@@ -113,6 +119,61 @@ class GunController:
             ))
         return guns
     
+    def _search_condition(self, search_term):
+        """搜索条件：名称、类型、型号、位置或序列号包含搜索词"""
+        if not search_term:
+            return "", ()
+        param = f"%{search_term}%"
+        return ("WHERE name LIKE ? OR type LIKE ? OR model LIKE ? OR location LIKE ? OR serial_number LIKE ?",
+                (param,) * 5)
+    
+    def search_query(self, search_term, order_by='name', descending=False, limit=None):
+        """构造搜索 SQL（供后台增量搜索使用独立连接执行），limit 为最多返回的行数"""
+        if order_by not in self.SORTABLE_COLUMNS:
+            order_by = 'name'
+        direction = 'DESC' if descending else 'ASC'
+        where, params = self._search_condition(search_term)
+        query = f"SELECT * FROM guns {where} ORDER BY {order_by} {direction}, id {direction}"
+        if limit is not None:
+            return f"{query} LIMIT ?", params + (limit,)
+        return query, params
+    
+    def count_guns(self, search_term=''):
+        """统计工枪数量（可按搜索词过滤）"""
+        where, params = self._search_condition(search_term)
+        row = self.db.fetch_one(f"SELECT COUNT(*) as count FROM guns {where}", params)
+        return row['count'] if row else 0
+    
+    def get_guns_page(self, offset, limit, search_term='', order_by='name', descending=False):
+        """分页获取工枪，排序由数据库完成"""
+        if order_by not in self.SORTABLE_COLUMNS:
+            order_by = 'name'
+        direction = 'DESC' if descending else 'ASC'
+        where, params = self._search_condition(search_term)
+        
+        query = f"""
+        SELECT * FROM guns {where}
+        ORDER BY {order_by} {direction}, id {direction}
+        LIMIT ? OFFSET ?
+        """
+        results = self.db.fetch_all(query, params + (limit, offset))
+        
+        guns = []
+        for row in results:
+            guns.append(WeldingGun(
+                id=row['id'],
+                name=row['name'],
+                type=row['type'],
+                model=row['model'],
+                serial_number=row['serial_number'],
+                status=row['status'],
+                location=row['location'],
+                last_maintenance=row['last_maintenance'],
+                notes=row['notes'],
+                created_at=row['created_at']
+            ))
+        return guns
+    
     def get_statistics(self):
         """获取统计信息"""
         stats = {}
@@ -1,28 +1,222 @@
 # controllers/preset_controller.py
 from models.database import Database
+from models.preset_parameters import parse_parameter_value, flatten_parameters, canonical_unit
+from services.preset_cache import PresetCache
+import os
 import json
 
+# 详情窗口下拉选项的目录（每个选项一个 JSON 列表文件）
+OPTIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'presets')
+
+# 详情窗口读取的选项键 -> 选项文件
+DETAIL_OPTION_FILES = {
+    'manufacturers': 'manufacturers.json',
+    'gun_types': 'gun_types.json',
+    'lines': 'lines.json',
+    'areas': 'areas.json',
+    'motor_brands': 'motor_brands.json',
+}
+
 class PresetController:
-    def __init__(self, db=None):
+    def __init__(self, db=None, options_dir=OPTIONS_DIR):
         self.db = db or Database()
+        # 按焊枪类型分组的预设缓存（parameters 已解析）
+        self.cache = PresetCache(self.db)
+        self.options_dir = options_dir
+        # 选项文件路径 -> ((修改时间, 大小), 选项列表)
+        self._option_files = {}
     
     def get_all_presets(self):
-        """获取所有预设"""
-        return self.db.fetch_all("SELECT * FROM presets ORDER BY name")
+        """获取所有预设（parameters 已解析为字典，结果来自缓存）"""
+        return self.cache.all()
+    
+    def get_presets_by_gun_type(self, gun_type):
+        """获取某个焊枪类型的预设（结果来自缓存）"""
+        return self.cache.get(gun_type)
+    
+    def _load_options(self, filename):
+        """读取一个选项文件（JSON 字符串列表），文件未变化时使用上次的结果"""
+        path = os.path.join(self.options_dir, filename)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return []
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = self._option_files.get(path)
+        if cached is not None and cached[0] == signature:
+            return list(cached[1])
+        
+        values = []
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                text = f.read().strip()
+            data = json.loads(text) if text else []
+            if isinstance(data, list):
+                values = [str(value) for value in data if value not in (None, '')]
+            else:
+                print(f"选项文件格式错误（应为列表）: {path}")
+        except (OSError, ValueError) as e:
+            print(f"读取选项文件失败 {path}: {e}")
+        self._option_files[path] = (signature, values)
+        return list(values)
+    
+    def get_detail_options(self, gun_type=None):
+        """
+        详情窗口（views/detail_window.DetailWindow）的下拉选项
+        
+        Returns:
+            dict: manufacturers / gun_types / lines / areas / motor_brands 选项列表
+                  （来自 presets/ 目录的选项文件，gun_types 另外合并已有预设的焊枪类型）；
+                  给定 gun_type 时还包含 weld_presets（该类型的预设）
+        """
+        options = {key: self._load_options(filename) for key, filename in DETAIL_OPTION_FILES.items()}
+        for preset_type in self.cache.gun_types():
+            if preset_type not in options['gun_types']:
+                options['gun_types'].append(preset_type)
+        if gun_type:
+            options['weld_presets'] = self.get_presets_by_gun_type(gun_type)
+        return options
     
     def get_preset_by_id(self, preset_id):
         """根据ID获取预设"""
         return self.db.fetch_one("SELECT * FROM presets WHERE id = ?", (preset_id,))
     
+    def _write_parameters(self, conn, preset_id, parameters):
+        """重写一个预设的参数行（调用方负责事务）"""
+        conn.execute("DELETE FROM preset_parameters WHERE preset_id = ?", (preset_id,))
+        conn.executemany(
+            "INSERT OR REPLACE INTO preset_parameters (preset_id, name, value_num, value_text, unit) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [(preset_id,) + row for row in flatten_parameters(parameters)]
+        )
+    
     def create_preset(self, name, gun_type, parameters=None, description=None):
-        """创建预设"""
+        """创建预设（parameters 同时保存为 JSON 和可索引的参数行）"""
         try:
-            params_json = json.dumps(parameters or {})
-            self.db.execute('''
-            INSERT INTO presets (name, gun_type, parameters, description, created_at)
-            VALUES (?, ?, ?, ?, datetime('now'))
-            ''', (name, gun_type, params_json, description))
+            params_json = json.dumps(parameters or {}, ensure_ascii=False)
+            conn = self.db.connect()
+            with conn:
+                cursor = conn.execute('''
+                INSERT INTO presets (name, gun_type, parameters, description, created_at)
+                VALUES (?, ?, ?, ?, datetime('now'))
+                ''', (name, gun_type, params_json, description))
+                self._write_parameters(conn, cursor.lastrowid, parameters or {})
+            self.cache.invalidate(gun_type)
             return True
         except Exception as e:
             print(f"创建预设失败: {e}")
             return False
+    
+    def update_preset(self, preset_id, name=None, gun_type=None, parameters=None, description=None):
+        """更新预设，参数为 None 的字段保持不变"""
+        try:
+            fields = {'name': name, 'gun_type': gun_type, 'description': description}
+            if parameters is not None:
+                fields['parameters'] = json.dumps(parameters, ensure_ascii=False)
+            fields = {key: value for key, value in fields.items() if value is not None}
+            old = self.get_preset_by_id(preset_id)
+
+            conn = self.db.connect()
+            with conn:
+                if fields:
+                    assignments = ", ".join(f"{key} = ?" for key in fields)
+                    conn.execute(f"UPDATE presets SET {assignments} WHERE id = ?",
+                                 tuple(fields.values()) + (preset_id,))
+                if parameters is not None:
+                    self._write_parameters(conn, preset_id, parameters)
+            self.cache.invalidate(*{gun_type or (old or {}).get('gun_type'), (old or {}).get('gun_type')})
+            return True
+        except Exception as e:
+            print(f"更新预设失败: {e}")
+            return False
+    
+    def delete_preset(self, preset_id):
+        """删除预设及其参数行"""
+        try:
+            old = self.get_preset_by_id(preset_id)
+            conn = self.db.connect()
+            with conn:
+                conn.execute("DELETE FROM preset_parameters WHERE preset_id = ?", (preset_id,))
+                conn.execute("DELETE FROM presets WHERE id = ?", (preset_id,))
+            if old:
+                self.cache.invalidate(old['gun_type'])
+            return True
+        except Exception as e:
+            print(f"删除预设失败: {e}")
+            return False
+    
+    def get_preset_parameters(self, preset_id):
+        """
+        获取预设的参数行
+
+        Returns:
+            dict: {参数名: {'value': 数值或文本, 'unit': 单位}}
+        """
+        rows = self.db.fetch_all(
+            "SELECT name, value_num, value_text, unit FROM preset_parameters WHERE preset_id = ? ORDER BY name",
+            (preset_id,)
+        )
+        return {
+            row['name']: {
+                'value': row['value_num'] if row['value_num'] is not None else row['value_text'],
+                'unit': row['unit'],
+            }
+            for row in rows
+        }
+    
+    def find_presets(self, gun_type=None, ranges=None, equals=None, unit=None):
+        """
+        按参数查找预设（走 preset_parameters 索引，不解析 JSON）
+
+        Args:
+            gun_type: 焊枪类型，为 None 时不限
+            ranges: {参数名: (最小值, 最大值[, 单位])}，任一端为 None 表示不限，
+                    如 {'force': (3, 4, 'kN')} 也会匹配 "3500 N"
+            equals: {参数名: 值}，带单位的值按换算后的数值和单位匹配（"3.5 kN" 匹配 "3500 N"），
+                    其余按数值（无单位）或原文本精确匹配
+            unit: 范围条件未单独给出单位时使用的单位；为 None 时只匹配没有单位的数值
+
+        Returns:
+            list: 预设行列表，按名称排序
+
+        Raises:
+            ValueError: 不认识的单位
+        """
+        conditions = []
+        params = []
+        if gun_type is not None:
+            conditions.append("p.gun_type = ?")
+            params.append(gun_type)
+
+        for name, bounds in (ranges or {}).items():
+            low, high = bounds[0], bounds[1]
+            # 边界换算为标准单位，与存储的数值直接比较
+            range_unit, factor = canonical_unit(bounds[2] if len(bounds) > 2 else unit)
+            clause = "SELECT preset_id FROM preset_parameters WHERE name = ? AND value_num IS NOT NULL AND unit IS ?"
+            values = [name, range_unit]
+            if low is not None:
+                clause += " AND value_num >= ?"
+                values.append(float(low) * factor)
+            if high is not None:
+                clause += " AND value_num <= ?"
+                values.append(float(high) * factor)
+            conditions.append(f"p.id IN ({clause})")
+            params.extend(values)
+
+        for name, value in (equals or {}).items():
+            number, text, value_unit = parse_parameter_value(value)
+            if number is not None:
+                # 换算后的浮点数可能有舍入误差，按相对误差比较
+                tolerance = abs(number) * 1e-9
+                conditions.append("p.id IN (SELECT preset_id FROM preset_parameters "
+                                  "WHERE name = ? AND value_num BETWEEN ? AND ? AND unit IS ?)")
+                params.extend([name, number - tolerance, number + tolerance, value_unit])
+            else:
+                conditions.append("p.id IN (SELECT preset_id FROM preset_parameters WHERE name = ? AND value_text = ?)")
+                params.extend([name, text])
+
+        query = "SELECT p.* FROM presets p"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY p.name"
+        return self.db.fetch_all(query, tuple(params))
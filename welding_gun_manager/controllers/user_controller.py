@@ -1,23 +1,18 @@
 # controllers/user_controller.py
 from models.database import Database
 from models.entities import User
+from services.auth_service import check_user_password, hash_password, is_password_hash
+from services.permission_service import Permission, ALL_PERMISSIONS, get_policy
 
 class UserController:
     def __init__(self, db=None):
         self.db = db or Database()
+        # 已登录用户（login 设置）
+        self.current_user = None
     
     def authenticate(self, username, password):
-        """用户认证"""
-        if username == "administrator":
-            row = self.db.fetch_one(
-                "SELECT * FROM users WHERE username = ? AND password IS NULL",
-                (username,)
-            )
-        else:
-            row = self.db.fetch_one(
-                "SELECT * FROM users WHERE username = ? AND password = ?",
-                (username, password)
-            )
+        """用户认证（校验密码哈希，旧的明文密码在登录成功后升级为哈希）"""
+        row = check_user_password(self.db, username, password, allow_passwordless=True)
         
         if row:
             # 安全地获取full_name，如果不存在则使用username
@@ -36,6 +31,33 @@ class UserController:
             )
         return None
     
+    def login(self, username, password):
+        """登录并记录当前用户"""
+        self.current_user = self.authenticate(username, password)
+        return self.current_user
+    
+    def logout(self):
+        self.current_user = None
+    
+    def get_current_user(self):
+        return self.current_user
+    
+    def has_permission(self, permission):
+        """当前用户是否拥有权限"""
+        return get_policy().allowed(self.current_user, permission)
+    
+    def is_admin(self):
+        return self.has_permission(ALL_PERMISSIONS)
+    
+    def can_add(self):
+        return self.has_permission(Permission.ADD_GUN)
+    
+    def can_edit(self):
+        return self.has_permission(Permission.EDIT_GUN)
+    
+    def can_delete(self):
+        return self.has_permission(Permission.DELETE_GUN)
+    
     def get_user_by_username(self, username):
         """根据用户名获取用户"""
         row = self.db.fetch_one(
@@ -83,11 +105,16 @@ class UserController:
     def create_user(self, user):
         """创建用户"""
         try:
+            # 密码只保存哈希
+            password = user.password
+            if password is not None and not is_password_hash(password):
+                password = hash_password(password)
+            
             self.db.execute('''
             INSERT INTO users (username, password, role, full_name, email, created_at)
             VALUES (?, ?, ?, ?, ?, ?)
             ''', (
-                user.username, user.password, user.role,
+                user.username, password, user.role,
                 user.full_name, user.email, user.created_at
             ))
             return True
@@ -2,14 +2,157 @@
 import time
 import os
 import sys
+import json
+import argparse
+import platform
+import statistics
+import subprocess
+import importlib
+from datetime import datetime
 
-def diagnose_imports():
-    """诊断导入问题"""
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+# 启动性能分析的入口脚本
+STARTUP_ENTRY_POINTS = ['main.py', 'main_fast.py', 'main_light.py', 'main_simple.py']
+
+# 默认的基线文件
+DEFAULT_BASELINE = os.path.join(current_dir, 'startup_baseline.json')
+
+# 超过基线该比例（且绝对值超过 REGRESSION_MIN_MS）视为性能回退
+REGRESSION_THRESHOLD = 0.10
+REGRESSION_MIN_MS = 5.0
+
+_REPORT_MARKER = "@@STARTUP_PROFILE@@"
+
+# 在子进程中运行入口脚本的驱动代码：
+# 对 Database.initialize、控制器构造、Tk 创建和首帧计时，首帧绘制后立即退出主循环
+_STARTUP_DRIVER = r'''
+import json, os, sys, time, runpy
+T0 = time.perf_counter()
+script = os.path.abspath(sys.argv[1])
+base = os.path.dirname(script)
+os.chdir(base)
+sys.path.insert(0, base)
+
+timings = {'db_initialize_ms': 0.0, 'db_initialize_calls': 0, 'controllers_ms': {}, 'dialogs': []}
+
+def now_ms():
+    return (time.perf_counter() - T0) * 1000
+
+class FirstFrame(BaseException):
+    pass
+
+import tkinter
+from tkinter import messagebox
+
+_tk_init = tkinter.Tk.__init__
+def tk_init(self, *args, **kwargs):
+    timings.setdefault('tk_created_ms', now_ms())
+    try:
+        _tk_init(self, *args, **kwargs)
+    except Exception as e:
+        timings['tk_error'] = str(e)
+        raise
+tkinter.Tk.__init__ = tk_init
+
+def mainloop(self=None, n=0):
+    root = self if self is not None else tkinter._default_root
+    if root is not None:
+        root.update()
+    timings['first_frame_ms'] = now_ms()
+    raise FirstFrame()
+tkinter.Misc.mainloop = mainloop
+tkinter.mainloop = mainloop
+
+def make_dialog(name):
+    def dialog(*args, **kwargs):
+        timings['dialogs'].append(name + ': ' + ' '.join(str(a) for a in args)[:200])
+        return None
+    return dialog
+for name in dir(messagebox):
+    if name.startswith(('show', 'ask')):
+        setattr(messagebox, name, make_dialog(name))
+
+def timed(record):
+    def wrap(func):
+        def inner(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record((time.perf_counter() - start) * 1000)
+        return inner
+    return wrap
+
+# 数据库和控制器在被测脚本导入它们时才打补丁，导入耗时照常计入脚本的启动时间
+import importlib.abc, importlib.machinery
+
+def patch_database(module):
+    def record_db(elapsed):
+        timings['db_initialize_ms'] += elapsed
+        timings['db_initialize_calls'] += 1
+    module.Database.initialize = timed(record_db)(module.Database.initialize)
+
+def patch_controller(class_name):
+    def patch(module):
+        def record(elapsed):
+            timings['controllers_ms'][class_name] = timings['controllers_ms'].get(class_name, 0.0) + elapsed
+        cls = getattr(module, class_name)
+        cls.__init__ = timed(record)(cls.__init__)
+    return patch
+
+patches = {
+    'models.database': patch_database,
+    'controllers.gun_controller': patch_controller('GunController'),
+    'controllers.user_controller': patch_controller('UserController'),
+    'controllers.preset_controller': patch_controller('PresetController'),
+    'controllers.file_controller': patch_controller('FileController'),
+}
+
+class PatchOnImport(importlib.abc.MetaPathFinder):
+    def find_spec(self, name, path, target=None):
+        if name not in patches:
+            return None
+        spec = importlib.machinery.PathFinder.find_spec(name, path)
+        if spec is None or spec.loader is None:
+            return spec
+        exec_module = spec.loader.exec_module
+        def exec_and_patch(module):
+            exec_module(module)
+            try:
+                patches[name](module)
+            except Exception as e:
+                timings['patch_error'] = str(e)
+        spec.loader.exec_module = exec_and_patch
+        return spec
+
+sys.meta_path.insert(0, PatchOnImport())
+
+timings['preload_ms'] = now_ms()
+try:
+    runpy.run_path(script, run_name='__main__')
+except FirstFrame:
+    pass
+except SystemExit as e:
+    timings['exit_code'] = e.code
+except BaseException as e:
+    timings['error'] = repr(e)
+timings['total_ms'] = now_ms()
+print(MARKER + json.dumps(timings, ensure_ascii=False))
+sys.stdout.flush()
+os._exit(0)
+'''
+
+
+def diagnose_imports(results=None):
+    """诊断导入问题
+
+    Args:
+        results: 可选列表，每个模块的导入结果（名称、是否成功、耗时毫秒）会追加到其中
+    """
     print("诊断导入问题...")
     print("=" * 60)
     
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    
     # 检查关键文件是否存在
     critical_files = [
         ('views/main_window.py', '主窗口模块'),
@@ -47,22 +190,25 @@ def diagnose_imports():
     ]
     
     for module_name, description in test_modules:
-        start_time = time.time()
+        start_time = time.perf_counter()
         try:
-            if '.' in module_name:
-                # 处理点号导入
-                parts = module_name.split('.')
-                exec(f"import {parts[0]}")
-                for i in range(1, len(parts)):
-                    exec(f"from {'.'.join(parts[:i])} import {parts[i]}")
-            else:
-                exec(f"import {module_name}")
-            
-            elapsed = time.time() - start_time
+            importlib.import_module(module_name)
+            elapsed = time.perf_counter() - start_time
             print(f"{description:20} ✓ 导入成功 ({elapsed:.3f}秒)")
+            ok, error = True, None
         except Exception as e:
-            elapsed = time.time() - start_time
+            elapsed = time.perf_counter() - start_time
             print(f"{description:20} ✗ 导入失败: {type(e).__name__} ({elapsed:.3f}秒)")
+            ok, error = False, f"{type(e).__name__}: {e}"
+    
+        if results is not None:
+            results.append({
+                'module': module_name,
+                'description': description,
+                'ok': ok,
+                'error': error,
+                'elapsed_ms': round(elapsed * 1000, 3),
+            })
     
     return all_exist
 
@@ -101,6 +247,274 @@ def test_database():
         print(f"✗ 数据库连接失败: {str(e)}")
         return False
 
+# ========== 启动性能分析 ==========
+
+def parse_importtime(stderr_text, top=25):
+    """
+    解析 -X importtime 输出
+
+    Returns:
+        dict: 导入总耗时和按累计耗时排序的前 top 个模块
+    """
+    modules = []
+    for line in stderr_text.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3:
+            continue
+        try:
+            self_us = int(parts[0].strip())
+            cumulative_us = int(parts[1].strip())
+        except ValueError:
+            # 表头行
+            continue
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules.append({
+            'module': name.strip(),
+            'depth': depth,
+            'self_ms': self_us / 1000,
+            'cumulative_ms': cumulative_us / 1000,
+        })
+
+    modules.sort(key=lambda m: m['cumulative_ms'], reverse=True)
+    return {
+        'module_count': len(modules),
+        'total_self_ms': round(sum(m['self_ms'] for m in modules), 3),
+        'top_modules': modules[:top],
+    }
+
+def profile_entry_point(script, timeout=120, top=25):
+    """
+    在独立子进程中启动入口脚本，记录导入耗时、数据库初始化、控制器构造和首帧时间
+
+    Returns:
+        dict: 单次运行的计时结果
+    """
+    script_path = os.path.join(current_dir, script)
+    driver = _STARTUP_DRIVER.replace('MARKER', repr(_REPORT_MARKER))
+
+    start = time.perf_counter()
+    try:
+        proc = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', driver, script_path],
+            cwd=current_dir,
+            stdin=subprocess.DEVNULL,
+            capture_output=True,
+            text=True,
+            encoding='utf-8',
+            errors='replace',
+            timeout=timeout,
+        )
+    except subprocess.TimeoutExpired:
+        return {'script': script, 'error': f"超时（{timeout}秒）"}
+    wall_ms = (time.perf_counter() - start) * 1000
+
+    result = {'script': script, 'process_wall_ms': round(wall_ms, 3)}
+    for line in proc.stdout.splitlines():
+        if line.startswith(_REPORT_MARKER):
+            result.update(json.loads(line[len(_REPORT_MARKER):]))
+            break
+    else:
+        result['error'] = result.get('error') or f"未获得分析结果（退出码 {proc.returncode}）"
+        result['stderr_tail'] = [l for l in proc.stderr.splitlines() if not l.startswith('import time:')][-10:]
+
+    result['imports'] = parse_importtime(proc.stderr, top=top)
+    return result
+
+def _median_metrics(runs):
+    """多次运行取中位数，降低噪声"""
+    ok_runs = [r for r in runs if 'total_ms' in r]
+    if not ok_runs:
+        return runs[-1]
+
+    merged = dict(ok_runs[-1])
+    for key in ('preload_ms', 'tk_created_ms', 'first_frame_ms', 'total_ms',
+                'db_initialize_ms', 'process_wall_ms'):
+        values = [r[key] for r in ok_runs if r.get(key) is not None]
+        if values:
+            merged[key] = round(statistics.median(values), 3)
+
+    controllers = {}
+    for name in {n for r in ok_runs for n in r.get('controllers_ms', {})}:
+        controllers[name] = round(statistics.median(
+            [r['controllers_ms'].get(name, 0.0) for r in ok_runs]), 3)
+    merged['controllers_ms'] = controllers
+
+    merged['imports']['total_self_ms'] = round(statistics.median(
+        [r['imports']['total_self_ms'] for r in ok_runs]), 3)
+    merged['runs'] = len(ok_runs)
+    return merged
+
+def profile_startup(entry_points=None, repeat=3, top=25):
+    """
+    对所有入口脚本做启动性能分析
+
+    Returns:
+        dict: 可直接保存为 JSON 的报告
+    """
+    entry_points = entry_points or STARTUP_ENTRY_POINTS
+    report = {
+        'generated_at': datetime.now().isoformat(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'entries': {},
+    }
+
+    for script in entry_points:
+        print(f"分析启动: {script} ...")
+        runs = [profile_entry_point(script, top=top) for _ in range(max(1, repeat))]
+        report['entries'][script] = _median_metrics(runs)
+
+    return report
+
+def _flatten_metrics(entry):
+    """提取用于比较的指标 {名称: 毫秒}"""
+    metrics = {}
+    for key in ('tk_created_ms', 'first_frame_ms', 'total_ms', 'db_initialize_ms'):
+        if entry.get(key) is not None:
+            metrics[key] = entry[key]
+    for name, value in entry.get('controllers_ms', {}).items():
+        metrics[f"controller:{name}"] = value
+    imports = entry.get('imports', {})
+    if 'total_self_ms' in imports:
+        metrics['imports_total_ms'] = imports['total_self_ms']
+    for module in imports.get('top_modules', []):
+        if module['depth'] == 0:
+            metrics[f"import:{module['module']}"] = module['cumulative_ms']
+    return metrics
+
+def diff_reports(baseline, current, threshold=REGRESSION_THRESHOLD, min_ms=REGRESSION_MIN_MS):
+    """
+    对比当前报告与基线
+
+    Returns:
+        dict: regressions / improvements 两个列表，每项包含脚本、指标、基线值、当前值和变化比例
+    """
+    diff = {'regressions': [], 'improvements': []}
+
+    for script, entry in current.get('entries', {}).items():
+        base_entry = baseline.get('entries', {}).get(script)
+        if not base_entry:
+            continue
+
+        base_metrics = _flatten_metrics(base_entry)
+        for metric, value in _flatten_metrics(entry).items():
+            if metric not in base_metrics:
+                continue
+            old = base_metrics[metric]
+            delta = value - old
+            if abs(delta) < min_ms:
+                continue
+            ratio = delta / old if old else float('inf')
+            item = {
+                'script': script,
+                'metric': metric,
+                'baseline_ms': round(old, 3),
+                'current_ms': round(value, 3),
+                'delta_ms': round(delta, 3),
+                'delta_pct': round(ratio * 100, 1) if old else None,
+            }
+            if ratio > threshold:
+                diff['regressions'].append(item)
+            elif ratio < -threshold:
+                diff['improvements'].append(item)
+
+    for key in diff:
+        diff[key].sort(key=lambda item: abs(item['delta_ms']), reverse=True)
+    return diff
+
+def print_startup_report(report, diff=None):
+    """打印启动分析摘要"""
+    print("\n" + "=" * 60)
+    print("启动性能分析")
+    print("=" * 60)
+
+    for script, entry in report['entries'].items():
+        print(f"\n{script}")
+        if entry.get('error'):
+            print(f"  ✗ {entry['error']}")
+        if entry.get('tk_error'):
+            print(f"  ✗ Tk 初始化失败: {entry['tk_error']}")
+        for key, label in (('tk_created_ms', '创建Tk窗口'), ('first_frame_ms', '首帧绘制'),
+                           ('db_initialize_ms', 'Database.initialize'), ('total_ms', '总耗时')):
+            if entry.get(key) is not None:
+                print(f"  {label:20} {entry[key]:10.1f} ms")
+        for name, value in entry.get('controllers_ms', {}).items():
+            print(f"  {name:20} {value:10.1f} ms")
+
+        imports = entry.get('imports', {})
+        print(f"  导入模块 {imports.get('module_count', 0)} 个，合计 {imports.get('total_self_ms', 0):.1f} ms")
+        for module in imports.get('top_modules', [])[:5]:
+            print(f"    {module['module']:40} {module['cumulative_ms']:8.1f} ms")
+
+    if diff is not None:
+        print("\n" + "=" * 60)
+        print("与基线对比")
+        print("=" * 60)
+        if not diff['regressions']:
+            print("✓ 没有发现性能回退")
+        for item in diff['regressions']:
+            print(f"✗ {item['script']} {item['metric']}: "
+                  f"{item['baseline_ms']:.1f} → {item['current_ms']:.1f} ms ({item['delta_pct']}%)")
+        for item in diff['improvements']:
+            print(f"✓ {item['script']} {item['metric']}: "
+                  f"{item['baseline_ms']:.1f} → {item['current_ms']:.1f} ms ({item['delta_pct']}%)")
+
+def run_diagnostic():
+    """运行诊断并返回报告（供主程序的诊断对话框使用）"""
+    import_results = []
+    files_ok = diagnose_imports(import_results)
+    db_ok = test_database()
+    return {
+        'generated_at': datetime.now().isoformat(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'files_ok': files_ok,
+        'database_ok': db_ok,
+        'imports': import_results,
+    }
+
+def run_startup_profile(argv=None):
+    """命令行：启动性能分析，输出 JSON 报告并与基线对比"""
+    parser = argparse.ArgumentParser(description="焊接枪管理系统 - 启动性能分析")
+    parser.add_argument('--profile', action='store_true', help="运行启动性能分析")
+    parser.add_argument('--entry', action='append', help="只分析指定入口脚本（可多次指定）")
+    parser.add_argument('--repeat', type=int, default=3, help="每个入口运行次数，取中位数")
+    parser.add_argument('--top', type=int, default=25, help="报告中保留的最慢导入模块数")
+    parser.add_argument('--output', default='startup_profile.json', help="JSON 报告输出路径")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="基线文件路径")
+    parser.add_argument('--save-baseline', action='store_true', help="把本次结果保存为基线")
+    parser.add_argument('--fail-on-regression', action='store_true', help="发现回退时返回非零退出码")
+    args = parser.parse_args(argv)
+
+    report = profile_startup(args.entry, repeat=args.repeat, top=args.top)
+
+    diff = None
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        diff = diff_reports(baseline, report)
+        report['baseline'] = {'path': args.baseline, 'generated_at': baseline.get('generated_at')}
+        report['diff'] = diff
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"基线已保存到: {args.baseline}")
+
+    print_startup_report(report, diff)
+    print(f"\nJSON 报告: {args.output}")
+
+    if args.fail_on_regression and diff and diff['regressions']:
+        return 1
+    return 0
+
 def main():
     """主诊断函数"""
     print("焊接枪管理系统 - 诊断工具")
@@ -134,4 +548,6 @@ def main():
     input()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if len(sys.argv) > 1:
+        sys.exit(run_startup_profile())
+    main()
@@ -1,15 +1,95 @@
 # file_operations.py
 import os
+import time
 import zipfile
 import shutil
+import threading
 from datetime import datetime
 import json
 
+from utils.file_utils import copy_file, hash_file
+from utils.locking import file_lock
+from services.integrity_service import CHECKSUM_ALGORITHM, MANIFEST_KEY, checksum_entry
+from services.metrics import metrics
+
+FILE_COPY_SECONDS = metrics.histogram(
+    'welding_gun_file_copy_seconds', "保存焊枪文件（复制并计算校验和）耗时（秒）", ('file_type',))
+FILE_COPY_BYTES = metrics.counter(
+    'welding_gun_file_copy_bytes_total', "保存焊枪文件复制的字节数", ('file_type',))
+ZIP_SECONDS = metrics.histogram(
+    'welding_gun_zip_seconds', "焊枪文件夹打包为 ZIP 的耗时（秒）")
+ZIP_BYTES = metrics.counter(
+    'welding_gun_zip_bytes_total', "打包的原始字节数")
+
+# 本身已压缩的格式直接存储，重复压缩只浪费 CPU
+STORED_EXTENSIONS = {'.zip', '.7z', '.rar', '.gz', '.jpg', '.jpeg', '.png', '.gif', '.webp', '.mp4', '.pdf'}
+
+# 不打包的文件：gun_info.json 的锁文件
+ZIP_SKIPPED_FILES = {'gun_info.json.lock'}
+
+
+def write_gun_zip(folder_path, zip_path, compresslevel=6):
+    """
+    把焊枪文件夹写入ZIP文件（先写临时文件，完成后替换）
+    
+    模块级函数，便于在进程池中调用。
+    
+    Returns:
+        dict: files（文件数）、bytes（原始字节数）、zip_bytes（ZIP大小）
+    """
+    temp_path = f"{zip_path}.tmp"
+    file_count = 0
+    total_bytes = 0
+    with zipfile.ZipFile(temp_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=compresslevel) as zipf:
+        for root, dirs, files in os.walk(folder_path):
+            dirs.sort()
+            for file in sorted(files):
+                if file in ZIP_SKIPPED_FILES:
+                    continue
+                file_path = os.path.join(root, file)
+                arcname = os.path.relpath(file_path, folder_path)
+                if os.path.splitext(file)[1].lower() in STORED_EXTENSIONS:
+                    zipf.write(file_path, arcname, compress_type=zipfile.ZIP_STORED)
+                else:
+                    zipf.write(file_path, arcname)
+                file_count += 1
+                total_bytes += os.path.getsize(file_path)
+    os.replace(temp_path, zip_path)
+    return {'files': file_count, 'bytes': total_bytes, 'zip_bytes': os.path.getsize(zip_path)}
+
+
+def record_zip(elapsed, stats):
+    """记录一次打包的耗时和字节数（write_gun_zip 可能在工作进程中执行，由主进程记录）"""
+    ZIP_SECONDS.observe(elapsed)
+    ZIP_BYTES.inc(stats.get('bytes', 0))
+
+
 class GunFileManager:
     """焊枪文件管理器"""
     
-    def __init__(self, base_dir="uploaded_guns"):
+    # 文件类型到子文件夹的映射
+    TYPE_TO_FOLDER = {
+        '3d': '3d_models',
+        '2d': '2d_drawings',
+        'image': 'images',
+        'signature': 'signature_drawings',
+        'dwg': 'dwg_files'
+    }
+    
+    # 上传后需要生成缩略图的文件类型
+    THUMBNAIL_TYPES = ('image', '2d', 'signature')
+    
+    def __init__(self, base_dir="uploaded_guns", thumbnails=None):
         self.base_dir = base_dir
+        # 可选的 ThumbnailService，设置后上传图片时在后台生成缩略图
+        self.thumbnails = thumbnails
+        
+        # 目录索引 {文件夹名: ((gun_info.json 修改时间, 大小), 焊枪信息)}，未变化的信息文件不再重复解析
+        self._catalog = {}
+        self._catalog_lock = threading.Lock()
+        # 文件监视器运行时为 True：索引由监视器增量维护，get_all_guns 不再扫描目录
+        self.catalog_watched = False
+        
         self.ensure_directory_exists()
     
     def ensure_directory_exists(self):
@@ -45,8 +125,11 @@ class GunFileManager:
         gun_info['created_at'] = datetime.now().isoformat()
         gun_info['folder_name'] = folder_name
         
-        with open(info_file, 'w', encoding='utf-8') as f:
-            json.dump(gun_info, f, ensure_ascii=False, indent=2)
+        with file_lock(info_file):
+            with open(info_file, 'w', encoding='utf-8') as f:
+                json.dump(gun_info, f, ensure_ascii=False, indent=2)
+        
+        self.refresh_catalog_entry(folder_path)
         
         return folder_path
     
@@ -63,17 +146,14 @@ class GunFileManager:
             str: 保存后的文件路径
         """
         # 映射文件类型到子文件夹
-        type_to_folder = {
-            '3d': '3d_models',
-            '2d': '2d_drawings',
-            'image': 'images',
-            'signature': 'signature_drawings',
-            'dwg': 'dwg_files'
-        }
+        type_to_folder = self.TYPE_TO_FOLDER
         
         if file_type not in type_to_folder:
             raise ValueError(f"不支持的文件类型: {file_type}")
         
+        # 已归档到二级存储的焊枪先恢复
+        self.ensure_local(folder_path)
+        
         # 获取原始文件名
         original_filename = os.path.basename(file_path)
         
@@ -88,37 +168,97 @@ class GunFileManager:
             new_filename = f"{name}_{timestamp}{ext}"
             target_path = os.path.join(target_folder, new_filename)
         
-        # 复制文件
-        shutil.copy2(file_path, target_path)
+        # 复制文件（reflink / copy_file_range / sendfile，数据不经过 Python），
+        # 再对落盘后的目标文件计算校验和，记录的是实际保存的内容
+        started = time.perf_counter()
+        copy_file(file_path, target_path)
+        size = os.path.getsize(target_path)
+        digest = hash_file(target_path, CHECKSUM_ALGORITHM)
+        FILE_COPY_SECONDS.observe(time.perf_counter() - started, file_type=file_type)
+        FILE_COPY_BYTES.inc(size, file_type=file_type)
         
         # 更新信息文件
-        self.update_file_info(folder_path, file_type, os.path.basename(target_path))
+        self.update_file_info(folder_path, file_type, os.path.basename(target_path),
+                              checksum=checksum_entry(size, digest))
+        
+        # 后台生成缩略图
+        if self.thumbnails and file_type in self.THUMBNAIL_TYPES:
+            self.thumbnails.generate_async(target_path)
         
         return target_path
     
-    def update_file_info(self, folder_path, file_type, filename):
-        """更新信息文件中的文件列表"""
+    def update_file_info(self, folder_path, file_type, filename, checksum=None):
+        """更新信息文件中的文件列表（checksum 为可选的 {size, blake2b} 校验记录）"""
         info_file = os.path.join(folder_path, 'gun_info.json')
         
-        if os.path.exists(info_file):
-            with open(info_file, 'r', encoding='utf-8') as f:
-                info = json.load(f)
-            
-            # 初始化文件列表
-            if 'files' not in info:
-                info['files'] = {}
-            
-            if file_type not in info['files']:
-                info['files'][file_type] = []
-            
-            # 添加文件
-            if filename not in info['files'][file_type]:
-                info['files'][file_type].append(filename)
-                info['updated_at'] = datetime.now().isoformat()
+        # 上传、目录监视和定时校验都会改写信息文件，读取-修改-写回期间加锁（跨线程和进程）
+        with file_lock(info_file):
+            if os.path.exists(info_file):
+                with open(info_file, 'r', encoding='utf-8') as f:
+                    info = json.load(f)
                 
-                # 保存更新
-                with open(info_file, 'w', encoding='utf-8') as f:
-                    json.dump(info, f, ensure_ascii=False, indent=2)
+                # 初始化文件列表
+                if 'files' not in info:
+                    info['files'] = {}
+                
+                if file_type not in info['files']:
+                    info['files'][file_type] = []
+                
+                changed = False
+                
+                # 添加文件
+                if filename not in info['files'][file_type]:
+                    info['files'][file_type].append(filename)
+                    changed = True
+                
+                # 记录校验信息，键为相对焊枪文件夹的路径
+                if checksum is not None:
+                    relpath = f"{self.TYPE_TO_FOLDER[file_type]}/{filename}"
+                    info.setdefault(MANIFEST_KEY, {})[relpath] = checksum
+                    changed = True
+                
+                if changed:
+                    info['updated_at'] = datetime.now().isoformat()
+                    
+                    # 保存更新（先写临时文件再替换，不加锁的读取方不会读到写了一半的文件）
+                    temp = f"{info_file}.tmp"
+                    with open(temp, 'w', encoding='utf-8') as f:
+                        json.dump(info, f, ensure_ascii=False, indent=2)
+                    os.replace(temp, info_file)
+                    
+                    self.refresh_catalog_entry(folder_path)
+    
+    def get_preview_files(self, folder_path):
+        """
+        获取焊枪文件夹中可预览的图片
+        
+        Returns:
+            list: (文件类型, 文件路径) 列表，按类型、文件名排序
+        """
+        from services.thumbnail_service import is_image_file
+        
+        self.ensure_local(folder_path)
+        type_to_folder = [('image', 'images'), ('2d', '2d_drawings'), ('signature', 'signature_drawings')]
+        files = []
+        for file_type, subfolder in type_to_folder:
+            subfolder_path = os.path.join(folder_path, subfolder)
+            if not os.path.isdir(subfolder_path):
+                continue
+            for name in sorted(os.listdir(subfolder_path)):
+                path = os.path.join(subfolder_path, name)
+                if is_image_file(name) and os.path.isfile(path):
+                    files.append((file_type, path))
+        return files
+    
+    def ensure_local(self, folder_path):
+        """
+        确保焊枪文件在主存储上：已归档的焊枪从二级存储解压恢复
+        
+        Returns:
+            bool: 是否执行了恢复
+        """
+        from services.storage_tiering import rehydrate_folder
+        return rehydrate_folder(folder_path)
     
     def create_zip_file(self, folder_path):
         """
@@ -133,15 +273,68 @@ class GunFileManager:
         zip_filename = os.path.basename(folder_path) + '.zip'
         zip_path = os.path.join(self.base_dir, zip_filename)
         
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for root, dirs, files in os.walk(folder_path):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    arcname = os.path.relpath(file_path, folder_path)
-                    zipf.write(file_path, arcname)
+        self.ensure_local(folder_path)
+        started = time.perf_counter()
+        stats = write_gun_zip(folder_path, zip_path)
+        record_zip(time.perf_counter() - started, stats)
         
         return zip_path
     
+    def _load_catalog_entry(self, folder_name):
+        """
+        读取一个焊枪文件夹的信息，gun_info.json 未变化时使用索引中的记录
+        
+        Returns:
+            dict: 焊枪信息；不是焊枪文件夹或读取失败时返回 None
+        """
+        info_file = os.path.join(self.base_dir, folder_name, 'gun_info.json')
+        try:
+            stat = os.stat(info_file)
+        except OSError:
+            return None
+        signature = (stat.st_mtime_ns, stat.st_size)
+        
+        with self._catalog_lock:
+            cached = self._catalog.get(folder_name)
+        if cached and cached[0] == signature:
+            return cached[1]
+        
+        try:
+            with open(info_file, 'r', encoding='utf-8') as f:
+                gun_info = json.load(f)
+        except (OSError, ValueError):
+            return None
+        
+        # 添加文件夹路径
+        gun_info['folder_path'] = os.path.join(self.base_dir, folder_name)
+        gun_info['zip_file'] = os.path.join(self.base_dir, folder_name + '.zip')
+        
+        with self._catalog_lock:
+            self._catalog[folder_name] = (signature, gun_info)
+        return gun_info
+    
+    def refresh_catalog_entry(self, folder_path):
+        """更新索引中的一个焊枪（文件夹已删除时移除）"""
+        folder_name = os.path.basename(os.path.normpath(folder_path))
+        if self._load_catalog_entry(folder_name) is None:
+            with self._catalog_lock:
+                self._catalog.pop(folder_name, None)
+    
+    def load_catalog(self):
+        """完整扫描一次目录，重建索引"""
+        if not os.path.exists(self.base_dir):
+            with self._catalog_lock:
+                self._catalog.clear()
+            return
+        
+        names = {item for item in os.listdir(self.base_dir)
+                 if os.path.isdir(os.path.join(self.base_dir, item))}
+        for item in names:
+            self._load_catalog_entry(item)
+        with self._catalog_lock:
+            for stale in set(self._catalog) - names:
+                del self._catalog[stale]
+    
     def get_all_guns(self):
         """获取所有焊枪信息"""
         guns = []
@@ -149,27 +342,21 @@ class GunFileManager:
         if not os.path.exists(self.base_dir):
             return guns
         
-        for item in os.listdir(self.base_dir):
-            item_path = os.path.join(self.base_dir, item)
+        # 监视器运行时索引已是最新，否则扫描目录（未变化的信息文件不重复解析）
+        if not self.catalog_watched:
+            self.load_catalog()
+        
+        with self._catalog_lock:
+            entries = [info for _, info in self._catalog.values()]
+        
+        for info in entries:
+            # 返回副本，调用方修改不影响索引
+            gun_info = dict(info)
             
-            if os.path.isdir(item_path):
-                info_file = os.path.join(item_path, 'gun_info.json')
-                
-                if os.path.exists(info_file):
-                    try:
-                        with open(info_file, 'r', encoding='utf-8') as f:
-                            gun_info = json.load(f)
-                        
-                        # 添加文件夹路径
-                        gun_info['folder_path'] = item_path
-                        gun_info['zip_file'] = os.path.join(self.base_dir, item + '.zip')
-                        
-                        # 检查是否有ZIP文件
-                        gun_info['has_zip'] = os.path.exists(gun_info['zip_file'])
-                        
-                        guns.append(gun_info)
-                    except:
-                        continue
+            # 检查是否有ZIP文件
+            gun_info['has_zip'] = os.path.exists(gun_info['zip_file'])
+            
+            guns.append(gun_info)
         
         # 按创建时间排序
         guns.sort(key=lambda x: x.get('created_at', ''), reverse=True)
@@ -191,9 +378,15 @@ class GunFileManager:
         gun = self.get_gun_by_name(gun_name)
         
         if gun:
+            # 删除二级存储中的归档
+            archive = gun.get('archived')
+            if archive and os.path.exists(archive.get('path', '')):
+                os.remove(archive['path'])
+            
             # 删除文件夹
             if 'folder_path' in gun and os.path.exists(gun['folder_path']):
                 shutil.rmtree(gun['folder_path'])
+                self.refresh_catalog_entry(gun['folder_path'])
             
             # 删除ZIP文件
             if 'zip_file' in gun and os.path.exists(gun['zip_file']):
@@ -0,0 +1,31 @@
+# welding_gun_manager/gunicorn_conf.py
+"""
+gunicorn 配置（Linux 部署）
+    gunicorn -c gunicorn_conf.py api_app:app
+gunicorn 管理 uvicorn 工作进程：崩溃自动重启，SIGTERM 时优雅关闭，SIGHUP 时平滑重载。
+"""
+
+import os
+
+from serve_api import default_workers, ensure_session_secret
+
+bind = os.environ.get('WELDING_GUN_API_BIND', '0.0.0.0:8000')
+workers = default_workers()
+worker_class = 'uvicorn.workers.UvicornWorker'
+
+# 大文件传输可能较慢，超时按分钟计；关闭时最多等待 30 秒让进行中的传输完成
+timeout = 300
+graceful_timeout = 30
+keepalive = 5
+
+# 定期重启工作进程，避免长时间运行后内存增长
+max_requests = 2000
+max_requests_jitter = 200
+
+accesslog = '-'
+errorlog = '-'
+
+
+def on_starting(server):
+    # 在派生工作进程之前设置共享的会话密钥
+    ensure_session_secret()
@@ -5,12 +5,19 @@
 Welding Gun Management System - Main Application
 """
 
+import time
+
+# 启动计时起点（尽量靠前，用于衡量到登录界面的耗时）
+_STARTUP_T0 = time.perf_counter()
+
+# 启动预算：从进程导入本模块到登录界面绘制完成
+STARTUP_BUDGET_MS = 300
+
 import os
 import sys
 import json
 import sqlite3
 import datetime
-import threading
 import traceback
 from pathlib import Path
 
@@ -23,28 +30,36 @@ if current_dir not in sys.path:
 try:
     import tkinter as tk
     from tkinter import ttk, messagebox, filedialog, simpledialog
-    import matplotlib.pyplot as plt
-    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-    import pandas as pd
-    from PIL import Image, ImageTk
 except ImportError as e:
     print(f"缺少依赖库: {e}")
-    print("请安装所需库: pip install matplotlib pandas pillow")
     sys.exit(1)
 
-# 本地模块导入
+# 重量级库延迟到第一次使用时导入：
+# matplotlib 在统计图表服务中、pandas 在导入导出、PIL 在图片预览
+from utils.lazy_import import lazy_import, is_available
+
+pd = lazy_import('pandas')
+Image = lazy_import('PIL.Image')
+ImageTk = lazy_import('PIL.ImageTk')
+
+for _module, _package in (('matplotlib', 'matplotlib'), ('pandas', 'pandas'), ('PIL', 'pillow')):
+    if not is_available(_module):
+        print(f"缺少依赖库: {_package}，相关功能不可用（pip install {_package}）")
+
+# 本地模块导入（控制器在 initialize_database 中创建时才导入）
 try:
-    from controllers.gun_controller import GunController
-    from controllers.user_controller import UserController
-    from controllers.preset_controller import PresetController
-    from controllers.file_controller import FileController
     from models.database import Database
+    from models.query_stats import query_stats
+    from services.metrics import metrics
+    from services.chart_service import StatisticsChartService
     from models.entities import WeldingGun, User, Preset
-    from views.login_dialog import LoginDialog
-    from views.main_window import MainWindow
-    from views.dialogs import *
     from services.file_service import FileService
     from services.preset_service import PresetService
+    from services.scheduler import get_scheduler, shutdown_scheduler, PRIORITY_LOW
+    from services.search_service import IncrementalSearch
+    from services.auth_service import get_session_manager
+    from services.permission_service import Permission, MENU_PERMISSIONS, get_policy
+    from views.virtual_table import VirtualTable
 except ImportError as e:
     print(f"模块导入错误: {e}")
     print("请确保所有模块文件都存在")
@@ -52,6 +67,13 @@ except ImportError as e:
     sys.exit(1)
 
 
+# 导航项 -> 所需权限
+NAV_PERMISSIONS = {
+    'user_management': Permission.MANAGE_USERS,
+    'settings': Permission.SETTINGS,
+}
+
+
 class WeldingGunManager:
     """焊接枪管理系统主类"""
     
@@ -60,6 +82,8 @@ class WeldingGunManager:
         self.root = None
         self.current_user = None
         self.is_admin = False
+        # 登录后签发的会话令牌
+        self.session_token = None
         
         # 控制器
         self.gun_controller = None
@@ -73,14 +97,29 @@ class WeldingGunManager:
         # 数据库
         self.db = None
         
+        # 统计图表（Figure 常驻，切换页面时复用缓存的图片）
+        self.chart_service = None
+        self.chart_photo = None
+        
+        # 后台任务调度器
+        self.scheduler = get_scheduler()
+        self.backup_task = None
+        
+        # 启动耗时（毫秒），登录界面首次绘制后记录
+        self.startup_time_ms = None
+        
         # 应用设置
         self.settings = self.load_settings()
+        self.configure_query_stats()
         
         # 应用状态
         self.app_state = {
             'logged_in': False,
             'current_view': None,
+            # 表格当前显示的搜索条件；输入中、结果未到的搜索词放在 pending_search，
+            # 结果到达时与表格数据源一起切换，二者始终一致
             'search_filter': '',
+            'pending_search': '',
             'sort_by': 'name',
             'sort_order': 'asc'
         }
@@ -97,7 +136,9 @@ class WeldingGunManager:
             'recent_files': [],
             'window_size': {'width': 1200, 'height': 800},
             'max_log_size': 10000,
-            'export_format': 'excel'
+            'export_format': 'excel',
+            'slow_query_threshold_ms': 100,
+            'slow_query_log': True
         }
         
         if os.path.exists(settings_file):
@@ -114,6 +155,27 @@ class WeldingGunManager:
         
         return default_settings
     
+    def configure_query_stats(self):
+        """按设置配置查询统计和慢查询日志"""
+        slow_log = ''
+        if self.settings.get('slow_query_log'):
+            log_dir = os.path.join(current_dir, 'logs')
+            os.makedirs(log_dir, exist_ok=True)
+            slow_log = os.path.join(log_dir, 'slow_queries.log')
+        query_stats.configure(
+            slow_threshold_ms=self.settings.get('slow_query_threshold_ms', 100),
+            slow_log_path=slow_log
+        )
+    
+    def set_current_view(self, view_id):
+        """记录当前页面，之后的数据库查询计入该页面"""
+        self.app_state['current_view'] = view_id
+        query_stats.set_context(view_id)
+        
+        # 切换页面时停止上一页面未完成的搜索
+        if getattr(self, 'gun_search', None):
+            self.gun_search.cancel()
+    
     def save_settings(self):
         """保存应用设置"""
         settings_file = os.path.join(current_dir, 'config', 'settings.json')
@@ -132,7 +194,12 @@ class WeldingGunManager:
                 messagebox.showerror("数据库错误", "数据库初始化失败")
                 return False
             
-            # 创建控制器
+            # 创建控制器（导入推迟到这里，不计入模块导入时间）
+            from controllers.gun_controller import GunController
+            from controllers.user_controller import UserController
+            from controllers.preset_controller import PresetController
+            from controllers.file_controller import FileController
+            
             self.gun_controller = GunController(self.db)
             self.user_controller = UserController(self.db)
             self.preset_controller = PresetController(self.db)
@@ -199,6 +266,9 @@ class WeldingGunManager:
             self.root = tk.Tk()
             self.root.title("焊接枪管理系统")
             
+            # 后台任务的回调统一在界面线程派发
+            self.scheduler.attach_tk(self.root)
+            
             # 设置窗口大小和位置
             width = self.settings['window_size']['width']
             height = self.settings['window_size']['height']
@@ -288,6 +358,9 @@ class WeldingGunManager:
         tools_menu.add_command(label="系统诊断", command=self.run_diagnostic)
         tools_menu.add_command(label="查看日志", command=self.show_logs)
         
+        # 登录后按权限启用/禁用菜单项
+        self.file_menu, self.edit_menu, self.tools_menu = file_menu, edit_menu, tools_menu
+        
         # 帮助菜单
         help_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="帮助", menu=help_menu)
@@ -443,6 +516,19 @@ class WeldingGunManager:
             font=("微软雅黑", 10)
         )
         remember_check.pack()
+        
+        # 记录首次显示登录界面的启动耗时
+        if self.startup_time_ms is None:
+            self.root.update_idletasks()
+            self.record_startup_time()
+    
+    def record_startup_time(self):
+        """记录并检查启动耗时是否超出预算"""
+        self.startup_time_ms = (time.perf_counter() - _STARTUP_T0) * 1000
+        if self.startup_time_ms > STARTUP_BUDGET_MS:
+            print(f"启动耗时 {self.startup_time_ms:.0f} ms，超出预算 {STARTUP_BUDGET_MS} ms")
+        else:
+            print(f"启动耗时 {self.startup_time_ms:.0f} ms（预算 {STARTUP_BUDGET_MS} ms）")
     
     def quick_login(self, username, password, username_var, password_var):
         """快速登录"""
@@ -457,14 +543,7 @@ class WeldingGunManager:
                 messagebox.showwarning("警告", "请输入用户名")
                 return
             
-            # 特殊处理administrator用户（无密码）
-            if username == "administrator":
-                user = self.user_controller.get_user_by_username(username)
-                if user and user.password is None:
-                    self.on_login_success(user)
-                    return
-            
-            # 普通用户验证
+            # 校验密码哈希（administrator 无密码时免密码登录）
             user = self.user_controller.authenticate(username, password)
             if user:
                 self.on_login_success(user)
@@ -485,6 +564,7 @@ class WeldingGunManager:
         }
         self.is_admin = (user.role == 'admin')
         self.app_state['logged_in'] = True
+        self.session_token = get_session_manager().issue(user)
         
         # 更新用户信息显示
         self.update_user_info()
@@ -534,8 +614,8 @@ class WeldingGunManager:
         ]
         
         for text, view_id, command in nav_buttons:
-            # 非管理员隐藏用户管理和系统设置
-            if not self.is_admin and view_id in ['user_management', 'settings']:
+            # 没有权限的用户隐藏用户管理和系统设置
+            if view_id in NAV_PERMISSIONS and not self.has_permission(NAV_PERMISSIONS[view_id]):
                 continue
             
             btn = tk.Button(
@@ -562,6 +642,8 @@ class WeldingGunManager:
     
     def show_dashboard(self):
         """显示仪表盘"""
+        self.set_current_view('dashboard')
+        
         # 清除内容区域
         for widget in self.content_frame.winfo_children():
             widget.destroy()
@@ -651,6 +733,8 @@ class WeldingGunManager:
     
     def show_gun_management(self):
         """显示工枪管理界面"""
+        self.set_current_view('gun_management')
+        
         for widget in self.content_frame.winfo_children():
             widget.destroy()
         
@@ -681,7 +765,11 @@ class WeldingGunManager:
         search_entry.pack(side=tk.LEFT, padx=5)
         
         def on_search():
-            self.search_guns(search_var.get())
+            self.search_guns(search_var.get().strip())
+        
+        # 边输入边搜索：停止输入后在后台查询，回车立即搜索
+        search_var.trace_add('write', lambda *args: self.on_gun_search_input(search_var.get().strip()))
+        search_entry.bind('<Return>', lambda e: on_search())
         
         search_btn = tk.Button(
             search_frame,
@@ -693,14 +781,7 @@ class WeldingGunManager:
         )
         search_btn.pack(side=tk.LEFT)
         
-        # 工枪列表
-        self.gun_tree = ttk.Treeview(
-            self.content_frame,
-            columns=('id', 'name', 'type', 'model', 'status', 'last_maintenance'),
-            show='headings'
-        )
-        
-        # 设置列
+        # 工枪列表（虚拟表格：只绘制可见行，排序在数据库中完成）
         columns = [
             ('id', 'ID', 50),
             ('name', '名称', 150),
@@ -710,17 +791,39 @@ class WeldingGunManager:
             ('last_maintenance', '上次维护', 120)
         ]
         
-        for col_id, heading, width in columns:
-            self.gun_tree.heading(col_id, text=heading)
-            self.gun_tree.column(col_id, width=width)
-        
-        # 滚动条
-        scrollbar = ttk.Scrollbar(self.content_frame, orient=tk.VERTICAL, 
-                                 command=self.gun_tree.yview)
-        self.gun_tree.configure(yscrollcommand=scrollbar.set)
-        
-        self.gun_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(20, 0), pady=20)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y, padx=(0, 20), pady=20)
+        self.gun_table = VirtualTable(
+            self.content_frame,
+            columns,
+            count_rows=lambda: self.gun_controller.count_guns(self.app_state['search_filter']),
+            fetch_rows=self.fetch_gun_rows,
+            sort_column=self.app_state['sort_by'],
+            descending=self.app_state['sort_order'] == 'desc',
+            sort_command=self.on_gun_sort
+        )
+        self.gun_table.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
+        self.gun_tree = self.gun_table.tree
+        
+        # 后台增量搜索，结果分批放入 gun_search_rows
+        self.gun_search_rows = []
+        self.gun_search_shown = None
+        self.gun_search = IncrementalSearch(
+            self.root,
+            self.gun_controller.db.db_path,
+            # 多取一行用于判断结果是否超出上限
+            build_query=lambda term: self.gun_controller.search_query(
+                term, self.app_state['sort_by'], self.app_state['sort_order'] == 'desc',
+                limit=self.gun_controller.SEARCH_RESULT_LIMIT + 1),
+            on_results=self.on_gun_search_results,
+            on_error=lambda term, e: self.update_status(f"搜索失败: {e}"),
+            map_row=lambda row: (
+                row['id'],
+                row['name'],
+                row['type'],
+                row['model'] or '',
+                row['status'],
+                row['last_maintenance'] or ''
+            )
+        )
         
         # 绑定双击事件
         self.gun_tree.bind('<Double-1>', self.on_gun_double_click)
@@ -741,32 +844,108 @@ class WeldingGunManager:
     def load_guns(self, search_term=''):
         """加载工枪数据"""
         try:
-            # 清空现有数据
-            for item in self.gun_tree.get_children():
-                self.gun_tree.delete(item)
-            
-            # 获取数据
-            guns = self.gun_controller.search_guns(search_term)
+            self.app_state['pending_search'] = search_term
+            if search_term:
+                # 搜索在后台执行，结果分批到达后显示
+                self.gun_search.start(search_term)
+                self.update_status(f"正在搜索: {search_term}")
+                return
             
-            # 插入数据
-            for gun in guns:
-                values = (
-                    gun.id,
-                    gun.name,
-                    gun.type,
-                    gun.model or '',
-                    gun.status,
-                    gun.last_maintenance or ''
-                )
-                self.gun_tree.insert('', 'end', values=values)
+            self.gun_search.cancel()
+            self.gun_search_shown = None
+            self.app_state['search_filter'] = ''
+            self.gun_table.set_source(
+                lambda: self.gun_controller.count_guns(),
+                self.fetch_gun_rows
+            )
             
-            self.update_status(f"加载了 {len(guns)} 条工枪记录")
+            self.update_status(f"共 {self.gun_table.total} 条工枪记录")
             
         except Exception as e:
             messagebox.showerror("加载错误", f"加载工枪数据失败: {str(e)}")
     
+    def reload_guns(self):
+        """数据修改后刷新工枪列表，保留搜索条件、滚动位置和选中项"""
+        try:
+            if self.app_state['pending_search']:
+                self.gun_search.start(self.app_state['pending_search'])
+            else:
+                self.gun_table.reload(keep_position=True)
+        except Exception as e:
+            messagebox.showerror("加载错误", f"加载工枪数据失败: {str(e)}")
+    
+    def on_gun_search_input(self, search_term):
+        """搜索框内容变化：清空时立即恢复全部列表，否则去抖后搜索"""
+        if search_term == self.app_state['pending_search'] and not self.gun_search.active:
+            return
+        if not search_term:
+            self.load_guns()
+            return
+        # 结果到达前表格仍显示上一次的数据源，search_filter 不变
+        self.app_state['pending_search'] = search_term
+        self.gun_search.request(search_term)
+    
+    def on_gun_search_results(self, search_term, rows, first, done):
+        """增量搜索结果到达（界面线程）"""
+        if first:
+            # 同一搜索词重新搜索（如编辑后刷新）时保留位置和选中项
+            keep_position = search_term == self.gun_search_shown
+            self.gun_search_shown = search_term
+            self.app_state['search_filter'] = search_term
+            self.gun_search_rows = list(rows)
+            self.gun_table.set_source(
+                lambda: len(self.gun_search_rows),
+                lambda offset, limit, sort_column, descending: self.gun_search_rows[offset:offset + limit],
+                keep_position=keep_position
+            )
+        else:
+            self.gun_search_rows.extend(rows)
+            self.gun_table.reload(keep_position=True)
+        
+        limit = self.gun_controller.SEARCH_RESULT_LIMIT
+        if len(self.gun_search_rows) > limit:
+            del self.gun_search_rows[limit:]
+            self.gun_table.reload(keep_position=True)
+            self.update_status(f"搜索 '{search_term}': 结果超过 {limit} 条，只显示前 {limit} 条，请输入更精确的条件")
+        elif done:
+            self.update_status(f"搜索 '{search_term}': 找到 {len(self.gun_search_rows)} 条工枪记录")
+        else:
+            self.update_status(f"搜索 '{search_term}': 已找到 {len(self.gun_search_rows)} 条...")
+    
+    def on_gun_sort(self, sort_column, descending):
+        """点击表头排序：搜索结果重新搜索，否则直接分页重取"""
+        self.app_state['sort_by'] = sort_column
+        self.app_state['sort_order'] = 'desc' if descending else 'asc'
+        if self.app_state['pending_search']:
+            self.gun_search_shown = None
+            self.gun_search.start(self.app_state['pending_search'])
+        else:
+            self.gun_table.reload()
+    
+    def fetch_gun_rows(self, offset, limit, sort_column, descending):
+        """虚拟表格的数据源：按当前搜索条件分页取行"""
+        self.app_state['sort_by'] = sort_column or 'name'
+        self.app_state['sort_order'] = 'desc' if descending else 'asc'
+        
+        guns = self.gun_controller.get_guns_page(
+            offset, limit,
+            search_term=self.app_state['search_filter'],
+            order_by=self.app_state['sort_by'],
+            descending=descending
+        )
+        return [(
+            gun.id,
+            gun.name,
+            gun.type,
+            gun.model or '',
+            gun.status,
+            gun.last_maintenance or ''
+        ) for gun in guns]
+    
     def add_gun_dialog(self):
         """添加工枪对话框"""
+        if not self.check_permission(Permission.ADD_GUN):
+            return
         dialog = GunEditDialog(self.root, title="添加工枪")
         if dialog.result:
             try:
@@ -775,7 +954,7 @@ class WeldingGunManager:
                 success = self.gun_controller.create_gun(gun)
                 if success:
                     messagebox.showinfo("成功", "工枪添加成功")
-                    self.load_guns()
+                    self.reload_guns()
                 else:
                     messagebox.showerror("错误", "添加工枪失败")
             except Exception as e:
@@ -819,6 +998,8 @@ class WeldingGunManager:
     
     def edit_gun_dialog(self):
         """编辑工枪对话框"""
+        if not self.check_permission(Permission.EDIT_GUN):
+            return
         selection = self.gun_tree.selection()
         if not selection:
             messagebox.showwarning("警告", "请先选择要编辑的工枪")
@@ -836,7 +1017,7 @@ class WeldingGunManager:
                     success = self.gun_controller.update_gun(gun_id, updated_data)
                     if success:
                         messagebox.showinfo("成功", "工枪更新成功")
-                        self.load_guns()
+                        self.reload_guns()
                     else:
                         messagebox.showerror("错误", "更新工枪失败")
             else:
@@ -846,6 +1027,8 @@ class WeldingGunManager:
     
     def delete_gun_dialog(self):
         """删除工枪对话框"""
+        if not self.check_permission(Permission.DELETE_GUN):
+            return
         selection = self.gun_tree.selection()
         if not selection:
             messagebox.showwarning("警告", "请先选择要删除的工枪")
@@ -860,7 +1043,7 @@ class WeldingGunManager:
                 success = self.gun_controller.delete_gun(gun_id)
                 if success:
                     messagebox.showinfo("成功", "工枪删除成功")
-                    self.load_guns()
+                    self.reload_guns()
                 else:
                     messagebox.showerror("错误", "删除工枪失败")
             except Exception as e:
@@ -873,10 +1056,11 @@ class WeldingGunManager:
     
     def show_user_management(self):
         """显示用户管理界面（仅管理员）"""
-        if not self.is_admin:
-            messagebox.showwarning("权限不足", "需要管理员权限")
+        if not self.check_permission(Permission.MANAGE_USERS):
             return
         
+        self.set_current_view('user_management')
+        
         for widget in self.content_frame.winfo_children():
             widget.destroy()
         
@@ -886,71 +1070,70 @@ class WeldingGunManager:
     
     def show_statistics(self):
         """显示统计分析界面"""
+        self.set_current_view('statistics')
+        
         for widget in self.content_frame.winfo_children():
             widget.destroy()
         
-        try:
-            # 获取统计数据
-            stats = self.gun_controller.get_statistics()
-            
-            # 创建图表框架
-            fig, axes = plt.subplots(1, 2, figsize=(10, 4))
-            
-            # 状态分布饼图
-            if stats.get('status_distribution'):
-                status_data = stats['status_distribution']
-                labels = list(status_data.keys())
-                sizes = list(status_data.values())
-                
-                axes[0].pie(sizes, labels=labels, autopct='%1.1f%%', startangle=90)
-                axes[0].set_title('工枪状态分布')
-                axes[0].axis('equal')
-            
-            # 类型分布柱状图
-            if stats.get('type_distribution'):
-                type_data = stats['type_distribution']
-                types = list(type_data.keys())
-                counts = list(type_data.values())
-                
-                axes[1].bar(types, counts)
-                axes[1].set_title('工枪类型分布')
-                axes[1].set_xlabel('类型')
-                axes[1].set_ylabel('数量')
-                axes[1].tick_params(axis='x', rotation=45)
-            
-            # 嵌入图表到Tkinter
-            canvas = FigureCanvasTkAgg(fig, self.content_frame)
-            canvas.draw()
-            canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
-            
-            # 添加统计表格
-            table_frame = tk.Frame(self.content_frame)
-            table_frame.pack(fill=tk.X, padx=20, pady=(0, 20))
-            
-            # 显示主要统计数据
-            tk.Label(table_frame, text="统计数据", 
-                    font=("微软雅黑", 12, "bold")).pack(anchor=tk.W)
-            
-            stats_text = tk.Text(table_frame, height=5, width=50)
-            stats_text.pack(fill=tk.X, pady=5)
-            
-            stats_info = f"""
+        # 图表区域：先显示上次缓存的图片，后台刷新完成后再替换
+        chart_label = tk.Label(self.content_frame, bg="white")
+        chart_label.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
+        
+        # 添加统计表格
+        table_frame = tk.Frame(self.content_frame)
+        table_frame.pack(fill=tk.X, padx=20, pady=(0, 20))
+        
+        # 显示主要统计数据
+        tk.Label(table_frame, text="统计数据", 
+                font=("微软雅黑", 12, "bold")).pack(anchor=tk.W)
+        
+        stats_text = tk.Text(table_frame, height=5, width=50)
+        stats_text.pack(fill=tk.X, pady=5)
+        
+        if self.chart_service is None:
+            self.chart_service = StatisticsChartService(self.db.db_path, scheduler=self.scheduler)
+        if self.chart_service.image is not None:
+            self.show_statistics_result(chart_label, stats_text,
+                                        (self.chart_service.stats, self.chart_service.image, False))
+        
+        # 按内容区宽度渲染，高度与原图表一致
+        width = self.content_frame.winfo_width() - 40
+        size = (width, 400) if width > 200 else None
+        self.chart_service.refresh(
+            callback=lambda result: self.show_statistics_result(chart_label, stats_text, result),
+            error_callback=lambda e: self.show_statistics_error(chart_label, e),
+            size=size
+        )
+    
+    def show_statistics_result(self, chart_label, stats_text, result):
+        """显示统计图表和数据（界面线程）"""
+        if not chart_label.winfo_exists():
+            # 已切换到其它页面
+            return
+        stats, image, changed = result
+        if changed or self.chart_photo is None:
+            self.chart_photo = ImageTk.PhotoImage(image)
+        chart_label.config(image=self.chart_photo)
+        
+        stats_info = f"""
 总工枪数: {stats.get('total_guns', 0)}
 在用工枪: {stats.get('active_guns', 0)}
 维护中工枪: {stats.get('maintenance_guns', 0)}
 待报废工枪: {stats.get('scrap_guns', 0)}
 """
-            stats_text.insert(tk.END, stats_info)
-            stats_text.config(state=tk.DISABLED)
-            
-        except Exception as e:
-            tk.Label(self.content_frame, text=f"加载统计数据失败: {str(e)}", 
-                    fg="red").pack(pady=50)
+        stats_text.config(state=tk.NORMAL)
+        stats_text.delete('1.0', tk.END)
+        stats_text.insert(tk.END, stats_info)
+        stats_text.config(state=tk.DISABLED)
+    
+    def show_statistics_error(self, chart_label, error):
+        """统计数据加载失败（界面线程）"""
+        if chart_label.winfo_exists():
+            chart_label.config(image='', text=f"加载统计数据失败: {str(error)}", fg="red")
     
     def show_settings_dialog(self):
         """显示设置对话框"""
-        if not self.is_admin:
-            messagebox.showwarning("权限不足", "需要管理员权限")
+        if not self.check_permission(Permission.SETTINGS):
             return
         
         dialog = SettingsDialog(self.root, self.settings)
@@ -958,10 +1141,20 @@ class WeldingGunManager:
             self.settings.update(dialog.result)
             self.save_settings()
             self.apply_theme()
+            self.configure_query_stats()
+
+            # 按新的间隔重新安排自动备份
+            if self.settings.get('auto_save', True):
+                self.start_auto_backup()
+            elif self.backup_task is not None:
+                self.scheduler.cancel(self.backup_task)
+                self.backup_task = None
             messagebox.showinfo("设置", "设置已保存，部分设置需要重启生效")
     
     def show_file_management(self):
         """显示文件管理界面"""
+        self.set_current_view('file_management')
+        
         for widget in self.content_frame.winfo_children():
             widget.destroy()
         
@@ -1015,25 +1208,35 @@ class WeldingGunManager:
         )
         
         if file_path:
-            try:
-                # 根据文件类型选择导入方法
+            if not file_path.endswith(('.xlsx', '.xls', '.csv')):
+                messagebox.showerror("错误", "不支持的文件格式")
+                return
+
+            def read_file():
+                # 根据文件类型选择导入方法（在工作线程中解析文件）
                 if file_path.endswith(('.xlsx', '.xls')):
-                    df = pd.read_excel(file_path)
-                elif file_path.endswith('.csv'):
-                    df = pd.read_csv(file_path)
-                else:
-                    messagebox.showerror("错误", "不支持的文件格式")
-                    return
-                
-                # 导入数据到数据库
-                imported = self.gun_controller.import_from_dataframe(df)
-                
-                messagebox.showinfo("导入成功", 
-                                  f"成功导入 {imported} 条记录")
-                self.load_guns()
-                
-            except Exception as e:
-                messagebox.showerror("导入错误", f"导入数据失败: {str(e)}")
+                    return pd.read_excel(file_path)
+                return pd.read_csv(file_path)
+
+            def on_loaded(df):
+                try:
+                    # 导入数据到数据库
+                    imported = self.gun_controller.import_from_dataframe(df)
+
+                    messagebox.showinfo("导入成功",
+                                      f"成功导入 {imported} 条记录")
+                    self.load_guns()
+
+                except Exception as e:
+                    messagebox.showerror("导入错误", f"导入数据失败: {str(e)}")
+
+            self.update_status("正在读取导入文件...")
+            self.scheduler.submit(
+                read_file,
+                name="import_data",
+                callback=on_loaded,
+                error_callback=lambda e: messagebox.showerror("导入错误", f"导入数据失败: {str(e)}")
+            )
     
     def export_data(self):
         """导出数据"""
@@ -1094,8 +1297,7 @@ class WeldingGunManager:
     
     def backup_database(self):
         """备份数据库"""
-        if not self.is_admin:
-            messagebox.showwarning("权限不足", "需要管理员权限")
+        if not self.check_permission(Permission.BACKUP):
             return
         
         file_path = filedialog.asksaveasfilename(
@@ -1113,8 +1315,7 @@ class WeldingGunManager:
     
     def restore_database(self):
         """恢复数据库"""
-        if not self.is_admin:
-            messagebox.showwarning("权限不足", "需要管理员权限")
+        if not self.check_permission(Permission.BACKUP):
             return
         
         if messagebox.askyesno("警告", "恢复数据库将覆盖当前数据，确定继续吗？"):
@@ -1136,9 +1337,10 @@ class WeldingGunManager:
         try:
             from diagnose import run_diagnostic
             report = run_diagnostic()
+            report['startup_time_ms'] = self.startup_time_ms
             
-            # 显示诊断结果
-            dialog = DiagnosticDialog(self.root, report)
+            # 显示诊断结果（查询统计在对话框中实时刷新）
+            DiagnosticDialog(self.root, report)
             
         except Exception as e:
             messagebox.showerror("诊断错误", f"运行诊断失败: {str(e)}")
@@ -1210,31 +1412,31 @@ Python版本: {sys.version}
         self.show_dashboard()
         self.update_status("仪表盘已刷新")
     
+    def has_permission(self, permission):
+        """当前用户是否拥有权限（位掩码按用户缓存）"""
+        return get_policy().allowed(self.current_user, permission)
+    
+    def check_permission(self, permission):
+        """操作前检查权限，没有权限时提示"""
+        if self.has_permission(permission):
+            return True
+        messagebox.showwarning("权限不足", "当前用户没有该操作的权限")
+        return False
+    
     def update_menu_permissions(self):
         """根据用户权限更新菜单项"""
-        # 启用/禁用编辑菜单项
-        for i in range(self.edit_menu.index(tk.END) + 1):
-            try:
-                label = self.edit_menu.entrycget(i, 'label')
-                if label in ['添加工枪', '编辑工枪', '删除工枪']:
-                    if not self.is_admin:
-                        self.edit_menu.entryconfig(i, state=tk.DISABLED)
-                    else:
-                        self.edit_menu.entryconfig(i, state=tk.NORMAL)
-            except:
-                pass
-        
-        # 启用/禁用工具菜单项
-        for i in range(self.tools_menu.index(tk.END) + 1):
-            try:
-                label = self.tools_menu.entrycget(i, 'label')
-                if label in ['备份数据库', '恢复数据库', '系统设置']:
-                    if not self.is_admin:
-                        self.tools_menu.entryconfig(i, state=tk.DISABLED)
-                    else:
-                        self.tools_menu.entryconfig(i, state=tk.NORMAL)
-            except:
-                pass
+        for menu in (getattr(self, name, None) for name in ('file_menu', 'edit_menu', 'tools_menu')):
+            if menu is None or menu.index(tk.END) is None:
+                continue
+            for i in range(menu.index(tk.END) + 1):
+                try:
+                    label = menu.entrycget(i, 'label')
+                except tk.TclError:
+                    # 分隔线没有 label
+                    continue
+                if label in MENU_PERMISSIONS:
+                    state = tk.NORMAL if self.has_permission(MENU_PERMISSIONS[label]) else tk.DISABLED
+                    menu.entryconfig(i, state=state)
     
     def on_closing(self):
         """关闭应用程序"""
@@ -1245,7 +1447,12 @@ Python版本: {sys.version}
             self.settings['window_size'] = {'width': width, 'height': height}
             self.save_settings()
             
+            # 停止后台任务
+            shutdown_scheduler()
+            
             # 关闭数据库连接
+            if self.chart_service:
+                self.chart_service.close()
             if self.db:
                 self.db.close()
             
@@ -1269,7 +1476,7 @@ Python版本: {sys.version}
             if not self.setup_gui():
                 return
             
-            # 启动自动备份（如果启用）
+            # 启动自动备份（如果启用，由调度器周期执行）
             if self.settings.get('auto_save', True):
                 self.start_auto_backup()
             
@@ -1284,39 +1491,40 @@ Python版本: {sys.version}
             traceback.print_exc()
     
     def start_auto_backup(self):
-        """启动自动备份"""
-        def backup_task():
-            interval = self.settings.get('backup_interval', 3600)
-            while True:
-                try:
-                    import time
-                    time.sleep(interval)
-                    
-                    # 在指定时间备份
-                    backup_dir = os.path.join(current_dir, 'backups')
-                    os.makedirs(backup_dir, exist_ok=True)
-                    
-                    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-                    backup_file = os.path.join(backup_dir, f"backup_{timestamp}.db")
-                    
-                    self.db.backup(backup_file)
-                    
-                    # 清理旧备份（保留最近5个）
-                    backup_files = sorted(
-                        [f for f in os.listdir(backup_dir) if f.startswith('backup_')],
-                        key=lambda x: os.path.getmtime(os.path.join(backup_dir, x))
-                    )
-                    
-                    if len(backup_files) > 5:
-                        for old_file in backup_files[:-5]:
-                            os.remove(os.path.join(backup_dir, old_file))
-                    
-                except Exception as e:
-                    print(f"自动备份失败: {e}")
-        
-        # 在新线程中运行备份任务
-        backup_thread = threading.Thread(target=backup_task, daemon=True)
-        backup_thread.start()
+        """启动自动备份（调度器周期任务）"""
+        if self.backup_task is not None:
+            self.scheduler.cancel(self.backup_task)
+
+        interval = self.settings.get('backup_interval', 3600)
+        self.backup_task = self.scheduler.schedule_periodic(
+            interval,
+            self.run_auto_backup,
+            priority=PRIORITY_LOW,
+            name="auto_backup",
+            error_callback=lambda e: print(f"自动备份失败: {e}")
+        )
+
+    def run_auto_backup(self):
+        """执行一次自动备份（在工作线程中运行）"""
+        backup_dir = os.path.join(current_dir, 'backups')
+        os.makedirs(backup_dir, exist_ok=True)
+
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        backup_file = os.path.join(backup_dir, f"backup_{timestamp}.db")
+
+        self.db.backup(backup_file)
+
+        # 清理旧备份（保留最近5个）
+        backup_files = sorted(
+            [f for f in os.listdir(backup_dir) if f.startswith('backup_')],
+            key=lambda x: os.path.getmtime(os.path.join(backup_dir, x))
+        )
+
+        if len(backup_files) > 5:
+            for old_file in backup_files[:-5]:
+                os.remove(os.path.join(backup_dir, old_file))
+
+        return backup_file
 
 
 # 对话框类（需要在主文件中定义或从模块导入）
@@ -1488,6 +1696,12 @@ class SettingsDialog(tk.Toplevel):
         ttk.Spinbox(data_frame, from_=1, to=24, textvariable=self.backup_var, 
                    width=10).grid(row=1, column=1, sticky=tk.W, pady=5, padx=(10, 0))
         
+        # 慢查询阈值
+        ttk.Label(data_frame, text="慢查询阈值(毫秒):").grid(row=2, column=0, sticky=tk.W, pady=5)
+        self.slow_query_var = tk.IntVar(value=self.settings.get('slow_query_threshold_ms', 100))
+        ttk.Spinbox(data_frame, from_=10, to=10000, increment=10, textvariable=self.slow_query_var,
+                   width=10).grid(row=2, column=1, sticky=tk.W, pady=5, padx=(10, 0))
+        
         # 按钮
         button_frame = ttk.Frame(self)
         button_frame.pack(fill=tk.X, padx=10, pady=(0, 10))
@@ -1518,6 +1732,7 @@ class SettingsDialog(tk.Toplevel):
             'auto_save': self.auto_save_var.get(),
             'export_format': self.export_format_var.get(),
             'backup_interval': self.backup_var.get() * 3600,
+            'slow_query_threshold_ms': self.slow_query_var.get(),
         }
         self.destroy()
 
@@ -1527,9 +1742,164 @@ class PrintDialog:
     def __init__(self, parent, data):
         pass
 
-class DiagnosticDialog:
+class DiagnosticDialog(tk.Toplevel):
+    """诊断对话框：诊断报告 + 实时数据库查询统计 + 运行指标"""
+    
+    REFRESH_MS = 2000
+    
     def __init__(self, parent, report):
-        pass
+        super().__init__(parent)
+        self.title("系统诊断")
+        self.geometry("900x600")
+        self.report = report
+        self.refresh_id = None
+        
+        self.setup_ui()
+        self.refresh_query_stats()
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+    
+    def setup_ui(self):
+        """设置UI"""
+        notebook = ttk.Notebook(self)
+        notebook.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        
+        # 诊断报告
+        report_frame = ttk.Frame(notebook, padding="10")
+        notebook.add(report_frame, text="诊断报告")
+        report_text = tk.Text(report_frame, wrap=tk.WORD, font=("Consolas", 10))
+        report_text.pack(fill=tk.BOTH, expand=True)
+        report_text.insert(tk.END, self.format_report())
+        report_text.config(state=tk.DISABLED)
+        
+        # 数据库查询
+        query_frame = ttk.Frame(notebook, padding="10")
+        notebook.add(query_frame, text="数据库查询")
+        
+        self.summary_var = tk.StringVar()
+        ttk.Label(query_frame, textvariable=self.summary_var).pack(anchor=tk.W, pady=(0, 5))
+        
+        ttk.Label(query_frame, text="按页面统计:").pack(anchor=tk.W)
+        self.context_tree = ttk.Treeview(query_frame, columns=('count', 'total', 'rows'), height=5)
+        self.context_tree.heading('#0', text='页面')
+        self.context_tree.heading('count', text='查询次数')
+        self.context_tree.heading('total', text='总耗时(ms)')
+        self.context_tree.heading('rows', text='行数')
+        self.context_tree.pack(fill=tk.X, pady=(0, 10))
+        
+        ttk.Label(query_frame, text="耗时最多的查询:").pack(anchor=tk.W)
+        columns = ('count', 'total', 'avg', 'max', 'rows', 'slow')
+        self.query_tree = ttk.Treeview(query_frame, columns=columns, height=10)
+        self.query_tree.heading('#0', text='SQL')
+        self.query_tree.column('#0', width=380)
+        for column, text in zip(columns, ('次数', '总耗时(ms)', '平均(ms)', '最大(ms)', '行数', '慢查询')):
+            self.query_tree.heading(column, text=text)
+            self.query_tree.column(column, width=70, anchor=tk.E)
+        self.query_tree.pack(fill=tk.BOTH, expand=True)
+        
+        # 慢查询
+        slow_frame = ttk.Frame(notebook, padding="10")
+        notebook.add(slow_frame, text="慢查询")
+        self.slow_text = tk.Text(slow_frame, wrap=tk.NONE, font=("Consolas", 10))
+        self.slow_text.pack(fill=tk.BOTH, expand=True)
+        
+        # 运行指标（耗时、吞吐量、缓存命中率）
+        metrics_frame = ttk.Frame(notebook, padding="10")
+        notebook.add(metrics_frame, text="运行指标")
+        self.metrics_text = tk.Text(metrics_frame, wrap=tk.NONE, font=("Consolas", 10))
+        self.metrics_text.pack(fill=tk.BOTH, expand=True)
+        
+        # 按钮
+        button_frame = ttk.Frame(self)
+        button_frame.pack(fill=tk.X, padx=10, pady=(0, 10))
+        ttk.Button(button_frame, text="关闭", command=self.on_close).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(button_frame, text="重置统计", command=self.reset_query_stats).pack(side=tk.RIGHT)
+        ttk.Button(button_frame, text="导出指标", command=self.export_metrics).pack(side=tk.RIGHT, padx=5)
+    
+    def format_report(self):
+        """格式化诊断报告"""
+        lines = [
+            f"生成时间: {self.report.get('generated_at', '')}",
+            f"Python: {self.report.get('python', '')}",
+            f"平台: {self.report.get('platform', '')}",
+        ]
+        if self.report.get('startup_time_ms') is not None:
+            lines.append(f"启动耗时: {self.report['startup_time_ms']:.0f} ms（预算 {STARTUP_BUDGET_MS} ms）")
+        lines.append(f"关键文件: {'✓ 完整' if self.report.get('files_ok') else '✗ 缺失'}")
+        lines.append(f"数据库: {'✓ 正常' if self.report.get('database_ok') else '✗ 异常'}")
+        lines.append("")
+        lines.append("模块导入:")
+        for item in self.report.get('imports', []):
+            status = "✓" if item['ok'] else f"✗ {item['error']}"
+            lines.append(f"  {item['module']:35} {item['elapsed_ms']:8.1f} ms  {status}")
+        return "\n".join(lines)
+    
+    def refresh_query_stats(self):
+        """刷新查询统计，对话框打开期间定时执行"""
+        stats = query_stats.snapshot()
+        totals = stats['totals']
+        self.summary_var.set(
+            f"查询 {totals['queries']} 次（{totals['distinct']} 种），总耗时 {totals['total_ms']:.1f} ms，"
+            f"返回 {totals['rows']} 行，错误 {totals['errors']}，"
+            f"慢查询 {totals['slow']}（≥{stats['slow_threshold_ms']} ms），当前页面: {stats['current_context']}"
+        )
+        
+        self.context_tree.delete(*self.context_tree.get_children())
+        for name, ctx in sorted(stats['contexts'].items(), key=lambda item: item[1]['total_ms'], reverse=True):
+            self.context_tree.insert('', tk.END, text=name,
+                                     values=(ctx['count'], f"{ctx['total_ms']:.1f}", ctx['rows']))
+        
+        self.query_tree.delete(*self.query_tree.get_children())
+        for query in stats['top_queries']:
+            self.query_tree.insert('', tk.END, text=query['sql'], values=(
+                query['count'], f"{query['total_ms']:.1f}", f"{query['avg_ms']:.2f}",
+                f"{query['max_ms']:.1f}", query['rows'], query['slow']
+            ))
+        
+        self.slow_text.delete('1.0', tk.END)
+        for event in reversed(stats['slow_queries']):
+            when = datetime.datetime.fromtimestamp(event['time']).strftime('%H:%M:%S')
+            self.slow_text.insert(tk.END, f"[{when}] {event['elapsed_ms']:.1f} ms  页面: {event['context']}\n")
+            self.slow_text.insert(tk.END, f"  {event['normalized']}\n")
+            for step in event['plan'] or []:
+                self.slow_text.insert(tk.END, f"    {step}\n")
+            self.slow_text.insert(tk.END, "\n")
+        
+        self.metrics_text.delete('1.0', tk.END)
+        self.metrics_text.insert(tk.END, metrics.dump_text())
+        
+        self.refresh_id = self.after(self.REFRESH_MS, self.refresh_query_stats)
+    
+    def reset_query_stats(self):
+        """重置查询统计（运行指标是累计值，不随之清零）"""
+        query_stats.reset()
+        if self.refresh_id:
+            self.after_cancel(self.refresh_id)
+        self.refresh_query_stats()
+    
+    def export_metrics(self):
+        """把运行指标导出为 Prometheus 文本文件"""
+        file_path = filedialog.asksaveasfilename(
+            parent=self,
+            title="导出运行指标",
+            defaultextension=".prom",
+            initialfile=f"metrics_{datetime.datetime.now():%Y%m%d_%H%M%S}.prom",
+            filetypes=[("Prometheus 文本", "*.prom"), ("文本文件", "*.txt")]
+        )
+        if not file_path:
+            return
+        try:
+            with open(file_path, 'w', encoding='utf-8') as f:
+                f.write(metrics.render())
+            messagebox.showinfo("导出指标", f"运行指标已导出到:\n{file_path}", parent=self)
+        except OSError as e:
+            messagebox.showerror("导出指标", f"导出失败: {e}", parent=self)
+    
+    def on_close(self):
+        """关闭对话框"""
+        if self.refresh_id:
+            self.after_cancel(self.refresh_id)
+            self.refresh_id = None
+        self.destroy()
 
 class LogViewerDialog:
     def __init__(self, parent, content):
@@ -3,65 +3,12 @@ import tkinter as tk
 from tkinter import ttk 
 import os
 import sys
-import threading
 import time
-import shutil
-import uuid
-from fastapi import FastAPI, File, UploadFile, HTTPException
-from fastapi.responses import FileResponse
-from typing import List
 
-app = FastAPI()
+from services.scheduler import get_scheduler, PRIORITY_HIGH
 
-# 添加上传目录
-UPLOAD_DIR = "uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-
-@app.post("/api/upload")
-async def upload_file(file: UploadFile = File(...)):
-    """上传文件"""
-    try:
-        # 生成唯一文件名，避免冲突
-        file_extension = os.path.splitext(file.filename)[1]
-        unique_filename = f"{uuid.uuid4().hex}{file_extension}"
-        
-        file_location = os.path.join(UPLOAD_DIR, unique_filename)
-        
-        # 保存文件
-        with open(file_location, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        return {
-            "message": "文件上传成功",
-            "original_filename": file.filename,
-            "saved_filename": unique_filename,
-            "file_path": file_location
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"上传失败: {str(e)}")
-
-@app.get("/api/download/{filename}")
-async def download_file(filename: str):
-    """下载文件"""
-    file_location = os.path.join(UPLOAD_DIR, filename)
-    
-    if not os.path.exists(file_location):
-        raise HTTPException(status_code=404, detail="文件不存在")
-    
-    return FileResponse(
-        path=file_location,
-        filename=filename,
-        media_type='application/octet-stream'
-    )
-
-@app.get("/api/files")
-async def list_files():
-    """获取文件列表"""
-    if not os.path.exists(UPLOAD_DIR):
-        return {"files": []}
-    
-    files = os.listdir(UPLOAD_DIR)
-    return {"files": files}
+# 文件服务 API 已移到 api_app.py，这里重新导出 app，"uvicorn main_fast:app"（run_api.bat）继续可用
+from api_app import app
 
 class FastApp:
     """快速启动的应用程序"""
@@ -69,6 +16,7 @@ class FastApp:
     def __init__(self):
         self.root = None
         self.initialized = False
+        self.scheduler = get_scheduler()
         
     def start(self):
         """启动应用程序"""
@@ -81,15 +29,22 @@ class FastApp:
         # 设置标题
         self.root.title("焊接枪管理系统")
         
-        # 在后台线程中初始化
-        print("在后台初始化系统...")
-        init_thread = threading.Thread(target=self.initialize_background)
-        init_thread.daemon = True
-        init_thread.start()
+        # 后台任务的回调统一在界面线程派发
+        self.scheduler.attach_tk(self.root)
         
         # 显示加载窗口
         self.show_loading_window()
         
+        # 在调度器中初始化，完成后回调到界面线程
+        print("在后台初始化系统...")
+        self.scheduler.submit(
+            self.initialize_background,
+            priority=PRIORITY_HIGH,
+            name="initialize",
+            callback=self.on_initialized,
+            error_callback=lambda e: self.show_error(str(e))
+        )
+        
         # 启动主循环
         self.root.mainloop()
     
@@ -119,49 +74,35 @@ class FastApp:
         self.progress = ttk.Progressbar(self.loading_window, mode='indeterminate', length=200)
         self.progress.pack(pady=20)
         self.progress.start()
-        
-        # 检查初始化的定时器
-        self.check_initialization()
     
-    def check_initialization(self):
-        """检查初始化是否完成"""
-        if self.initialized:
-            # 初始化完成，关闭加载窗口，显示主窗口
-            self.progress.stop()
-            self.loading_window.destroy()
-            self.show_main_window()
-        else:
-            # 继续检查
-            self.root.after(100, self.check_initialization)
+    def on_initialized(self, db_exists):
+        """初始化完成（界面线程回调）"""
+        if not db_exists:
+            self.show_db_error()
+            return
+        
+        # 初始化完成，关闭加载窗口，显示主窗口
+        self.initialized = True
+        self.progress.stop()
+        self.loading_window.destroy()
+        self.show_main_window()
     
     def initialize_background(self):
-        """在后台初始化"""
-        try:
-            # 添加路径
-            current_dir = os.path.dirname(os.path.abspath(__file__))
-            if current_dir not in sys.path:
-                sys.path.insert(0, current_dir)
-            
-            # 延迟导入，避免启动时加载所有模块
-            time.sleep(0.5)  # 模拟初始化时间
-            
-            # 检查数据库
-            if not os.path.exists("welding_gun.db"):
-                print("警告: 数据库文件不存在")
-                # 在UI线程中显示错误
-                self.root.after(0, self.show_db_error)
-                return
-            
-            # 标记初始化完成
-            self.initialized = True
-            
-        except Exception as e:
-            print(f"初始化失败: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            
-            # 在UI线程中显示错误
-            self.root.after(0, lambda: self.show_error(str(e)))
+        """在后台初始化（工作线程中执行，不操作界面）"""
+        # 添加路径
+        current_dir = os.path.dirname(os.path.abspath(__file__))
+        if current_dir not in sys.path:
+            sys.path.insert(0, current_dir)
+        
+        # 延迟导入，避免启动时加载所有模块
+        time.sleep(0.5)  # 模拟初始化时间
+        
+        # 检查数据库
+        if not os.path.exists("welding_gun.db"):
+            print("警告: 数据库文件不存在")
+            return False
+        
+        return True
     
     def show_db_error(self):
         """显示数据库错误"""
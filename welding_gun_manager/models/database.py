@@ -2,15 +2,32 @@
 # models/database.py
 import sqlite3
 import os
+import time
+
+from models.query_stats import query_stats
+from services.metrics import metrics
+
+DB_QUERY_SECONDS = metrics.histogram(
+    'welding_gun_db_query_seconds', "数据库查询耗时（秒），operation 为语句类型", ('operation',))
+DB_QUERY_ERRORS = metrics.counter(
+    'welding_gun_db_query_errors_total', "数据库查询失败次数", ('operation',))
+BACKUP_SECONDS = metrics.histogram(
+    'welding_gun_backup_seconds', "数据库备份耗时（秒）")
+BACKUP_BYTES = metrics.counter(
+    'welding_gun_backup_bytes_total', "备份写出的字节数")
+BACKUP_LAST_SUCCESS = metrics.gauge(
+    'welding_gun_backup_last_success_timestamp_seconds', "最近一次成功备份的时间（Unix 时间戳）")
 
 class Database:
-    def __init__(self, db_path="welding_gun.db"):
+    def __init__(self, db_path="welding_gun.db", check_same_thread=True):
         self.db_path = db_path
+        # 由后台服务持有、在加锁后跨线程使用的连接需要设为 False
+        self.check_same_thread = check_same_thread
         self.conn = None
     
     def connect(self):
         if self.conn is None:
-            self.conn = sqlite3.connect(self.db_path)
+            self.conn = sqlite3.connect(self.db_path, check_same_thread=self.check_same_thread)
             self.conn.row_factory = sqlite3.Row
         return self.conn
     
@@ -24,6 +41,8 @@ class Database:
             if not os.path.exists(self.db_path):
                 self.create_tables()
                 self.create_default_data()
+            self.ensure_indexes()
+            self.ensure_preset_tables()
             return True
         except Exception as e:
             print(f"数据库初始化失败: {e}")
@@ -66,20 +85,93 @@ class Database:
         ''')
         
         conn.commit()
+        self.ensure_indexes()
         print("数据库表创建成功")
     
+    # 建索引的列：GunController.SORTABLE_COLUMNS 中的每一列（id 即 rowid，serial_number 已有 UNIQUE 索引）。
+    # SQLite 的索引项末尾带 rowid，单列索引即可满足 "ORDER BY 列, id" 的分页排序。
+    INDEXED_GUN_COLUMNS = ('name', 'type', 'model', 'status', 'location', 'last_maintenance', 'created_at')
+    
+    def ensure_indexes(self):
+        """创建工枪表可排序列的索引（分页排序依赖这些索引，不再对整表临时排序）"""
+        conn = self.connect()
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='guns'"
+        ).fetchone()
+        if not exists:
+            return
+        for column in self.INDEXED_GUN_COLUMNS:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_guns_{column} ON guns({column})")
+        conn.commit()
+    
+    def ensure_preset_tables(self):
+        """
+        创建预设表和参数表
+        
+        preset_parameters 按 (参数名, 数值) 建索引，按参数范围查找预设时不再逐行解析 JSON；
+        首次创建参数表或参数解析规则变化（PARAMETER_FORMAT_VERSION）时从 parameters 列重建参数行。
+        """
+        from models.preset_parameters import flatten_parameters, PARAMETER_FORMAT_VERSION
+        
+        conn = self.connect()
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS presets (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            gun_type TEXT NOT NULL,
+            parameters TEXT,
+            description TEXT,
+            created_at TEXT NOT NULL
+        )
+        ''')
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='preset_parameters'"
+        ).fetchone()
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS preset_parameters (
+            preset_id INTEGER NOT NULL REFERENCES presets(id) ON DELETE CASCADE,
+            name TEXT NOT NULL,
+            value_num REAL,
+            value_text TEXT,
+            unit TEXT,
+            PRIMARY KEY (preset_id, name)
+        ) WITHOUT ROWID
+        ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_preset_parameters_num ON preset_parameters(name, value_num)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_preset_parameters_text ON preset_parameters(name, value_text)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_presets_gun_type ON presets(gun_type, name)")
+        conn.execute("CREATE TABLE IF NOT EXISTS schema_info (key TEXT PRIMARY KEY, value TEXT)")
+        
+        version = conn.execute(
+            "SELECT value FROM schema_info WHERE key = 'preset_parameter_format'"
+        ).fetchone()
+        if not exists or version is None or version[0] != str(PARAMETER_FORMAT_VERSION):
+            conn.execute("DELETE FROM preset_parameters")
+            rows = conn.execute("SELECT id, parameters FROM presets").fetchall()
+            for row in rows:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO preset_parameters VALUES (?, ?, ?, ?, ?)",
+                    [(row['id'],) + entry for entry in flatten_parameters(row['parameters'])]
+                )
+            conn.execute(
+                "INSERT OR REPLACE INTO schema_info (key, value) VALUES ('preset_parameter_format', ?)",
+                (str(PARAMETER_FORMAT_VERSION),)
+            )
+        conn.commit()
+    
     def create_default_data(self):
         conn = self.connect()
         cursor = conn.cursor()
         
         import datetime
+        from services.auth_service import hash_password
         
-        # 插入默认用户
+        # 插入默认用户（密码只保存哈希）
         current_time = datetime.datetime.now().isoformat()
         users = [
-            ('system', 'manager', 'admin', '系统管理员', 'admin@welding.com', current_time),
+            ('system', hash_password('manager'), 'admin', '系统管理员', 'admin@welding.com', current_time),
             ('administrator', None, 'admin', 'Administrator', '', current_time),
-            ('user', 'user123', 'user', '普通用户', 'user@welding.com', current_time)
+            ('user', hash_password('user123'), 'user', '普通用户', 'user@welding.com', current_time)
         ]
         
         cursor.executemany('''
@@ -103,17 +195,64 @@ class Database:
         print("默认数据创建成功")
     
     def execute(self, query, params=()):
+        start = time.perf_counter()
+        try:
+            cursor = self._execute(query, params)
+        except Exception as e:
+            self._record(query, params, start, 0, e)
+            raise
+        self._record(query, params, start, cursor.rowcount)
+        return cursor
+    
+    def fetch_all(self, query, params=()):
+        start = time.perf_counter()
+        try:
+            rows = [dict(row) for row in self._execute(query, params).fetchall()]
+        except Exception as e:
+            self._record(query, params, start, 0, e)
+            raise
+        self._record(query, params, start, len(rows))
+        return rows
+    
+    def fetch_one(self, query, params=()):
+        start = time.perf_counter()
+        try:
+            row = self._execute(query, params).fetchone()
+        except Exception as e:
+            self._record(query, params, start, 0, e)
+            raise
+        self._record(query, params, start, 1 if row else 0)
+        return dict(row) if row else None
+    
+    def _execute(self, query, params):
         conn = self.connect()
         cursor = conn.cursor()
         cursor.execute(query, params)
         conn.commit()
         return cursor
     
-    def fetch_all(self, query, params=()):
-        cursor = self.execute(query, params)
-        return [dict(row) for row in cursor.fetchall()]
+    def _record(self, query, params, start, rows, error=None):
+        """记录查询耗时到全局查询统计和运行指标"""
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        # 语句类型（SELECT / INSERT / ...）作为标签，种类有限
+        operation = query.lstrip().split(None, 1)[0].upper() if query.strip() else 'EMPTY'
+        DB_QUERY_SECONDS.observe(elapsed_ms / 1000, operation=operation)
+        if error is not None:
+            DB_QUERY_ERRORS.inc(operation=operation)
+        query_stats.record(query, params, elapsed_ms, rows, conn=self.conn,
+                           error=error, db_path=self.db_path)
     
-    def fetch_one(self, query, params=()):
-        cursor = self.execute(query, params)
-        row = cursor.fetchone()
-        return dict(row) if row else None
\ No newline at end of file
+    def backup(self, target_path):
+        """在线备份数据库到目标文件（使用独立连接，可在后台线程中调用）"""
+        started = time.perf_counter()
+        source = sqlite3.connect(self.db_path)
+        target = sqlite3.connect(target_path)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+        BACKUP_SECONDS.observe(time.perf_counter() - started)
+        BACKUP_BYTES.inc(os.path.getsize(target_path))
+        BACKUP_LAST_SUCCESS.set(time.time())
+        return target_path
\ No newline at end of file
@@ -0,0 +1,129 @@
+# models/preset_parameters.py
+"""
+预设参数的行式表示
+把预设的 parameters（嵌套字典）展开为 preset_parameters 表的行（参数名, 数值, 文本, 单位），
+供数据库回填、PresetController 和批量同步共用。
+
+带单位的数值（如 "3.5 kN"）换算为标准单位（N）存储，"3500 N" 与 "3.5 kN" 可以直接比较；
+只识别 UNITS 中的单位，日期（"2024-01-15"）、版本号（"1.2.3"）、型号（"2T"）和
+前导零编码（"007"）都按文本保存。
+"""
+import json
+import re
+
+# 参数行格式版本：解析规则变化时递增，Database.ensure_preset_tables 据此重建参数行
+PARAMETER_FORMAT_VERSION = 2
+
+# 可识别的单位 -> (标准单位, 换算系数)
+UNITS = {
+    # 力
+    'N': ('N', 1.0), 'daN': ('N', 10.0), 'kN': ('N', 1000.0),
+    # 电流
+    'mA': ('A', 0.001), 'A': ('A', 1.0), 'kA': ('A', 1000.0),
+    # 电压
+    'mV': ('V', 0.001), 'V': ('V', 1.0), 'kV': ('V', 1000.0),
+    # 功率
+    'W': ('W', 1.0), 'kW': ('W', 1000.0), 'VA': ('VA', 1.0), 'kVA': ('VA', 1000.0),
+    # 时间
+    'ms': ('ms', 1.0), 's': ('ms', 1000.0),
+    # 长度
+    'um': ('mm', 0.001), 'μm': ('mm', 0.001), 'mm': ('mm', 1.0), 'cm': ('mm', 10.0), 'm': ('mm', 1000.0),
+    # 压力
+    'kPa': ('bar', 0.01), 'MPa': ('bar', 10.0), 'bar': ('bar', 1.0),
+    # 质量
+    'g': ('kg', 0.001), 'kg': ('kg', 1.0),
+    # 频率
+    'Hz': ('Hz', 1.0), 'kHz': ('Hz', 1000.0),
+    # 比例和角度
+    '%': ('%', 1.0), '°': ('°', 1.0), 'deg': ('°', 1.0),
+}
+
+# 大小写写错时（如 "KN"、"KA"）只在不会混淆的情况下识别
+_FOLDED_UNITS = {}
+for _unit in UNITS:
+    _FOLDED_UNITS.setdefault(_unit.lower(), []).append(_unit)
+_FOLDED_UNITS = {key: units[0] for key, units in _FOLDED_UNITS.items() if len(units) == 1}
+
+_NUMBER_WITH_UNIT = re.compile(r'^\s*([-+]?(?:\d+(?:\.\d+)?|\.\d+)(?:[eE][-+]?\d+)?)(?:\s*(\S+?))?\s*$')
+# 前导零的数字串（如 "007"）是编码，不是数值
+_LEADING_ZERO = re.compile(r'^[-+]?0\d')
+
+
+def canonical_unit(unit):
+    """
+    单位的标准形式
+
+    Returns:
+        tuple: (标准单位, 换算系数)；unit 为空时返回 (None, 1.0)
+
+    Raises:
+        ValueError: 不认识的单位
+    """
+    if not unit:
+        return None, 1.0
+    unit = unit.strip()
+    if unit in UNITS:
+        return UNITS[unit]
+    folded = _FOLDED_UNITS.get(unit.lower())
+    if folded is None:
+        raise ValueError(f"不支持的单位: {unit}")
+    return UNITS[folded]
+
+
+def parse_parameter_value(value):
+    """
+    把参数值拆分为 (数值, 文本, 单位)
+
+    数字、纯数字字符串和带已知单位的数字字符串存入数值列以便范围查询（带单位时换算为标准单位），
+    其余按原文本保存。
+    """
+    if isinstance(value, bool):
+        return (1.0 if value else 0.0), None, None
+    if isinstance(value, (int, float)):
+        return float(value), None, None
+    if value is None:
+        return None, None, None
+    text = str(value)
+    match = _NUMBER_WITH_UNIT.match(text)
+    if match and not _LEADING_ZERO.match(match.group(1)):
+        try:
+            unit, factor = canonical_unit(match.group(2))
+        except ValueError:
+            return None, text, None
+        return float(match.group(1)) * factor, None, unit
+    return None, text, None
+
+
+def flatten_parameters(parameters):
+    """
+    把参数字典展开为 preset_parameters 的行
+
+    嵌套字典的键用 "." 连接（如 electrode.force），列表按 JSON 文本保存。
+
+    Args:
+        parameters: 参数字典或 JSON 字符串
+
+    Returns:
+        list: (参数名, 数值, 文本, 单位) 列表
+    """
+    if isinstance(parameters, str):
+        try:
+            parameters = json.loads(parameters)
+        except ValueError:
+            return []
+    if not isinstance(parameters, dict):
+        return []
+
+    rows = []
+
+    def walk(prefix, value):
+        if isinstance(value, dict):
+            for key, item in value.items():
+                walk(f"{prefix}.{key}" if prefix else str(key), item)
+        elif isinstance(value, list):
+            rows.append((prefix, None, json.dumps(value, ensure_ascii=False), None))
+        else:
+            rows.append((prefix,) + parse_parameter_value(value))
+
+    walk('', parameters)
+    return rows
@@ -0,0 +1,253 @@
+# models/query_stats.py
+"""
+数据库查询统计
+记录每条 SQL 的耗时和行数，按归一化 SQL 汇总；
+超过阈值的慢查询连同 EXPLAIN QUERY PLAN 一起记录，并通知订阅者。
+"""
+
+import re
+import json
+import time
+import threading
+import traceback
+from collections import deque, Counter
+
+# 默认慢查询阈值（毫秒）
+DEFAULT_SLOW_THRESHOLD_MS = 100
+
+# 耗时分布的分桶上界（毫秒）
+LATENCY_BUCKETS_MS = (1, 5, 20, 100, 500)
+_BUCKET_LABELS = [f"<{bound}ms" for bound in LATENCY_BUCKETS_MS] + [f">={LATENCY_BUCKETS_MS[-1]}ms"]
+
+_COMMENT_RE = re.compile(r'--[^\n]*|/\*.*?\*/', re.S)
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST_RE = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_SPACE_RE = re.compile(r'\s+')
+
+
+def normalize_sql(sql):
+    """把 SQL 归一化为模板：去掉注释和多余空白，字面量替换为 ?"""
+    sql = _COMMENT_RE.sub(' ', sql)
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _IN_LIST_RE.sub('(?+)', sql)
+    return _SPACE_RE.sub(' ', sql).strip()
+
+
+def _bucket_label(elapsed_ms):
+    for bound, label in zip(LATENCY_BUCKETS_MS, _BUCKET_LABELS):
+        if elapsed_ms < bound:
+            return label
+    return _BUCKET_LABELS[-1]
+
+
+class QueryStats:
+    """
+    进程内查询统计（线程安全）
+
+    - 按归一化 SQL 汇总次数、总耗时、最大耗时、行数、错误数
+    - 按界面上下文（如当前页面）汇总查询次数和耗时
+    - 慢查询保存在环形缓冲区中，可选追加写入日志文件（JSON Lines）
+    - subscribe() 注册的回调在每条查询记录后调用
+    """
+
+    def __init__(self, slow_threshold_ms=DEFAULT_SLOW_THRESHOLD_MS, max_slow_queries=100):
+        self.enabled = True
+        self.slow_threshold_ms = slow_threshold_ms
+        self.slow_log_path = None
+        self.explain_slow_queries = True
+
+        self._lock = threading.Lock()
+        self._queries = {}
+        self._contexts = {}
+        self._latency_histogram = Counter()
+        self._slow_queries = deque(maxlen=max_slow_queries)
+        self._subscribers = []
+        self._context = 'default'
+        self._started_at = time.time()
+
+    # ========== 配置 ==========
+    def configure(self, enabled=None, slow_threshold_ms=None, slow_log_path=None,
+                  explain_slow_queries=None):
+        """修改统计配置，未传入的参数保持不变"""
+        if enabled is not None:
+            self.enabled = enabled
+        if slow_threshold_ms is not None:
+            self.slow_threshold_ms = slow_threshold_ms
+        if slow_log_path is not None:
+            self.slow_log_path = slow_log_path or None
+        if explain_slow_queries is not None:
+            self.explain_slow_queries = explain_slow_queries
+
+    def set_context(self, name):
+        """设置当前上下文（如当前显示的页面），之后的查询计入该上下文"""
+        self._context = name or 'default'
+
+    @property
+    def context(self):
+        return self._context
+
+    # ========== 订阅 ==========
+    def subscribe(self, callback):
+        """
+        订阅查询事件
+
+        Args:
+            callback: callback(event)，event 为包含 sql、normalized、elapsed_ms、
+                      rows、slow、context、plan、error 的字典。回调在执行查询的线程中调用
+        """
+        with self._lock:
+            if callback not in self._subscribers:
+                self._subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        """取消订阅"""
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    # ========== 记录 ==========
+    def record(self, sql, params, elapsed_ms, rows, conn=None, error=None, db_path=None):
+        """记录一次查询"""
+        if not self.enabled:
+            return
+
+        normalized = normalize_sql(sql)
+        context = self._context
+        slow = elapsed_ms >= self.slow_threshold_ms
+
+        plan = None
+        if slow and conn is not None and self.explain_slow_queries and error is None:
+            plan = self.explain(conn, sql, params)
+
+        with self._lock:
+            entry = self._queries.get(normalized)
+            if entry is None:
+                entry = self._queries[normalized] = {
+                    'sql': normalized,
+                    'count': 0,
+                    'total_ms': 0.0,
+                    'max_ms': 0.0,
+                    'rows': 0,
+                    'errors': 0,
+                    'slow': 0,
+                    'contexts': Counter(),
+                }
+            entry['count'] += 1
+            entry['total_ms'] += elapsed_ms
+            entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+            entry['rows'] += max(rows, 0)
+            entry['contexts'][context] += 1
+            if error is not None:
+                entry['errors'] += 1
+            if slow:
+                entry['slow'] += 1
+
+            ctx = self._contexts.setdefault(context, {'count': 0, 'total_ms': 0.0, 'rows': 0})
+            ctx['count'] += 1
+            ctx['total_ms'] += elapsed_ms
+            ctx['rows'] += max(rows, 0)
+
+            self._latency_histogram[_bucket_label(elapsed_ms)] += 1
+            subscribers = list(self._subscribers)
+
+        event = {
+            'time': time.time(),
+            'sql': sql,
+            'normalized': normalized,
+            'params': repr(params)[:200],
+            'elapsed_ms': round(elapsed_ms, 3),
+            'rows': rows,
+            'slow': slow,
+            'context': context,
+            'plan': plan,
+            'error': str(error) if error is not None else None,
+            'db_path': db_path,
+        }
+
+        if slow:
+            with self._lock:
+                self._slow_queries.append(event)
+            self._write_slow_log(event)
+
+        for callback in subscribers:
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"查询统计订阅回调失败: {e}")
+                traceback.print_exc()
+
+    def explain(self, conn, sql, params=()):
+        """获取查询计划，非 SELECT/WITH 语句返回 None"""
+        if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+            return None
+        try:
+            rows = conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+            return [row[-1] for row in rows]
+        except Exception as e:
+            return [f"EXPLAIN 失败: {e}"]
+
+    def _write_slow_log(self, event):
+        if not self.slow_log_path:
+            return
+        try:
+            with open(self.slow_log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(event, ensure_ascii=False) + '\n')
+        except Exception as e:
+            print(f"写入慢查询日志失败: {e}")
+
+    # ========== 查询结果 ==========
+    def snapshot(self, top=20):
+        """
+        获取统计快照
+
+        Returns:
+            dict: totals、latency_histogram、contexts、top_queries（按总耗时排序）、slow_queries
+        """
+        with self._lock:
+            queries = []
+            for entry in self._queries.values():
+                item = dict(entry)
+                item['contexts'] = dict(entry['contexts'])
+                item['avg_ms'] = round(entry['total_ms'] / entry['count'], 3)
+                item['total_ms'] = round(entry['total_ms'], 3)
+                item['max_ms'] = round(entry['max_ms'], 3)
+                queries.append(item)
+            contexts = {name: dict(value, total_ms=round(value['total_ms'], 3))
+                        for name, value in self._contexts.items()}
+            histogram = {label: self._latency_histogram.get(label, 0) for label in _BUCKET_LABELS}
+            slow_queries = list(self._slow_queries)
+
+        queries.sort(key=lambda q: q['total_ms'], reverse=True)
+        return {
+            'since': self._started_at,
+            'slow_threshold_ms': self.slow_threshold_ms,
+            'current_context': self._context,
+            'totals': {
+                'queries': sum(q['count'] for q in queries),
+                'total_ms': round(sum(q['total_ms'] for q in queries), 3),
+                'rows': sum(q['rows'] for q in queries),
+                'errors': sum(q['errors'] for q in queries),
+                'slow': sum(q['slow'] for q in queries),
+                'distinct': len(queries),
+            },
+            'latency_histogram': histogram,
+            'contexts': contexts,
+            'top_queries': queries[:top],
+            'slow_queries': slow_queries,
+        }
+
+    def reset(self):
+        """清空统计"""
+        with self._lock:
+            self._queries.clear()
+            self._contexts.clear()
+            self._latency_histogram.clear()
+            self._slow_queries.clear()
+            self._started_at = time.time()
+
+
+# 全局统计实例，所有 Database 对象共享
+query_stats = QueryStats()
@@ -1,6 +1,10 @@
 #!/usr/bin/env python3
 """
 项目打包器 - 将Python项目转换为可分享的文本文件
+
+流式打包：文件在线程池中读取和压缩，按顺序边生成边写出，内存占用与项目大小无关；
+每个文件的大小、修改时间、哈希和行数缓存在 .packer_cache 中，下次打包时未变化的文件
+不再读取和压缩（压缩块按内容哈希保存，可直接复用）。
 """
 
 import os
@@ -9,35 +13,116 @@ import base64
 import json
 import zlib
 import hashlib
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 
+from utils.ignore_matcher import IgnoreMatcher, GITIGNORE_NAME
+
+# 打包缓存目录（相对项目根目录）
+CACHE_DIR_NAME = ".packer_cache"
+
+# 压缩包中每个文件记录的标记行前缀
+PACK_FILE_MARKER = "### FILE "
+
+
+class _SplitWriter:
+    """按字符数分块写出的文本写入器（max_chars 为 None 时写入单个文件）"""
+    
+    def __init__(self, output_file, max_chars=None):
+        self.output_file = output_file
+        self.max_chars = max_chars
+        self.parts = []
+        self.total_chars = 0
+        self._file = None
+        self._part_chars = 0
+    
+    def _open_part(self):
+        if self._file:
+            self._close_part()
+        part_num = len(self.parts) + 1
+        path = f"{self.output_file}_part{part_num:02d}.txt"
+        self._file = open(path, 'w', encoding='utf-8')
+        self._file.write(f"项目分块 {part_num}\n")
+        self._file.write("=" * 60 + "\n\n")
+        self.parts.append(path)
+        self._part_chars = 0
+    
+    def _close_part(self):
+        self._file.close()
+        print(f"创建分块 {len(self.parts)}: {self.parts[-1]} ({self._part_chars / 1024:.1f} KB)")
+        self._file = None
+    
+    def write(self, text):
+        self.total_chars += len(text)
+        if self.max_chars is None:
+            if self._file is None:
+                self._file = open(self.output_file, 'w', encoding='utf-8')
+            self._file.write(text)
+            return
+        
+        while text:
+            if self._file is None or self._part_chars >= self.max_chars:
+                self._open_part()
+            room = self.max_chars - self._part_chars
+            chunk, text = text[:room], text[room:]
+            self._file.write(chunk)
+            self._part_chars += len(chunk)
+    
+    def close(self):
+        if self._file is None:
+            return
+        if self.max_chars is None:
+            self._file.close()
+            self._file = None
+        else:
+            self._close_part()
+
+
+def _ordered_prefetch(executor, func, items, window):
+    """按顺序返回 func(item) 的结果，最多同时有 window 个任务在执行或等待写出"""
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(func, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
 class ProjectPacker:
     """项目打包器"""
     
-    def __init__(self, project_root="."):
+    def __init__(self, project_root=".", workers=None):
         self.project_root = Path(project_root).resolve()
+        self.workers = workers or min(8, (os.cpu_count() or 1) + 4)
+        self.cache_dir = self.project_root / CACHE_DIR_NAME
+        # 忽略规则（.gitignore 语法），项目中的 .gitignore 文件也会生效
         self.ignore_patterns = [
-            "__pycache__",
-            ".pyc",
-            ".pyo",
-            ".pyd",
-            ".so",
-            ".db",
-            ".db-journal",
-            ".log",
-            ".tmp",
-            ".temp",
+            "__pycache__/",
+            "*.pyc",
+            "*.pyo",
+            "*.pyd",
+            "*.so",
+            "*.db",
+            "*.db-journal",
+            "*.log",
+            "*.tmp",
+            "*.temp",
             "*.zip",
             "*.7z",
             "*.rar",
-            "uploaded_guns",  # 排除上传的文件
-            "backups",        # 排除备份文件
-            "venv",           # 排除虚拟环境
-            ".git",           # 排除git目录
-            ".vscode",
-            ".idea",
-            "node_modules",
+            "uploaded_guns/",  # 排除上传的文件
+            "backups/",        # 排除备份文件
+            "venv/",           # 排除虚拟环境
+            ".venv/",
+            ".git/",           # 排除git目录
+            ".vscode/",
+            ".idea/",
+            "node_modules/",
+            f"{CACHE_DIR_NAME}/",  # 排除打包缓存
         ]
         
         self.code_extensions = [
@@ -45,27 +130,37 @@ class ProjectPacker:
             '.ini', '.cfg', '.conf', '.html', '.css', '.js'
         ]
         
+        # should_include 使用的匹配器（按 ignore_patterns 编译一次）
+        self._matcher = None
+        self._matcher_patterns = None
+        
+        # 文件元数据缓存 {相对路径: {size, mtime_ns, sha256, lines}}
+        self._file_cache = None
+        self.stats = {'read': 0, 'reused': 0}
+    
+    def build_matcher(self):
+        """按 ignore_patterns 和项目根目录的 .gitignore 编译匹配器"""
+        matcher = IgnoreMatcher(self.ignore_patterns)
+        matcher.add_file(self.project_root / GITIGNORE_NAME)
+        return matcher
+    
     def should_include(self, filepath):
         """判断文件是否应该包含"""
+        # 检查文件扩展名（不需要访问文件系统，先判断）
+        if filepath.suffix.lower() not in self.code_extensions:
+            return False
+        
         # 转换为相对路径
         try:
             rel_path = filepath.relative_to(self.project_root)
         except ValueError:
             return False
-            
-        # 检查忽略模式
-        for pattern in self.ignore_patterns:
-            if pattern.startswith('*'):
-                if str(rel_path).endswith(pattern[1:]):
-                    return False
-            elif pattern in str(rel_path):
-                return False
-                
-        # 检查文件扩展名
-        if filepath.suffix.lower() in self.code_extensions:
-            return True
-            
-        return False
+        
+        # 检查忽略规则
+        if self._matcher is None or self._matcher_patterns != self.ignore_patterns:
+            self._matcher = self.build_matcher()
+            self._matcher_patterns = list(self.ignore_patterns)
+        return not self._matcher.is_ignored(rel_path.as_posix())
     
     def read_file_safely(self, filepath):
         """安全读取文件内容"""
@@ -76,81 +171,182 @@ class ProjectPacker:
         except Exception as e:
             return f"# 读取文件失败: {str(e)}"
     
-    def generate_project_report(self):
-        """生成项目结构报告"""
-        report = []
+    def iter_project_files(self):
+        """
+        按路径顺序列出要打包的文件 (绝对路径, 相对路径)
+        
+        被忽略的目录在遍历时直接剪掉，各级目录中的 .gitignore 同样生效；只按名称判断，不 stat 文件。
+        """
+        matcher = IgnoreMatcher(self.ignore_patterns)
+        extensions = set(self.code_extensions)
+        for rel_dir, entries in matcher.walk(str(self.project_root)):
+            for entry in entries:
+                if os.path.splitext(entry.name)[1].lower() in extensions:
+                    rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                    yield Path(entry.path), rel_path
+    
+    # ========== 文件缓存 ==========
+    def _cache_index_path(self):
+        return self.cache_dir / "index.json"
+    
+    def _chunk_path(self, digest):
+        return self.cache_dir / "chunks" / f"{digest}.z"
+    
+    def load_cache(self):
+        if self._file_cache is None:
+            try:
+                with open(self._cache_index_path(), 'r', encoding='utf-8') as f:
+                    self._file_cache = json.load(f)
+            except (OSError, ValueError):
+                self._file_cache = {}
+        return self._file_cache
+    
+    def save_cache(self, entries):
+        """保存本次打包的文件元数据，并删除不再引用的压缩块"""
+        self.cache_dir.mkdir(exist_ok=True)
+        index_path = self._cache_index_path()
+        temp_path = index_path.with_suffix('.json.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(entries, f, ensure_ascii=False)
+        os.replace(temp_path, index_path)
+        self._file_cache = entries
         
-        # 项目统计
-        code_files = []
-        total_lines = 0
-        total_size = 0
+        chunk_dir = self.cache_dir / "chunks"
+        if chunk_dir.is_dir():
+            used = {entry['sha256'] for entry in entries.values()}
+            for chunk in chunk_dir.iterdir():
+                if chunk.stem not in used:
+                    chunk.unlink()
+    
+    def _scan_file(self, item, compress=False):
+        """
+        获取文件元数据（在线程池中执行）
         
-        for root, dirs, files in os.walk(self.project_root):
-            root_path = Path(root)
-            
-            # 过滤目录
-            dirs[:] = [d for d in dirs if not any(pattern in d for pattern in self.ignore_patterns)]
-            
-            for file in files:
-                filepath = root_path / file
-                if self.should_include(filepath):
-                    try:
-                        content = self.read_file_safely(filepath)
-                        lines = content.count('\n') + 1
-                        size = filepath.stat().st_size
-                        
-                        code_files.append({
-                            'path': str(filepath.relative_to(self.project_root)),
-                            'lines': lines,
-                            'size': size,
-                            'content': content
-                        })
-                        
-                        total_lines += lines
-                        total_size += size
-                    except:
-                        continue
+        大小和修改时间与缓存一致时直接使用缓存，否则读取文件计算哈希和行数；
+        compress 为 True 时同时保存压缩块。
+        
+        Returns:
+            tuple: (相对路径, 元数据, 是否来自缓存)
+        """
+        filepath, rel_path = item
+        stat = filepath.stat()
+        cached = self.load_cache().get(rel_path)
+        if (cached and cached['size'] == stat.st_size and cached['mtime_ns'] == stat.st_mtime_ns
+                and (not compress or self._chunk_path(cached['sha256']).exists())):
+            return rel_path, cached, True
+        
+        with open(filepath, 'rb') as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+        entry = {
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': digest,
+            'lines': data.count(b'\n') + 1,
+        }
+        
+        if compress:
+            # 按内容哈希保存，内容相同的文件（包括改名后的文件）共用同一个压缩块
+            chunk_path = self._chunk_path(digest)
+            if not chunk_path.exists():
+                chunk_path.parent.mkdir(parents=True, exist_ok=True)
+                temp_path = chunk_path.with_name(f"{chunk_path.name}.{threading.get_ident()}.tmp")
+                with open(temp_path, 'wb') as f:
+                    f.write(zlib.compress(data, level=9))
+                os.replace(temp_path, chunk_path)
+        return rel_path, entry, False
+    
+    def scan_project(self, compress=False):
+        """
+        在线程池中扫描全部文件
+        
+        Returns:
+            list: (相对路径, 元数据) 列表，按路径排序
+        """
+        self.load_cache()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = list(executor.map(lambda item: self._scan_file(item, compress),
+                                        self.iter_project_files()))
+        
+        reused = sum(1 for _, _, hit in results if hit)
+        self.stats = {'read': len(results) - reused, 'reused': reused}
+        files = [(rel_path, entry) for rel_path, entry, _ in results]
+        self.save_cache(dict(files))
+        return files
+    
+    # ========== 文本报告 ==========
+    def write_project_report(self, writer, files=None):
+        """
+        把项目报告流式写入 writer（提供 write(text) 的对象）
+        
+        文件内容在线程池中预读，按顺序写出，同时在内存中的文件数不超过线程数的两倍。
+        
+        Returns:
+            list: scan_project 的结果
+        """
+        files = files if files is not None else self.scan_project()
+        total_lines = sum(entry['lines'] for _, entry in files)
+        total_size = sum(entry['size'] for _, entry in files)
         
         # 生成报告头
-        report.append("=" * 80)
-        report.append(f"项目打包报告 - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        report.append("=" * 80)
-        report.append("")
-        report.append(f"项目根目录: {self.project_root}")
-        report.append(f"文件数量: {len(code_files)}")
-        report.append(f"代码行数: {total_lines}")
-        report.append(f"总大小: {total_size / 1024:.1f} KB")
-        report.append("")
-        report.append("目录结构:")
-        report.append("-" * 40)
+        header = [
+            "=" * 80,
+            f"项目打包报告 - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+            "=" * 80,
+            "",
+            f"项目根目录: {self.project_root}",
+            f"文件数量: {len(files)}",
+            f"代码行数: {total_lines}",
+            f"总大小: {total_size / 1024:.1f} KB",
+            "",
+            "目录结构:",
+            "-" * 40,
+        ]
         
         # 生成目录树
-        for code_file in sorted(code_files, key=lambda x: x['path']):
-            indent = "  " * code_file['path'].count(os.sep)
-            report.append(f"{indent}📄 {code_file['path']} ({code_file['lines']}行, {code_file['size']}字节)")
+        for rel_path, entry in files:
+            indent = "  " * rel_path.count('/')
+            header.append(f"{indent}📄 {rel_path} ({entry['lines']}行, {entry['size']}字节)")
         
-        report.append("")
-        report.append("文件内容:")
-        report.append("=" * 80)
+        header.extend(["", "文件内容:", "=" * 80])
+        writer.write("\n".join(header))
         
         # 添加文件内容
-        for i, code_file in enumerate(code_files, 1):
-            report.append(f"\n{'=' * 80}")
-            report.append(f"文件 {i}/{len(code_files)}: {code_file['path']}")
-            report.append(f"大小: {code_file['size']}字节 | 行数: {code_file['lines']}")
-            report.append(f"{'=' * 80}\n")
-            report.append(code_file['content'])
+        def read(item):
+            rel_path, entry = item
+            return rel_path, entry, self.read_file_safely(self.project_root / rel_path)
         
-        return "\n".join(report), code_files
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            contents = _ordered_prefetch(executor, read, files, self.workers * 2)
+            for i, (rel_path, entry, content) in enumerate(contents, 1):
+                writer.write(f"\n\n{'=' * 80}\n")
+                writer.write(f"文件 {i}/{len(files)}: {rel_path}\n")
+                writer.write(f"大小: {entry['size']}字节 | 行数: {entry['lines']}\n")
+                writer.write(f"{'=' * 80}\n\n")
+                writer.write(content)
+        return files
+    
+    def generate_project_report(self):
+        """生成项目结构报告（整份报告在内存中，只适合小项目；大项目请用 save_report 流式写出）"""
+        import io
+        
+        buffer = io.StringIO()
+        files = self.write_project_report(buffer)
+        code_files = [{'path': rel_path, 'lines': entry['lines'], 'size': entry['size']}
+                      for rel_path, entry in files]
+        return buffer.getvalue(), code_files
     
     def compress_report(self, report_text):
         """压缩报告文本"""
+        # 只编码一次，压缩和校验和共用同一份字节
+        data = report_text.encode('utf-8')
+        
         # 先压缩再Base64编码
-        compressed = zlib.compress(report_text.encode('utf-8'), level=9)
+        compressed = zlib.compress(data, level=9)
         encoded = base64.b64encode(compressed).decode('ascii')
         
         # 计算校验和
-        checksum = hashlib.md5(report_text.encode('utf-8')).hexdigest()
+        checksum = hashlib.md5(data).hexdigest()
         
         return {
             'compressed': encoded,
@@ -160,53 +356,52 @@ class ProjectPacker:
         }
     
     def save_report(self, output_file="project_report.txt"):
-        """保存报告到文件"""
-        report_text, _ = self.generate_project_report()
-        
+        """保存报告到文件（边生成边写出，超过 100KB 时分块）"""
         print(f"生成报告中...")
-        print(f"原始大小: {len(report_text)} 字节")
+        files = self.scan_project()
+        print(f"文件: {len(files)} 个（读取 {self.stats['read']}，缓存 {self.stats['reused']}）")
         
-        # 如果文件太大，分割
+        # 按文件总大小估算报告大小，决定是否分割
         max_size = 100 * 1024  # 100KB
-        if len(report_text) > max_size:
+        estimated = sum(entry['size'] for _, entry in files)
+        if estimated > max_size:
             print("文件较大，进行分割...")
-            return self.save_split_report(report_text, output_file)
+            return self.save_split_report(output_file=output_file, files=files)
         
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(report_text)
+        writer = _SplitWriter(output_file)
+        try:
+            self.write_project_report(writer, files)
+        finally:
+            writer.close()
         
         print(f"报告已保存到: {output_file}")
         print(f"文件大小: {os.path.getsize(output_file) / 1024:.1f} KB")
         return output_file
     
-    def save_split_report(self, report_text, output_file="project_report"):
-        """保存分割的报告"""
+    def save_split_report(self, report_text=None, output_file="project_report", files=None):
+        """
+        保存分割的报告（每块 80KB，分块文件名为 <output_file>_partNN.txt）
+        
+        report_text 为 None 时流式生成报告并写出；传入已生成的报告文本时按原方式直接分割。
+        """
         max_chunk = 80 * 1024  # 80KB 每个分块
         
-        parts = []
-        for i in range(0, len(report_text), max_chunk):
-            chunk = report_text[i:i + max_chunk]
-            part_num = len(parts) + 1
-            part_file = f"{output_file}_part{part_num:02d}.txt"
-            
-            # 添加分块信息头
-            header = f"项目分块 {part_num}/{len(report_text)//max_chunk + 1}\n"
-            header += f"总大小: {len(report_text)} 字节\n"
-            header += f"本块: {len(chunk)} 字节\n"
-            header += "=" * 60 + "\n\n"
-            
-            with open(part_file, 'w', encoding='utf-8') as f:
-                f.write(header + chunk)
-            
-            parts.append(part_file)
-            print(f"创建分块 {part_num}: {part_file} ({len(chunk)/1024:.1f} KB)")
+        writer = _SplitWriter(output_file, max_chars=max_chunk)
+        try:
+            if report_text is None:
+                self.write_project_report(writer, files)
+            else:
+                writer.write(report_text)
+        finally:
+            writer.close()
+        parts = writer.parts
         
         # 创建索引文件
         index_file = f"{output_file}_index.txt"
         with open(index_file, 'w', encoding='utf-8') as f:
             f.write(f"项目分块索引\n")
             f.write(f"生成时间: {datetime.now()}\n")
-            f.write(f"总大小: {len(report_text)} 字节\n")
+            f.write(f"总大小: {writer.total_chars} 字节\n")
             f.write(f"分块数量: {len(parts)}\n")
             f.write("=" * 60 + "\n\n")
             for part in parts:
@@ -215,6 +410,80 @@ class ProjectPacker:
         print(f"索引文件: {index_file}")
         print(f"请上传所有分块文件")
         return parts
+    
+    # ========== 压缩包 ==========
+    def compress_and_save(self, output_file="project_compressed.txt"):
+        """
+        压缩打包：每个文件单独 zlib 压缩后 Base64 编码，逐个写出
+        
+        未变化的文件直接使用缓存的压缩块。文件格式:
+            第一行为 JSON 头（文件数、原始大小、各文件哈希的汇总校验和）
+            每个文件两行: "### FILE <相对路径> <sha256> <大小> <行数>"，以及压缩数据的 Base64
+        
+        Returns:
+            dict: 文件数、原始大小、压缩后大小和汇总校验和
+        """
+        files = self.scan_project(compress=True)
+        
+        # 汇总校验和：按路径顺序对 (路径, 文件哈希) 计算 SHA-256
+        summary = hashlib.sha256()
+        for rel_path, entry in files:
+            summary.update(f"{rel_path}\0{entry['sha256']}\n".encode('utf-8'))
+        
+        info = {
+            'format': 'welding-gun-pack/1',
+            'created_at': datetime.now().isoformat(),
+            'files': len(files),
+            'original_size': sum(entry['size'] for _, entry in files),
+            'checksum': summary.hexdigest(),
+        }
+        
+        temp_file = f"{output_file}.tmp"
+        with open(temp_file, 'w', encoding='ascii') as out:
+            out.write(json.dumps(info, ensure_ascii=True) + "\n")
+            for rel_path, entry in files:
+                with open(self._chunk_path(entry['sha256']), 'rb') as f:
+                    encoded = base64.b64encode(f.read()).decode('ascii')
+                name = json.dumps(rel_path, ensure_ascii=True)
+                out.write(f"{PACK_FILE_MARKER}{name} {entry['sha256']} {entry['size']} {entry['lines']}\n")
+                out.write(encoded + "\n")
+        os.replace(temp_file, output_file)
+        
+        info['compressed_size'] = os.path.getsize(output_file)
+        print(f"压缩包已保存到: {output_file}")
+        print(f"文件: {info['files']} 个（读取 {self.stats['read']}，缓存 {self.stats['reused']}）")
+        print(f"原始大小: {info['original_size'] / 1024:.1f} KB  压缩后: {info['compressed_size'] / 1024:.1f} KB")
+        return info
+
+
+def unpack_compressed(pack_file, target_dir):
+    """
+    还原 compress_and_save 生成的压缩包（逐个文件解压并校验哈希）
+    
+    Returns:
+        int: 还原的文件数
+    """
+    target_dir = Path(target_dir).resolve()
+    count = 0
+    with open(pack_file, 'r', encoding='ascii') as f:
+        json.loads(f.readline())
+        for line in f:
+            if not line.startswith(PACK_FILE_MARKER):
+                continue
+            name_json, digest, _size, _lines = line[len(PACK_FILE_MARKER):].rsplit(' ', 3)
+            rel_path = json.loads(name_json)
+            data = zlib.decompress(base64.b64decode(f.readline()))
+            if hashlib.sha256(data).hexdigest() != digest:
+                raise ValueError(f"文件校验失败: {rel_path}")
+            
+            target = (target_dir / rel_path).resolve()
+            if target_dir not in target.parents:
+                raise ValueError(f"不安全的文件路径: {rel_path}")
+            target.parent.mkdir(parents=True, exist_ok=True)
+            with open(target, 'wb') as out:
+                out.write(data)
+            count += 1
+    return count
 
 def main():
     """主函数"""
@@ -239,23 +508,23 @@ def main():
     if choice == "1":
         output_file = packer.save_report("welding_gun_project_full.txt")
         print(f"\n✅ 完整报告已生成: {output_file}")
-        
+    
     elif choice == "2":
         # 只打包核心文件
         core_files = packer.save_core_files("welding_gun_project_core.txt")
         print(f"\n✅ 核心文件报告已生成")
-        
+    
     elif choice == "3":
         # 压缩打包
         compressed = packer.compress_and_save("welding_gun_project_compressed.txt")
         print(f"\n✅ 压缩报告已生成")
-        
+    
     elif choice == "4":
         # 分析项目结构
         packer.analyze_project()
-        
+    
     else:
         print("无效选择")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
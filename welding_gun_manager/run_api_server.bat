@@ -0,0 +1,5 @@
+@echo off
+cd /d "%~dp0"
+echo 启动焊接枪管理系统API（生产模式）...
+python serve_api.py --host 0.0.0.0 --port 8000
+pause
\ No newline at end of file
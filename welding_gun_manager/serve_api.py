@@ -0,0 +1,78 @@
+# welding_gun_manager/serve_api.py
+"""
+文件服务 API 的生产环境入口
+以多个 uvicorn 工作进程运行 api_app:app（不使用 --reload），收到 Ctrl+C / SIGTERM 后
+停止接收新连接，等待进行中的传输完成（最多 --graceful-timeout 秒）再退出。
+
+用法:
+    python serve_api.py [--host 0.0.0.0] [--port 8000] [--workers 4]
+
+Linux 上也可以用 gunicorn 管理工作进程:
+    gunicorn -c gunicorn_conf.py api_app:app
+"""
+
+import os
+import sys
+import secrets
+import argparse
+
+from services.auth_service import SECRET_ENV
+
+
+def default_workers():
+    """默认工作进程数：文件传输以 I/O 为主，每个进程另有线程池，按 CPU 核数即可"""
+    return int(os.environ.get('WELDING_GUN_API_WORKERS', 0)) or max(2, os.cpu_count() or 1)
+
+
+def ensure_session_secret():
+    """
+    各工作进程必须使用同一个会话密钥，否则一个进程签发的令牌在其他进程中无效。
+    （退出登录记录在数据库的 revoked_sessions 表中，其他进程最迟 REVOCATION_CHECK_TTL 秒后拒绝该令牌。）
+    未配置环境变量时生成一个，由工作进程继承（重启服务后已签发的令牌失效）。
+    """
+    if not os.environ.get(SECRET_ENV):
+        os.environ[SECRET_ENV] = secrets.token_hex(32)
+        print(f"提示: 未设置 {SECRET_ENV}，已生成临时会话密钥，重启后需要重新登录")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="启动焊枪文件服务 API（生产模式）")
+    parser.add_argument('--host', default='0.0.0.0', help="监听地址")
+    parser.add_argument('--port', type=int, default=8000, help="监听端口")
+    parser.add_argument('--workers', type=int, default=default_workers(), help="工作进程数")
+    parser.add_argument('--threads', type=int, default=None,
+                        help="每个工作进程的文件读写线程数（默认 64，即 WELDING_GUN_API_THREADS）")
+    parser.add_argument('--graceful-timeout', type=int, default=30,
+                        help="关闭时等待进行中请求的最长秒数")
+    parser.add_argument('--keep-alive', type=int, default=5, help="空闲长连接保持秒数")
+    parser.add_argument('--log-level', default='info', help="日志级别")
+    args = parser.parse_args(argv)
+
+    try:
+        import uvicorn
+    except ImportError:
+        print("错误: 未安装 uvicorn，请运行 pip install uvicorn fastapi python-multipart")
+        return 1
+
+    # 上传目录和数据库都是相对路径，以本文件所在目录为工作目录
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    ensure_session_secret()
+    if args.threads:
+        os.environ['WELDING_GUN_API_THREADS'] = str(args.threads)
+
+    print(f"焊枪文件服务: http://{args.host}:{args.port}  工作进程: {args.workers}")
+    uvicorn.run(
+        "api_app:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        timeout_keep_alive=args.keep_alive,
+        proxy_headers=True,
+        log_level=args.log_level,
+    )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,383 @@
+# services/auth_service.py
+"""
+认证与会话
+密码使用加盐的 scrypt 哈希保存（不支持时回退到 PBKDF2-SHA256），登录时把旧的明文密码升级为哈希；
+登录成功后签发 HMAC 签名的会话令牌，校验令牌只需一次 HMAC 计算和内存查找，
+已校验的会话和角色查询结果放在带过期时间的内存缓存中，API 请求不再访问数据库。
+API 以多个工作进程运行时，注销记录保存在数据库中，各进程按 REVOCATION_CHECK_TTL 定期复查。
+"""
+
+import os
+import json
+import time
+import hmac
+import base64
+import hashlib
+import secrets
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from services.metrics import record_cache
+
+# scrypt 参数：N=2^14、r=8 约占用 16MB 内存，单次哈希约几十毫秒
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+
+# PBKDF2 回退的迭代次数
+PBKDF2_ITERATIONS = 600000
+
+# 会话有效期和角色缓存时间（秒）
+SESSION_TTL = 8 * 3600
+ROLE_CACHE_TTL = 300
+
+# 其他进程中的注销最迟多少秒后生效（会话的注销状态缓存时间）
+REVOCATION_CHECK_TTL = 15
+
+# 签名密钥的环境变量；未设置时每次启动随机生成（重启后旧令牌失效）
+SECRET_ENV = 'WELDING_GUN_SESSION_SECRET'
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+# ========== 密码哈希 ==========
+def hash_password(password):
+    """
+    生成密码哈希
+
+    Returns:
+        str: 'scrypt$N$r$p$盐$哈希' 或 'pbkdf2_sha256$迭代次数$盐$哈希'
+    """
+    salt = secrets.token_bytes(16)
+    if hasattr(hashlib, 'scrypt'):
+        digest = hashlib.scrypt(password.encode('utf-8'), salt=salt,
+                                n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P, dklen=32)
+        return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64encode(salt)}${_b64encode(digest)}"
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, PBKDF2_ITERATIONS)
+    return f"pbkdf2_sha256${PBKDF2_ITERATIONS}${_b64encode(salt)}${_b64encode(digest)}"
+
+
+def is_password_hash(stored):
+    return isinstance(stored, str) and stored.startswith(('scrypt$', 'pbkdf2_sha256$'))
+
+
+def verify_password(stored, password):
+    """
+    校验密码
+
+    Returns:
+        tuple: (是否正确, 是否需要重新哈希)；明文或参数过旧的记录需要重新哈希
+    """
+    if stored is None or password is None:
+        return False, False
+    if not is_password_hash(stored):
+        # 旧数据：明文密码
+        return hmac.compare_digest(stored.encode('utf-8'), password.encode('utf-8')), True
+
+    try:
+        scheme, *fields = stored.split('$')
+        if scheme == 'scrypt':
+            n, r, p = (int(value) for value in fields[:3])
+            salt, expected = _b64decode(fields[3]), _b64decode(fields[4])
+            digest = hashlib.scrypt(password.encode('utf-8'), salt=salt, n=n, r=r, p=p,
+                                    dklen=len(expected), maxmem=256 * r * (n + p + 2))
+            outdated = (n, r, p) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+        else:
+            iterations = int(fields[0])
+            salt, expected = _b64decode(fields[1]), _b64decode(fields[2])
+            digest = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iterations)
+            outdated = hasattr(hashlib, 'scrypt') or iterations < PBKDF2_ITERATIONS
+    except (ValueError, IndexError) as e:
+        print(f"密码哈希格式错误: {e}")
+        return False, False
+
+    ok = hmac.compare_digest(digest, expected)
+    return ok, ok and outdated
+
+
+# 用户不存在时也计算一次哈希，登录耗时不暴露用户名是否存在
+_DUMMY_HASH = None
+
+
+def check_user_password(db, username, password, allow_passwordless=False):
+    """
+    按用户名查询用户并校验密码，明文或过旧的密码校验通过后升级为新哈希
+
+    数据库中密码为空的账户一律拒绝；只有本机 Tk 界面传入 allow_passwordless=True 时，
+    administrator 账户保持原有约定免密码登录。网络接口（API）不得放开。
+
+    Args:
+        db: models.database.Database（或提供 fetch_one / execute 的对象）
+        allow_passwordless: 是否允许 administrator 免密码登录（仅本机界面）
+
+    Returns:
+        dict: 用户行；验证失败返回 None
+    """
+    global _DUMMY_HASH
+    row = db.fetch_one("SELECT * FROM users WHERE username = ?", (username,))
+
+    if row is None:
+        if _DUMMY_HASH is None:
+            _DUMMY_HASH = hash_password(secrets.token_hex(8))
+        verify_password(_DUMMY_HASH, password or '')
+        return None
+
+    if row['password'] is None:
+        return row if allow_passwordless and username == "administrator" else None
+
+    ok, needs_upgrade = verify_password(row['password'], password)
+    if not ok:
+        return None
+    if needs_upgrade:
+        try:
+            new_hash = hash_password(password)
+            db.execute("UPDATE users SET password = ? WHERE id = ?", (new_hash, row['id']))
+            row['password'] = new_hash
+        except Exception as e:
+            print(f"升级密码哈希失败: {e}")
+    return row
+
+
+# ========== 缓存 ==========
+class TTLCache:
+    """带过期时间和容量上限的内存缓存（线程安全）"""
+
+    def __init__(self, ttl, maxsize=4096):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires, value = item
+            if expires <= time.monotonic():
+                del self._data[key]
+                return default
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            item = self._data.pop(key, None)
+        return default if item is None else item[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+def db_role_lookup(db_path="welding_gun.db"):
+    """按用户 id 查询角色的函数（每次使用独立连接，可在任意线程调用）"""
+    def lookup(user_id):
+        conn = sqlite3.connect(db_path)
+        try:
+            row = conn.execute("SELECT role FROM users WHERE id = ?", (user_id,)).fetchone()
+        finally:
+            conn.close()
+        return row[0] if row else None
+    return lookup
+
+
+class DBRevocationStore:
+    """
+    保存在数据库中的注销记录（revoked_sessions 表），多个工作进程共享
+
+    每次使用独立连接，可在任意线程和进程中调用；过期的记录在写入时清理。
+    """
+
+    def __init__(self, db_path="welding_gun.db"):
+        self.db_path = db_path
+        self._ready = False
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        if not self._ready:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS revoked_sessions (
+                    sid TEXT PRIMARY KEY,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            conn.commit()
+            self._ready = True
+        return conn
+
+    def add(self, sid, expires_at):
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM revoked_sessions WHERE expires_at <= ?", (time.time(),))
+            conn.execute("INSERT OR REPLACE INTO revoked_sessions (sid, expires_at) VALUES (?, ?)",
+                         (sid, expires_at))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def is_revoked(self, sid):
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT 1 FROM revoked_sessions WHERE sid = ?", (sid,)).fetchone()
+        finally:
+            conn.close()
+        return row is not None
+
+
+# ========== 会话 ==========
+class SessionManager:
+    """
+    会话令牌管理
+
+    令牌格式为 base64(载荷).base64(HMAC-SHA256 签名)，载荷包含会话 id、用户 id、用户名、角色和过期时间。
+
+    Args:
+        secret: 签名密钥（bytes 或 str），默认读取环境变量，未设置时随机生成
+        ttl: 会话有效期（秒）
+        role_lookup: 可选函数 role_lookup(user_id) -> 角色，设置后角色按 ROLE_CACHE_TTL 缓存并定期重新查询，
+            用户被删除或降权后缓存过期即生效；未设置时使用令牌中的角色
+        role_ttl: 角色缓存时间（秒）
+        revocations: 可选的共享注销记录（如 DBRevocationStore），提供 add(sid, expires_at) 和 is_revoked(sid)；
+            未设置时注销只在当前进程内有效
+        revocation_ttl: 共享注销状态的缓存时间（秒）
+    """
+
+    def __init__(self, secret=None, ttl=SESSION_TTL, role_lookup=None, role_ttl=ROLE_CACHE_TTL,
+                 revocations=None, revocation_ttl=REVOCATION_CHECK_TTL):
+        secret = secret or os.environ.get(SECRET_ENV) or secrets.token_bytes(32)
+        self._secret = secret.encode('utf-8') if isinstance(secret, str) else secret
+        self.ttl = ttl
+        self.role_lookup = role_lookup
+        # 令牌 -> 会话；令牌过期时间不超过会话有效期
+        self._sessions = TTLCache(ttl)
+        self._roles = TTLCache(role_ttl)
+        self._revoked = TTLCache(ttl)
+        self.revocations = revocations
+        # sid -> 共享存储中是否已注销
+        self._revocation_checks = TTLCache(revocation_ttl)
+
+    def _sign(self, payload):
+        return _b64encode(hmac.new(self._secret, payload.encode('ascii'), hashlib.sha256).digest())
+
+    def issue(self, user):
+        """
+        为登录成功的用户签发令牌
+
+        Args:
+            user: User 对象或包含 id / username / role 的字典
+        """
+        get = user.get if isinstance(user, dict) else lambda key: getattr(user, key, None)
+        now = int(time.time())
+        session = {
+            'sid': secrets.token_hex(8),
+            'uid': get('id'),
+            'username': get('username'),
+            'role': get('role'),
+            'iat': now,
+            'exp': now + int(self.ttl),
+        }
+        payload = _b64encode(json.dumps(session, separators=(',', ':')).encode('utf-8'))
+        token = f"{payload}.{self._sign(payload)}"
+        self._sessions.set(token, session)
+        if session['uid'] is not None:
+            self._roles.set(session['uid'], session['role'])
+        return token
+
+    def validate(self, token):
+        """
+        校验令牌
+
+        Returns:
+            dict: 会话信息（含当前角色）；无效、过期或已注销时返回 None
+        """
+        if not token:
+            return None
+        session = self._sessions.get(token)
+        record_cache('session', session is not None)
+        if session is None:
+            # 不在缓存中（如重启后使用环境变量中的同一密钥）：校验签名后解析载荷
+            payload, _, signature = token.partition('.')
+            if not signature or not hmac.compare_digest(signature, self._sign(payload)):
+                return None
+            try:
+                session = json.loads(_b64decode(payload))
+            except ValueError:
+                return None
+            remaining = session.get('exp', 0) - time.time()
+            if remaining <= 0:
+                return None
+            self._sessions.set(token, session, ttl=remaining)
+
+        if session['exp'] <= time.time() or self._revoked.get(session['sid']) or self._revoked_elsewhere(session):
+            return None
+
+        role = session['role']
+        if self.role_lookup is not None and session['uid'] is not None:
+            role = self._roles.get(session['uid'])
+            record_cache('session_role', role is not None)
+            if role is None:
+                role = self.role_lookup(session['uid'])
+                if role is None:
+                    return None
+                self._roles.set(session['uid'], role)
+        return dict(session, role=role)
+
+    def _revoked_elsewhere(self, session):
+        """查询共享注销记录（其他工作进程处理的退出登录），结果缓存 revocation_ttl 秒"""
+        if self.revocations is None:
+            return False
+        revoked = self._revocation_checks.get(session['sid'])
+        record_cache('session_revocation', revoked is not None)
+        if revoked is None:
+            try:
+                revoked = self.revocations.is_revoked(session['sid'])
+            except sqlite3.Error as e:
+                print(f"查询注销记录失败: {e}")
+                return False
+            self._revocation_checks.set(session['sid'], revoked)
+        return revoked
+
+    def revoke(self, token):
+        """注销令牌（退出登录）"""
+        session = self._sessions.pop(token) or self.validate(token)
+        if session:
+            self._revoked.set(session['sid'], True)
+            if self.revocations is not None:
+                try:
+                    self.revocations.add(session['sid'], session['exp'])
+                except sqlite3.Error as e:
+                    print(f"保存注销记录失败: {e}")
+
+    def invalidate_user(self, user_id):
+        """用户角色或密码修改后清除角色缓存"""
+        self._roles.pop(user_id)
+
+
+_session_manager = None
+_session_lock = threading.Lock()
+
+
+def get_session_manager():
+    """进程内共享的会话管理器"""
+    global _session_manager
+    with _session_lock:
+        if _session_manager is None:
+            _session_manager = SessionManager()
+        return _session_manager
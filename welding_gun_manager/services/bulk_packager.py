@@ -0,0 +1,157 @@
+# services/bulk_packager.py
+"""
+批量打包
+按名称列表或条件（焊接类型/品牌/型号）选出多把焊枪，在进程池中每个进程打包一把焊枪，
+全部完成后在输出目录写入汇总清单 manifest.json（每个ZIP的大小、校验和及包含的文件）。
+"""
+
+import os
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from file_operations import write_gun_zip, record_zip
+from services.integrity_service import CHECKSUM_ALGORITHM, MANIFEST_KEY
+from services.storage_tiering import is_archived
+from utils.file_utils import hash_file
+
+# 可筛选的 gun_info.json 字段（新建焊枪对话框填写的字段；位置只在数据库中，文件夹里没有）
+FILTER_FIELDS = ('weld_type', 'gun_brand', 'gun_model')
+
+MANIFEST_NAME = 'manifest.json'
+
+
+def _package_gun(folder_path, zip_path):
+    """打包一把焊枪（在工作进程中执行）"""
+    if is_archived(folder_path):
+        # 只剩存根时打出的 ZIP 没有文件，不能算成功
+        raise RuntimeError(f"焊枪已归档到二级存储，尚未恢复: {folder_path}")
+    started = time.perf_counter()
+    stats = write_gun_zip(folder_path, zip_path)
+    stats[CHECKSUM_ALGORITHM] = hash_file(zip_path, CHECKSUM_ALGORITHM)
+    stats['elapsed_s'] = round(time.perf_counter() - started, 3)
+    return stats
+
+
+class BulkPackager:
+    """
+    批量打包焊枪
+
+    Args:
+        file_manager: GunFileManager
+        workers: 进程数，默认为 CPU 核数
+    """
+
+    def __init__(self, file_manager, workers=None):
+        self.file_manager = file_manager
+        self.workers = workers
+
+    def select(self, names=None, weld_type=None, gun_brand=None, gun_model=None, guns=None):
+        """
+        选出要打包的焊枪
+
+        Args:
+            names: 焊枪名称列表，为 None 时不按名称筛选
+            weld_type / gun_brand / gun_model: 条件，为空时不筛选
+            guns: 已加载的 gun_info 列表，为 None 时重新扫描目录
+
+        Returns:
+            list: gun_info 字典列表
+        """
+        criteria = {'weld_type': weld_type, 'gun_brand': gun_brand, 'gun_model': gun_model}
+        wanted = set(names) if names is not None else None
+
+        selected = []
+        for gun in (guns if guns is not None else self.file_manager.get_all_guns()):
+            if wanted is not None and gun.get('name') not in wanted:
+                continue
+            if any(value and gun.get(key) != value for key, value in criteria.items()):
+                continue
+            selected.append(gun)
+        return selected
+
+    def filter_options(self, guns=None):
+        """各筛选条件现有的取值，用于界面下拉框"""
+        options = {key: set() for key in FILTER_FIELDS}
+        for gun in (guns if guns is not None else self.file_manager.get_all_guns()):
+            for key in FILTER_FIELDS:
+                if gun.get(key):
+                    options[key].add(gun[key])
+        return {key: sorted(values) for key, values in options.items()}
+
+    def package(self, guns, output_dir, progress=None):
+        """
+        打包焊枪到输出目录
+
+        Args:
+            guns: select() 返回的 gun_info 列表
+            output_dir: 输出目录
+            progress: 可选回调 progress(done, total, entry)，在调用线程中执行
+
+        Returns:
+            dict: 汇总清单（同时写入 output_dir/manifest.json）
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        started_at = time.time()
+        entries = []
+        total = len(guns)
+
+        def finish(gun, zip_path, stats=None, error=None):
+            entry = {
+                'name': gun.get('name'),
+                'folder': os.path.basename(gun['folder_path']),
+                'zip': os.path.basename(zip_path),
+            }
+            if error is not None:
+                entry['error'] = str(error)
+            else:
+                entry.update(stats)
+                record_zip(stats['elapsed_s'], stats)
+                entry['files'] = gun.get('files', {})
+                entry[MANIFEST_KEY] = gun.get(MANIFEST_KEY, {})
+            entries.append(entry)
+            if progress:
+                progress(len(entries), total, entry)
+
+        jobs = []
+        for gun in guns:
+            zip_path = os.path.join(output_dir, os.path.basename(gun['folder_path']) + '.zip')
+            try:
+                # 已归档到二级存储的焊枪先恢复，否则 ZIP 中只有存根 gun_info.json
+                self.file_manager.ensure_local(gun['folder_path'])
+            except Exception as e:
+                finish(gun, zip_path, error=e)
+                continue
+            jobs.append((gun, zip_path))
+
+        if len(jobs) <= 1 or self.workers == 1:
+            for gun, zip_path in jobs:
+                try:
+                    finish(gun, zip_path, _package_gun(gun['folder_path'], zip_path))
+                except Exception as e:
+                    finish(gun, zip_path, error=e)
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                futures = {executor.submit(_package_gun, gun['folder_path'], zip_path): (gun, zip_path)
+                           for gun, zip_path in jobs}
+                for future in as_completed(futures):
+                    gun, zip_path = futures[future]
+                    try:
+                        finish(gun, zip_path, future.result())
+                    except Exception as e:
+                        finish(gun, zip_path, error=e)
+
+        entries.sort(key=lambda entry: entry['folder'])
+        manifest = {
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(started_at)),
+            'elapsed_s': round(time.time() - started_at, 3),
+            'checksum_algorithm': CHECKSUM_ALGORITHM,
+            'count': sum(1 for entry in entries if 'error' not in entry),
+            'failed': sum(1 for entry in entries if 'error' in entry),
+            'bytes': sum(entry.get('bytes', 0) for entry in entries),
+            'zip_bytes': sum(entry.get('zip_bytes', 0) for entry in entries),
+            'guns': entries,
+        }
+        with open(os.path.join(output_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        return manifest
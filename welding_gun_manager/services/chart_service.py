@@ -0,0 +1,286 @@
+# services/chart_service.py
+"""
+统计图表服务
+Figure 和 Axes 只创建一次并常驻内存，统计数据变化时原地修改饼图扇区和柱高；
+只有动态图元用 blit 重绘到缓存的背景上，渲染在后台线程完成，界面只显示生成的图片。
+"""
+
+import math
+import threading
+
+from services.scheduler import get_scheduler, PRIORITY_HIGH
+
+
+def _nice_ceiling(value):
+    """不小于 value 的“整齐”刻度上限（1、2、5 × 10^n）"""
+    if value <= 0:
+        return 1
+    magnitude = 10 ** math.floor(math.log10(value))
+    for step in (1, 2, 5, 10):
+        if value <= step * magnitude:
+            return step * magnitude
+    return 10 * magnitude
+
+
+class StatisticsChart:
+    """
+    常驻的统计图表（左：状态分布饼图，右：类型分布柱状图）
+
+    使用 matplotlib.figure.Figure 和 Agg 画布，不经过 pyplot，
+    因此不会在 pyplot 的全局图表管理器中累积 Figure。
+    非线程安全：同一时间只能由一个线程调用 update/render。
+    """
+
+    def __init__(self, width_px=1000, height_px=400, dpi=100):
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        self.dpi = dpi
+        self.figure = Figure(figsize=(width_px / dpi, height_px / dpi), dpi=dpi)
+        self.canvas = FigureCanvasAgg(self.figure)
+        self.pie_ax, self.bar_ax = self.figure.subplots(1, 2)
+
+        self.pie_ax.set_title('工枪状态分布')
+        self.pie_ax.set_aspect('equal')
+        self.pie_ax.set_xlim(-1.4, 1.4)
+        self.pie_ax.set_ylim(-1.3, 1.3)
+        self.pie_ax.axis('off')
+        self.bar_ax.set_title('工枪类型分布')
+        self.bar_ax.set_xlabel('类型')
+        self.bar_ax.set_ylabel('数量')
+
+        self._status_keys = None
+        self._type_keys = None
+        self._wedges = []
+        self._pie_labels = []
+        self._pie_pcts = []
+        self._bars = []
+        self._bar_ymax = None
+        self._empty_text = None
+
+        # blit 用的背景（不含动态图元），布局变化时置为 None 重新生成
+        self._background = None
+        self._data = None
+
+    @property
+    def needs_full_draw(self):
+        """背景是否需要重新绘制（布局、坐标范围或尺寸变化后）"""
+        return self._background is None
+
+    # ========== 图元更新 ==========
+    def set_size(self, width_px, height_px):
+        """修改图表像素尺寸，尺寸不变时不做任何事"""
+        width_px, height_px = int(width_px), int(height_px)
+        current = self.figure.get_size_inches() * self.dpi
+        if (round(current[0]), round(current[1])) != (width_px, height_px):
+            self.figure.set_size_inches(width_px / self.dpi, height_px / self.dpi)
+            self._background = None
+
+    def update(self, stats):
+        """
+        用统计数据更新图元
+
+        Returns:
+            bool: 图表内容是否有变化
+        """
+        status = dict(stats.get('status_distribution') or {})
+        types = dict(stats.get('type_distribution') or {})
+        data = (tuple(status.items()), tuple(types.items()))
+        if data == self._data:
+            return False
+        self._data = data
+
+        self._update_pie(status)
+        self._update_bars(types)
+        return True
+
+    def _update_pie(self, status):
+        keys = tuple(status)
+        values = [max(v, 0) for v in status.values()]
+        total = sum(values)
+
+        if keys != self._status_keys:
+            # 类别变化：只重建饼图的动态图元
+            for artist in self._wedges + self._pie_labels + self._pie_pcts:
+                artist.remove()
+            self._wedges, self._pie_labels, self._pie_pcts = [], [], []
+            if self._empty_text is not None:
+                self._empty_text.remove()
+                self._empty_text = None
+
+            if keys:
+                wedges, labels, pcts = self.pie_ax.pie(
+                    [1] * len(keys), labels=[str(k) for k in keys],
+                    colors=[f"C{i % 10}" for i in range(len(keys))],
+                    autopct='%1.1f%%', startangle=90
+                )
+                self._wedges, self._pie_labels, self._pie_pcts = list(wedges), list(labels), list(pcts)
+                # pie() 会重设坐标范围，恢复固定范围以免背景变化
+                self.pie_ax.set_xlim(-1.4, 1.4)
+                self.pie_ax.set_ylim(-1.3, 1.3)
+                self.pie_ax.axis('off')
+            else:
+                self._empty_text = self.pie_ax.text(0, 0, '暂无数据', ha='center', va='center')
+            for artist in self._wedges + self._pie_labels + self._pie_pcts:
+                artist.set_animated(True)
+            self._status_keys = keys
+            self._background = None
+
+        if not keys:
+            return
+
+        # 原地修改扇区角度及标签位置（与 Axes.pie 的布局一致）
+        theta = 90.0
+        for wedge, label, pct, value in zip(self._wedges, self._pie_labels, self._pie_pcts, values):
+            share = value / total if total else 1 / len(values)
+            theta2 = theta + 360.0 * share
+            wedge.set_theta1(theta)
+            wedge.set_theta2(theta2)
+            mid = math.radians((theta + theta2) / 2)
+            x, y = math.cos(mid), math.sin(mid)
+            label.set_position((1.1 * x, 1.1 * y))
+            label.set_horizontalalignment('left' if x > 0 else 'right')
+            pct.set_position((0.6 * x, 0.6 * y))
+            pct.set_text(f"{share * 100:.1f}%")
+            wedge.set_visible(value > 0)
+            label.set_visible(value > 0)
+            pct.set_visible(value > 0)
+            theta = theta2
+
+    def _update_bars(self, types):
+        keys = tuple(types)
+        values = list(types.values())
+
+        if keys != self._type_keys:
+            for bar in self._bars:
+                bar.remove()
+            # 用数值位置加刻度标签，类别变化时不会残留旧的分类刻度
+            positions = list(range(len(keys)))
+            container = self.bar_ax.bar(positions, [0] * len(keys), color='C0')
+            self._bars = list(container.patches)
+            for bar in self._bars:
+                bar.set_animated(True)
+            self.bar_ax.set_xticks(positions, [str(k) for k in keys])
+            self.bar_ax.set_xlim(-0.6, max(len(keys), 1) - 0.4)
+            self.bar_ax.tick_params(axis='x', rotation=45)
+            self._type_keys = keys
+            self._background = None
+
+        for bar, value in zip(self._bars, values):
+            bar.set_height(value)
+
+        # 纵轴刻度属于背景，只在最大值超出范围或明显变小时调整
+        peak = max(values, default=0)
+        if self._bar_ymax is None or peak > self._bar_ymax or peak < self._bar_ymax / 4:
+            self._bar_ymax = _nice_ceiling(peak * 1.1)
+            self.bar_ax.set_ylim(0, self._bar_ymax)
+            self._background = None
+
+    # ========== 渲染 ==========
+    def _animated_artists(self):
+        return self._wedges + self._pie_labels + self._pie_pcts + self._bars
+
+    def render(self):
+        """
+        渲染并返回 PIL.Image（RGBA）
+
+        背景有效时只恢复背景并重绘动态图元（blit），否则完整绘制一次并缓存背景。
+        """
+        from PIL import Image
+
+        if self._background is None:
+            self.figure.tight_layout()
+            # 动态图元设为 animated 后 draw() 不会绘制它们，得到纯背景
+            self.canvas.draw()
+            self._background = self.canvas.copy_from_bbox(self.figure.bbox)
+        else:
+            self.canvas.restore_region(self._background)
+
+        for artist in self._animated_artists():
+            if artist.get_visible():
+                artist.axes.draw_artist(artist)
+
+        buffer = self.canvas.buffer_rgba()
+        width, height = buffer.shape[1], buffer.shape[0]
+        return Image.frombuffer('RGBA', (width, height), bytes(buffer), 'raw', 'RGBA', 0, 1)
+
+
+class StatisticsChartService:
+    """
+    统计页面的数据与图表缓存
+
+    后台线程用独立连接查询统计数据，通过 PRAGMA data_version 判断其它连接
+    是否修改过数据库，未变化时直接返回缓存的统计和图片，不查询也不重绘。
+    """
+
+    def __init__(self, db_path, scheduler=None):
+        self.db_path = db_path
+        self.scheduler = scheduler or get_scheduler()
+        self.stats = None
+        self.image = None
+
+        self._lock = threading.Lock()
+        self._db = None
+        self._controller = None
+        self._chart = None
+        self._data_version = None
+        self._size = None
+        self._task = None
+
+    def invalidate(self):
+        """标记缓存失效（本进程写入数据后调用）"""
+        self._data_version = None
+
+    def refresh(self, callback, error_callback=None, size=None):
+        """
+        在后台线程获取统计并渲染图表
+
+        Args:
+            callback: callback((stats, image, changed))，在界面线程调用
+            error_callback: error_callback(exception)，在界面线程调用
+            size: 可选的 (宽, 高) 像素尺寸
+        """
+        if self._task is not None:
+            self.scheduler.cancel(self._task)
+        self._task = self.scheduler.submit(
+            self._refresh, size,
+            priority=PRIORITY_HIGH,
+            callback=callback,
+            error_callback=error_callback,
+            name="statistics_chart"
+        )
+        return self._task
+
+    def _refresh(self, size=None):
+        # 后台线程：串行化对连接和 Figure 的访问
+        with self._lock:
+            if self._db is None:
+                from models.database import Database
+                from controllers.gun_controller import GunController
+                self._db = Database(self.db_path, check_same_thread=False)
+                self._controller = GunController(self._db)
+
+            version = self._db.connect().execute("PRAGMA data_version").fetchone()[0]
+            if version != self._data_version or self.stats is None:
+                self.stats = self._controller.get_statistics()
+                self._data_version = version
+
+            if self._chart is None:
+                self._chart = StatisticsChart(*(size or (1000, 400)))
+            elif size:
+                self._chart.set_size(*size)
+
+            changed = self._chart.update(self.stats)
+            if changed or self.image is None or self._chart.needs_full_draw:
+                self.image = self._chart.render()
+                changed = True
+            return self.stats, self.image, changed
+
+    def close(self):
+        """释放数据库连接和图表"""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+            self._chart = None
+            self.image = None
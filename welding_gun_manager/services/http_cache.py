@@ -0,0 +1,276 @@
+# services/http_cache.py
+"""
+API 响应压缩和缓存头
+CompressionMiddleware 按 Accept-Encoding 对 JSON、CSV、DXF 等文本类响应做 gzip（安装了 brotli 时优先 br）
+流式压缩，图片、压缩包等已压缩的内容原样返回；ETag / If-None-Match 辅助函数让轮询类接口在内容未变时返回 304。
+"""
+
+import os
+import zlib
+import hashlib
+import mimetypes
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 值得压缩的内容类型（其余类型如图片、zip、7z 已经是压缩格式，不再压缩）
+COMPRESSIBLE_TYPES = {
+    'application/json', 'application/xml', 'application/javascript',
+    'application/csv', 'application/dxf', 'image/vnd.dxf', 'image/svg+xml',
+}
+
+# mimetypes 不认识或识别不准的焊枪文件类型
+EXTRA_MEDIA_TYPES = {
+    '.dxf': 'image/vnd.dxf',
+    '.csv': 'text/csv',
+    '.json': 'application/json',
+    '.txt': 'text/plain',
+    '.log': 'text/plain',
+    '.step': 'application/step',
+    '.stp': 'application/step',
+}
+
+# 小于该字节数的响应不压缩
+MINIMUM_SIZE = 1024
+
+
+def guess_media_type(filename):
+    """按扩展名猜测内容类型，未知时返回 application/octet-stream"""
+    ext = os.path.splitext(filename)[1].lower()
+    if ext in EXTRA_MEDIA_TYPES:
+        return EXTRA_MEDIA_TYPES[ext]
+    return mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+
+def is_compressible(content_type):
+    """内容类型是否值得压缩"""
+    media_type = (content_type or '').split(';', 1)[0].strip().lower()
+    return (media_type.startswith('text/') or media_type in COMPRESSIBLE_TYPES
+            or media_type.endswith('+json') or media_type.endswith('+xml'))
+
+
+def choose_encoding(accept_encoding):
+    """
+    根据 Accept-Encoding 选择压缩算法
+
+    Returns:
+        str: 'br'（需要安装 brotli）、'gzip' 或 None
+    """
+    accepted = {}
+    for item in (accept_encoding or '').split(','):
+        name, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.strip().lower()] = quality
+
+    def allowed(name):
+        return accepted.get(name, accepted.get('*', 0.0)) > 0
+
+    if brotli is not None and allowed('br'):
+        return 'br'
+    if allowed('gzip'):
+        return 'gzip'
+    return None
+
+
+# ========== ETag ==========
+def make_etag(*parts):
+    """由若干部分生成强 ETag"""
+    digest = hashlib.blake2b('\0'.join(str(part) for part in parts).encode('utf-8'), digest_size=16)
+    return f'"{digest.hexdigest()}"'
+
+
+def file_etag(path, checksum=None):
+    """
+    文件的 ETag：有内容校验和时使用校验和，否则使用大小和修改时间
+
+    Args:
+        path: 文件路径
+        checksum: 可选的校验清单记录（{size, blake2b}）
+    """
+    stat = os.stat(path)
+    if checksum and checksum.get('size') == stat.st_size:
+        digest = next((value for key, value in checksum.items() if key != 'size' and value), None)
+        if digest:
+            return f'"{digest[:32]}"'
+    return make_etag(stat.st_size, stat.st_mtime_ns)
+
+
+def etag_matches(if_none_match, etag):
+    """If-None-Match 是否命中（弱比较，压缩后的 W/ 前缀不影响结果）"""
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    target = etag[2:] if etag.startswith('W/') else etag
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == target:
+            return True
+    return False
+
+
+def not_modified(request, etag, cache_control):
+    """
+    请求带的 If-None-Match 命中时返回 304 响应，否则返回 None
+
+    Args:
+        request: starlette Request
+        etag: 当前内容的 ETag
+        cache_control: Cache-Control 头
+    """
+    if etag_matches(request.headers.get('if-none-match'), etag):
+        return Response(status_code=304, headers={'ETag': etag, 'Cache-Control': cache_control})
+    return None
+
+
+# ========== 压缩 ==========
+class _Compressor:
+    """gzip / br 流式压缩器"""
+
+    def __init__(self, encoding, level):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._brotli = brotli.Compressor(quality=level['br'])
+        else:
+            self._zlib = zlib.compressobj(level['gzip'], zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        if self.encoding == 'br':
+            return self._brotli.process(data)
+        return self._zlib.compress(data)
+
+    def flush(self):
+        if self.encoding == 'br':
+            return self._brotli.finish()
+        return self._zlib.flush()
+
+
+class CompressionMiddleware:
+    """
+    响应压缩中间件（ASGI）
+
+    只压缩 200 状态、没有 Content-Encoding、内容类型为文本类的响应；Range 请求不压缩，以免破坏断点续传。
+    单条消息的响应一次压缩并给出 Content-Length，文件等多段响应边读边压缩。
+
+    Args:
+        app: ASGI 应用
+        minimum_size: 小于该字节数的响应不压缩
+        gzip_level: gzip 压缩级别
+        brotli_quality: brotli 压缩质量
+    """
+
+    def __init__(self, app, minimum_size=MINIMUM_SIZE, gzip_level=6, brotli_quality=4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.level = {'gzip': gzip_level, 'br': brotli_quality}
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        encoding = choose_encoding(headers.get('accept-encoding'))
+        if encoding is None or 'range' in headers:
+            await self.app(scope, receive, send)
+            return
+
+        # 压缩时不能让服务器直接发送文件（http.response.pathsend）
+        extensions = scope.get('extensions')
+        if extensions and 'http.response.pathsend' in extensions:
+            extensions = {key: value for key, value in extensions.items() if key != 'http.response.pathsend'}
+            scope = dict(scope, extensions=extensions)
+
+        responder = _CompressingResponder(send, encoding, self.minimum_size, self.level)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressingResponder:
+    """拦截 send，决定是否压缩并改写响应头"""
+
+    def __init__(self, send, encoding, minimum_size, level):
+        self._send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.level = level
+        self._start = None
+        self._compressor = None
+        # None: 尚未决定；True: 压缩；False: 原样转发
+        self._compressing = None
+
+    def _should_compress(self, message):
+        headers = Headers(raw=message['headers'])
+        return (message['status'] == 200 and 'content-encoding' not in headers
+                and is_compressible(headers.get('content-type')))
+
+    def _compressed_headers(self, content_length=None):
+        headers = MutableHeaders(raw=list(self._start['headers']))
+        headers['Content-Encoding'] = self.encoding
+        headers.add_vary_header('Accept-Encoding')
+        if 'content-length' in headers:
+            del headers['Content-Length']
+        if content_length is not None:
+            headers['Content-Length'] = str(content_length)
+        # 压缩后的表示与原文不同字节，强 ETag 改为弱 ETag
+        etag = headers.get('etag')
+        if etag and not etag.startswith('W/'):
+            headers['ETag'] = 'W/' + etag
+        return dict(self._start, headers=headers.raw)
+
+    async def send(self, message):
+        message_type = message['type']
+        if message_type == 'http.response.start':
+            if self._should_compress(message):
+                self._start = message
+            else:
+                self._compressing = False
+                await self._send(message)
+            return
+
+        if message_type != 'http.response.body' or self._compressing is False:
+            await self._send(message)
+            return
+
+        body = message.get('body', b'')
+        more_body = message.get('more_body', False)
+
+        if self._compressing is None:
+            if not more_body:
+                # 完整响应在一条消息里：太小时不压缩，否则一次压缩
+                if len(body) < self.minimum_size:
+                    self._compressing = False
+                    headers = MutableHeaders(raw=list(self._start['headers']))
+                    headers.add_vary_header('Accept-Encoding')
+                    await self._send(dict(self._start, headers=headers.raw))
+                    await self._send(message)
+                    return
+                compressor = _Compressor(self.encoding, self.level)
+                data = compressor.compress(body) + compressor.flush()
+                self._compressing = True
+                await self._send(self._compressed_headers(len(data)))
+                await self._send({'type': 'http.response.body', 'body': data, 'more_body': False})
+                return
+
+            self._compressing = True
+            self._compressor = _Compressor(self.encoding, self.level)
+            await self._send(self._compressed_headers())
+
+        data = self._compressor.compress(body) if body else b''
+        if not more_body:
+            data += self._compressor.flush()
+        if data or not more_body:
+            await self._send({'type': 'http.response.body', 'body': data, 'more_body': more_body})
@@ -0,0 +1,343 @@
+# services/integrity_service.py
+"""
+文件完整性校验
+保存文件时记录大小和 BLAKE2b 哈希（焊枪文件记在 gun_info.json 的 checksums 中，
+上传目录记在 .manifest.json 中）；校验时用进程池并行重新计算，找出损坏、丢失和未登记的文件。
+"""
+
+import os
+import json
+import time
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from utils.file_utils import hash_file
+from utils.locking import file_lock
+
+# 哈希算法（hashlib 内置，速度接近磁盘读取速度）
+CHECKSUM_ALGORITHM = 'blake2b'
+
+# gun_info.json 中保存校验信息的键
+MANIFEST_KEY = 'checksums'
+
+# 上传目录的清单文件名
+UPLOAD_MANIFEST_NAME = '.manifest.json'
+
+# 文件数少于该值时在当前进程中校验，省去启动进程池的开销
+MIN_FILES_FOR_POOL = 32
+
+# 焊枪文件夹中不参与校验的文件
+_IGNORED_FILES = {'gun_info.json', 'gun_info.json.lock'}
+
+
+def checksum_entry(size, digest):
+    """清单中的一条记录"""
+    return {'size': size, CHECKSUM_ALGORITHM: digest}
+
+
+def _verify_file(item):
+    """
+    校验单个文件（在工作进程中执行，必须是模块级函数）
+
+    Args:
+        item: (分组, 相对路径, 绝对路径, 期望记录或 None)
+
+    Returns:
+        tuple: (分组, 相对路径, 状态, 记录)，状态为 ok / corrupt / missing / unrecorded / error
+    """
+    group, relpath, path, expected = item
+    try:
+        size = os.path.getsize(path)
+    except FileNotFoundError:
+        return group, relpath, 'missing', expected
+    except OSError as e:
+        return group, relpath, 'error', {'error': str(e)}
+
+    # 大小不同无需计算哈希
+    if expected is not None and expected.get('size') != size:
+        return group, relpath, 'corrupt', {'size': size, 'expected_size': expected.get('size')}
+
+    try:
+        digest = hash_file(path, CHECKSUM_ALGORITHM)
+    except OSError as e:
+        return group, relpath, 'error', {'error': str(e)}
+
+    actual = checksum_entry(size, digest)
+    if expected is None:
+        return group, relpath, 'unrecorded', actual
+    if expected.get(CHECKSUM_ALGORITHM) != digest:
+        return group, relpath, 'corrupt', actual
+    return group, relpath, 'ok', actual
+
+
+def _load_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _write_json(path, data):
+    # 先写临时文件再替换，避免中途失败留下半个清单
+    temp = f"{path}.tmp"
+    with open(temp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(temp, path)
+
+
+class ChecksumManifest:
+    """
+    目录级校验清单（JSON 文件，{文件名: {size, blake2b}}）
+
+    用于没有 gun_info.json 的目录，如 API 的上传目录。线程安全。
+    """
+
+    def __init__(self, root, name=UPLOAD_MANIFEST_NAME):
+        self.root = root
+        self.path = os.path.join(root, name)
+        self._lock = threading.Lock()
+        # (mtime_ns, size, entries)：清单文件未变化时不再重复解析
+        self._cached = None
+
+    def _entries(self):
+        """清单内容（按文件的修改时间和大小缓存，调用方不应修改）"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return {}
+        cached = self._cached
+        if cached is not None and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            return cached[2]
+        try:
+            entries = _load_json(self.path)
+        except (OSError, ValueError) as e:
+            print(f"读取校验清单失败: {e}")
+            return {}
+        self._cached = (stat.st_mtime_ns, stat.st_size, entries)
+        return entries
+
+    def load(self):
+        return dict(self._entries())
+
+    def record(self, filename, size, digest):
+        """登记一个文件（多个 API 工作进程共用清单，读改写期间加文件锁）"""
+        with self._lock, file_lock(self.path):
+            entries = self.load()
+            entries[filename] = checksum_entry(size, digest)
+            _write_json(self.path, entries)
+
+    def remove(self, filename):
+        """删除一个文件的记录"""
+        with self._lock, file_lock(self.path):
+            entries = self.load()
+            if entries.pop(filename, None) is not None:
+                _write_json(self.path, entries)
+
+    def get(self, filename):
+        return self._entries().get(filename)
+
+
+# ========== 收集待校验文件 ==========
+def collect_gun_files(base_dir):
+    """
+    收集焊枪目录树中所有待校验的文件
+
+    Returns:
+        list: _verify_file 的参数元组列表；分组为焊枪文件夹名
+    """
+    items = []
+    if not os.path.isdir(base_dir):
+        return items
+
+    for folder_name in sorted(os.listdir(base_dir)):
+        folder_path = os.path.join(base_dir, folder_name)
+        info_file = os.path.join(folder_path, 'gun_info.json')
+        if not os.path.isfile(info_file):
+            continue
+        try:
+            info = _load_json(info_file)
+        except (OSError, ValueError) as e:
+            print(f"读取焊枪信息失败 {info_file}: {e}")
+            info = {}
+
+        # 已归档到二级存储的焊枪：校验归档文件本身
+        from services.storage_tiering import ARCHIVE_KEY
+        archive = info.get(ARCHIVE_KEY)
+        if archive:
+            expected = checksum_entry(archive.get('archive_bytes'), archive.get(CHECKSUM_ALGORITHM))
+            items.append((folder_name, os.path.basename(archive['path']), archive['path'], expected))
+            continue
+        recorded = dict(info.get(MANIFEST_KEY, {}))
+
+        for root, _, files in os.walk(folder_path):
+            for name in files:
+                path = os.path.join(root, name)
+                relpath = os.path.relpath(path, folder_path).replace(os.sep, '/')
+                if relpath in _IGNORED_FILES or name.endswith('.tmp'):
+                    continue
+                items.append((folder_name, relpath, path, recorded.pop(relpath, None)))
+
+        # 清单中有记录但磁盘上已不存在的文件
+        for relpath, expected in recorded.items():
+            items.append((folder_name, relpath, os.path.join(folder_path, relpath), expected))
+    return items
+
+
+def collect_manifest_files(manifest):
+    """收集 ChecksumManifest 目录中待校验的文件，分组为目录路径"""
+    recorded = manifest.load()
+    items = []
+    if os.path.isdir(manifest.root):
+        for name in sorted(os.listdir(manifest.root)):
+            path = os.path.join(manifest.root, name)
+            if name.startswith('.') or not os.path.isfile(path):
+                continue
+            items.append((manifest.root, name, path, recorded.pop(name, None)))
+    for name, expected in recorded.items():
+        items.append((manifest.root, name, os.path.join(manifest.root, name), expected))
+    return items
+
+
+# ========== 校验 ==========
+def verify_files(items, workers=None, progress=None):
+    """
+    并行校验文件
+
+    Args:
+        items: collect_* 返回的参数元组列表
+        workers: 进程数，默认为 CPU 核数
+        progress: 可选回调 progress(done, total)，在调用线程中执行
+
+    Returns:
+        list: _verify_file 的结果列表
+    """
+    total = len(items)
+    results = []
+    if total < MIN_FILES_FOR_POOL or workers == 1:
+        for item in items:
+            results.append(_verify_file(item))
+            if progress:
+                progress(len(results), total)
+        return results
+
+    # 大文件和小文件混在一起，按块分发以平衡各进程的负载
+    chunksize = max(1, min(16, total // ((workers or os.cpu_count() or 1) * 8)))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for result in executor.map(_verify_file, items, chunksize=chunksize):
+            results.append(result)
+            if progress:
+                progress(len(results), total)
+    return results
+
+
+def summarize(results, started_at):
+    """汇总校验结果"""
+    report = {
+        'started_at': started_at,
+        'elapsed_s': round(time.time() - started_at, 3),
+        'checked': len(results),
+        'bytes': 0,
+        'ok': 0,
+        'corrupt': [],
+        'missing': [],
+        'unrecorded': [],
+        'error': [],
+    }
+    for group, relpath, status, detail in results:
+        if detail and 'size' in detail and status in ('ok', 'unrecorded'):
+            report['bytes'] += detail['size']
+        if status == 'ok':
+            report['ok'] += 1
+        else:
+            report[status].append({'group': group, 'path': relpath, 'detail': detail})
+    report['healthy'] = not (report['corrupt'] or report['missing'] or report['error'])
+    return report
+
+
+def _backfill_gun_manifests(base_dir, results):
+    """把未登记文件的校验信息写回各自的 gun_info.json"""
+    by_folder = {}
+    for folder_name, relpath, status, detail in results:
+        if status == 'unrecorded':
+            by_folder.setdefault(folder_name, {})[relpath] = detail
+
+    for folder_name, entries in by_folder.items():
+        info_file = os.path.join(base_dir, folder_name, 'gun_info.json')
+        try:
+            # 与上传、目录监视共用同一把锁，避免覆盖期间写入的文件记录
+            with file_lock(info_file):
+                info = _load_json(info_file)
+                info.setdefault(MANIFEST_KEY, {}).update(entries)
+                _write_json(info_file, info)
+        except (OSError, ValueError, TimeoutError) as e:
+            print(f"写入校验信息失败 {info_file}: {e}")
+
+
+def verify_gun_tree(base_dir="uploaded_guns", upload_dir=None, workers=None,
+                    backfill=False, log_path=None, progress=None):
+    """
+    校验整个焊枪文件目录（可选同时校验上传目录）
+
+    Args:
+        base_dir: GunFileManager 的根目录
+        upload_dir: 可选，带 .manifest.json 的上传目录
+        workers: 进程数
+        backfill: 是否把未登记文件（旧数据）的校验信息写入清单
+        log_path: 可选，报告追加写入的日志文件（JSON Lines）
+        progress: progress(done, total)
+
+    Returns:
+        dict: 校验报告
+    """
+    started_at = time.time()
+    items = collect_gun_files(base_dir)
+    if upload_dir:
+        items.extend(collect_manifest_files(ChecksumManifest(upload_dir)))
+
+    results = verify_files(items, workers=workers, progress=progress)
+    report = summarize(results, started_at)
+    report['base_dir'] = base_dir
+
+    if backfill and report['unrecorded']:
+        _backfill_gun_manifests(base_dir, [r for r in results if r[0] != upload_dir])
+        if upload_dir:
+            manifest = ChecksumManifest(upload_dir)
+            for group, relpath, status, detail in results:
+                if group == upload_dir and status == 'unrecorded':
+                    manifest.record(relpath, detail['size'], detail[CHECKSUM_ALGORITHM])
+
+    if log_path:
+        try:
+            os.makedirs(os.path.dirname(log_path) or '.', exist_ok=True)
+            with open(log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(report, ensure_ascii=False) + '\n')
+        except OSError as e:
+            print(f"写入校验日志失败: {e}")
+    return report
+
+
+def format_report(report):
+    """把校验报告格式化为文本"""
+    lines = [
+        f"校验文件: {report['checked']} 个，{report['bytes'] / 1024 / 1024:.1f} MB，"
+        f"耗时 {report['elapsed_s']:.1f} 秒",
+        f"正常: {report['ok']}  损坏: {len(report['corrupt'])}  丢失: {len(report['missing'])}  "
+        f"未登记: {len(report['unrecorded'])}  错误: {len(report['error'])}",
+    ]
+    for status, title in (('corrupt', '损坏'), ('missing', '丢失'), ('error', '错误')):
+        for entry in report[status][:20]:
+            lines.append(f"  [{title}] {entry['group']}/{entry['path']}")
+    return "\n".join(lines)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="校验焊枪文件完整性")
+    parser.add_argument('base_dir', nargs='?', default='uploaded_guns')
+    parser.add_argument('--uploads', default=None, help="同时校验的上传目录")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--backfill', action='store_true', help="为未登记的文件补写校验信息")
+    args = parser.parse_args()
+
+    result = verify_gun_tree(args.base_dir, args.uploads, workers=args.workers, backfill=args.backfill)
+    print(format_report(result))
+    raise SystemExit(0 if result['healthy'] else 1)
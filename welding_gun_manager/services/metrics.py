@@ -0,0 +1,341 @@
+# services/metrics.py
+"""
+运行指标
+进程内的计数器（Counter）、仪表（Gauge）和直方图（Histogram），可输出为 Prometheus 文本格式（API 的 /metrics）
+或供 Tk 诊断对话框显示的文本摘要。
+
+命名约定：耗时直方图以 _seconds 结尾，对应的字节计数器为同一前缀加 _bytes_total
+（如 welding_gun_file_copy_seconds / welding_gun_file_copy_bytes_total），摘要中据此计算吞吐量。
+
+指标只在本进程内累计：API 以多个工作进程运行时，每次抓取 /metrics 得到的是处理该请求的进程的数据，
+输出的每个样本都带有 pid 标签，各进程的序列互不覆盖，跨进程汇总时按 pid 求和（如 sum without (pid)）。
+"""
+
+import os
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+
+# 默认直方图分桶上界（秒）
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _format_labels(names, values, extra=None, const=()):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    pairs.extend(const)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class _Metric:
+    """指标基类：按标签值分别保存"""
+
+    metric_type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"指标 {self.name} 需要标签 {self.labelnames}，传入的是 {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def samples(self):
+        """[(名称后缀, 标签值, 附加标签, 值)]"""
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+
+    metric_type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        if amount < 0:
+            raise ValueError("计数器只能增加")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def total(self):
+        """所有标签值的合计"""
+        with self._lock:
+            return sum(self._values.values())
+
+    def samples(self):
+        with self._lock:
+            return [('_total' if not self.name.endswith('_total') else '', key, None, value)
+                    for key, value in sorted(self._values.items())]
+
+
+class Gauge(_Metric):
+    """可增可减的当前值；也可以用 set_function 在采集时计算"""
+
+    metric_type = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._function = None
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, function):
+        """采集时调用 function() 取值（只用于无标签的仪表）"""
+        self._function = function
+
+    def value(self, **labels):
+        if self._function is not None:
+            return self._function()
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        if self._function is not None:
+            try:
+                return [('', (), None, self._function())]
+            except Exception as e:
+                print(f"采集指标失败 {self.name}: {e}")
+                return []
+        with self._lock:
+            return [('', key, None, value) for key, value in sorted(self._values.items())]
+
+
+class Histogram(_Metric):
+    """
+    直方图：按分桶统计观测值的分布，同时累计总和和次数
+
+    Args:
+        buckets: 分桶上界（升序），自动补充 +Inf
+    """
+
+    metric_type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # [各分桶计数（最后一个为 +Inf）, 总和, 次数]
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """记录 with 块的耗时（秒）"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def summary(self):
+        """
+        所有标签值合并后的摘要
+
+        Returns:
+            dict: count、sum、avg 和按分桶估计的 p50 / p95 上界
+        """
+        with self._lock:
+            counts = [0] * (len(self.buckets) + 1)
+            total = 0.0
+            count = 0
+            for bucket_counts, value_sum, value_count in self._values.values():
+                counts = [a + b for a, b in zip(counts, bucket_counts)]
+                total += value_sum
+                count += value_count
+
+        def quantile(q):
+            if not count:
+                return None
+            target = q * count
+            running = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                running += bucket_count
+                if running >= target:
+                    return bound
+            return float('inf')
+
+        return {
+            'count': count,
+            'sum': total,
+            'avg': total / count if count else None,
+            'p50': quantile(0.5),
+            'p95': quantile(0.95),
+        }
+
+    def samples(self):
+        result = []
+        with self._lock:
+            items = sorted((key, (list(entry[0]), entry[1], entry[2])) for key, entry in self._values.items())
+        for key, (bucket_counts, value_sum, value_count) in items:
+            running = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), bucket_counts):
+                running += bucket_count
+                result.append(('_bucket', key, ('le', _format_value(float(bound))), running))
+            result.append(('_sum', key, None, value_sum))
+            result.append(('_count', key, None, value_count))
+        return result
+
+
+class MetricsRegistry:
+    """
+    指标注册表（线程安全）
+
+    counter() / gauge() / histogram() 按名称获取或创建指标，同名指标类型必须一致。
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    def _get_or_create(self, cls, name, documentation, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"指标 {name} 已以不同的类型或标签注册")
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def metrics(self):
+        with self._lock:
+            return sorted(self._metrics.values(), key=lambda metric: metric.name)
+
+    def reset(self):
+        """
+        清空所有指标的数值（指标定义保留）
+
+        只用于测试：计数器在进程运行期间归零会让 Prometheus 误判为进程重启。
+        """
+        for metric in self.metrics():
+            metric.reset()
+        self.started_at = time.time()
+
+    # ========== 输出 ==========
+    def render(self):
+        """Prometheus 文本格式（text/plain; version=0.0.4），样本带 pid 标签区分工作进程"""
+        const = (('pid', os.getpid()),)
+        lines = []
+        for metric in self.metrics():
+            samples = metric.samples()
+            if not samples:
+                continue
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.metric_type}")
+            for suffix, key, extra, value in samples:
+                labels = _format_labels(metric.labelnames, key, extra, const)
+                lines.append(f"{metric.name}{suffix}{labels} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+    def cache_hit_rates(self):
+        """{缓存名: (命中次数, 未命中次数, 命中率)}"""
+        hits = {}
+        for _, (name, result), _, value in CACHE_REQUESTS.samples():
+            entry = hits.setdefault(name, [0, 0])
+            entry[0 if result == 'hit' else 1] += value
+        return {name: (hit, miss, hit / (hit + miss) if hit + miss else None)
+                for name, (hit, miss) in hits.items()}
+
+    def dump_text(self):
+        """供诊断对话框显示的文本摘要"""
+        lines = [f"统计开始: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started_at))}", ""]
+
+        rates = self.cache_hit_rates()
+        if rates:
+            lines.append("缓存命中率:")
+            for name, (hit, miss, rate) in rates.items():
+                lines.append(f"  {name:20} {rate * 100 if rate is not None else 0:6.1f}%  命中 {hit}  未命中 {miss}")
+            lines.append("")
+
+        histograms = [metric for metric in self.metrics() if isinstance(metric, Histogram)]
+        if histograms:
+            lines.append("耗时:")
+            for metric in histograms:
+                summary = metric.summary()
+                if not summary['count']:
+                    continue
+                text = (f"  {metric.name:45} 次数 {summary['count']:6}  平均 {summary['avg'] * 1000:9.2f} ms  "
+                        f"p95 ≤ {_format_value(summary['p95'])} s")
+                # 有对应字节计数器时给出吞吐量
+                if metric.name.endswith('_seconds'):
+                    bytes_metric = self.get(metric.name[:-len('_seconds')] + '_bytes_total')
+                    if isinstance(bytes_metric, Counter) and summary['sum'] > 0:
+                        text += f"  {bytes_metric.total() / summary['sum'] / 1024 / 1024:8.2f} MB/s"
+                lines.append(text)
+            lines.append("")
+
+        lines.append("计数和当前值:")
+        for metric in self.metrics():
+            if isinstance(metric, Histogram) or metric is CACHE_REQUESTS:
+                continue
+            for suffix, key, _, value in metric.samples():
+                labels = _format_labels(metric.labelnames, key)
+                lines.append(f"  {metric.name}{labels} {_format_value(value)}")
+        return '\n'.join(lines)
+
+
+# 全局注册表，进程内共享
+metrics = MetricsRegistry()
+
+# 各模块共用的缓存命中统计
+CACHE_REQUESTS = metrics.counter(
+    'welding_gun_cache_requests_total', "缓存查找次数（result 为 hit / miss）", ('cache', 'result'))
+
+
+def record_cache(cache, hit):
+    """记录一次缓存查找"""
+    CACHE_REQUESTS.inc(cache=cache, result='hit' if hit else 'miss')
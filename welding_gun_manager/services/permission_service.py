@@ -0,0 +1,129 @@
+# services/permission_service.py
+"""
+权限策略
+角色到权限的映射在加载时编译为位掩码，按用户缓存判定结果；
+Tk 界面（菜单、按钮、操作前检查）和 FastAPI 依赖使用同一套策略，每次检查只是一次字典查找和位运算。
+"""
+
+import threading
+from enum import IntFlag
+
+
+class Permission(IntFlag):
+    """权限位"""
+    VIEW_GUNS = 1 << 0        # 查看工枪和统计
+    ADD_GUN = 1 << 1          # 添加工枪
+    EDIT_GUN = 1 << 2         # 编辑工枪
+    DELETE_GUN = 1 << 3       # 删除工枪
+    UPLOAD_FILES = 1 << 4     # 上传焊枪文件
+    DOWNLOAD_FILES = 1 << 5   # 下载文件
+    MANAGE_USERS = 1 << 6     # 用户管理
+    SETTINGS = 1 << 7         # 系统设置
+    BACKUP = 1 << 8           # 备份/恢复数据库
+
+
+ALL_PERMISSIONS = Permission(sum(Permission))
+
+# 角色 -> 权限（未列出的角色没有任何权限）
+ROLE_PERMISSIONS = {
+    'admin': ALL_PERMISSIONS,
+    'user': Permission.VIEW_GUNS | Permission.UPLOAD_FILES | Permission.DOWNLOAD_FILES,
+    'readonly': Permission.VIEW_GUNS | Permission.DOWNLOAD_FILES,
+}
+
+# 菜单项 -> 所需权限
+MENU_PERMISSIONS = {
+    '添加工枪': Permission.ADD_GUN,
+    '编辑工枪': Permission.EDIT_GUN,
+    '删除工枪': Permission.DELETE_GUN,
+    '备份数据库': Permission.BACKUP,
+    '恢复数据库': Permission.BACKUP,
+    '设置': Permission.SETTINGS,
+    '系统设置': Permission.SETTINGS,
+    '用户列表': Permission.MANAGE_USERS,
+    '添加用户': Permission.MANAGE_USERS,
+}
+
+
+def _user_key(user):
+    """用户缓存键：(id 或用户名, 角色)，角色变化后自然使用新键"""
+    if user is None:
+        return None
+    if isinstance(user, dict):
+        return (user.get('id') or user.get('uid') or user.get('username'), user.get('role'))
+    return (getattr(user, 'id', None) or getattr(user, 'username', None), getattr(user, 'role', None))
+
+
+class PolicyEngine:
+    """
+    权限判定
+
+    Args:
+        role_permissions: {角色: Permission}，默认 ROLE_PERMISSIONS
+    """
+
+    def __init__(self, role_permissions=None):
+        self._lock = threading.Lock()
+        self._user_masks = {}
+        self.load(role_permissions or ROLE_PERMISSIONS)
+
+    def load(self, role_permissions):
+        """编译角色权限并清空用户缓存"""
+        masks = {role: int(Permission(permissions)) for role, permissions in role_permissions.items()}
+        with self._lock:
+            self._role_masks = masks
+            self._user_masks = {}
+
+    def role_mask(self, role):
+        return self._role_masks.get(role, 0)
+
+    def user_mask(self, user):
+        """
+        用户的权限位掩码
+
+        Args:
+            user: User 对象、用户字典或会话字典（需包含 role）
+        """
+        key = _user_key(user)
+        if key is None:
+            return 0
+        mask = self._user_masks.get(key)
+        if mask is None:
+            mask = self.role_mask(key[1])
+            with self._lock:
+                self._user_masks[key] = mask
+        return mask
+
+    def allowed(self, user, permission):
+        """用户是否拥有 permission（多个权限位时需全部拥有）"""
+        permission = int(permission)
+        return self.user_mask(user) & permission == permission
+
+    def role_allowed(self, role, permission):
+        permission = int(permission)
+        return self.role_mask(role) & permission == permission
+
+    def permissions(self, user):
+        """用户拥有的权限"""
+        return Permission(self.user_mask(user))
+
+    def invalidate(self, user_id=None):
+        """清除用户缓存（user_id 为 None 时全部清除）"""
+        with self._lock:
+            if user_id is None:
+                self._user_masks = {}
+            else:
+                self._user_masks = {key: mask for key, mask in self._user_masks.items() if key[0] != user_id}
+
+
+_policy = None
+_policy_lock = threading.Lock()
+
+
+def get_policy():
+    """进程内共享的权限策略"""
+    global _policy
+    with _policy_lock:
+        if _policy is None:
+            _policy = PolicyEngine()
+        return _policy
@@ -0,0 +1,132 @@
+# services/preset_cache.py
+"""
+预设缓存
+按焊枪类型分组缓存预设（parameters 已解析为字典），LRU 限制缓存的类型数量；
+本连接的增删改由 PresetController 显式失效，其他连接/进程（如批量导入）的修改通过
+PRAGMA data_version 发现，打开详情窗口等场景不再重复查询和解析整个预设表。
+缓存的预设只在内部保存，get / all 返回副本，调用方修改返回值不会影响缓存。
+"""
+
+import copy
+import json
+import threading
+from collections import OrderedDict
+
+from services.metrics import record_cache
+
+
+def _parse_row(row):
+    """把预设行的 parameters 解析为字典"""
+    preset = dict(row)
+    params = preset.get('parameters')
+    if isinstance(params, str):
+        try:
+            preset['parameters'] = json.loads(params) if params else {}
+        except ValueError:
+            print(f"预设参数格式错误: {preset.get('name')}")
+            preset['parameters'] = {}
+    elif params is None:
+        preset['parameters'] = {}
+    return preset
+
+
+def _copy_presets(presets):
+    """复制预设列表（parameters 可能是嵌套字典，需要深复制）"""
+    return [dict(preset, parameters=copy.deepcopy(preset['parameters'])) for preset in presets]
+
+
+class PresetCache:
+    """
+    预设缓存
+
+    Args:
+        db: models.database.Database
+        maxsize: 最多缓存的焊枪类型数
+    """
+
+    def __init__(self, db, maxsize=64):
+        self.db = db
+        self.maxsize = maxsize
+        self._groups = OrderedDict()
+        self._all = None
+        self._data_version = None
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def _check_external_changes(self):
+        """其他连接修改过数据库时清空缓存"""
+        try:
+            version = self.db.connect().execute("PRAGMA data_version").fetchone()[0]
+        except Exception as e:
+            print(f"检查数据库版本失败: {e}")
+            version = None
+        if version != self._data_version:
+            self._groups.clear()
+            self._all = None
+            self._data_version = version
+
+    def get(self, gun_type):
+        """
+        获取某个焊枪类型的预设
+
+        Returns:
+            list: 预设字典列表的副本（按名称排序，parameters 为字典）
+        """
+        with self._lock:
+            self._check_external_changes()
+            presets = self._groups.get(gun_type)
+            if presets is not None:
+                self._groups.move_to_end(gun_type)
+                self.hits += 1
+                record_cache('preset', True)
+                return _copy_presets(presets)
+
+            self.misses += 1
+            record_cache('preset', False)
+            if self._all is not None:
+                presets = [preset for preset in self._all if preset.get('gun_type') == gun_type]
+            else:
+                rows = self.db.fetch_all("SELECT * FROM presets WHERE gun_type = ? ORDER BY name", (gun_type,))
+                presets = [_parse_row(row) for row in rows]
+
+            self._groups[gun_type] = presets
+            while len(self._groups) > self.maxsize:
+                self._groups.popitem(last=False)
+            return _copy_presets(presets)
+
+    def all(self):
+        """获取全部预设的副本（按名称排序）"""
+        with self._lock:
+            return _copy_presets(self._load_all())
+
+    def _load_all(self):
+        """缓存中的全部预设（内部使用，不复制）"""
+        with self._lock:
+            self._check_external_changes()
+            if self._all is not None:
+                self.hits += 1
+                record_cache('preset', True)
+                return self._all
+            self.misses += 1
+            record_cache('preset', False)
+            self._all = [_parse_row(row) for row in self.db.fetch_all("SELECT * FROM presets ORDER BY name")]
+            return self._all
+
+    def gun_types(self):
+        """已有预设的焊枪类型"""
+        return sorted({preset['gun_type'] for preset in self._load_all() if preset.get('gun_type')})
+
+    def invalidate(self, *gun_types):
+        """
+        使缓存失效
+
+        Args:
+            gun_types: 受影响的焊枪类型；不传时清空全部
+        """
+        with self._lock:
+            self._all = None
+            if not gun_types:
+                self._groups.clear()
+            for gun_type in gun_types:
+                self._groups.pop(gun_type, None)
@@ -0,0 +1,362 @@
+# services/preset_sync.py
+"""
+预设批量同步
+从 JSON / CSV / xlsx 文件读取预设，按 (焊枪类型, 名称) 与数据库中的预设比较，
+得出新增 / 更新 / 未变化（可选删除）的差异，并在一个事务中只写入有变化的行；也可把预设导出为这三种格式。
+
+用法:
+    python -m services.preset_sync presets.xlsx [--db welding_gun.db] [--dry-run] [--delete-missing]
+    python -m services.preset_sync --export presets.csv
+"""
+
+import os
+import csv
+import json
+import time
+
+from models.preset_parameters import flatten_parameters
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+# 表格文件中的固定列，其余列均视为参数（列名中的 "." 表示嵌套，如 electrode.tip）
+BASE_COLUMNS = ('name', 'gun_type', 'description')
+PARAMETERS_COLUMN = 'parameters'
+
+# 空单元格：该预设没有这个参数（与值为 None 的参数区分，后者导出为 null）
+_MISSING = object()
+
+
+def _reject_constant(name):
+    raise ValueError(name)
+
+
+# ========== 读取 ==========
+def _cell_value(value):
+    """
+    表格单元格转为参数值
+
+    导出时数字写为数字，其余值（文本、布尔、None、列表）写为 JSON 文本，这里按 JSON 解析还原，
+    "007" 这样的编码不会变成数字；不是合法 JSON 的文本（如手工填写的 3.5 kN、007、2024-01-15）原样保留。
+    空单元格返回 _MISSING。
+    """
+    if value is None:
+        return _MISSING
+    if isinstance(value, (bool, int, float)):
+        return value
+    text = value if isinstance(value, str) else str(value)
+    if not text.strip():
+        return _MISSING
+    try:
+        return json.loads(text, parse_constant=_reject_constant)
+    except ValueError:
+        return text.strip()
+
+
+def _export_cell(value):
+    """参数值转为表格单元格：数字原样写出，其余写为 JSON 文本，读回时类型不变"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    return json.dumps(value, ensure_ascii=False)
+
+
+def _set_nested(parameters, key, value):
+    parts = key.split('.')
+    target = parameters
+    for part in parts[:-1]:
+        target = target.setdefault(part, {})
+    target[parts[-1]] = value
+
+
+def _preset_from_record(record):
+    """表格的一行（列名 -> 值）转为预设字典"""
+    preset = {'name': None, 'gun_type': None, 'description': None, 'parameters': {}}
+    for column, value in record.items():
+        if column is None:
+            continue
+        column = str(column).strip()
+        if column in BASE_COLUMNS:
+            preset[column] = str(value).strip() if value not in (None, '') else None
+        elif column == PARAMETERS_COLUMN:
+            if value not in (None, ''):
+                preset['parameters'].update(json.loads(value) if isinstance(value, str) else value)
+        else:
+            value = _cell_value(value)
+            if value is not _MISSING:
+                _set_nested(preset['parameters'], column, value)
+    return preset
+
+
+def _read_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get('presets', [])
+    return [{
+        'name': item.get('name'),
+        'gun_type': item.get('gun_type'),
+        'description': item.get('description'),
+        'parameters': item.get('parameters') or {},
+    } for item in data]
+
+
+def _read_csv(path):
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        return [_preset_from_record(row) for row in csv.DictReader(f)]
+
+
+def _read_xlsx(path):
+    if openpyxl is None:
+        raise RuntimeError("读取 xlsx 需要安装 openpyxl")
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return []
+        return [_preset_from_record(dict(zip(header, row))) for row in rows
+                if any(value not in (None, '') for value in row)]
+    finally:
+        workbook.close()
+
+
+def load_presets(path):
+    """
+    读取预设文件（按扩展名识别 .json / .csv / .xlsx）
+
+    Returns:
+        list: 预设字典列表（name, gun_type, description, parameters）
+    """
+    ext = os.path.splitext(path)[1].lower()
+    readers = {'.json': _read_json, '.csv': _read_csv, '.xlsx': _read_xlsx}
+    if ext not in readers:
+        raise ValueError(f"不支持的预设文件格式: {ext}")
+
+    presets = readers[ext](path)
+    for index, preset in enumerate(presets, 1):
+        if not preset.get('name') or not preset.get('gun_type'):
+            raise ValueError(f"第 {index} 条预设缺少 name 或 gun_type")
+    return presets
+
+
+# ========== 比较与写入 ==========
+def _leaf_values(parameters, prefix=''):
+    """展开嵌套参数为 {"a.b": 原始值}（空字典作为一个值保留）"""
+    flat = {}
+    for key, value in parameters.items():
+        name = f"{prefix}.{key}" if prefix else str(key)
+        if isinstance(value, dict) and value:
+            flat.update(_leaf_values(value, name))
+        else:
+            flat[name] = value
+    return flat
+
+
+def _key(preset):
+    return (preset['gun_type'], preset['name'])
+
+
+class PresetSync:
+    """
+    预设批量同步
+
+    Args:
+        db: models.database.Database
+        cache: 可选 PresetCache，写入后使其失效
+    """
+
+    def __init__(self, db, cache=None):
+        self.db = db
+        self.cache = cache
+
+    def existing(self):
+        """{(焊枪类型, 名称): 行}，parameters 已解析"""
+        conn = self.db.connect()
+        result = {}
+        for row in conn.execute("SELECT id, name, gun_type, parameters, description FROM presets"):
+            try:
+                parameters = json.loads(row['parameters']) if row['parameters'] else {}
+            except ValueError:
+                parameters = None
+            result[(row['gun_type'], row['name'])] = {
+                'id': row['id'],
+                'parameters': parameters,
+                'description': row['description'],
+            }
+        return result
+
+    def diff(self, presets, delete_missing=False):
+        """
+        比较文件中的预设和数据库
+
+        Returns:
+            dict: insert / update / unchanged / delete 列表和 duplicates（文件中重复的键，后出现的生效）
+        """
+        incoming = {}
+        duplicates = []
+        for preset in presets:
+            if _key(preset) in incoming:
+                duplicates.append(_key(preset))
+            incoming[_key(preset)] = preset
+
+        existing = self.existing()
+        result = {'insert': [], 'update': [], 'unchanged': [], 'delete': [], 'duplicates': duplicates}
+        for key, preset in incoming.items():
+            current = existing.get(key)
+            if current is None:
+                result['insert'].append(preset)
+            elif (current['parameters'] != preset['parameters']
+                  or (current['description'] or None) != (preset.get('description') or None)):
+                result['update'].append(dict(preset, id=current['id']))
+            else:
+                result['unchanged'].append(key)
+        if delete_missing:
+            result['delete'] = [dict(id=row['id'], gun_type=key[0], name=key[1])
+                                for key, row in existing.items() if key not in incoming]
+        return result
+
+    def apply(self, diff):
+        """在一个事务中写入差异"""
+        conn = self.db.connect()
+        insert_param = ("INSERT INTO preset_parameters (preset_id, name, value_num, value_text, unit) "
+                        "VALUES (?, ?, ?, ?, ?)")
+        with conn:
+            for preset in diff['insert']:
+                cursor = conn.execute(
+                    "INSERT INTO presets (name, gun_type, parameters, description, created_at) "
+                    "VALUES (?, ?, ?, ?, datetime('now'))",
+                    (preset['name'], preset['gun_type'],
+                     json.dumps(preset['parameters'], ensure_ascii=False), preset.get('description'))
+                )
+                conn.executemany(insert_param, [(cursor.lastrowid,) + row
+                                                for row in flatten_parameters(preset['parameters'])])
+
+            for preset in diff['update']:
+                conn.execute(
+                    "UPDATE presets SET parameters = ?, description = ? WHERE id = ?",
+                    (json.dumps(preset['parameters'], ensure_ascii=False), preset.get('description'), preset['id'])
+                )
+                conn.execute("DELETE FROM preset_parameters WHERE preset_id = ?", (preset['id'],))
+                conn.executemany(insert_param, [(preset['id'],) + row
+                                                for row in flatten_parameters(preset['parameters'])])
+
+            if diff['delete']:
+                ids = [(preset['id'],) for preset in diff['delete']]
+                conn.executemany("DELETE FROM preset_parameters WHERE preset_id = ?", ids)
+                conn.executemany("DELETE FROM presets WHERE id = ?", ids)
+
+        if self.cache is not None:
+            self.cache.invalidate()
+
+    def sync(self, path, dry_run=False, delete_missing=False):
+        """
+        读取文件、比较并写入
+
+        Returns:
+            dict: 各类差异的数量和各阶段耗时（秒）
+        """
+        started = time.perf_counter()
+        presets = load_presets(path)
+        loaded = time.perf_counter()
+        diff = self.diff(presets, delete_missing=delete_missing)
+        diffed = time.perf_counter()
+        if not dry_run and (diff['insert'] or diff['update'] or diff['delete']):
+            self.apply(diff)
+        applied = time.perf_counter()
+
+        return {
+            'file': path,
+            'dry_run': dry_run,
+            'total': len(presets),
+            'inserted': len(diff['insert']),
+            'updated': len(diff['update']),
+            'unchanged': len(diff['unchanged']),
+            'deleted': len(diff['delete']),
+            'duplicates': len(diff['duplicates']),
+            'read_s': round(loaded - started, 3),
+            'diff_s': round(diffed - loaded, 3),
+            'apply_s': round(applied - diffed, 3),
+            'elapsed_s': round(applied - started, 3),
+        }
+
+    # ========== 导出 ==========
+    def export(self, path):
+        """把全部预设导出为 .json / .csv / .xlsx，返回导出的条数"""
+        rows = self.db.connect().execute(
+            "SELECT name, gun_type, parameters, description FROM presets ORDER BY gun_type, name"
+        ).fetchall()
+        presets = [{
+            'name': row['name'],
+            'gun_type': row['gun_type'],
+            'description': row['description'],
+            'parameters': json.loads(row['parameters']) if row['parameters'] else {},
+        } for row in rows]
+
+        ext = os.path.splitext(path)[1].lower()
+        if ext == '.json':
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({'presets': presets}, f, ensure_ascii=False, indent=2)
+            return len(presets)
+
+        # 表格格式：参数展开为列，嵌套键用 "." 连接；数字以外的值写为 JSON 文本，没有的参数留空
+        flat_rows = []
+        columns = []
+        for preset in presets:
+            flat = _leaf_values(preset['parameters'])
+            for name in flat:
+                if name not in columns:
+                    columns.append(name)
+            flat_rows.append((preset, flat))
+        header = list(BASE_COLUMNS) + columns
+        records = [[preset['name'], preset['gun_type'], preset['description']]
+                   + [_export_cell(flat[column]) if column in flat else None for column in columns]
+                   for preset, flat in flat_rows]
+
+        if ext == '.csv':
+            with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(header)
+                writer.writerows(records)
+        elif ext == '.xlsx':
+            if openpyxl is None:
+                raise RuntimeError("导出 xlsx 需要安装 openpyxl")
+            workbook = openpyxl.Workbook(write_only=True)
+            sheet = workbook.create_sheet('presets')
+            sheet.append(header)
+            for record in records:
+                sheet.append(record)
+            workbook.save(path)
+        else:
+            raise ValueError(f"不支持的预设文件格式: {ext}")
+        return len(presets)
+
+
+if __name__ == '__main__':
+    import argparse
+    from models.database import Database
+
+    parser = argparse.ArgumentParser(description="批量导入/导出焊接预设")
+    parser.add_argument('file', help="预设文件（.json / .csv / .xlsx）")
+    parser.add_argument('--db', default='welding_gun.db', help="数据库路径")
+    parser.add_argument('--export', action='store_true', help="把数据库中的预设导出到文件")
+    parser.add_argument('--dry-run', action='store_true', help="只比较，不写入")
+    parser.add_argument('--delete-missing', action='store_true', help="删除文件中没有的预设")
+    args = parser.parse_args()
+
+    database = Database(args.db)
+    database.ensure_preset_tables()
+    try:
+        syncer = PresetSync(database)
+        if args.export:
+            print(f"已导出 {syncer.export(args.file)} 条预设到 {args.file}")
+        else:
+            report = syncer.sync(args.file, dry_run=args.dry_run, delete_missing=args.delete_missing)
+            print(f"预设: {report['total']} 条  新增: {report['inserted']}  更新: {report['updated']}  "
+                  f"未变化: {report['unchanged']}  删除: {report['deleted']}  重复: {report['duplicates']}")
+            print(f"耗时: 读取 {report['read_s']:.2f}s  比较 {report['diff_s']:.2f}s  "
+                  f"写入 {report['apply_s']:.2f}s  共 {report['elapsed_s']:.2f}s"
+                  + ("（未写入）" if args.dry_run else ""))
+    finally:
+        database.close()
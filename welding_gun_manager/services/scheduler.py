@@ -0,0 +1,337 @@
+# services/scheduler.py
+"""
+后台任务调度器
+固定数量的工作线程 + 优先级队列 + 周期任务 + 取消，
+任务回调统一放入完成队列，由一个 Tk after 钩子在界面线程中派发。
+"""
+
+import heapq
+import itertools
+import os
+import queue
+import threading
+import time
+import traceback
+
+# 优先级（数值越小越先执行）
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 5
+PRIORITY_LOW = 10
+
+
+class Task:
+    """调度器中的任务句柄"""
+
+    def __init__(self, func, args=(), kwargs=None, priority=PRIORITY_NORMAL,
+                 callback=None, error_callback=None, interval=None, name=None):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs or {}
+        self.priority = priority
+        self.callback = callback
+        self.error_callback = error_callback
+        self.interval = interval
+        self.name = name or getattr(func, '__name__', 'task')
+
+        self.cancelled = False
+        self.running = False
+        self.done = False
+        self.result = None
+        self.error = None
+        self.run_count = 0
+        self._finished = threading.Event()
+
+    @property
+    def periodic(self):
+        return self.interval is not None
+
+    def cancel(self):
+        """取消任务；周期任务会停止后续执行。返回任务是否尚未执行完"""
+        self.cancelled = True
+        if not self.running:
+            self._finished.set()
+        return not self.done
+
+    def wait(self, timeout=None):
+        """等待一次性任务结束（或被取消）"""
+        return self._finished.wait(timeout)
+
+    def __repr__(self):
+        state = 'cancelled' if self.cancelled else ('done' if self.done else 'pending')
+        return f"<Task {self.name} priority={self.priority} {state}>"
+
+
+class TaskScheduler:
+    """
+    进程内任务调度器
+
+    - 固定大小的工作线程池，线程数不会随任务数增长
+    - 就绪任务按优先级执行，同优先级按提交顺序
+    - PRIORITY_LOW（及更低）的后台任务最多同时占用 max_background 个线程，
+      完整性校验、分级迁移等长任务运行时始终留有线程给界面任务
+    - 支持延迟任务和周期任务（固定间隔，上一次结束后再计时）
+    - 回调通过完成队列在界面线程执行，避免在工作线程中操作 Tk
+    """
+
+    def __init__(self, max_workers=None, name="scheduler", max_background=None):
+        if max_workers is None:
+            # 至少两个线程，单核机器上也能给界面任务留一个
+            max_workers = max(2, min(4, os.cpu_count() or 1))
+        self.max_workers = max(1, max_workers)
+        if max_background is None:
+            max_background = self.max_workers - 1
+        self.max_background = max(1, min(max_background, self.max_workers))
+        self.name = name
+        self._background_running = 0
+
+        self._cond = threading.Condition()
+        self._ready = []      # (priority, seq, task)
+        self._delayed = []    # (due, seq, task)
+        self._seq = itertools.count()
+        self._completions = queue.Queue()
+        self._running = True
+
+        self._tk_root = None
+        self._after_id = None
+        self._poll_ms = 50
+
+        self._workers = []
+        for i in range(self.max_workers):
+            worker = threading.Thread(
+                target=self._worker_loop,
+                name=f"{name}-worker-{i}",
+                daemon=True
+            )
+            worker.start()
+            self._workers.append(worker)
+
+    # ========== 提交任务 ==========
+    def submit(self, func, *args, priority=PRIORITY_NORMAL, callback=None,
+               error_callback=None, delay=0, name=None, **kwargs):
+        """
+        提交一次性任务
+
+        Args:
+            func: 在工作线程中执行的函数
+            priority: 优先级，PRIORITY_HIGH / PRIORITY_NORMAL / PRIORITY_LOW
+            callback: 成功后在界面线程调用 callback(result)
+            error_callback: 失败后在界面线程调用 error_callback(exception)
+            delay: 延迟执行的秒数
+
+        Returns:
+            Task: 任务句柄，可用于取消
+        """
+        task = Task(func, args, kwargs, priority, callback, error_callback, name=name)
+        self._enqueue(task, delay)
+        return task
+
+    def schedule_periodic(self, interval, func, *args, priority=PRIORITY_LOW,
+                          callback=None, error_callback=None, initial_delay=None,
+                          name=None, **kwargs):
+        """
+        提交周期任务，每次执行结束后间隔 interval 秒再次执行
+
+        Returns:
+            Task: 任务句柄，调用 cancel() 停止周期执行
+        """
+        if interval <= 0:
+            raise ValueError("周期任务的间隔必须大于0")
+        task = Task(func, args, kwargs, priority, callback, error_callback,
+                    interval=interval, name=name)
+        self._enqueue(task, interval if initial_delay is None else initial_delay)
+        return task
+
+    def cancel(self, task):
+        """取消任务"""
+        if task is None:
+            return False
+        with self._cond:
+            result = task.cancel()
+            self._cond.notify_all()
+        return result
+
+    def call_in_ui(self, func, *args):
+        """把一个调用放入完成队列，在界面线程中执行"""
+        self._completions.put((func, args))
+        if self._tk_root is None:
+            self.drain_completions()
+
+    def _enqueue(self, task, delay):
+        with self._cond:
+            if not self._running:
+                raise RuntimeError("调度器已关闭")
+            if delay and delay > 0:
+                heapq.heappush(self._delayed, (time.monotonic() + delay, next(self._seq), task))
+            else:
+                heapq.heappush(self._ready, (task.priority, next(self._seq), task))
+            self._cond.notify()
+
+    # ========== 工作线程 ==========
+    def _next_task(self):
+        """取出下一个可执行任务；调度器关闭时返回 None"""
+        with self._cond:
+            while self._running:
+                now = time.monotonic()
+                while self._delayed and self._delayed[0][0] <= now:
+                    _, seq, task = heapq.heappop(self._delayed)
+                    heapq.heappush(self._ready, (task.priority, seq, task))
+
+                while self._ready:
+                    priority, _, task = self._ready[0]
+                    if task.cancelled:
+                        heapq.heappop(self._ready)
+                        continue
+                    # 队首是后台任务说明没有更高优先级的就绪任务；后台名额用完时等待
+                    if priority >= PRIORITY_LOW:
+                        if self._background_running >= self.max_background:
+                            break
+                        self._background_running += 1
+                    heapq.heappop(self._ready)
+                    task.running = True
+                    return task
+
+                timeout = None
+                if self._delayed:
+                    timeout = max(0.0, self._delayed[0][0] - now)
+                self._cond.wait(timeout)
+            return None
+
+    def _worker_loop(self):
+        while True:
+            task = self._next_task()
+            if task is None:
+                return
+
+            try:
+                task.result = task.func(*task.args, **task.kwargs)
+                task.error = None
+            except Exception as e:
+                task.error = e
+            finally:
+                task.run_count += 1
+
+            self._post_completion(task)
+
+            with self._cond:
+                task.running = False
+                if task.priority >= PRIORITY_LOW:
+                    self._background_running -= 1
+                    self._cond.notify_all()
+                if task.periodic and not task.cancelled and self._running:
+                    heapq.heappush(self._delayed,
+                                   (time.monotonic() + task.interval, next(self._seq), task))
+                    self._cond.notify()
+                else:
+                    task.done = True
+                    task._finished.set()
+
+    def _post_completion(self, task):
+        if task.error is not None:
+            if task.error_callback:
+                # 已取消的任务不再通知调用方（与成功回调一致）
+                if not task.cancelled:
+                    self.call_in_ui(task.error_callback, task.error)
+            else:
+                print(f"后台任务 {task.name} 失败: {task.error}")
+                traceback.print_exception(type(task.error), task.error, task.error.__traceback__)
+        elif task.callback and not task.cancelled:
+            self.call_in_ui(task.callback, task.result)
+
+    # ========== 界面线程派发 ==========
+    def attach_tk(self, root, poll_ms=50):
+        """
+        绑定 Tk 根窗口，用一个 after 钩子统一派发完成队列
+
+        未绑定时，回调直接在工作线程中执行（适用于无界面的服务端）。
+        """
+        self.detach_tk()
+        self._tk_root = root
+        self._poll_ms = poll_ms
+        self._after_id = root.after(poll_ms, self._poll_tk)
+
+    def detach_tk(self):
+        """解除 Tk 绑定"""
+        if self._tk_root is not None and self._after_id is not None:
+            try:
+                self._tk_root.after_cancel(self._after_id)
+            except Exception:
+                pass
+        self._tk_root = None
+        self._after_id = None
+
+    def _poll_tk(self):
+        self.drain_completions()
+        if self._tk_root is not None:
+            try:
+                self._after_id = self._tk_root.after(self._poll_ms, self._poll_tk)
+            except Exception:
+                # 窗口已销毁
+                self._tk_root = None
+                self._after_id = None
+
+    def drain_completions(self, time_budget=0.02):
+        """
+        执行完成队列中的回调，单次最多占用 time_budget 秒，避免界面卡顿
+
+        Returns:
+            int: 本次执行的回调数量
+        """
+        deadline = time.perf_counter() + time_budget
+        count = 0
+        while True:
+            try:
+                func, args = self._completions.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                func(*args)
+            except Exception as e:
+                print(f"任务回调执行失败: {e}")
+                traceback.print_exc()
+            count += 1
+            if time.perf_counter() >= deadline:
+                break
+        return count
+
+    # ========== 状态与关闭 ==========
+    def pending_count(self):
+        """等待执行的任务数量（含延迟和周期任务）"""
+        with self._cond:
+            return sum(1 for _, _, t in self._ready if not t.cancelled) + \
+                   sum(1 for _, _, t in self._delayed if not t.cancelled)
+
+    def shutdown(self, wait=True, timeout=None):
+        """关闭调度器，未开始的任务将被丢弃"""
+        with self._cond:
+            self._running = False
+            for _, _, task in self._ready + self._delayed:
+                task.cancel()
+            self._ready.clear()
+            self._delayed.clear()
+            self._cond.notify_all()
+        self.detach_tk()
+        if wait:
+            for worker in self._workers:
+                worker.join(timeout)
+
+
+_default_scheduler = None
+_default_lock = threading.Lock()
+
+
+def get_scheduler():
+    """获取全局调度器（首次调用时创建）"""
+    global _default_scheduler
+    with _default_lock:
+        if _default_scheduler is None:
+            _default_scheduler = TaskScheduler()
+        return _default_scheduler
+
+
+def shutdown_scheduler(wait=False):
+    """关闭全局调度器"""
+    global _default_scheduler
+    with _default_lock:
+        if _default_scheduler is not None:
+            _default_scheduler.shutdown(wait=wait)
+            _default_scheduler = None
@@ -0,0 +1,150 @@
+# services/search_service.py
+"""
+边输入边搜索
+按键去抖后在后台线程执行查询，新的搜索开始时用 sqlite3.Connection.interrupt()
+中断仍在执行的旧查询；结果分批送回界面线程，先到先显示。
+"""
+
+import sqlite3
+import threading
+import time
+
+from models.query_stats import query_stats
+from services.scheduler import get_scheduler, PRIORITY_HIGH
+
+
+class IncrementalSearch:
+    """
+    可取消的增量搜索
+
+    Args:
+        widget: 任意 Tk 控件，用于 after() 去抖
+        db_path: 数据库文件路径（后台查询使用独立连接）
+        build_query: build_query(term) -> (sql, params)
+        map_row: 可选，在后台线程中把 sqlite3.Row 转换为显示用的值元组
+        on_results: on_results(term, rows, first, done)，在界面线程中调用；
+                    first 为 True 时 rows 是新结果集的开头，否则追加到已有结果，
+                    done 表示已取完
+        on_error: on_error(term, exception)，在界面线程中调用
+        debounce_ms: 最后一次按键后等待多久开始查询
+        chunk_size: 每批送回的行数
+    """
+
+    def __init__(self, widget, db_path, build_query, on_results, on_error=None,
+                 map_row=None, debounce_ms=250, chunk_size=200, scheduler=None):
+        self.widget = widget
+        self.db_path = db_path
+        self.build_query = build_query
+        self.map_row = map_row or tuple
+        self.on_results = on_results
+        self.on_error = on_error
+        self.debounce_ms = debounce_ms
+        self.chunk_size = chunk_size
+        self.scheduler = scheduler or get_scheduler()
+
+        self.term = None
+        self._generation = 0
+        self._after_id = None
+        self._task = None
+        self._lock = threading.Lock()
+        self._conn = None
+
+    # ========== 界面线程调用 ==========
+    def request(self, term):
+        """按键时调用：重新计时，停止输入 debounce_ms 后开始搜索"""
+        if self._after_id is not None:
+            self.widget.after_cancel(self._after_id)
+        self._after_id = self.widget.after(self.debounce_ms, lambda: self.start(term))
+
+    def start(self, term):
+        """立即开始搜索，取消之前所有未完成的搜索"""
+        self._after_id = None
+        self.cancel()
+        self.term = term
+        generation = self._generation
+        self._task = self.scheduler.submit(
+            self._run, generation, term,
+            priority=PRIORITY_HIGH,
+            name="incremental_search"
+        )
+
+    def cancel(self):
+        """取消等待中的去抖和正在执行的查询"""
+        if self._after_id is not None:
+            self.widget.after_cancel(self._after_id)
+            self._after_id = None
+        with self._lock:
+            self._generation += 1
+            if self._conn is not None:
+                # 让正在执行的 SQL 以 "interrupted" 错误尽快返回
+                self._conn.interrupt()
+        if self._task is not None:
+            self.scheduler.cancel(self._task)
+            self._task = None
+
+    @property
+    def active(self):
+        """是否有正在进行（或等待去抖）的搜索"""
+        return self._after_id is not None or (self._task is not None and not self._task.done)
+
+    # ========== 后台线程 ==========
+    def _is_current(self, generation):
+        return generation == self._generation
+
+    def _run(self, generation, term):
+        sql, params = self.build_query(term)
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        with self._lock:
+            if not self._is_current(generation):
+                conn.close()
+                return
+            self._conn = conn
+        # 查询耗时（含分批取行）和行数计入查询统计，与 Database 的查询一起按页面汇总
+        started = time.perf_counter()
+        row_count = 0
+        error = None
+        try:
+            cursor = conn.execute(sql, params)
+            first = True
+            while True:
+                rows = cursor.fetchmany(self.chunk_size)
+                done = len(rows) < self.chunk_size
+                row_count += len(rows)
+                rows = [self.map_row(row) for row in rows]
+                if not self._is_current(generation):
+                    return
+                if rows or first:
+                    self.scheduler.call_in_ui(self._deliver, generation, term, rows, first, done)
+                first = False
+                if done:
+                    return
+        except sqlite3.OperationalError as e:
+            error = e
+            if 'interrupted' in str(e) and not self._is_current(generation):
+                return
+            self.scheduler.call_in_ui(self._fail, generation, term, e)
+        except Exception as e:
+            error = e
+            self.scheduler.call_in_ui(self._fail, generation, term, e)
+        finally:
+            with self._lock:
+                if self._conn is conn:
+                    self._conn = None
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            query_stats.record(sql, params, elapsed_ms, row_count, conn=conn, error=error, db_path=self.db_path)
+            conn.close()
+
+    def _deliver(self, generation, term, rows, first, done):
+        # 界面线程：丢弃已过期搜索的结果
+        if not self._is_current(generation):
+            return
+        self.on_results(term, rows, first, done)
+
+    def _fail(self, generation, term, error):
+        if not self._is_current(generation):
+            return
+        if self.on_error:
+            self.on_error(term, error)
+        else:
+            print(f"搜索失败: {error}")
@@ -0,0 +1,326 @@
+# services/storage_tiering.py
+"""
+分级存储
+按策略把冷数据（已报废/停用且长期未修改的焊枪）的文件夹压缩归档到二级存储目录，
+主目录中只保留带归档信息的 gun_info.json 存根，列表照常显示；
+通过 GunFileManager 访问文件时自动从归档中恢复。
+"""
+
+import os
+import json
+import time
+import sqlite3
+import tarfile
+import threading
+from datetime import datetime
+
+from services.integrity_service import CHECKSUM_ALGORITHM
+from utils.file_utils import hash_file
+from utils.locking import file_lock
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# gun_info.json 中记录归档信息的键
+ARCHIVE_KEY = 'archived'
+
+# 默认冷数据状态
+COLD_STATUSES = ('scrap', 'inactive')
+
+_rehydrate_lock = threading.Lock()
+
+# 归档时留在文件夹中的文件（信息存根和它的锁文件）
+_KEPT_FILES = {'gun_info.json', 'gun_info.json.lock'}
+
+
+def _read_info(folder_path):
+    with open(os.path.join(folder_path, 'gun_info.json'), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _write_info(folder_path, info):
+    """原子替换 gun_info.json（调用方需持有文件锁）"""
+    info_file = os.path.join(folder_path, 'gun_info.json')
+    temp = f"{info_file}.tmp"
+    with open(temp, 'w', encoding='utf-8') as f:
+        json.dump(info, f, ensure_ascii=False, indent=2)
+    os.replace(temp, info_file)
+
+
+def is_archived(folder_path):
+    """焊枪文件夹是否只剩归档存根"""
+    try:
+        return ARCHIVE_KEY in _read_info(folder_path)
+    except (OSError, ValueError):
+        return False
+
+
+# ========== 归档读写 ==========
+def _archive_format():
+    """优先使用 zstd（需安装 zstandard），否则使用标准库的 xz（LZMA）"""
+    return 'zstd' if zstandard is not None else 'xz'
+
+
+def _list_members(folder_path):
+    """
+    要归档的条目（不含 gun_info.json 和锁文件）
+
+    Returns:
+        list: (相对路径, 是否目录, 大小, 修改时间 ns)，目录在其内容之前
+    """
+    members = []
+    for root, dirs, files in os.walk(folder_path):
+        dirs.sort()
+        rel_root = os.path.relpath(root, folder_path)
+        for name in dirs:
+            members.append((os.path.normpath(os.path.join(rel_root, name)), True, 0, 0))
+        for name in sorted(files):
+            if root == folder_path and name in _KEPT_FILES:
+                continue
+            stat = os.stat(os.path.join(root, name))
+            members.append((os.path.normpath(os.path.join(rel_root, name)), False, stat.st_size, stat.st_mtime_ns))
+    return members
+
+
+def _write_archive(folder_path, archive_path, fmt, members):
+    """把 members 列出的条目写入压缩 tar"""
+    def add_members(tar):
+        for relpath, _, _, _ in members:
+            tar.add(os.path.join(folder_path, relpath), arcname=relpath.replace(os.sep, '/'), recursive=False)
+
+    if fmt == 'zstd':
+        with open(archive_path, 'wb') as f:
+            with zstandard.ZstdCompressor(level=10, threads=-1).stream_writer(f) as writer:
+                with tarfile.open(fileobj=writer, mode='w|') as tar:
+                    add_members(tar)
+    else:
+        with tarfile.open(archive_path, mode='w:xz', preset=6) as tar:
+            add_members(tar)
+
+
+def _extract_archive(archive_path, target_dir, fmt):
+    """解压归档到目标目录（只允许普通文件和目录，防止路径穿越）"""
+    def extract(tar):
+        if hasattr(tarfile, 'data_filter'):
+            tar.extractall(target_dir, filter='data')
+            return
+        for member in tar:
+            name = os.path.normpath(member.name)
+            if name.startswith(('..', os.sep)) or os.path.isabs(name) or not (member.isfile() or member.isdir()):
+                raise ValueError(f"归档中包含不安全的条目: {member.name}")
+            tar.extract(member, target_dir)
+
+    if fmt == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("该归档使用 zstd 压缩，需要安装 zstandard")
+        with open(archive_path, 'rb') as f:
+            with zstandard.ZstdDecompressor().stream_reader(f) as reader:
+                with tarfile.open(fileobj=reader, mode='r|') as tar:
+                    extract(tar)
+    else:
+        with tarfile.open(archive_path, mode='r:xz') as tar:
+            extract(tar)
+
+
+def archive_folder(folder_path, archive_dir):
+    """
+    把焊枪文件夹归档到二级存储并替换为存根
+
+    Returns:
+        dict: 归档信息（路径、格式、大小、校验和）
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    fmt = _archive_format()
+    folder_name = os.path.basename(os.path.normpath(folder_path))
+    archive_path = os.path.abspath(os.path.join(archive_dir, f"{folder_name}.tar.{'zst' if fmt == 'zstd' else 'xz'}"))
+    temp_path = f"{archive_path}.tmp"
+
+    # 从列出条目到删除完成都持有信息文件的锁：期间上传登记、目录同步都要等待，
+    # 只删除确实写入归档且之后未被改动的文件，锁外新写入的文件保留在原处
+    with file_lock(os.path.join(folder_path, 'gun_info.json')):
+        info = _read_info(folder_path)
+        if ARCHIVE_KEY in info:
+            return info[ARCHIVE_KEY]
+
+        members = _list_members(folder_path)
+        _write_archive(folder_path, temp_path, fmt, members)
+        os.replace(temp_path, archive_path)
+
+        archive = {
+            'path': archive_path,
+            'format': fmt,
+            'original_bytes': sum(size for _, is_dir, size, _ in members if not is_dir),
+            'archive_bytes': os.path.getsize(archive_path),
+            CHECKSUM_ALGORITHM: hash_file(archive_path, CHECKSUM_ALGORITHM),
+            'archived_at': datetime.now().isoformat(),
+        }
+
+        # 先写存根信息再删除文件，中途失败时归档和原文件都还在
+        info[ARCHIVE_KEY] = archive
+        _write_info(folder_path, info)
+
+        for relpath, is_dir, size, mtime_ns in members:
+            if is_dir:
+                continue
+            path = os.path.join(folder_path, relpath)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if (stat.st_size, stat.st_mtime_ns) == (size, mtime_ns):
+                os.remove(path)
+        # 目录由深到浅删除，只删空目录
+        for relpath, is_dir, _, _ in reversed(members):
+            if is_dir:
+                try:
+                    os.rmdir(os.path.join(folder_path, relpath))
+                except OSError:
+                    pass
+    return archive
+
+
+def rehydrate_folder(folder_path, keep_archive=False):
+    """
+    从归档恢复焊枪文件夹（存根不是归档状态时直接返回）
+
+    Returns:
+        bool: 是否执行了恢复
+    """
+    with _rehydrate_lock, file_lock(os.path.join(folder_path, 'gun_info.json')):
+        info = _read_info(folder_path)
+        archive = info.get(ARCHIVE_KEY)
+        if not archive:
+            return False
+
+        archive_path = archive['path']
+        if not os.path.exists(archive_path):
+            raise FileNotFoundError(f"归档文件不存在: {archive_path}")
+        digest = hash_file(archive_path, CHECKSUM_ALGORITHM)
+        if digest != archive.get(CHECKSUM_ALGORITHM):
+            raise ValueError(f"归档文件校验失败: {archive_path}")
+
+        _extract_archive(archive_path, folder_path, archive['format'])
+
+        info.pop(ARCHIVE_KEY, None)
+        info['rehydrated_at'] = datetime.now().isoformat()
+        _write_info(folder_path, info)
+        if not keep_archive:
+            os.remove(archive_path)
+        return True
+
+
+# ========== 策略 ==========
+class TieringPolicy:
+    """
+    冷热判定策略
+
+    Args:
+        cold_statuses: 数据库 guns.status 属于这些值的焊枪为冷数据
+        min_idle_days: 文件夹最近修改距今超过该天数才归档，避免刚改为报废就被移走
+    """
+
+    def __init__(self, cold_statuses=COLD_STATUSES, min_idle_days=30):
+        self.cold_statuses = set(cold_statuses)
+        self.min_idle_days = min_idle_days
+
+    def is_cold(self, status, last_modified, now=None):
+        if status not in self.cold_statuses:
+            return False
+        now = now or time.time()
+        return now - last_modified >= self.min_idle_days * 86400
+
+
+class StorageTiering:
+    """
+    分级存储引擎
+
+    Args:
+        file_manager: GunFileManager（主存储）
+        archive_dir: 二级存储目录
+        db_path: 数据库路径，用于读取焊枪状态
+        policy: TieringPolicy
+    """
+
+    def __init__(self, file_manager, archive_dir, db_path="welding_gun.db", policy=None):
+        self.file_manager = file_manager
+        self.archive_dir = archive_dir
+        self.db_path = db_path
+        self.policy = policy or TieringPolicy()
+
+    def _gun_statuses(self):
+        """{焊枪名称: 状态}，使用独立连接，可在后台线程调用"""
+        if not os.path.exists(self.db_path):
+            return {}
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return {name: status for name, status in conn.execute("SELECT name, status FROM guns")}
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _last_modified(folder_path):
+        latest = 0
+        for root, _, files in os.walk(folder_path):
+            for name in files:
+                latest = max(latest, os.path.getmtime(os.path.join(root, name)))
+        return latest
+
+    def plan(self):
+        """
+        生成迁移计划
+
+        Returns:
+            dict: archive（需要归档的焊枪）、rehydrate（已归档但重新启用的焊枪）
+        """
+        statuses = self._gun_statuses()
+        now = time.time()
+        plan = {'archive': [], 'rehydrate': []}
+        for gun in self.file_manager.get_all_guns():
+            status = statuses.get(gun.get('name'), gun.get('status'))
+            if gun.get(ARCHIVE_KEY):
+                if status is not None and status not in self.policy.cold_statuses:
+                    plan['rehydrate'].append(gun)
+            else:
+                last_modified = self._last_modified(gun['folder_path'])
+                # 刚从归档恢复的文件保留原修改时间，按恢复时间计算空闲天数
+                if gun.get('rehydrated_at'):
+                    rehydrated = datetime.fromisoformat(gun['rehydrated_at']).timestamp()
+                    last_modified = max(last_modified, rehydrated)
+                if self.policy.is_cold(status, last_modified, now):
+                    plan['archive'].append(gun)
+        return plan
+
+    def run(self, dry_run=False):
+        """
+        执行一次分级迁移（适合作为调度器的周期任务）
+
+        Returns:
+            dict: 归档/恢复的焊枪名称、释放的字节数和错误
+        """
+        plan = self.plan()
+        report = {'archived': [], 'rehydrated': [], 'freed_bytes': 0, 'errors': []}
+        if dry_run:
+            report['archived'] = [gun['name'] for gun in plan['archive']]
+            report['rehydrated'] = [gun['name'] for gun in plan['rehydrate']]
+            return report
+
+        for gun in plan['archive']:
+            try:
+                archive = archive_folder(gun['folder_path'], self.archive_dir)
+                # 主存储上的ZIP可随时重新生成，一并删除
+                if gun.get('has_zip') and os.path.exists(gun['zip_file']):
+                    os.remove(gun['zip_file'])
+                report['archived'].append(gun['name'])
+                report['freed_bytes'] += archive['original_bytes']
+            except Exception as e:
+                report['errors'].append({'name': gun['name'], 'error': str(e)})
+
+        for gun in plan['rehydrate']:
+            try:
+                rehydrate_folder(gun['folder_path'])
+                report['rehydrated'].append(gun['name'])
+            except Exception as e:
+                report['errors'].append({'name': gun['name'], 'error': str(e)})
+        return report
@@ -0,0 +1,161 @@
+# services/template_service.py
+"""
+焊枪信息导入模板
+生成 Excel / CSV 模板（前 4 行为字段名、说明、示例和提示，第 5 行起填写数据），
+以及从填写后的模板中读取数据行。界面（对话框、提示）留在调用方，这里只做文件读写，
+benchmark.py 也直接调用这些函数计时。
+"""
+
+# 模板字段：(键, 列标题, 说明)
+TEMPLATE_FIELDS = [
+    ("weld_type", "焊接类型*", "必填，可选值：钢点焊、铝点焊、其他"),
+    ("gun_brand", "焊枪品牌*", "必填，可选值：小原、森德莱、日基"),
+    ("gun_number", "焊枪编号*", "必填，焊枪唯一编号"),
+    ("gun_model", "焊枪型号", "选填，可选值：C型、X型、异型C、异型X、其他"),
+    ("throat_depth", "喉深(mm)", "选填，单位：毫米"),
+    ("throat_width", "喉宽(mm)", "选填，单位：毫米"),
+    ("max_stroke", "最大行程(mm)", "选填，单位：毫米"),
+    ("max_pressure", "最大压力(kN)", "选填，单位：千牛"),
+    ("motor_brand", "电机品牌", "选填，可选值：ABB、安川、川崎、发那科、华数控、库卡、那智、其他"),
+    ("cap_spec", "电极帽规格", "选填"),
+    ("cap_tilt", "电极帽是否倾斜", "选填，可选值：是、否"),
+    ("static_tilt_angle", "静电极帽倾斜角度(°)", "选填，单位：度"),
+    ("dynamic_tilt_angle", "动电极帽倾斜角度(°)", "选填，单位：度"),
+]
+
+# 示例数据行（与 TEMPLATE_FIELDS 顺序一致）
+TEMPLATE_EXAMPLE = ["钢点焊", "小原", "GUN-001", "C型", "500", "200",
+                    "150", "4.5", "库卡", "R30", "否", "0", "0"]
+
+# 数据之前的固定行数：字段名、说明、示例、提示
+TEMPLATE_HEADER_ROWS = 4
+
+# 模板中的提示行（"↓ 请从这一行开始…"、"← 请在此处开始填写"），读取时跳过
+_HINT_PREFIXES = ('↓', '←')
+
+
+class TemplateFormatError(ValueError):
+    """文件不是导出的模板格式"""
+
+
+def template_rows(field_definitions=TEMPLATE_FIELDS):
+    """模板的前 5 行：字段名、说明、示例、提示和第一行空白数据行"""
+    width = len(field_definitions)
+    return [
+        [label for _, label, _ in field_definitions],
+        [desc for _, _, desc in field_definitions],
+        list(TEMPLATE_EXAMPLE),
+        ["↓ 请从这一行开始填写您的数据 ↓"] + [""] * (width - 1),
+        [""] * width,
+    ]
+
+
+def write_template(file_path, field_definitions=TEMPLATE_FIELDS, rows=()):
+    """
+    导出模板文件（按扩展名保存为 xlsx / xls / csv）
+
+    Args:
+        rows: 附加在模板之后的数据行（用于生成已填写的示例文件）
+
+    Raises:
+        ImportError: 未安装 pandas 或 openpyxl（调用方可改用 write_template_csv）
+    """
+    import pandas as pd
+    import openpyxl
+    from openpyxl.styles import Font, Alignment, PatternFill
+
+    header = template_rows(field_definitions)
+    df = pd.DataFrame(header + [list(row) for row in rows])
+    width = len(field_definitions)
+
+    if file_path.lower().endswith('.xlsx'):
+        with pd.ExcelWriter(file_path, engine='openpyxl') as writer:
+            df.to_excel(writer, index=False, header=False)
+            worksheet = writer.sheets['Sheet1']
+
+            # 列宽按模板行计算（默认最小 15，最大 40）
+            for i in range(width):
+                max_len = max([15] + [len(str(row[i])) for row in header if i < len(row)])
+                column_letter = openpyxl.utils.get_column_letter(i + 1)
+                worksheet.column_dimensions[column_letter].width = min(max_len + 2, 40)
+
+            for col in range(1, width + 1):
+                # 第一行（字段名）红色粗体，第二行（说明）蓝色斜体，第三行（示例）灰色，第四行（提示）粗体居中
+                worksheet.cell(row=1, column=col).font = Font(bold=True, color="FF0000")
+                worksheet.cell(row=2, column=col).font = Font(italic=True, color="0000FF")
+                worksheet.cell(row=3, column=col).font = Font(color="808080")
+                cell = worksheet.cell(row=4, column=col)
+                cell.font = Font(bold=True)
+                cell.alignment = Alignment(horizontal='center')
+
+                # 第五行黄色背景，提示用户从此处开始填写
+                cell = worksheet.cell(row=5, column=col)
+                cell.fill = PatternFill(start_color="FFFF00", end_color="FFFF00", fill_type="solid")
+                cell.font = Font(bold=True)
+                cell.value = "← 请在此处开始填写"
+
+            worksheet.freeze_panes = "A2"
+
+    elif file_path.lower().endswith('.xls'):
+        df.to_excel(file_path, index=False, header=False, engine='xlwt')
+    else:
+        df.to_csv(file_path, index=False, header=False, encoding='utf-8-sig')
+
+
+def write_template_csv(file_path, field_definitions=TEMPLATE_FIELDS, rows=()):
+    """不依赖 pandas 的 CSV 模板"""
+    import csv
+
+    with open(file_path, 'w', newline='', encoding='utf-8-sig') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerows(template_rows(field_definitions))
+        writer.writerows(rows)
+
+
+def _data_rows(rows):
+    """跳过模板的前 4 行、提示行和空行，单元格转为去掉首尾空白的字符串"""
+    data = []
+    for row in rows[TEMPLATE_HEADER_ROWS:]:
+        cleaned_row = ['' if cell is None or cell != cell else str(cell).strip() for cell in row]
+        if not any(cleaned_row) or all(cell.startswith(_HINT_PREFIXES) for cell in cleaned_row if cell):
+            continue
+        data.append(cleaned_row)
+    return data
+
+
+def read_template_rows(file_path, use_pandas=True, encodings=('utf-8-sig', 'gbk', 'gb2312')):
+    """
+    读取填写后的模板中的数据行
+
+    Excel 需要 pandas；CSV 依次尝试 encodings 中的编码。
+
+    Returns:
+        list: 每行为字符串列表
+
+    Raises:
+        TemplateFormatError: 行数不足，不是导出的模板
+    """
+    if file_path.lower().endswith(('.xlsx', '.xls')):
+        import pandas as pd
+        rows = pd.read_excel(file_path, header=None, dtype=object).values.tolist()
+    else:
+        rows = None
+        for encoding in encodings:
+            try:
+                if use_pandas:
+                    import pandas as pd
+                    rows = pd.read_csv(file_path, header=None, encoding=encoding, dtype=str,
+                                       keep_default_na=False).values.tolist()
+                else:
+                    import csv
+                    with open(file_path, 'r', encoding=encoding, newline='') as f:
+                        rows = list(csv.reader(f))
+                break
+            except UnicodeDecodeError:
+                continue
+        if rows is None:
+            raise UnicodeDecodeError(encodings[-1], b'', 0, 1, "无法识别文件编码")
+
+    if len(rows) < TEMPLATE_HEADER_ROWS:
+        raise TemplateFormatError("文件格式不正确，请使用导出的模板文件")
+    return _data_rows(rows)
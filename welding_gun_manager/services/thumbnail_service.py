@@ -0,0 +1,214 @@
+# services/thumbnail_service.py
+"""
+缩略图服务
+上传图片时在后台线程生成多种尺寸的缩略图，按文件内容的 SHA-256 保存到磁盘缓存；
+浏览时直接读取缓存的小图，不再加载原始大图。内容相同的文件共用同一组缩略图。
+"""
+
+import os
+import sqlite3
+import threading
+
+from services.scheduler import get_scheduler, PRIORITY_NORMAL, PRIORITY_LOW
+from services.metrics import record_cache
+from utils.file_utils import sha256_file
+
+# 缩略图尺寸（最长边像素）
+THUMBNAIL_SIZES = {
+    'small': 128,
+    'medium': 320,
+    'large': 1024,
+}
+
+# 可以生成缩略图的格式（PDF/DXF/DWG 图纸需要专门的渲染器，不在此处理）
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tif', '.tiff', '.webp'}
+
+# 默认缓存目录
+DEFAULT_CACHE_DIR = os.path.join('cache', 'thumbnails')
+
+
+def is_image_file(path):
+    """是否为支持生成缩略图的图片文件"""
+    return os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS
+
+
+class ThumbnailService:
+    """
+    按内容哈希缓存的缩略图
+
+    缓存目录结构: <cache_dir>/<哈希前两位>/<哈希>_<尺寸>.jpg|.png
+    文件路径到哈希的对应关系（连同大小和修改时间）记在 index.db 中，
+    文件未变化时不必重新读取整个文件计算哈希。
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, sizes=None, scheduler=None):
+        self.cache_dir = cache_dir
+        self.sizes = dict(sizes or THUMBNAIL_SIZES)
+        self.scheduler = scheduler or get_scheduler()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # 同一内容只允许一个线程生成，其它线程等待结果
+        self._generating = {}
+        self._index = sqlite3.connect(os.path.join(self.cache_dir, 'index.db'),
+                                      check_same_thread=False)
+        self._index.execute('''
+        CREATE TABLE IF NOT EXISTS file_hashes (
+            path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            digest TEXT NOT NULL
+        )
+        ''')
+        self._index.commit()
+
+    # ========== 哈希 ==========
+    def file_digest(self, path):
+        """文件内容哈希；大小和修改时间未变时使用索引中的记录"""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self._lock:
+            row = self._index.execute(
+                "SELECT size, mtime_ns, digest FROM file_hashes WHERE path = ?", (path,)
+            ).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2]
+
+        digest = sha256_file(path)
+        with self._lock:
+            self._index.execute(
+                "INSERT OR REPLACE INTO file_hashes (path, size, mtime_ns, digest) VALUES (?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime_ns, digest)
+            )
+            self._index.commit()
+        return digest
+
+    # ========== 缓存查找 ==========
+    def _cache_base(self, digest, size):
+        return os.path.join(self.cache_dir, digest[:2], f"{digest}_{size}")
+
+    def cached_path(self, digest, size='medium'):
+        """已缓存的缩略图路径，没有时返回 None"""
+        base = self._cache_base(digest, size)
+        for ext in ('.jpg', '.png'):
+            if os.path.exists(base + ext):
+                return base + ext
+        return None
+
+    def get_thumbnail(self, path, size='medium', generate=True):
+        """
+        获取文件的缩略图路径（同步，供后台线程和 API 调用）
+
+        Args:
+            path: 原始图片路径
+            size: THUMBNAIL_SIZES 中的尺寸名
+            generate: 缓存中没有时是否立即生成
+
+        Returns:
+            str: 缩略图路径；不支持的文件或未生成时返回 None
+        """
+        if size not in self.sizes:
+            raise ValueError(f"不支持的缩略图尺寸: {size}")
+        if not is_image_file(path):
+            return None
+
+        digest = self.file_digest(path)
+        cached = self.cached_path(digest, size)
+        record_cache('thumbnail', cached is not None)
+        if cached or not generate:
+            return cached
+        return self._generate(path, digest).get(size)
+
+    def generate(self, path):
+        """生成文件的全部尺寸缩略图，返回 {尺寸名: 路径}"""
+        if not is_image_file(path):
+            return {}
+        return self._generate(path, self.file_digest(path))
+
+    def _generate(self, path, digest):
+        with self._lock:
+            event = self._generating.get(digest)
+            owner = event is None
+            if owner:
+                event = self._generating[digest] = threading.Event()
+        if not owner:
+            event.wait()
+            return {size: self.cached_path(digest, size) for size in self.sizes}
+
+        try:
+            existing = {size: self.cached_path(digest, size) for size in self.sizes}
+            if all(existing.values()):
+                return existing
+            return self._render(path, digest)
+        finally:
+            with self._lock:
+                del self._generating[digest]
+            event.set()
+
+    def _render(self, path, digest):
+        """从原图生成各尺寸缩略图：大图只解码一次，从大到小依次缩小"""
+        from PIL import Image, ImageOps
+
+        results = {}
+        os.makedirs(os.path.dirname(self._cache_base(digest, 'x')), exist_ok=True)
+        with Image.open(path) as source:
+            largest = max(self.sizes.values())
+            # JPEG 可在解码时直接按 1/2、1/4、1/8 缩小，大幅减少解码时间和内存
+            source.draft('RGB', (largest, largest))
+            image = ImageOps.exif_transpose(source)
+            has_alpha = image.mode in ('RGBA', 'LA') or 'transparency' in image.info
+            image = image.convert('RGBA' if has_alpha else 'RGB')
+
+            for size, edge in sorted(self.sizes.items(), key=lambda item: -item[1]):
+                image.thumbnail((edge, edge), Image.LANCZOS)
+                target = self._cache_base(digest, size) + ('.png' if has_alpha else '.jpg')
+                temp = f"{target}.{threading.get_ident()}.tmp"
+                if has_alpha:
+                    image.save(temp, 'PNG', optimize=True)
+                else:
+                    image.save(temp, 'JPEG', quality=85)
+                # 先写临时文件再替换，读取方不会看到写了一半的缩略图
+                os.replace(temp, target)
+                results[size] = target
+        return results
+
+    # ========== 后台任务 ==========
+    def generate_async(self, paths, callback=None, priority=PRIORITY_LOW):
+        """上传后在后台生成缩略图，每个文件一个任务，返回任务列表"""
+        if isinstance(paths, str):
+            paths = [paths]
+        return [
+            self.scheduler.submit(self.generate, path, priority=priority,
+                                  callback=callback, name="thumbnail_generate")
+            for path in paths if is_image_file(path)
+        ]
+
+    def request(self, path, size='medium', callback=None, error_callback=None,
+                priority=PRIORITY_NORMAL):
+        """
+        在后台获取缩略图路径，callback(path) 在界面线程调用
+
+        Returns:
+            Task: 可用 scheduler.cancel 取消（如关闭预览窗口时）
+        """
+        return self.scheduler.submit(self.get_thumbnail, path, size,
+                                     priority=priority, callback=callback,
+                                     error_callback=error_callback, name="thumbnail_request")
+
+    def close(self):
+        """关闭哈希索引"""
+        with self._lock:
+            self._index.close()
+
+
+_default_service = None
+_default_lock = threading.Lock()
+
+
+def get_thumbnail_service():
+    """获取进程内共享的缩略图服务"""
+    global _default_service
+    with _default_lock:
+        if _default_service is None:
+            _default_service = ThumbnailService()
+        return _default_service
@@ -1 +1,432 @@
+# sync/sync_manager.py
+"""
+焊枪文件夹同步
+监视 uploaded_guns 目录，操作员直接在资源管理器中增删、重命名文件后，
+增量更新对应焊枪的 gun_info.json（文件列表和校验和）以及 GunFileManager 的目录索引。
+优先使用 watchdog（inotify/ReadDirectoryChangesW 等系统通知），未安装时回退到定时轮询；
+短时间内的连续事件按焊枪文件夹合并，文件写入稳定后才处理一次。
+"""
 
+import os
+import json
+import time
+import threading
+from datetime import datetime
+
+from file_operations import GunFileManager
+from services.integrity_service import CHECKSUM_ALGORITHM, MANIFEST_KEY, checksum_entry
+from utils.file_utils import hash_file
+from utils.locking import file_lock
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+# 子文件夹到文件类型的映射
+FOLDER_TO_TYPE = {folder: file_type for file_type, folder in GunFileManager.TYPE_TO_FOLDER.items()}
+
+# 不需要登记的文件
+_IGNORED_SUFFIXES = ('.tmp', '.part', '.crdownload', '~')
+_IGNORED_NAMES = {'gun_info.json', 'gun_info.json.lock', 'Thumbs.db', 'desktop.ini', '.DS_Store'}
+
+
+def _is_ignored(name):
+    return name in _IGNORED_NAMES or name.startswith(('~$', '.')) or name.endswith(_IGNORED_SUFFIXES)
+
+
+def scan_gun_files(folder_path):
+    """
+    列出焊枪文件夹中各类型子文件夹下的文件
+
+    Returns:
+        dict: {相对路径: (文件类型, 文件名, os.stat_result)}
+    """
+    files = {}
+    for subfolder, file_type in FOLDER_TO_TYPE.items():
+        subfolder_path = os.path.join(folder_path, subfolder)
+        try:
+            entries = list(os.scandir(subfolder_path))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.is_file() and not _is_ignored(entry.name):
+                files[f"{subfolder}/{entry.name}"] = (file_type, entry.name, entry.stat())
+    return files
+
+
+def _load_info(info_file):
+    try:
+        with open(info_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _listed_files(info):
+    """gun_info.json 中登记的文件 {相对路径: (文件类型, 文件名)}"""
+    listed = {}
+    for file_type, names in info.get('files', {}).items():
+        subfolder = GunFileManager.TYPE_TO_FOLDER.get(file_type)
+        if subfolder:
+            for name in names:
+                listed[f"{subfolder}/{name}"] = (file_type, name)
+    return listed
+
+
+def reconcile_gun_folder(folder_path, hash_new_files=True):
+    """
+    按磁盘上的实际文件更新 gun_info.json
+
+    新文件加入 files 列表并计算校验和，消失的文件从列表和校验记录中删除
+    （重命名即删除旧名称、登记新名称）；没有变化时不写文件。
+
+    Returns:
+        dict: added / removed 的相对路径列表
+    """
+    from services.storage_tiering import ARCHIVE_KEY
+
+    changes = {'added': [], 'removed': []}
+    info_file = os.path.join(folder_path, 'gun_info.json')
+
+    # 新文件的哈希可能很慢，先在锁外计算；加锁后重新读取信息文件再合并，
+    # 避免长时间阻塞上传和定时校验对同一文件的写入
+    hashed = {}
+    if hash_new_files:
+        info = _load_info(info_file)
+        if info is None or info.get(ARCHIVE_KEY):
+            return changes
+        known = set(_listed_files(info)) | set(info.get(MANIFEST_KEY, {}))
+        for relpath, (_, _, stat) in scan_gun_files(folder_path).items():
+            if relpath not in known:
+                digest = hash_file(os.path.join(folder_path, relpath), CHECKSUM_ALGORITHM)
+                hashed[relpath] = checksum_entry(stat.st_size, digest)
+
+    with file_lock(info_file):
+        info = _load_info(info_file)
+        # 已归档的存根没有本地文件
+        if info is None or info.get(ARCHIVE_KEY):
+            return changes
+
+        on_disk = scan_gun_files(folder_path)
+        listed = _listed_files(info)
+        checksums = info.setdefault(MANIFEST_KEY, {})
+
+        removed = [relpath for relpath in set(listed) | set(checksums) if relpath not in on_disk]
+        added = [relpath for relpath in on_disk if relpath not in listed]
+        if not removed and not added:
+            return changes
+
+        for relpath in removed:
+            checksums.pop(relpath, None)
+            if relpath in listed:
+                file_type, name = listed[relpath]
+                info['files'][file_type].remove(name)
+
+        for relpath in sorted(added):
+            file_type, name, stat = on_disk[relpath]
+            info.setdefault('files', {}).setdefault(file_type, []).append(name)
+            if relpath in checksums or not hash_new_files:
+                continue
+            entry = hashed.get(relpath)
+            # 锁外计算哈希之后文件又被改写
+            if entry is None or entry['size'] != stat.st_size:
+                digest = hash_file(os.path.join(folder_path, relpath), CHECKSUM_ALGORITHM)
+                entry = checksum_entry(stat.st_size, digest)
+            checksums[relpath] = entry
+
+        info['updated_at'] = datetime.now().isoformat()
+        temp = f"{info_file}.tmp"
+        with open(temp, 'w', encoding='utf-8') as f:
+            json.dump(info, f, ensure_ascii=False, indent=2)
+        os.replace(temp, info_file)
+
+    changes['added'] = sorted(added)
+    changes['removed'] = sorted(removed)
+    return changes
+
+
+class EventCoalescer:
+    """
+    事件合并
+
+    同一个键（焊枪文件夹）在 delay 秒内的多次事件只触发一次 flush；
+    flush(keys) 在内部线程中调用。
+    """
+
+    def __init__(self, flush, delay=0.5):
+        self.flush = flush
+        self.delay = delay
+        self._pending = {}
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._loop, name="sync-coalescer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def add(self, key):
+        """登记一个事件，重新计时"""
+        with self._cond:
+            self._pending[key] = time.monotonic() + self.delay
+            self._cond.notify_all()
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while self._running:
+                    now = time.monotonic()
+                    due = [key for key, deadline in self._pending.items() if deadline <= now]
+                    if due:
+                        for key in due:
+                            del self._pending[key]
+                        break
+                    timeout = min(self._pending.values()) - now if self._pending else None
+                    self._cond.wait(timeout)
+                if not self._running:
+                    return
+            try:
+                self.flush(due)
+            except Exception as e:
+                print(f"同步处理失败: {e}")
+
+
+class _WatchdogHandler(FileSystemEventHandler):
+    """把 watchdog 事件转换为受影响的焊枪文件夹"""
+
+    def __init__(self, watcher):
+        super().__init__()
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        if event.event_type in ('opened', 'closed_no_write'):
+            return
+        self.watcher.notify_path(event.src_path)
+        dest_path = getattr(event, 'dest_path', None)
+        if dest_path:
+            self.watcher.notify_path(dest_path)
+
+
+class _PollingObserver:
+    """
+    没有 watchdog 时的轮询实现：比较各焊枪文件夹的文件快照
+
+    每 interval 秒只检查主目录中新增、删除的文件夹和 hot_window 秒内有过变化的文件夹；
+    全量检查的间隔从 interval 开始，没有发现变化时逐次加倍（最长 max_interval 秒），发现变化后恢复。
+    """
+
+    def __init__(self, watcher, interval, max_interval=60.0, hot_window=120.0):
+        self.watcher = watcher
+        self.interval = interval
+        self.max_interval = max(interval, max_interval)
+        self.hot_window = hot_window
+        self.full_interval = interval
+        self._next_full = 0.0
+        self._snapshots = {}
+        # 文件夹名 -> 最近一次发现变化的时间（monotonic）
+        self._hot = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _snapshot(self, folder_path):
+        snapshot = {relpath: (stat.st_size, stat.st_mtime_ns)
+                    for relpath, (_, _, stat) in scan_gun_files(folder_path).items()}
+        try:
+            info_stat = os.stat(os.path.join(folder_path, 'gun_info.json'))
+            snapshot['gun_info.json'] = (info_stat.st_size, info_stat.st_mtime_ns)
+        except OSError:
+            pass
+        return snapshot
+
+    def poll(self, full=True):
+        """
+        检查一次，返回有变化的焊枪文件夹
+
+        Args:
+            full: 检查全部文件夹；否则只检查新增、删除和最近有变化的文件夹
+        """
+        base_dir = self.watcher.file_manager.base_dir
+        try:
+            names = {entry.name for entry in os.scandir(base_dir) if entry.is_dir()}
+        except OSError:
+            names = set()
+        now = time.monotonic()
+        self._hot = {name: seen for name, seen in self._hot.items() if now - seen < self.hot_window}
+        if full:
+            candidates = names | set(self._snapshots)
+        else:
+            candidates = (names ^ set(self._snapshots)) | (set(self._hot) & names)
+
+        changed = []
+        for name in candidates:
+            folder_path = os.path.join(base_dir, name)
+            snapshot = self._snapshot(folder_path) if name in names else None
+            if snapshot != self._snapshots.get(name):
+                changed.append(folder_path)
+                self._hot[name] = now
+            if snapshot is None:
+                self._snapshots.pop(name, None)
+                self._hot.pop(name, None)
+            else:
+                self._snapshots[name] = snapshot
+        return changed
+
+    def tick(self):
+        """轮询线程每 interval 秒调用一次：到期时全量检查并调整全量检查的间隔"""
+        now = time.monotonic()
+        full = now >= self._next_full
+        changed = self.poll(full)
+        if full:
+            self.full_interval = self.interval if changed else min(self.full_interval * 2, self.max_interval)
+            self._next_full = now + self.full_interval
+        return changed
+
+    def baseline(self):
+        """记录初始快照；初始快照中的文件夹不算最近有变化"""
+        self.poll()
+        self._hot.clear()
+
+    def start(self):
+        self.baseline()
+        self._next_full = time.monotonic() + self.full_interval
+        self._thread = threading.Thread(target=self._loop, name="sync-polling", daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            for folder_path in self.tick():
+                self.watcher.notify_folder(folder_path)
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+class GunFolderWatcher:
+    """
+    焊枪目录监视器
+
+    Args:
+        file_manager: GunFileManager
+        on_change: 可选回调 on_change(changes)，changes 为 {文件夹路径: {added, removed}}，在监视线程中调用
+        debounce: 事件合并等待时间（秒）
+        poll_interval: 轮询模式检查最近变化的文件夹的间隔（秒）
+        max_poll_interval: 轮询模式全量检查的最长间隔（秒）
+        use_watchdog: 是否使用 watchdog，默认已安装时使用
+
+    start() 会建立目录索引（大目录较慢），应在后台线程中调用；stop() 可以在 start() 完成之前调用。
+    """
+
+    def __init__(self, file_manager, on_change=None, debounce=0.5, poll_interval=2.0,
+                 max_poll_interval=60.0, use_watchdog=None):
+        self.file_manager = file_manager
+        self.on_change = on_change
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.use_watchdog = (Observer is not None) if use_watchdog is None else use_watchdog
+        self.coalescer = EventCoalescer(self._flush, debounce)
+        self._observer = None
+        self._lock = threading.Lock()
+        self._stopped = False
+
+    @property
+    def mode(self):
+        return 'watchdog' if self.use_watchdog else 'polling'
+
+    def start(self):
+        """建立索引并开始监视"""
+        base_dir = os.path.abspath(self.file_manager.base_dir)
+        os.makedirs(base_dir, exist_ok=True)
+        self.file_manager.load_catalog()
+
+        with self._lock:
+            if self._stopped or self._observer is not None:
+                return
+            self.coalescer.start()
+            if self.use_watchdog:
+                self._observer = Observer()
+                self._observer.schedule(_WatchdogHandler(self), base_dir, recursive=True)
+                self._observer.start()
+            else:
+                self._observer = _PollingObserver(self, self.poll_interval, self.max_poll_interval)
+                self._observer.start()
+
+            # 索引由监视器维护后，列表不再扫描目录
+            self.file_manager.catalog_watched = True
+
+    def stop(self):
+        """停止监视，列表恢复为按需扫描"""
+        with self._lock:
+            self._stopped = True
+            self.file_manager.catalog_watched = False
+            observer, self._observer = self._observer, None
+        if observer is not None:
+            observer.stop()
+            if self.use_watchdog:
+                observer.join(timeout=5)
+        self.coalescer.stop()
+
+    # ========== 事件 ==========
+    def notify_path(self, path):
+        """文件系统事件：定位到所属的焊枪文件夹"""
+        base_dir = os.path.abspath(self.file_manager.base_dir)
+        relpath = os.path.relpath(os.path.abspath(path), base_dir)
+        if relpath.startswith('..'):
+            return
+        top = relpath.split(os.sep, 1)[0]
+        if top == '.':
+            return
+        if top.endswith('.zip'):
+            # 主目录中的ZIP变化只影响 has_zip，get_all_guns 每次都会检查
+            return
+        self.notify_folder(os.path.join(self.file_manager.base_dir, top))
+
+    def notify_folder(self, folder_path):
+        self.coalescer.add(folder_path)
+
+    def _is_settling(self, folder_path):
+        """文件仍在写入（修改时间在合并窗口内）时推迟处理"""
+        now = time.time()
+        for _, _, stat in scan_gun_files(folder_path).values():
+            if now - stat.st_mtime < self.debounce:
+                return True
+        return False
+
+    def _flush(self, folders):
+        changes = {}
+        for folder_path in folders:
+            if os.path.isdir(folder_path) and self._is_settling(folder_path):
+                self.notify_folder(folder_path)
+                continue
+            try:
+                result = reconcile_gun_folder(folder_path) if os.path.isdir(folder_path) else {}
+            except Exception as e:
+                print(f"同步焊枪文件夹失败 {folder_path}: {e}")
+                continue
+            self.file_manager.refresh_catalog_entry(folder_path)
+
+            if result.get('added') and self.file_manager.thumbnails:
+                paths = [os.path.join(folder_path, relpath) for relpath in result['added']]
+                self.file_manager.thumbnails.generate_async(paths)
+            changes[folder_path] = result
+
+        if changes and self.on_change:
+            self.on_change(changes)
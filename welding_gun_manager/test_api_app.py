@@ -0,0 +1,69 @@
+# welding_gun_manager/test_api_app.py
+"""文件服务 API 测试：上传失败清理、缩略图接口"""
+import os
+
+import pytest
+
+pytest.importorskip('httpx')
+
+import api_app
+from fastapi.testclient import TestClient
+from services.integrity_service import ChecksumManifest
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    upload_dir = tmp_path / "uploads"
+    upload_dir.mkdir()
+    monkeypatch.setattr(api_app, 'UPLOAD_DIR', str(upload_dir))
+    monkeypatch.setattr(api_app, 'upload_manifest', ChecksumManifest(str(upload_dir)))
+    monkeypatch.setattr(api_app, '_file_list', None)
+    monkeypatch.setattr(api_app, 'THUMBNAIL_DIR', str(tmp_path / "thumbnails"))
+    monkeypatch.setattr(api_app, '_thumbnails', None)
+    return TestClient(api_app.app)
+
+
+def test_upload_records_checksum(client):
+    response = client.post("/api/upload", files={'file': ('a.dxf', b"0\nSECTION\n", 'application/octet-stream')})
+    assert response.status_code == 200
+    saved = response.json()['saved_filename']
+    assert api_app.upload_manifest.get(saved)['size'] == 10
+
+
+@pytest.mark.parametrize('failing', ['copy_stream_hashed', 'record'])
+def test_failed_upload_leaves_no_file(client, monkeypatch, failing):
+    def boom(*args, **kwargs):
+        raise OSError("磁盘已满")
+
+    if failing == 'record':
+        monkeypatch.setattr(api_app.upload_manifest, 'record', boom)
+    else:
+        monkeypatch.setattr(api_app, 'copy_stream_hashed', boom)
+
+    response = client.post("/api/upload", files={'file': ('a.dxf', b"data", 'application/octet-stream')})
+    assert response.status_code == 500
+    assert [name for name in os.listdir(api_app.UPLOAD_DIR) if not name.startswith('.')] == []
+
+
+def test_thumbnail_endpoint(client):
+    pytest.importorskip('PIL')
+    from PIL import Image
+
+    Image.new('RGB', (800, 600), (20, 40, 60)).save(os.path.join(api_app.UPLOAD_DIR, 'photo.jpg'))
+    with open(os.path.join(api_app.UPLOAD_DIR, 'part.dxf'), 'wb') as f:
+        f.write(b"0\nSECTION\n")
+
+    assert client.get("/api/thumbnail/photo.jpg", params={'size': 'huge'}).status_code == 400
+    assert client.get("/api/thumbnail/missing.jpg").status_code == 404
+    assert client.get("/api/thumbnail/part.dxf").status_code == 415
+
+    response = client.get("/api/thumbnail/photo.jpg", params={'size': 'small'})
+    assert response.status_code == 200
+    assert response.headers['content-type'] == 'image/jpeg'
+    etag = response.headers['etag']
+
+    cached = client.get("/api/thumbnail/photo.jpg", params={'size': 'small'}, headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.headers['etag'] == etag
+    # 不同尺寸是不同的缩略图
+    assert client.get("/api/thumbnail/photo.jpg", headers={'If-None-Match': etag}).status_code == 200
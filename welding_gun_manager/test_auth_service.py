@@ -0,0 +1,128 @@
+# welding_gun_manager/test_auth_service.py
+"""认证与会话测试"""
+import time
+
+import pytest
+
+from models.database import Database
+from services.auth_service import (SessionManager, DBRevocationStore, hash_password, verify_password,
+                                   is_password_hash, check_user_password)
+
+USER = {'id': 1, 'username': 'manager', 'role': 'manager'}
+
+
+def test_logout_in_one_worker_revokes_everywhere(tmp_path):
+    """两个工作进程共用密钥和数据库：一个进程注销后另一个进程也拒绝该令牌"""
+    store_path = str(tmp_path / "sessions.db")
+    worker_a = SessionManager(secret='s', revocations=DBRevocationStore(store_path), revocation_ttl=0)
+    worker_b = SessionManager(secret='s', revocations=DBRevocationStore(store_path), revocation_ttl=0)
+
+    token = worker_a.issue(USER)
+    assert worker_b.validate(token)['username'] == 'manager'
+
+    worker_a.revoke(token)
+    assert worker_a.validate(token) is None
+    assert worker_b.validate(token) is None
+    # 新进程（缓存为空）同样拒绝
+    fresh = SessionManager(secret='s', revocations=DBRevocationStore(store_path))
+    assert fresh.validate(token) is None
+
+
+def test_revocation_without_shared_store_is_local(tmp_path):
+    worker_a = SessionManager(secret='s')
+    worker_b = SessionManager(secret='s')
+    token = worker_a.issue(USER)
+    worker_a.revoke(token)
+    assert worker_a.validate(token) is None
+    assert worker_b.validate(token) is not None
+
+
+def test_hash_and_verify_password():
+    stored = hash_password('secret')
+    assert is_password_hash(stored)
+    assert stored != hash_password('secret')  # 每次加不同的盐
+    assert verify_password(stored, 'secret') == (True, False)
+    assert verify_password(stored, 'wrong') == (False, False)
+    assert verify_password(None, 'secret') == (False, False)
+    # 旧数据的明文密码可以校验，但需要升级
+    assert verify_password('secret', 'secret') == (True, True)
+
+
+def test_default_users_are_seeded_with_hashes(tmp_path):
+    db = Database(str(tmp_path / "users.db"))
+    assert db.initialize()
+    rows = {row['username']: row['password'] for row in db.fetch_all("SELECT username, password FROM users")}
+    assert is_password_hash(rows['system']) and is_password_hash(rows['user'])
+    assert rows['administrator'] is None
+    assert check_user_password(db, 'system', 'manager')['role'] == 'admin'
+    assert check_user_password(db, 'user', 'wrong') is None
+    assert check_user_password(db, 'administrator', None, allow_passwordless=True)['username'] == 'administrator'
+    db.close()
+
+
+def test_passwordless_admin_is_local_only(tmp_path):
+    """密码为空的 administrator 只能在本机界面免密码登录，网络登录一律拒绝"""
+    db = Database(str(tmp_path / "users.db"))
+    assert db.initialize()
+    assert check_user_password(db, 'administrator', None) is None
+    assert check_user_password(db, 'administrator', '') is None
+    assert check_user_password(db, 'administrator', 'anything') is None
+    # 其它账户密码为空时即使允许免密码也拒绝
+    db.execute("INSERT INTO users (username, password, role, created_at) VALUES ('blank', NULL, 'admin', '')")
+    assert check_user_password(db, 'blank', None, allow_passwordless=True) is None
+    db.close()
+
+
+def test_api_login_rejects_passwordless_admin(tmp_path, monkeypatch):
+    pytest.importorskip('httpx')
+    monkeypatch.chdir(tmp_path)
+    import api_app
+    from fastapi.testclient import TestClient
+
+    db = Database(str(tmp_path / "welding_gun.db"))
+    assert db.initialize()
+    db.close()
+    monkeypatch.setattr(api_app, 'DB_PATH', str(tmp_path / "welding_gun.db"))
+    client = TestClient(api_app.app)
+    assert client.post("/api/login", json={"username": "administrator"}).status_code == 401
+    assert client.post("/api/login", json={"username": "administrator", "password": ""}).status_code == 401
+    response = client.post("/api/login", json={"username": "system", "password": "manager"})
+    assert response.status_code == 200 and response.json()['role'] == 'admin'
+
+
+def test_plaintext_password_is_upgraded_on_login(tmp_path):
+    db = Database(str(tmp_path / "users.db"))
+    db.create_tables()
+    db.execute("INSERT INTO users (username, password, role, created_at) VALUES ('old', 'pw', 'user', '')")
+    assert check_user_password(db, 'old', 'pw') is not None
+    stored = db.fetch_one("SELECT password FROM users WHERE username = 'old'")['password']
+    assert is_password_hash(stored) and verify_password(stored, 'pw')[0]
+    db.close()
+
+
+def test_tampered_and_expired_tokens_are_rejected():
+    manager = SessionManager(secret='s', ttl=60)
+    token = manager.issue(USER)
+    payload, _, signature = token.partition('.')
+    assert manager.validate(f"{payload}x.{signature}") is None
+    assert SessionManager(secret='other').validate(token) is None
+    # 重启后（缓存为空）用同一密钥仍可校验
+    assert SessionManager(secret='s').validate(token)['uid'] == 1
+
+    short = SessionManager(secret='s', ttl=0.01)
+    expiring = short.issue(USER)
+    time.sleep(0.02)
+    assert short.validate(expiring) is None
+
+
+def test_role_lookup_sees_demotion_after_invalidate():
+    roles = {1: 'admin'}
+    manager = SessionManager(secret='s', role_lookup=roles.get)
+    token = manager.issue(dict(USER, role='admin'))
+    assert manager.validate(token)['role'] == 'admin'
+    roles[1] = 'user'
+    manager.invalidate_user(1)
+    assert manager.validate(token)['role'] == 'user'
+    del roles[1]
+    manager.invalidate_user(1)
+    assert manager.validate(token) is None
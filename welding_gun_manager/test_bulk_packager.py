@@ -0,0 +1,74 @@
+# welding_gun_manager/test_bulk_packager.py
+"""批量打包测试：按条件筛选；已归档到二级存储的焊枪先恢复再打包"""
+import os
+import json
+import zipfile
+
+from file_operations import GunFileManager
+from services.bulk_packager import BulkPackager, MANIFEST_NAME
+from services.storage_tiering import archive_folder, is_archived
+
+
+def _make_gun(manager, tmp_path, name, **info):
+    folder = manager.create_gun_folder({'name': name, **info})
+    source = tmp_path / f"{name}.dxf"
+    source.write_bytes(b"0\nSECTION\n" * 1000)
+    manager.save_file_to_folder(folder, str(source), '2d')
+    return folder
+
+
+def test_select_by_gun_info_fields(tmp_path):
+    """筛选条件和下拉框取值都来自新建焊枪时写入的字段"""
+    manager = GunFileManager(str(tmp_path / "guns"))
+    _make_gun(manager, tmp_path, "A", weld_type='钢点焊', gun_brand='小原', gun_model='C型')
+    _make_gun(manager, tmp_path, "B", weld_type='铝点焊', gun_brand='小原', gun_model='X型')
+    _make_gun(manager, tmp_path, "C", weld_type='钢点焊', gun_brand='日基')
+    packager = BulkPackager(manager, workers=1)
+
+    assert packager.filter_options() == {
+        'weld_type': sorted(['钢点焊', '铝点焊']),
+        'gun_brand': sorted(['小原', '日基']),
+        'gun_model': ['C型', 'X型'],
+    }
+    assert sorted(gun['name'] for gun in packager.select(weld_type='钢点焊')) == ['A', 'C']
+    assert [gun['name'] for gun in packager.select(weld_type='钢点焊', gun_brand='小原')] == ['A']
+    assert [gun['name'] for gun in packager.select(gun_model='X型')] == ['B']
+    assert [gun['name'] for gun in packager.select(names=['C', 'D'])] == ['C']
+
+
+def test_package_archived_gun(tmp_path):
+    """归档的焊枪打包后 ZIP 中包含原始文件"""
+    manager = GunFileManager(str(tmp_path / "guns"))
+    folder = _make_gun(manager, tmp_path, "G1")
+    archive_folder(folder, str(tmp_path / "archive"))
+    assert is_archived(folder)
+
+    packager = BulkPackager(manager, workers=1)
+    output_dir = tmp_path / "out"
+    manifest = packager.package(packager.select(), str(output_dir))
+
+    assert manifest['count'] == 1 and manifest['failed'] == 0
+    assert not is_archived(folder)
+    zip_path = output_dir / manifest['guns'][0]['zip']
+    with zipfile.ZipFile(zip_path) as zf:
+        names = zf.namelist()
+        assert '2d_drawings/G1.dxf' in names
+        assert zf.read('2d_drawings/G1.dxf') == b"0\nSECTION\n" * 1000
+
+
+def test_missing_archive_is_reported_as_failure(tmp_path):
+    """归档文件丢失时该焊枪记为失败，不生成只有存根的 ZIP"""
+    manager = GunFileManager(str(tmp_path / "guns"))
+    folder = _make_gun(manager, tmp_path, "G2")
+    archive = archive_folder(folder, str(tmp_path / "archive"))
+    os.remove(archive['path'])
+
+    packager = BulkPackager(manager, workers=1)
+    output_dir = tmp_path / "out"
+    manifest = packager.package(packager.select(), str(output_dir))
+
+    assert manifest['count'] == 0 and manifest['failed'] == 1
+    assert 'error' in manifest['guns'][0]
+    with open(output_dir / MANIFEST_NAME, encoding='utf-8') as f:
+        assert json.load(f)['failed'] == 1
+    assert not (output_dir / manifest['guns'][0]['zip']).exists()
@@ -0,0 +1,139 @@
+# welding_gun_manager/test_chart_service.py
+"""统计图表测试（Agg，无界面）：图元原地更新、不新建 Figure，数据未变时不重新统计"""
+import gc
+import sqlite3
+
+import pytest
+
+matplotlib = pytest.importorskip('matplotlib')
+pytest.importorskip('PIL')
+matplotlib.use('Agg')
+
+from matplotlib.figure import Figure
+
+from models.database import Database
+from services.chart_service import StatisticsChart, StatisticsChartService
+
+# 测试环境可能没有中文字体
+pytestmark = pytest.mark.filterwarnings('ignore:Glyph')
+
+
+def _stats(status, types):
+    return {'status_distribution': status, 'type_distribution': types}
+
+
+def _figure_count():
+    gc.collect()
+    return sum(isinstance(obj, Figure) for obj in gc.get_objects())
+
+
+def test_update_reuses_figure_and_artists():
+    chart = StatisticsChart(600, 300)
+    assert chart.update(_stats({'active': 3, 'scrap': 1}, {'X': 2, 'Y': 5}))
+    first_image = chart.render()
+    figure, canvas = chart.figure, chart.canvas
+    wedges, bars = list(chart._wedges), list(chart._bars)
+    figures = _figure_count()
+
+    for i in range(1, 20):
+        assert chart.update(_stats({'active': 3 + i, 'scrap': 1}, {'X': 2 + i, 'Y': 5}))
+        image = chart.render()
+        assert image.size == first_image.size
+    assert chart.figure is figure and chart.canvas is canvas
+    assert chart._wedges == wedges and chart._bars == bars
+    assert _figure_count() == figures
+
+    # 柱高和扇区角度原地修改
+    assert [bar.get_height() for bar in bars] == [21, 5]
+    assert wedges[0].theta1 == 90
+    assert wedges[0].theta2 == pytest.approx(90 + 360 * 22 / 23)
+    assert wedges[1].theta2 == pytest.approx(450)
+
+    # 数据不变时不修改
+    assert not chart.update(_stats({'active': 22, 'scrap': 1}, {'X': 21, 'Y': 5}))
+
+
+def test_blit_after_first_draw():
+    chart = StatisticsChart(600, 300)
+    chart.update(_stats({'active': 1}, {'X': 1}))
+    chart.render()
+    assert not chart.needs_full_draw
+    background = chart._background
+
+    # 只改数值：复用背景
+    chart.update(_stats({'active': 2}, {'X': 1}))
+    chart.render()
+    assert chart._background is background
+
+    # 类别变化或纵轴超出范围：重建背景
+    chart.update(_stats({'active': 2, 'scrap': 1}, {'X': 1}))
+    assert chart.needs_full_draw
+    chart.render()
+    chart.update(_stats({'active': 2, 'scrap': 1}, {'X': 100}))
+    assert chart.needs_full_draw
+
+
+def test_zero_values_and_empty_data():
+    chart = StatisticsChart(600, 300)
+    chart.update(_stats({'active': 0, 'scrap': 2}, {}))
+    assert not chart._wedges[0].get_visible() and chart._wedges[1].get_visible()
+    chart.render()
+    chart.update(_stats({}, {}))
+    assert chart._wedges == [] and chart._empty_text is not None
+    chart.render()
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "guns.db")
+    db = Database(path)
+    db.create_tables()
+    for i in range(10):
+        db.execute("INSERT INTO guns (name, type, status, created_at) VALUES (?, ?, ?, ?)",
+                   (f"G{i}", 'X' if i % 2 else 'Y', 'active' if i < 7 else 'scrap', '2024-01-01'))
+    db.close()
+    return path
+
+
+def test_service_skips_unchanged_data(db_path, monkeypatch):
+    service = StatisticsChartService(db_path)
+    try:
+        stats, image, changed = service._refresh((600, 300))
+        assert changed
+        assert stats['status_distribution'] == {'active': 7, 'scrap': 3}
+
+        queries = []
+        get_statistics = service._controller.get_statistics
+
+        def counting_get_statistics():
+            queries.append(1)
+            return get_statistics()
+        monkeypatch.setattr(service._controller, 'get_statistics', counting_get_statistics)
+        chart = service._chart
+
+        # PRAGMA data_version 未变：不查询、不重绘
+        assert service._refresh((600, 300)) == (stats, image, False)
+        assert queries == []
+
+        # 其它连接写入后重新统计并重绘
+        conn = sqlite3.connect(db_path)
+        conn.execute("UPDATE guns SET status = 'scrap' WHERE name = 'G0'")
+        conn.commit()
+        conn.close()
+        stats, new_image, changed = service._refresh((600, 300))
+        assert changed and new_image is not image
+        assert stats['status_distribution'] == {'active': 6, 'scrap': 4}
+        assert queries == [1]
+
+        # 本进程标记失效后重新统计，结果相同时不重绘
+        service.invalidate()
+        assert service._refresh((600, 300)) == (stats, new_image, False)
+        assert queries == [1, 1]
+
+        # 尺寸变化只重绘，不重新统计
+        _, resized, changed = service._refresh((800, 300))
+        assert changed and resized.size == (800, 300)
+        assert queries == [1, 1]
+        assert service._chart is chart
+    finally:
+        service.close()
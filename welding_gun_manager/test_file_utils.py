@@ -0,0 +1,215 @@
+# welding_gun_manager/test_file_utils.py
+"""大文件 I/O 测试：零拷贝回退链、短复制、流偏移对齐、mmap 窗口和边复制边哈希"""
+import hashlib
+import io
+import os
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from utils import file_utils
+from utils.file_utils import (ALIGNMENT, copy_and_hash, copy_file, copy_stream, copy_stream_hashed, hash_file,
+                              sha256_file)
+
+MIB = 1024 * 1024
+SIZES = [0, 10, MIB, MIB + 12345, 40 * MIB + 7]
+
+
+@pytest.fixture(scope='module')
+def sources(tmp_path_factory):
+    """各个大小的随机内容源文件 {size: (路径, 内容)}"""
+    base = tmp_path_factory.mktemp('sources')
+    files = {}
+    for size in SIZES:
+        data = os.urandom(size)
+        path = base / f"src_{size}.bin"
+        path.write_bytes(data)
+        files[size] = (str(path), data)
+    return files
+
+
+def _no_reflink(monkeypatch):
+    monkeypatch.setattr(file_utils, '_try_reflink', lambda src_fd, dst_fd: False)
+
+
+def _fail(*args, **kwargs):
+    raise OSError(95, "Operation not supported")
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_copy_and_hash_match_hashlib(sources, tmp_path, size):
+    src, data = sources[size]
+
+    dst = copy_file(src, str(tmp_path / "copy.bin"))
+    assert Path(dst).read_bytes() == data
+    assert hash_file(dst) == sha256_file(dst) == hashlib.sha256(data).hexdigest()
+
+    dst, copied, digest = copy_and_hash(src, str(tmp_path / "hashed.bin"))
+    assert copied == size
+    assert digest == hashlib.blake2b(data).hexdigest()
+    assert Path(dst).read_bytes() == data
+
+
+@pytest.mark.parametrize('path', ['copy_file_range', 'sendfile', 'buffered'])
+@pytest.mark.parametrize('size', [10, MIB + 12345])
+def test_copy_file_fallback_chain(sources, tmp_path, monkeypatch, path, size):
+    """reflink 不可用时依次回退到 copy_file_range、sendfile、缓冲复制"""
+    src, data = sources[size]
+    _no_reflink(monkeypatch)
+    used = []
+
+    def spy(name, func):
+        def wrapper(*args):
+            used.append(name)
+            return func(*args)
+        return wrapper
+
+    if path == 'copy_file_range':
+        if not hasattr(os, 'copy_file_range'):
+            pytest.skip("平台不支持 copy_file_range")
+        monkeypatch.setattr(os, 'copy_file_range', spy('copy_file_range', os.copy_file_range))
+    else:
+        monkeypatch.setattr(os, 'copy_file_range', _fail, raising=False)
+    if path == 'sendfile':
+        if not hasattr(os, 'sendfile') or not file_utils.sys.platform.startswith('linux'):
+            pytest.skip("平台不支持 sendfile 写普通文件")
+        monkeypatch.setattr(os, 'sendfile', spy('sendfile', os.sendfile))
+    elif path == 'buffered':
+        monkeypatch.delattr(os, 'copy_file_range', raising=False)
+        monkeypatch.delattr(os, 'sendfile', raising=False)
+        monkeypatch.setattr(file_utils, '_copy_buffered', spy('buffered', file_utils._copy_buffered))
+
+    dst = copy_file(src, str(tmp_path / "copy.bin"))
+    assert Path(dst).read_bytes() == data
+    assert used and set(used) == {path}
+
+
+@pytest.mark.parametrize('zero_copy', ['copy_file_range', 'sendfile'])
+def test_short_copy_is_completed_with_buffered_copy(sources, tmp_path, monkeypatch, zero_copy):
+    """零拷贝中途返回 0（如源文件被截断后又追加）时，剩余部分用普通读写补齐"""
+    src, data = sources[MIB + 12345]
+    _no_reflink(monkeypatch)
+    limit = 3 * ALIGNMENT + 17
+
+    if zero_copy == 'copy_file_range':
+        if not hasattr(os, 'copy_file_range'):
+            pytest.skip("平台不支持 copy_file_range")
+        real = os.copy_file_range
+        copied = []
+
+        def short_copy(src_fd, dst_fd, count):
+            n = real(src_fd, dst_fd, min(count, limit - sum(copied)))
+            copied.append(n)
+            return n
+        monkeypatch.setattr(os, 'copy_file_range', short_copy)
+    else:
+        if not hasattr(os, 'sendfile') or not file_utils.sys.platform.startswith('linux'):
+            pytest.skip("平台不支持 sendfile 写普通文件")
+        monkeypatch.setattr(os, 'copy_file_range', _fail, raising=False)
+        real = os.sendfile
+
+        def short_copy(dst_fd, src_fd, offset, count):
+            return real(dst_fd, src_fd, offset, min(count, max(0, limit - offset)))
+        monkeypatch.setattr(os, 'sendfile', short_copy)
+
+    dst = copy_file(src, str(tmp_path / "copy.bin"))
+    assert Path(dst).read_bytes() == data
+
+
+def test_zero_copy_error_after_partial_copy_is_raised(sources, tmp_path, monkeypatch):
+    """已经复制了一部分再出错时不能静默回退，否则目标文件内容错位"""
+    if not hasattr(os, 'copy_file_range'):
+        pytest.skip("平台不支持 copy_file_range")
+    src, _ = sources[MIB]
+    _no_reflink(monkeypatch)
+    real = os.copy_file_range
+    calls = []
+
+    def fail_second(src_fd, dst_fd, count):
+        calls.append(count)
+        if len(calls) > 1:
+            raise OSError(5, "I/O error")
+        return real(src_fd, dst_fd, min(count, ALIGNMENT))
+    monkeypatch.setattr(os, 'copy_file_range', fail_second)
+
+    with pytest.raises(OSError):
+        copy_file(src, str(tmp_path / "copy.bin"))
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_copy_stream_from_partly_read_file(sources, tmp_path, size):
+    """源文件已读过一部分（读缓冲超过 tell() 位置）时，从 tell() 处接着复制"""
+    src, data = sources[size]
+    skip = min(size, 7)
+    with open(src, 'rb') as fsrc, open(tmp_path / "out.bin", 'wb') as fdst:
+        assert fsrc.read(skip) == data[:skip]
+        assert copy_stream(fsrc, fdst) == size - skip
+        assert fsrc.tell() == size
+        # 复制后还能继续写在末尾
+        fdst.write(b"END")
+    assert (tmp_path / "out.bin").read_bytes() == data[skip:] + b"END"
+
+
+def test_copy_stream_spooled_sources(tmp_path):
+    """未落盘的 SpooledTemporaryFile 走缓冲复制，已落盘的走零拷贝，都从当前位置开始"""
+    data = os.urandom(MIB + 12345)
+    for max_size in (10 * MIB, 1024):
+        with tempfile.SpooledTemporaryFile(max_size=max_size) as spooled:
+            spooled.write(data)
+            spooled.seek(1000)
+            assert spooled.read(234) == data[1000:1234]
+            assert spooled._rolled == (max_size == 1024)
+            with open(tmp_path / "out.bin", 'wb') as fdst:
+                assert copy_stream(spooled, fdst) == len(data) - 1234
+            # 内存中的文件不应被 fileno() 强制写盘
+            assert spooled._rolled == (max_size == 1024)
+        assert (tmp_path / "out.bin").read_bytes() == data[1234:]
+
+
+def test_copy_stream_to_non_file_target():
+    data = os.urandom(100000)
+    target = io.BytesIO()
+    assert copy_stream(io.BytesIO(data), target, buffer_size=4096) == len(data)
+    assert target.getvalue() == data
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_copy_stream_hashed(sources, tmp_path, size):
+    src, data = sources[size]
+    skip = min(size, 10)
+    with open(src, 'rb') as fsrc, open(tmp_path / "out.bin", 'wb') as fdst:
+        fsrc.read(skip)
+        copied, digest = copy_stream_hashed(fsrc, fdst, 'sha256')
+    assert copied == size - skip
+    assert digest == hashlib.sha256(data[skip:]).hexdigest()
+    assert (tmp_path / "out.bin").read_bytes() == data[skip:]
+
+
+@pytest.mark.parametrize('size', [
+    MIB,                      # 恰好两个窗口
+    MIB - 1,                  # 窗口内结束
+    MIB + 1,                  # 下一个窗口的第一个字节
+    MIB + 3 * ALIGNMENT + 5,  # 窗口内跨多段
+])
+def test_mmap_window_boundaries(tmp_path, monkeypatch, size):
+    """窗口大小不是分段大小的整数倍时，各窗口和分段首尾相接，不重复也不遗漏"""
+    window = MIB // 2
+    buffer_size = 3 * ALIGNMENT
+    assert window % buffer_size
+    monkeypatch.setattr(file_utils, 'MMAP_WINDOW_SIZE', window)
+    data = os.urandom(size)
+    path = tmp_path / "data.bin"
+    path.write_bytes(data)
+
+    with open(path, 'rb') as f:
+        parts = [bytes(view) for view in file_utils._mapped_windows(f, size, buffer_size)]
+    assert b"".join(parts) == data
+    assert max(len(part) for part in parts) == buffer_size
+    # 每个窗口的最后一段在窗口边界截断
+    assert len(parts[window // buffer_size]) == window % buffer_size
+
+    assert hash_file(str(path), 'sha256', buffer_size) == hashlib.sha256(data).hexdigest()
+    _, _, digest = copy_and_hash(str(path), str(tmp_path / "copy.bin"), 'sha256', buffer_size=buffer_size)
+    assert digest == hashlib.sha256(data).hexdigest()
+    assert (tmp_path / "copy.bin").read_bytes() == data
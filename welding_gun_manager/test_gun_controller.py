@@ -0,0 +1,63 @@
+# welding_gun_manager/test_gun_controller.py
+"""工枪查询测试：搜索、分页和搜索结果上限"""
+import pytest
+
+from models.database import Database
+from controllers.gun_controller import GunController
+
+
+@pytest.fixture
+def controller(tmp_path):
+    db = Database(str(tmp_path / "guns.db"))
+    db.create_tables()
+    for i in range(30):
+        db.execute("INSERT INTO guns (name, type, model, serial_number, status, location, created_at) "
+                   "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                   (f"G{i:02d}", 'X' if i % 2 else 'Y', f"M{i % 3}", f"SN{i:03d}", 'active', f"L{i % 5}",
+                    f"2024-01-{i + 1:02d}"))
+    yield GunController(db)
+    db.close()
+
+
+def test_count_and_page_with_search(controller):
+    assert controller.count_guns() == 30
+    assert controller.count_guns('M1') == 10
+    page = controller.get_guns_page(0, 4, 'M1', 'name', descending=True)
+    assert [gun.name for gun in page] == ['G28', 'G25', 'G22', 'G19']
+
+
+def test_search_query_limit(controller):
+    sql, params = controller.search_query('G', 'serial_number', limit=5)
+    rows = controller.db.fetch_all(sql, params)
+    assert [row['serial_number'] for row in rows] == ['SN000', 'SN001', 'SN002', 'SN003', 'SN004']
+
+    sql, params = controller.search_query('G')
+    assert len(controller.db.fetch_all(sql, params)) == 30
+
+
+def test_unknown_sort_column_falls_back_to_name(controller):
+    sql, _ = controller.search_query('G', 'name; DROP TABLE guns')
+    assert 'ORDER BY name ASC' in sql
+
+
+def _query_plan(db, sql, params):
+    return ' '.join(row['detail'] for row in db.fetch_all(f"EXPLAIN QUERY PLAN {sql}", params))
+
+
+@pytest.mark.parametrize('column', GunController.SORTABLE_COLUMNS)
+def test_every_sortable_column_pages_without_sorting(controller, column):
+    """每个可排序列都有索引：分页查询不需要对整表临时排序"""
+    sql = f"SELECT * FROM guns ORDER BY {column} DESC, id DESC LIMIT ? OFFSET ?"
+    plan = _query_plan(controller.db, sql, (10, 0))
+    assert 'TEMP B-TREE' not in plan, plan
+
+
+def test_system_database_indexes_sortable_columns(tmp_path):
+    pytest.importorskip('requests')
+    from welding_gun_system import Database as SystemDatabase, GunController as SystemGunController
+    db = SystemDatabase(str(tmp_path / "system.db"))
+    assert db.initialize()
+    for column in SystemGunController.SORTABLE_COLUMNS:
+        plan = _query_plan(db, f"SELECT * FROM guns ORDER BY {column}, id LIMIT 10", ())
+        assert 'TEMP B-TREE' not in plan, (column, plan)
+    db.close()
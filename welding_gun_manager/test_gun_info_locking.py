@@ -0,0 +1,62 @@
+# welding_gun_manager/test_gun_info_locking.py
+"""gun_info.json 并发写入测试：上传、目录同步和校验回填不互相覆盖"""
+import json
+import threading
+import zipfile
+
+from file_operations import GunFileManager, write_gun_zip
+from services.integrity_service import MANIFEST_KEY
+from sync.sync_manager import reconcile_gun_folder
+
+
+def _load(folder):
+    with open(f"{folder}/gun_info.json", encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_concurrent_writers_keep_every_file(tmp_path):
+    manager = GunFileManager(str(tmp_path / "guns"))
+    folder = manager.create_gun_folder({'name': 'G1', 'gun_type': 'X'})
+    sources = []
+    for i in range(20):
+        source = tmp_path / f"part{i}.dxf"
+        source.write_bytes(b"x" * (i + 1))
+        sources.append(str(source))
+
+    stop = threading.Event()
+
+    def reconcile_loop():
+        while not stop.is_set():
+            reconcile_gun_folder(folder)
+
+    def upload(paths):
+        for path in paths:
+            manager.save_file_to_folder(folder, path, '2d')
+
+    reconciler = threading.Thread(target=reconcile_loop)
+    reconciler.start()
+    uploaders = [threading.Thread(target=upload, args=(sources[i::4],)) for i in range(4)]
+    for thread in uploaders:
+        thread.start()
+    for thread in uploaders:
+        thread.join()
+    stop.set()
+    reconciler.join()
+
+    info = _load(folder)
+    assert sorted(info['files']['2d']) == sorted(f"part{i}.dxf" for i in range(20))
+    assert len(info[MANIFEST_KEY]) == 20
+
+
+def test_lock_file_is_not_packaged(tmp_path):
+    manager = GunFileManager(str(tmp_path / "guns"))
+    folder = manager.create_gun_folder({'name': 'G2', 'gun_type': 'X'})
+    source = tmp_path / "a.dxf"
+    source.write_bytes(b"data")
+    manager.save_file_to_folder(folder, str(source), '2d')
+
+    zip_path = str(tmp_path / "G2.zip")
+    write_gun_zip(folder, zip_path)
+    with zipfile.ZipFile(zip_path) as zf:
+        assert 'gun_info.json.lock' not in zf.namelist()
+        assert 'gun_info.json' in zf.namelist()
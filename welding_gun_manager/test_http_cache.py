@@ -0,0 +1,120 @@
+# welding_gun_manager/test_http_cache.py
+"""响应压缩和缓存头测试：编码协商、ETag 和压缩中间件"""
+import asyncio
+import gzip
+import os
+
+import pytest
+
+from services import http_cache
+from services.http_cache import (CompressionMiddleware, choose_encoding, etag_matches, file_etag, guess_media_type,
+                                 is_compressible, make_etag)
+
+
+@pytest.fixture
+def no_brotli(monkeypatch):
+    monkeypatch.setattr(http_cache, 'brotli', None)
+
+
+@pytest.mark.parametrize('accept, expected', [
+    ('gzip, deflate', 'gzip'),
+    ('gzip;q=0', None),
+    ('br', None),
+    ('*', 'gzip'),
+    ('*, gzip;q=0', None),
+    ('', None),
+    (None, None),
+])
+def test_choose_encoding_without_brotli(no_brotli, accept, expected):
+    assert choose_encoding(accept) == expected
+
+
+def test_compressible_and_media_types():
+    assert is_compressible('application/json; charset=utf-8')
+    assert is_compressible('text/csv')
+    assert is_compressible('application/problem+json')
+    assert not is_compressible('image/png')
+    assert not is_compressible(None)
+    assert guess_media_type('A.DXF') == 'image/vnd.dxf'
+    assert guess_media_type('model.stp') == 'application/step'
+    assert guess_media_type('unknown.zzz') == 'application/octet-stream'
+
+
+def test_etags(tmp_path):
+    assert make_etag('a', 1) == make_etag('a', 1) != make_etag('a', 2)
+
+    path = tmp_path / "a.dxf"
+    path.write_bytes(b"data")
+    # 校验清单中的摘要与文件大小一致时直接使用
+    assert file_etag(str(path), {'size': 4, 'blake2b': 'ab' * 32}) == f'"{"ab" * 16}"'
+    fallback = file_etag(str(path), {'size': 5, 'blake2b': 'ab' * 32})
+    assert fallback == file_etag(str(path))
+    os.utime(path, ns=(0, 0))
+    assert file_etag(str(path)) != fallback
+
+    assert etag_matches('"x"', '"x"')
+    assert etag_matches('"y", W/"x"', '"x"')
+    assert etag_matches('"x"', 'W/"x"')
+    assert etag_matches('*', '"x"')
+    assert not etag_matches('"y"', '"x"')
+    assert not etag_matches(None, '"x"')
+
+
+def _call(app, headers):
+    """用 ASGI 接口调用中间件，返回 (响应头字典, 响应体)"""
+    scope = {'type': 'http', 'method': 'GET', 'path': '/', 'headers': [
+        (name.encode('latin-1'), value.encode('latin-1')) for name, value in headers.items()]}
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(CompressionMiddleware(app, minimum_size=100)(scope, receive, send))
+    start = messages[0]
+    response_headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in start['headers']}
+    body = b''.join(message.get('body', b'') for message in messages[1:])
+    return response_headers, body
+
+
+def _app(content_type, chunks, status=200):
+    async def app(scope, receive, send):
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': [(b'content-type', content_type.encode()), (b'etag', b'"v1"')]})
+        for i, chunk in enumerate(chunks):
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': i < len(chunks) - 1})
+    return app
+
+
+def test_single_message_response_is_gzipped(no_brotli):
+    payload = b'{"guns": []}' * 50
+    headers, body = _call(_app('application/json', [payload]), {'accept-encoding': 'gzip'})
+    assert headers['content-encoding'] == 'gzip'
+    assert headers['content-length'] == str(len(body))
+    assert headers['etag'] == 'W/"v1"'
+    assert 'Accept-Encoding' in headers['vary']
+    assert gzip.decompress(body) == payload
+
+
+def test_streamed_response_is_compressed_incrementally(no_brotli):
+    chunks = [b'a,b,c\n' * 100, b'd,e,f\n' * 100, b'']
+    headers, body = _call(_app('text/csv', chunks), {'accept-encoding': 'gzip'})
+    assert headers['content-encoding'] == 'gzip'
+    assert 'content-length' not in headers
+    assert gzip.decompress(body) == b''.join(chunks)
+
+
+@pytest.mark.parametrize('content_type, chunks, request_headers, status', [
+    ('image/png', [b'x' * 500], {'accept-encoding': 'gzip'}, 200),
+    ('application/json', [b'x' * 10], {'accept-encoding': 'gzip'}, 200),
+    ('application/json', [b'x' * 500], {}, 200),
+    ('application/json', [b'x' * 500], {'accept-encoding': 'gzip', 'range': 'bytes=0-9'}, 200),
+    ('application/json', [b'x' * 500], {'accept-encoding': 'gzip'}, 404),
+])
+def test_uncompressed_responses_pass_through(no_brotli, content_type, chunks, request_headers, status):
+    headers, body = _call(_app(content_type, chunks, status), request_headers)
+    assert 'content-encoding' not in headers
+    assert headers['etag'] == '"v1"'
+    assert body == b''.join(chunks)
@@ -0,0 +1,89 @@
+# welding_gun_manager/test_ignore_matcher.py
+"""忽略规则测试：gitignore 语法、取反、目录规则和遍历"""
+import pytest
+
+from utils.ignore_matcher import IgnoreMatcher, compile_rule
+
+
+@pytest.mark.parametrize('patterns, path, is_dir, expected', [
+    (['*.tmp'], 'a.tmp', False, True),
+    (['*.tmp'], 'sub/deep/a.tmp', False, True),
+    (['*.tmp'], 'a.tmpx', False, False),
+    (['file?.txt'], 'file1.txt', False, True),
+    (['file?.txt'], 'file12.txt', False, False),
+    (['[ab].dxf'], 'b.dxf', False, True),
+    (['[!ab].dxf'], 'b.dxf', False, False),
+    (['[!ab].dxf'], 'c.dxf', False, True),
+    # 含 / 的规则相对根目录
+    (['/build'], 'build', True, True),
+    (['/build'], 'src/build', True, False),
+    (['docs/*.pdf'], 'docs/a.pdf', False, True),
+    (['docs/*.pdf'], 'docs/sub/a.pdf', False, False),
+    # ** 匹配任意层级
+    (['**/cache'], 'a/b/cache', True, True),
+    (['**/cache'], 'cache', True, True),
+    (['logs/**'], 'logs/a/b.log', False, True),
+    (['a/**/b'], 'a/x/y/b', False, True),
+    (['a/**/b'], 'a/b', False, True),
+    # / 结尾只匹配目录
+    (['tmp/'], 'tmp', True, True),
+    (['tmp/'], 'tmp', False, False),
+    # 转义
+    (['\\#notes'], '#notes', False, True),
+    (['\\!important'], '!important', False, True),
+])
+def test_match(patterns, path, is_dir, expected):
+    assert IgnoreMatcher(patterns).match(path, is_dir) is expected
+
+
+def test_comments_and_blank_lines_are_skipped():
+    assert compile_rule('# comment') is None
+    assert compile_rule('   ') is None
+    assert compile_rule('/') is None
+    assert IgnoreMatcher(['# *.tmp', '']).match('a.tmp') is False
+
+
+def test_negation_last_matching_rule_wins():
+    matcher = IgnoreMatcher(['*.log', '!keep.log'])
+    assert matcher.match('a.log')
+    assert not matcher.match('keep.log')
+    matcher.add(['keep.log'])
+    assert matcher.match('keep.log')
+
+
+def test_ignored_directory_cannot_be_reincluded():
+    matcher = IgnoreMatcher(['build/', '!build/keep.txt'])
+    assert matcher.is_ignored('build/keep.txt')
+    assert matcher.is_ignored('build/sub/other.txt')
+    assert not matcher.is_ignored('src/keep.txt')
+
+
+def test_rules_relative_to_nested_gitignore():
+    matcher = IgnoreMatcher()
+    matcher.add(['*.bak', '/local'], base='sub')
+    assert matcher.match('sub/a.bak')
+    assert matcher.match('sub/x/a.bak')
+    assert not matcher.match('a.bak')
+    assert matcher.match('sub/local', is_dir=True)
+    assert not matcher.match('sub/x/local', is_dir=True)
+
+
+def test_walk_prunes_ignored_directories_and_reads_gitignore(tmp_path):
+    (tmp_path / 'keep').mkdir()
+    (tmp_path / 'keep' / 'a.dxf').write_text('a')
+    (tmp_path / 'keep' / 'a.tmp').write_text('a')
+    (tmp_path / 'skip').mkdir()
+    (tmp_path / 'skip' / 'b.dxf').write_text('b')
+    (tmp_path / 'nested').mkdir()
+    (tmp_path / 'nested' / '.gitignore').write_text('*.pdf\n')
+    (tmp_path / 'nested' / 'c.pdf').write_text('c')
+    (tmp_path / 'nested' / 'c.dxf').write_text('c')
+    (tmp_path / 'top.pdf').write_text('t')
+
+    matcher = IgnoreMatcher(['*.tmp', 'skip/'])
+    walked = {rel_dir: [entry.name for entry in files] for rel_dir, files in matcher.walk(str(tmp_path))}
+    assert walked == {
+        '': ['top.pdf'],
+        'keep': ['a.dxf'],
+        'nested': ['.gitignore', 'c.dxf'],
+    }
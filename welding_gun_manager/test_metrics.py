@@ -0,0 +1,75 @@
+# welding_gun_manager/test_metrics.py
+"""运行指标测试：Prometheus 文本输出和摘要"""
+import os
+
+import pytest
+
+from services.metrics import MetricsRegistry, CACHE_REQUESTS, metrics, record_cache
+
+
+def test_render_counter_gauge_and_histogram():
+    registry = MetricsRegistry()
+    requests = registry.counter('app_requests_total', "请求数", ('method',))
+    in_flight = registry.gauge('app_in_flight', "进行中的请求")
+    latency = registry.histogram('app_latency_seconds', "耗时", buckets=(0.1, 1.0))
+
+    requests.inc(method='GET')
+    requests.inc(2, method='POST')
+    in_flight.set(3)
+    for value in (0.05, 0.5, 5):
+        latency.observe(value)
+
+    pid = os.getpid()
+    lines = registry.render().splitlines()
+    assert "# TYPE app_requests_total counter" in lines
+    assert f'app_requests_total{{method="GET",pid="{pid}"}} 1' in lines
+    assert f'app_requests_total{{method="POST",pid="{pid}"}} 2' in lines
+    assert f'app_in_flight{{pid="{pid}"}} 3' in lines
+    # 分桶计数是累计的
+    assert f'app_latency_seconds_bucket{{le="0.1",pid="{pid}"}} 1' in lines
+    assert f'app_latency_seconds_bucket{{le="1",pid="{pid}"}} 2' in lines
+    assert f'app_latency_seconds_bucket{{le="+Inf",pid="{pid}"}} 3' in lines
+    assert f'app_latency_seconds_count{{pid="{pid}"}} 3' in lines
+
+
+def test_label_values_are_escaped():
+    registry = MetricsRegistry()
+    registry.counter('app_errors_total', "错误数", ('message',)).inc(message='a "b"\nc\\d')
+    assert 'message="a \\"b\\"\\nc\\\\d"' in registry.render()
+
+
+def test_metric_definitions_must_match():
+    registry = MetricsRegistry()
+    registry.counter('app_total', "计数", ('a',))
+    with pytest.raises(ValueError):
+        registry.gauge('app_total', "计数", ('a',))
+    with pytest.raises(ValueError):
+        registry.counter('app_total', "计数")
+    with pytest.raises(ValueError):
+        registry.counter('app_total', "计数", ('a',)).inc(b=1)
+    with pytest.raises(ValueError):
+        registry.counter('app_total', "计数", ('a',)).inc(-1, a=1)
+
+
+def test_histogram_summary_and_throughput():
+    registry = MetricsRegistry()
+    seconds = registry.histogram('app_copy_seconds', "复制耗时", buckets=(0.5, 1.0, 2.0))
+    copied = registry.counter('app_copy_bytes_total', "复制字节数")
+    seconds.observe(1.5)
+    seconds.observe(0.5)
+    copied.inc(2 * 1024 * 1024)
+
+    summary = seconds.summary()
+    assert summary['count'] == 2 and summary['avg'] == 1.0
+    assert summary['p50'] == 0.5 and summary['p95'] == 2.0
+    assert "1.00 MB/s" in registry.dump_text()
+
+
+def test_cache_hit_rates():
+    before = metrics.cache_hit_rates().get('test_cache', (0, 0, None))
+    record_cache('test_cache', True)
+    record_cache('test_cache', True)
+    record_cache('test_cache', False)
+    hit, miss, _ = metrics.cache_hit_rates()['test_cache']
+    assert (hit - before[0], miss - before[1]) == (2, 1)
+    assert CACHE_REQUESTS.value(cache='test_cache', result='hit') == hit
@@ -0,0 +1,52 @@
+# welding_gun_manager/test_permission_service.py
+"""权限策略测试：角色位掩码、用户缓存和失效"""
+from models.entities import User
+from services.permission_service import (PolicyEngine, Permission, ALL_PERMISSIONS, ROLE_PERMISSIONS,
+                                         MENU_PERMISSIONS)
+
+
+def test_role_masks():
+    policy = PolicyEngine()
+    admin = {'id': 1, 'role': 'admin'}
+    user = {'id': 2, 'role': 'user'}
+    readonly = {'id': 3, 'role': 'readonly'}
+
+    assert policy.permissions(admin) == ALL_PERMISSIONS
+    assert all(policy.allowed(admin, permission) for permission in MENU_PERMISSIONS.values())
+    assert policy.allowed(user, Permission.UPLOAD_FILES)
+    assert not policy.allowed(user, Permission.DELETE_GUN)
+    assert policy.allowed(readonly, Permission.VIEW_GUNS | Permission.DOWNLOAD_FILES)
+    # 多个权限位需全部拥有
+    assert not policy.allowed(readonly, Permission.VIEW_GUNS | Permission.UPLOAD_FILES)
+
+
+def test_unknown_role_and_anonymous_have_nothing():
+    policy = PolicyEngine()
+    assert policy.user_mask(None) == 0
+    assert not policy.allowed(None, Permission.VIEW_GUNS)
+    assert policy.permissions({'id': 4, 'role': 'guest'}) == Permission(0)
+    assert not policy.role_allowed('guest', Permission.VIEW_GUNS)
+
+
+def test_user_objects_and_session_dicts_share_the_policy():
+    policy = PolicyEngine()
+    user = User('u5', None, role='user', id=5)
+    session = {'uid': 5, 'username': 'u5', 'role': 'user'}
+    assert policy.user_mask(user) == policy.user_mask(session) == int(ROLE_PERMISSIONS['user'])
+
+
+def test_role_change_uses_new_mask_and_invalidate_clears_cache():
+    policy = PolicyEngine()
+    assert not policy.allowed({'id': 6, 'role': 'user'}, Permission.SETTINGS)
+    # 缓存键包含角色，角色变化后不会命中旧结果
+    assert policy.allowed({'id': 6, 'role': 'admin'}, Permission.SETTINGS)
+
+    policy.load({'user': Permission.VIEW_GUNS | Permission.SETTINGS})
+    assert policy.allowed({'id': 6, 'role': 'user'}, Permission.SETTINGS)
+    assert policy.user_mask({'id': 6, 'role': 'admin'}) == 0
+
+    policy.user_mask({'id': 7, 'role': 'user'})
+    policy.invalidate(6)
+    assert set(key[0] for key in policy._user_masks) == {7}
+    policy.invalidate()
+    assert policy._user_masks == {}
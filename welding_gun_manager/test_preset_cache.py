@@ -0,0 +1,51 @@
+# welding_gun_manager/test_preset_cache.py
+"""预设缓存和详情窗口选项测试"""
+import json
+
+import pytest
+
+from models.database import Database
+from controllers.preset_controller import PresetController
+
+
+@pytest.fixture
+def controller(tmp_path):
+    db = Database(str(tmp_path / "presets.db"))
+    db.ensure_preset_tables()
+    options_dir = tmp_path / "options"
+    options_dir.mkdir()
+    (options_dir / "manufacturers.json").write_text(json.dumps(["小原", "森德莱"]), encoding='utf-8')
+    (options_dir / "gun_types.json").write_text(json.dumps(["X型"]), encoding='utf-8')
+    (options_dir / "motor_brands.json").write_text("\r\n", encoding='utf-8')
+    controller = PresetController(db, options_dir=str(options_dir))
+    assert controller.create_preset('p1', 'C型', {'electrode': {'force': '3 kN'}})
+    yield controller
+    db.close()
+
+
+def test_cached_presets_are_copies(controller):
+    presets = controller.get_presets_by_gun_type('C型')
+    presets[0]['parameters']['electrode']['force'] = 'changed'
+    presets[0]['name'] = 'changed'
+    presets.clear()
+    fresh = controller.get_presets_by_gun_type('C型')
+    assert fresh[0]['name'] == 'p1'
+    assert fresh[0]['parameters'] == {'electrode': {'force': '3 kN'}}
+
+    everything = controller.get_all_presets()
+    everything[0]['parameters']['electrode'] = None
+    assert controller.get_all_presets()[0]['parameters'] == {'electrode': {'force': '3 kN'}}
+    assert controller.cache.hits >= 2
+
+
+def test_detail_options_have_the_keys_detail_window_reads(controller, tmp_path):
+    options = controller.get_detail_options('C型')
+    assert options['manufacturers'] == ["小原", "森德莱"]
+    assert options['gun_types'] == ["X型", "C型"]
+    assert options['motor_brands'] == []
+    assert options['lines'] == [] and options['areas'] == []
+    assert [preset['name'] for preset in options['weld_presets']] == ['p1']
+
+    # 选项文件修改后重新读取
+    (tmp_path / "options" / "lines.json").write_text(json.dumps(["L1", "L2"]), encoding='utf-8')
+    assert controller.get_detail_options()['lines'] == ["L1", "L2"]
@@ -0,0 +1,97 @@
+# welding_gun_manager/test_preset_parameters.py
+"""预设参数解析和按参数查找预设的测试"""
+import pytest
+
+from models.database import Database
+from models.preset_parameters import parse_parameter_value, flatten_parameters, canonical_unit
+from controllers.preset_controller import PresetController
+
+
+def test_parse_numbers_and_units():
+    assert parse_parameter_value(3) == (3.0, None, None)
+    assert parse_parameter_value("3.5") == (3.5, None, None)
+    assert parse_parameter_value("3.5 kN") == (3500.0, None, 'N')
+    assert parse_parameter_value("3500N") == (3500.0, None, 'N')
+    assert parse_parameter_value("12kA") == (12000.0, None, 'A')
+    assert parse_parameter_value("0.5 s") == (500.0, None, 'ms')
+    # 大小写写错但不会混淆的单位
+    assert parse_parameter_value("3 KN") == (3000.0, None, 'N')
+
+
+def test_parse_keeps_non_numeric_text():
+    for text in ("2024-01-15", "1.2.3", "2T", "007", "3 apples", "M8x1.25"):
+        assert parse_parameter_value(text) == (None, text, None), text
+    assert parse_parameter_value(None) == (None, None, None)
+
+
+def test_flatten_nested_and_lists():
+    rows = flatten_parameters({'electrode': {'force': '3 kN', 'tip': 'F16'}, 'steps': [1, 2]})
+    assert ('electrode.force', 3000.0, None, 'N') in rows
+    assert ('electrode.tip', None, 'F16', None) in rows
+    assert ('steps', None, '[1, 2]', None) in rows
+    assert flatten_parameters("not json") == []
+
+
+def test_canonical_unit_rejects_unknown():
+    assert canonical_unit('kN') == ('N', 1000.0)
+    assert canonical_unit(None) == (None, 1.0)
+    with pytest.raises(ValueError):
+        canonical_unit('furlong')
+
+
+@pytest.fixture
+def controller(tmp_path):
+    db = Database(str(tmp_path / "presets.db"))
+    db.ensure_preset_tables()
+    controller = PresetController(db)
+    presets = {
+        'kN': {'force': '3.5 kN', 'date': '2024-01-15', 'mode': '2T'},
+        'N': {'force': '3500 N', 'date': '2024-12-31', 'mode': '2'},
+        'bare': {'force': 3.2, 'code': '007'},
+        'out': {'force': '4.5 kN', 'code': '7'},
+    }
+    for name, parameters in presets.items():
+        assert controller.create_preset(name, 'X', parameters)
+    yield controller
+    db.close()
+
+
+def _names(rows):
+    return sorted(row['name'] for row in rows)
+
+
+def test_equals_text_values_match_exactly(controller):
+    assert _names(controller.find_presets(equals={'date': '2024-01-15'})) == ['kN']
+    assert _names(controller.find_presets(equals={'mode': '2T'})) == ['kN']
+    assert _names(controller.find_presets(equals={'mode': '2'})) == ['N']
+    assert _names(controller.find_presets(equals={'code': '007'})) == ['bare']
+    assert _names(controller.find_presets(equals={'code': '7'})) == ['out']
+
+
+def test_equals_converts_units(controller):
+    assert _names(controller.find_presets(equals={'force': '3.5 kN'})) == ['N', 'kN']
+    assert _names(controller.find_presets(equals={'force': 3.2})) == ['bare']
+
+
+def test_ranges_convert_units(controller):
+    assert _names(controller.find_presets(ranges={'force': (3, 4, 'kN')})) == ['N', 'kN']
+    assert _names(controller.find_presets(ranges={'force': (3, 4)}, unit='kN')) == ['N', 'kN']
+    assert _names(controller.find_presets(ranges={'force': (3000, None, 'N')})) == ['N', 'kN', 'out']
+    # 不带单位的范围只匹配没有单位的数值
+    assert _names(controller.find_presets(ranges={'force': (3, 4)})) == ['bare']
+
+
+def test_stale_parameter_rows_are_rebuilt(tmp_path):
+    db = Database(str(tmp_path / "stale.db"))
+    db.ensure_preset_tables()
+    PresetController(db).create_preset('p', 'X', {'date': '2024-01-15'})
+    conn = db.connect()
+    # 模拟旧版本解析规则写入的参数行
+    conn.execute("UPDATE preset_parameters SET value_num = 2024, value_text = NULL, unit = '-01-15'")
+    conn.execute("DELETE FROM schema_info")
+    conn.commit()
+
+    db.ensure_preset_tables()
+    row = conn.execute("SELECT value_num, value_text, unit FROM preset_parameters").fetchone()
+    assert tuple(row) == (None, '2024-01-15', None)
+    db.close()
@@ -0,0 +1,68 @@
+# welding_gun_manager/test_preset_sync.py
+"""预设批量同步测试：导出后重新导入不产生任何更新"""
+import pytest
+
+from models.database import Database
+from controllers.preset_controller import PresetController
+from services.preset_sync import PresetSync, load_presets, openpyxl
+
+PRESETS = {
+    'typed': {'code': '007', 'enabled': True, 'note': None, 'force': '3.5 kN', 'current': 12.5, 'cycles': 3},
+    'nested': {'electrode': {'tip': 'F16', 'force': 3200}, 'steps': [1, 2, '3'], 'empty': {}},
+    'numeric_text': {'code': '42', 'version': '1.2.3', 'date': '2024-01-15', 'flag': 'True'},
+}
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = Database(str(tmp_path / "presets.db"))
+    db.ensure_preset_tables()
+    controller = PresetController(db)
+    for name, parameters in PRESETS.items():
+        assert controller.create_preset(name, 'X', parameters, description=f"{name} preset")
+    # 同一名称在另一焊枪类型下
+    assert controller.create_preset('typed', 'Y', {'code': '0012'})
+    yield db
+    db.close()
+
+
+@pytest.mark.parametrize('ext', ['.json', '.csv', '.xlsx'])
+def test_export_reimport_is_unchanged(db, tmp_path, ext):
+    if ext == '.xlsx' and openpyxl is None:
+        pytest.skip("未安装 openpyxl")
+    path = str(tmp_path / f"presets{ext}")
+    syncer = PresetSync(db)
+    assert syncer.export(path) == 4
+
+    loaded = {(preset['gun_type'], preset['name']): preset['parameters'] for preset in load_presets(path)}
+    assert loaded[('X', 'typed')] == PRESETS['typed']
+    assert loaded[('X', 'nested')] == PRESETS['nested']
+    assert loaded[('X', 'numeric_text')] == PRESETS['numeric_text']
+    assert loaded[('Y', 'typed')] == {'code': '0012'}
+
+    report = syncer.sync(path)
+    assert (report['inserted'], report['updated'], report['unchanged']) == (0, 0, 4)
+
+
+def test_sync_applies_only_changes(db, tmp_path):
+    path = str(tmp_path / "presets.csv")
+    syncer = PresetSync(db)
+    syncer.export(path)
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        text = f.read()
+    with open(path, 'w', encoding='utf-8-sig') as f:
+        f.write(text.replace('"""F16"""', '"""F20"""'))
+
+    report = syncer.sync(path)
+    assert (report['inserted'], report['updated'], report['unchanged']) == (0, 1, 3)
+    row = db.fetch_one("SELECT value_text FROM preset_parameters p JOIN presets s ON s.id = p.preset_id "
+                       "WHERE s.name = 'nested' AND p.name = 'electrode.tip'")
+    assert row['value_text'] == 'F20'
+
+
+def test_hand_written_csv_keeps_codes_as_text(tmp_path):
+    path = tmp_path / "manual.csv"
+    path.write_text("name,gun_type,force,code,date,current\n"
+                    "p1,X,3.5 kN,007,2024-01-15,12.5\n", encoding='utf-8')
+    preset = load_presets(str(path))[0]
+    assert preset['parameters'] == {'force': '3.5 kN', 'code': '007', 'date': '2024-01-15', 'current': 12.5}
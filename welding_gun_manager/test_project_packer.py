@@ -0,0 +1,133 @@
+# welding_gun_manager/test_project_packer.py
+"""项目打包测试：文件缓存复用、压缩块回收、压缩包还原和分块报告"""
+import base64
+import hashlib
+import json
+import os
+import zlib
+
+import pytest
+
+from project_packer import CACHE_DIR_NAME, PACK_FILE_MARKER, ProjectPacker, unpack_compressed
+
+
+@pytest.fixture
+def project(tmp_path):
+    root = tmp_path / "project"
+    files = {
+        'main.py': "print('hello')\n",
+        'README.md': "# 焊枪管理\n\n说明\n",
+        'services/a.py': "A = 1\n" * 200,
+        'services/b.py': "B = 2\n",
+        'services/copy_of_b.py': "B = 2\n",
+        'data/guns.db': "不打包",
+        'app.log': "不打包",
+    }
+    for rel_path, text in files.items():
+        path = root / rel_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text, encoding='utf-8')
+    return root
+
+
+def _chunks(root):
+    chunk_dir = root / CACHE_DIR_NAME / "chunks"
+    return {path.stem for path in chunk_dir.iterdir()} if chunk_dir.is_dir() else set()
+
+
+def test_scan_reuses_cache_for_unchanged_files(project):
+    packer = ProjectPacker(project, workers=2)
+    files = packer.scan_project()
+    assert [rel_path for rel_path, _ in files] == [
+        'README.md', 'main.py', 'services/a.py', 'services/b.py', 'services/copy_of_b.py']
+    assert packer.stats == {'read': 5, 'reused': 0}
+    assert dict(files)['services/a.py']['sha256'] == hashlib.sha256(b"A = 1\n" * 200).hexdigest()
+
+    # 新的打包器从 .packer_cache 读取缓存
+    again = ProjectPacker(project, workers=2)
+    assert again.scan_project() == files
+    assert again.stats == {'read': 0, 'reused': 5}
+
+    (project / "main.py").write_text("print('changed')\n", encoding='utf-8')
+    stat = os.stat(project / "main.py")
+    os.utime(project / "main.py", ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    rescanned = ProjectPacker(project, workers=2).scan_project()
+    assert dict(rescanned)['main.py']['sha256'] == hashlib.sha256(b"print('changed')\n").hexdigest()
+
+
+def test_unused_chunks_are_removed(project, tmp_path):
+    packer = ProjectPacker(project, workers=2)
+    packer.compress_and_save(str(tmp_path / "pack1.txt"))
+    chunks = _chunks(project)
+    # 内容相同的两个文件共用一个压缩块
+    assert len(chunks) == 4
+    assert packer.stats['read'] == 5
+
+    packer = ProjectPacker(project, workers=2)
+    packer.compress_and_save(str(tmp_path / "pack2.txt"))
+    assert packer.stats == {'read': 0, 'reused': 5}
+    assert (tmp_path / "pack1.txt").read_text().splitlines()[1:] == (tmp_path / "pack2.txt").read_text().splitlines()[1:]
+
+    a_digest = hashlib.sha256(b"A = 1\n" * 200).hexdigest()
+    (project / "services" / "a.py").unlink()
+    (project / "services" / "copy_of_b.py").unlink()
+    ProjectPacker(project, workers=2).compress_and_save(str(tmp_path / "pack3.txt"))
+    assert _chunks(project) == chunks - {a_digest}
+
+
+def test_compress_and_unpack_round_trip(project, tmp_path):
+    info = ProjectPacker(project, workers=2).compress_and_save(str(tmp_path / "pack.txt"))
+    assert info['files'] == 5
+
+    target = tmp_path / "restored"
+    assert unpack_compressed(str(tmp_path / "pack.txt"), str(target)) == 5
+    for rel_path in ('README.md', 'main.py', 'services/a.py', 'services/b.py', 'services/copy_of_b.py'):
+        assert (target / rel_path).read_bytes() == (project / rel_path).read_bytes()
+    assert not (target / "app.log").exists() and not (target / CACHE_DIR_NAME).exists()
+
+
+def _write_pack(path, rel_path, data, digest=None):
+    digest = digest or hashlib.sha256(data).hexdigest()
+    with open(path, 'w', encoding='ascii') as f:
+        f.write(json.dumps({'format': 'welding-gun-pack/1', 'files': 1}) + "\n")
+        f.write(f"{PACK_FILE_MARKER}{json.dumps(rel_path)} {digest} {len(data)} 1\n")
+        f.write(base64.b64encode(zlib.compress(data)).decode('ascii') + "\n")
+
+
+@pytest.mark.parametrize('rel_path', ['../evil.py', 'a/../../evil.py', 'ABSOLUTE'])
+def test_unpack_rejects_path_traversal(tmp_path, rel_path):
+    if rel_path == 'ABSOLUTE':
+        rel_path = str(tmp_path / "out" / "evil.py")
+    pack = tmp_path / "evil.txt"
+    _write_pack(pack, rel_path, b"x = 1\n")
+    with pytest.raises(ValueError):
+        unpack_compressed(str(pack), str(tmp_path / "out" / "restored"))
+    assert not (tmp_path / "out" / "evil.py").exists()
+
+
+def test_unpack_rejects_hash_mismatch(tmp_path):
+    pack = tmp_path / "bad.txt"
+    _write_pack(pack, 'a.py', b"x = 1\n", digest='0' * 64)
+    with pytest.raises(ValueError):
+        unpack_compressed(str(pack), str(tmp_path / "out"))
+    assert not (tmp_path / "out" / "a.py").exists()
+
+
+def test_split_report_keeps_old_call_and_part_names(project, tmp_path):
+    """save_split_report(report_text, output_file) 仍按原来的文件名分块"""
+    packer = ProjectPacker(project, workers=2)
+    report_text = "行\n" * (50 * 1024)
+    output_file = str(tmp_path / "report.txt")
+    parts = packer.save_split_report(report_text, output_file)
+    assert [os.path.basename(part) for part in parts] == ['report.txt_part01.txt', 'report.txt_part02.txt']
+    body = ""
+    for part in parts:
+        with open(part, encoding='utf-8') as f:
+            body += f.read().split("=" * 60 + "\n\n", 1)[1]
+    assert body == report_text
+    assert os.path.exists(output_file + "_index.txt")
+
+    # 不传报告文本时流式生成
+    parts = packer.save_split_report(output_file=str(tmp_path / "streamed.txt"))
+    with open(parts[0], encoding='utf-8') as f:
+        assert "services/a.py" in f.read()
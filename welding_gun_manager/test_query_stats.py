@@ -0,0 +1,146 @@
+# welding_gun_manager/test_query_stats.py
+"""查询统计测试：SQL 归一化、耗时分布、慢查询记录和订阅"""
+import json
+import sqlite3
+import threading
+
+import pytest
+
+from models.query_stats import QueryStats, normalize_sql, query_stats
+from services.scheduler import TaskScheduler
+from services.search_service import IncrementalSearch
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "stats.db"))
+    conn.execute("CREATE TABLE guns (id INTEGER PRIMARY KEY, name TEXT, status TEXT)")
+    conn.execute("CREATE INDEX idx_guns_name ON guns(name)")
+    conn.executemany("INSERT INTO guns (name, status) VALUES (?, ?)", [(f"G{i}", 'active') for i in range(20)])
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+@pytest.mark.parametrize('sql, expected', [
+    ("SELECT * FROM guns WHERE id = 42", "SELECT * FROM guns WHERE id = ?"),
+    ("SELECT *\n  FROM guns  -- 注释\n WHERE name = 'it''s'", "SELECT * FROM guns WHERE name = ?"),
+    ("SELECT /* hint */ name FROM guns WHERE id IN (?, ?, ?)", "SELECT name FROM guns WHERE id IN (?+)"),
+    ("SELECT * FROM guns WHERE id IN (1, 2, 3.5)", "SELECT * FROM guns WHERE id IN (?+)"),
+    ("SELECT * FROM guns2 LIMIT 10", "SELECT * FROM guns2 LIMIT ?"),
+])
+def test_normalize_sql(sql, expected):
+    assert normalize_sql(sql) == expected
+
+
+def test_aggregates_by_template_and_context():
+    stats = QueryStats()
+    stats.set_context('guns')
+    stats.record("SELECT * FROM guns WHERE id = 1", (), 2.0, 1)
+    stats.record("SELECT * FROM guns WHERE id = 2", (), 4.0, 1)
+    stats.set_context('stats')
+    stats.record("SELECT COUNT(*) FROM guns", (), 0.5, 1, error=RuntimeError("x"))
+
+    snapshot = stats.snapshot()
+    by_sql = {query['sql']: query for query in snapshot['top_queries']}
+    entry = by_sql["SELECT * FROM guns WHERE id = ?"]
+    assert (entry['count'], entry['total_ms'], entry['max_ms'], entry['avg_ms']) == (2, 6.0, 4.0, 3.0)
+    assert entry['contexts'] == {'guns': 2}
+    assert snapshot['totals']['queries'] == 3 and snapshot['totals']['errors'] == 1
+    assert snapshot['contexts']['guns']['count'] == 2
+    assert snapshot['contexts']['stats']['total_ms'] == 0.5
+    # 按总耗时排序
+    assert snapshot['top_queries'][0]['sql'] == "SELECT * FROM guns WHERE id = ?"
+
+    stats.reset()
+    assert stats.snapshot()['totals']['queries'] == 0
+
+
+def test_latency_histogram_buckets():
+    stats = QueryStats()
+    for elapsed in (0.5, 1, 4.9, 5, 99.9, 100, 499, 500, 10000):
+        stats.record("SELECT 1", (), elapsed, 0)
+    assert stats.snapshot()['latency_histogram'] == {
+        '<1ms': 1, '<5ms': 2, '<20ms': 1, '<100ms': 1, '<500ms': 2, '>=500ms': 2,
+    }
+
+
+def test_slow_queries_keep_plan_and_write_log(conn, tmp_path):
+    log_path = tmp_path / "slow.jsonl"
+    stats = QueryStats(slow_threshold_ms=10, max_slow_queries=2)
+    stats.configure(slow_log_path=str(log_path))
+
+    stats.record("SELECT * FROM guns WHERE name = ?", ('G1',), 50, 1, conn=conn)
+    stats.record("UPDATE guns SET status = 'x'", (), 20, 20, conn=conn)
+    stats.record("SELECT * FROM guns", (), 9, 20, conn=conn)
+    stats.record("SELECT * FROM guns WHERE id = ?", (1,), 30, 1, conn=conn)
+
+    slow = stats.snapshot()['slow_queries']
+    # 环形缓冲区只保留最近的 2 条
+    assert [event['normalized'] for event in slow] == ["UPDATE guns SET status = ?",
+                                                        "SELECT * FROM guns WHERE id = ?"]
+    assert slow[0]['plan'] is None
+    assert slow[1]['plan'] and 'INTEGER PRIMARY KEY' in slow[1]['plan'][0]
+    assert stats.snapshot()['totals']['slow'] == 3
+
+    events = [json.loads(line) for line in log_path.read_text(encoding='utf-8').splitlines()]
+    assert len(events) == 3
+    assert 'idx_guns_name' in events[0]['plan'][0]
+
+    stats.configure(explain_slow_queries=False)
+    stats.record("SELECT * FROM guns WHERE name = ?", ('G1',), 50, 1, conn=conn)
+    assert stats.snapshot()['slow_queries'][-1]['plan'] is None
+
+
+def test_subscribe_and_unsubscribe():
+    stats = QueryStats(slow_threshold_ms=10)
+    events = []
+    callback = stats.subscribe(events.append)
+    stats.subscribe(events.append)
+    stats.subscribe(lambda event: 1 / 0)  # 回调出错不影响记录
+
+    stats.record("SELECT 1", (), 1, 1)
+    stats.record("SELECT 2", (), 11, 1)
+    assert [(event['sql'], event['slow']) for event in events] == [("SELECT 1", False), ("SELECT 2", True)]
+
+    stats.unsubscribe(callback)
+    stats.record("SELECT 3", (), 1, 1)
+    assert len(events) == 2
+
+    stats.configure(enabled=False)
+    stats.record("SELECT 4", (), 1, 1)
+    assert stats.snapshot()['totals']['queries'] == 3
+
+
+class _Widget:
+    def after(self, ms, func):
+        return None
+
+    def after_cancel(self, after_id):
+        pass
+
+
+def test_background_search_queries_are_recorded(conn, tmp_path):
+    """后台搜索使用独立连接，查询同样计入统计"""
+    events = []
+    finished = threading.Event()
+    callback = query_stats.subscribe(events.append)
+    scheduler = TaskScheduler(max_workers=1)
+    try:
+        search = IncrementalSearch(
+            _Widget(), str(tmp_path / "stats.db"),
+            lambda term: ("SELECT name FROM guns WHERE name LIKE ? ORDER BY id", (f"%{term}%",)),
+            lambda term, rows, first, done: done and finished.set(),
+            chunk_size=5, scheduler=scheduler
+        )
+        search.start('G1')
+        assert finished.wait(5)
+        assert search._task.wait(5)
+    finally:
+        query_stats.unsubscribe(callback)
+        scheduler.shutdown(wait=True, timeout=5)
+
+    recorded = [event for event in events if event['normalized'].startswith("SELECT name FROM guns")]
+    assert len(recorded) == 1
+    assert recorded[0]['rows'] == 11  # G1, G10..G19
+    assert recorded[0]['error'] is None
@@ -0,0 +1,153 @@
+# welding_gun_manager/test_scheduler.py
+"""后台任务调度器测试：优先级、回调派发、延迟、周期任务和取消"""
+import threading
+import time
+
+import pytest
+
+from services.scheduler import TaskScheduler, PRIORITY_HIGH, PRIORITY_LOW
+
+
+class _FakeRoot:
+    """只记录 after 调用的 Tk 根窗口替身，回调由测试手动派发"""
+
+    def after(self, ms, func):
+        return 'after-id'
+
+    def after_cancel(self, after_id):
+        pass
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = TaskScheduler(max_workers=1)
+    yield scheduler
+    scheduler.shutdown(wait=True, timeout=5)
+
+
+def _block(scheduler):
+    """占住唯一的工作线程，返回放行用的事件"""
+    release = threading.Event()
+    started = threading.Event()
+
+    def hold():
+        started.set()
+        release.wait(5)
+
+    scheduler.submit(hold)
+    assert started.wait(5)
+    return release
+
+
+def test_ready_tasks_run_by_priority_then_order(scheduler):
+    release = _block(scheduler)
+    order = []
+    scheduler.submit(order.append, 'low', priority=PRIORITY_LOW)
+    scheduler.submit(order.append, 'normal-1')
+    scheduler.submit(order.append, 'high', priority=PRIORITY_HIGH)
+    last = scheduler.submit(order.append, 'normal-2')
+    release.set()
+    assert last.wait(5)
+    scheduler.submit(lambda: None).wait(5)
+    assert order == ['high', 'normal-1', 'normal-2', 'low']
+
+
+def test_callbacks_wait_for_ui_thread(scheduler):
+    scheduler.attach_tk(_FakeRoot())
+    results, errors = [], []
+    ok = scheduler.submit(lambda: 42, callback=results.append)
+    failed = scheduler.submit(lambda: 1 / 0, error_callback=errors.append)
+    assert ok.wait(5) and failed.wait(5)
+
+    # 绑定界面后回调不在工作线程中执行
+    assert results == [] and errors == []
+    assert scheduler.drain_completions() == 2
+    assert results == [42]
+    assert isinstance(errors[0], ZeroDivisionError)
+
+
+def test_cancelled_task_does_not_run(scheduler):
+    release = _block(scheduler)
+    ran = []
+    task = scheduler.submit(ran.append, 1)
+    assert scheduler.pending_count() == 1
+    assert scheduler.cancel(task)
+    release.set()
+    assert task.wait(5)
+    scheduler.submit(lambda: None).wait(5)
+    assert ran == [] and scheduler.pending_count() == 0
+
+
+def test_delayed_and_periodic_tasks(scheduler):
+    started = time.monotonic()
+    delayed = scheduler.submit(time.monotonic, delay=0.1)
+    assert delayed.wait(5)
+    assert delayed.result - started >= 0.1
+
+    runs = threading.Event()
+    count = []
+
+    def tick():
+        count.append(1)
+        if len(count) == 3:
+            runs.set()
+
+    periodic = scheduler.schedule_periodic(0.01, tick, initial_delay=0)
+    assert runs.wait(5)
+    scheduler.cancel(periodic)
+    assert periodic.wait(5)
+    assert periodic.run_count >= 3
+
+    with pytest.raises(ValueError):
+        scheduler.schedule_periodic(0, tick)
+
+
+def test_shutdown_rejects_new_tasks():
+    scheduler = TaskScheduler(max_workers=1)
+    scheduler.shutdown(wait=True, timeout=5)
+    with pytest.raises(RuntimeError):
+        scheduler.submit(lambda: None)
+
+
+def test_background_tasks_leave_a_worker_for_interactive_tasks():
+    scheduler = TaskScheduler(max_workers=2)
+    try:
+        assert scheduler.max_background == 1
+        release = threading.Event()
+        started = []
+        for i in range(3):
+            scheduler.submit(lambda i=i: (started.append(i), release.wait(5)), priority=PRIORITY_LOW)
+        # 两个后台长任务不能同时占满线程，高优先级任务立即执行
+        interactive = scheduler.submit(lambda: 'ok', priority=PRIORITY_HIGH)
+        assert interactive.wait(2) and interactive.result == 'ok'
+        assert started == [0]
+        release.set()
+        last = scheduler.submit(lambda: None, priority=PRIORITY_LOW)
+        assert last.wait(5)
+        assert sorted(started) == [0, 1, 2]
+    finally:
+        scheduler.shutdown(wait=True, timeout=5)
+
+
+def test_cancelled_task_does_not_report_error():
+    scheduler = TaskScheduler(max_workers=1)
+    scheduler.attach_tk(_FakeRoot())
+    try:
+        started = threading.Event()
+        release = threading.Event()
+        errors = []
+
+        def fail():
+            started.set()
+            release.wait(5)
+            raise RuntimeError("boom")
+
+        task = scheduler.submit(fail, error_callback=errors.append)
+        assert started.wait(5)
+        scheduler.cancel(task)
+        release.set()
+        assert task.wait(5)
+        scheduler.drain_completions()
+        assert errors == []
+    finally:
+        scheduler.shutdown(wait=True, timeout=5)
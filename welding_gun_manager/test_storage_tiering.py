@@ -0,0 +1,153 @@
+# welding_gun_manager/test_storage_tiering.py
+"""分级存储测试：冷热策略、迁移计划、归档与恢复"""
+import json
+import os
+import sqlite3
+import time
+
+import pytest
+
+from file_operations import GunFileManager
+from services import storage_tiering
+from services.storage_tiering import (ARCHIVE_KEY, StorageTiering, TieringPolicy, archive_folder, is_archived,
+                                      rehydrate_folder)
+
+DAY = 86400
+
+
+def _make_gun(manager, tmp_path, name, content=b"0\nSECTION\n" * 500):
+    folder = manager.create_gun_folder({'name': name, 'gun_type': 'X'})
+    source = tmp_path / f"{name}.dxf"
+    source.write_bytes(content)
+    manager.save_file_to_folder(folder, str(source), '2d')
+    return folder
+
+
+def _age(folder, days):
+    """把文件夹中所有文件的修改时间改为 days 天前"""
+    stamp = time.time() - days * DAY
+    for root, _, files in os.walk(folder):
+        for name in files:
+            os.utime(os.path.join(root, name), (stamp, stamp))
+
+
+def _statuses_db(path, statuses):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE guns (name TEXT, status TEXT)")
+    conn.executemany("INSERT INTO guns VALUES (?, ?)", statuses.items())
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_policy_requires_cold_status_and_idle_time():
+    policy = TieringPolicy(min_idle_days=30)
+    now = time.time()
+    assert policy.is_cold('scrap', now - 31 * DAY, now)
+    assert policy.is_cold('inactive', now - 30 * DAY, now)
+    assert not policy.is_cold('scrap', now - 29 * DAY, now)
+    assert not policy.is_cold('active', now - 365 * DAY, now)
+    assert not policy.is_cold(None, 0, now)
+    assert TieringPolicy(cold_statuses=('retired',), min_idle_days=0).is_cold('retired', now, now)
+
+
+def test_archive_and_rehydrate_round_trip(tmp_path):
+    manager = GunFileManager(str(tmp_path / "guns"))
+    folder = _make_gun(manager, tmp_path, "G1")
+    image = os.path.join(folder, 'images', 'photo.png')
+    with open(image, 'wb') as f:
+        f.write(os.urandom(4096))
+    with open(image, 'rb') as f:
+        image_bytes = f.read()
+
+    archive = archive_folder(folder, str(tmp_path / "archive"))
+    assert is_archived(folder)
+    assert os.path.exists(archive['path'])
+    assert archive['original_bytes'] == 500 * len(b"0\nSECTION\n") + 4096
+    # 主目录只剩存根
+    assert sorted(os.listdir(folder)) == ['gun_info.json', 'gun_info.json.lock']
+    # 重复归档直接返回已有信息
+    assert archive_folder(folder, str(tmp_path / "archive")) == archive
+
+    assert rehydrate_folder(folder)
+    assert not is_archived(folder)
+    assert not os.path.exists(archive['path'])
+    with open(os.path.join(folder, '2d_drawings', 'G1.dxf'), 'rb') as f:
+        assert f.read() == b"0\nSECTION\n" * 500
+    with open(image, 'rb') as f:
+        assert f.read() == image_bytes
+    assert os.path.isdir(os.path.join(folder, '3d_models'))
+    assert not rehydrate_folder(folder)
+
+
+def test_file_added_during_archive_is_kept(tmp_path, monkeypatch):
+    """写归档期间新出现的文件没有进入归档，不能被删除"""
+    manager = GunFileManager(str(tmp_path / "guns"))
+    folder = _make_gun(manager, tmp_path, "G1")
+    late = os.path.join(folder, '2d_drawings', 'late.dxf')
+    write_archive = storage_tiering._write_archive
+
+    def write_then_add(folder_path, archive_path, fmt, members):
+        write_archive(folder_path, archive_path, fmt, members)
+        with open(late, 'wb') as f:
+            f.write(b"late")
+
+    monkeypatch.setattr(storage_tiering, '_write_archive', write_then_add)
+    archive_folder(folder, str(tmp_path / "archive"))
+    assert os.path.exists(late)
+    assert not os.path.exists(os.path.join(folder, '2d_drawings', 'G1.dxf'))
+
+    rehydrate_folder(folder)
+    assert sorted(os.listdir(os.path.join(folder, '2d_drawings'))) == ['G1.dxf', 'late.dxf']
+
+
+def test_rehydrate_rejects_corrupted_archive(tmp_path):
+    manager = GunFileManager(str(tmp_path / "guns"))
+    folder = _make_gun(manager, tmp_path, "G1")
+    archive = archive_folder(folder, str(tmp_path / "archive"))
+    with open(archive['path'], 'ab') as f:
+        f.write(b"garbage")
+    with pytest.raises(ValueError):
+        rehydrate_folder(folder)
+    assert is_archived(folder)
+
+
+def test_plan_and_run(tmp_path):
+    manager = GunFileManager(str(tmp_path / "guns"))
+    cold = _make_gun(manager, tmp_path, "COLD")
+    recent = _make_gun(manager, tmp_path, "RECENT")
+    active = _make_gun(manager, tmp_path, "ACTIVE")
+    _age(cold, 60)
+    _age(active, 60)
+    db_path = _statuses_db(str(tmp_path / "guns.db"), {'COLD': 'scrap', 'RECENT': 'scrap', 'ACTIVE': 'active'})
+    tiering = StorageTiering(manager, str(tmp_path / "archive"), db_path=db_path)
+
+    plan = tiering.plan()
+    assert [gun['name'] for gun in plan['archive']] == ['COLD']
+    assert plan['rehydrate'] == []
+
+    # 预演不改动文件
+    assert tiering.run(dry_run=True)['archived'] == ['COLD']
+    assert not is_archived(cold)
+
+    report = tiering.run()
+    assert report['archived'] == ['COLD'] and report['errors'] == []
+    assert report['freed_bytes'] > 0
+    assert is_archived(cold) and not is_archived(recent) and not is_archived(active)
+    assert tiering.plan() == {'archive': [], 'rehydrate': []}
+
+    # 重新启用后恢复；恢复时间计入空闲天数，不会立即再次归档
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE guns SET status = 'active' WHERE name = 'COLD'")
+    conn.commit()
+    conn.close()
+    assert tiering.run()['rehydrated'] == ['COLD']
+    assert not is_archived(cold)
+    with open(os.path.join(cold, 'gun_info.json'), encoding='utf-8') as f:
+        assert ARCHIVE_KEY not in json.load(f)
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE guns SET status = 'scrap' WHERE name = 'COLD'")
+    conn.commit()
+    conn.close()
+    assert tiering.plan()['archive'] == []
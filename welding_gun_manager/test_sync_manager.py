@@ -0,0 +1,109 @@
+# welding_gun_manager/test_sync_manager.py
+"""焊枪目录同步测试：gun_info.json 对账和轮询监视"""
+import json
+import os
+import threading
+
+from file_operations import GunFileManager
+from services.integrity_service import MANIFEST_KEY
+from sync.sync_manager import GunFolderWatcher, reconcile_gun_folder, _PollingObserver
+
+
+def _load(folder):
+    with open(os.path.join(folder, 'gun_info.json'), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _gun(tmp_path, name='G1'):
+    manager = GunFileManager(str(tmp_path / "guns"))
+    folder = manager.create_gun_folder({'name': name, 'gun_type': 'X'})
+    return manager, folder
+
+
+def test_reconcile_add_remove_and_rename(tmp_path):
+    _, folder = _gun(tmp_path)
+    subfolder = os.path.join(folder, GunFileManager.TYPE_TO_FOLDER['2d'])
+    with open(os.path.join(subfolder, 'a.dxf'), 'wb') as f:
+        f.write(b"aaa")
+    with open(os.path.join(subfolder, 'a.dxf.tmp'), 'wb') as f:
+        f.write(b"partial")
+
+    changes = reconcile_gun_folder(folder)
+    relpath = f"{GunFileManager.TYPE_TO_FOLDER['2d']}/a.dxf"
+    assert changes == {'added': [relpath], 'removed': []}
+    info = _load(folder)
+    assert info['files']['2d'] == ['a.dxf']
+    assert info[MANIFEST_KEY][relpath]['size'] == 3
+
+    # 没有变化时不改写文件
+    mtime = os.stat(os.path.join(folder, 'gun_info.json')).st_mtime_ns
+    assert reconcile_gun_folder(folder) == {'added': [], 'removed': []}
+    assert os.stat(os.path.join(folder, 'gun_info.json')).st_mtime_ns == mtime
+
+    # 重命名：旧名称删除，新名称登记
+    os.rename(os.path.join(subfolder, 'a.dxf'), os.path.join(subfolder, 'b.dxf'))
+    renamed = f"{GunFileManager.TYPE_TO_FOLDER['2d']}/b.dxf"
+    assert reconcile_gun_folder(folder) == {'added': [renamed], 'removed': [relpath]}
+    info = _load(folder)
+    assert info['files']['2d'] == ['b.dxf']
+    assert set(info[MANIFEST_KEY]) == {renamed}
+
+    os.remove(os.path.join(subfolder, 'b.dxf'))
+    assert reconcile_gun_folder(folder) == {'added': [], 'removed': [renamed]}
+    assert _load(folder)['files']['2d'] == []
+
+
+def test_polling_backs_off_full_scans(tmp_path):
+    manager, folder = _gun(tmp_path)
+    quiet = manager.create_gun_folder({'name': 'G2', 'gun_type': 'X'})
+    watcher = GunFolderWatcher(manager, use_watchdog=False)
+    observer = _PollingObserver(watcher, interval=1.0, max_interval=4.0)
+    observer.baseline()
+
+    # 没有变化时全量检查的间隔逐次加倍，不超过上限
+    for expected in (2.0, 4.0, 4.0):
+        observer._next_full = 0.0
+        assert observer.tick() == []
+        assert observer.full_interval == expected
+
+    # 非全量检查不会发现安静文件夹中的变化，全量检查会
+    subfolder = os.path.join(quiet, GunFileManager.TYPE_TO_FOLDER['2d'])
+    with open(os.path.join(subfolder, 'a.dxf'), 'wb') as f:
+        f.write(b"a")
+    assert observer.poll(full=False) == []
+    observer._next_full = 0.0
+    assert observer.tick() == [quiet]
+    assert observer.full_interval == 1.0
+
+    # 有过变化的文件夹和新文件夹在两次全量检查之间也会检查
+    with open(os.path.join(subfolder, 'b.dxf'), 'wb') as f:
+        f.write(b"b")
+    new_folder = manager.create_gun_folder({'name': 'G3', 'gun_type': 'X'})
+    assert sorted(observer.poll(full=False)) == sorted([quiet, new_folder])
+    assert folder not in observer._hot
+
+
+def test_watcher_reconciles_in_polling_mode(tmp_path):
+    manager, folder = _gun(tmp_path)
+    reconciled = threading.Event()
+    watcher = GunFolderWatcher(manager, on_change=lambda changes: reconciled.set(),
+                               debounce=0.05, poll_interval=0.05, use_watchdog=False)
+    watcher.start()
+    try:
+        assert manager.catalog_watched
+        with open(os.path.join(folder, GunFileManager.TYPE_TO_FOLDER['2d'], 'a.dxf'), 'wb') as f:
+            f.write(b"a")
+        assert reconciled.wait(5)
+        assert _load(folder)['files']['2d'] == ['a.dxf']
+    finally:
+        watcher.stop()
+    assert not manager.catalog_watched
+
+
+def test_stop_before_start_does_not_start(tmp_path):
+    manager, _ = _gun(tmp_path)
+    watcher = GunFolderWatcher(manager, use_watchdog=False)
+    watcher.stop()
+    watcher.start()
+    assert watcher._observer is None
+    assert not manager.catalog_watched
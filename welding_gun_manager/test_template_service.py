@@ -0,0 +1,48 @@
+# welding_gun_manager/test_template_service.py
+"""导入模板测试：导出的模板填写后读取，跳过标题、说明、示例和提示行"""
+import pytest
+
+from services.template_service import (write_template, write_template_csv, read_template_rows,
+                                       TemplateFormatError, TEMPLATE_FIELDS)
+
+ROWS = [
+    ["钢点焊", "小原", "GUN-101", "C型", "500", "200", "150", "4.5", "库卡", "R30", "否", "0", "0"],
+    ["铝点焊", "日基", "GUN-102", "", "", "", "", "", "", "", "", "", ""],
+]
+
+
+@pytest.mark.parametrize('ext', ['.csv', '.xlsx'])
+def test_template_round_trip(tmp_path, ext):
+    if ext == '.xlsx':
+        pytest.importorskip('openpyxl')
+    pytest.importorskip('pandas')
+    path = str(tmp_path / f"template{ext}")
+    write_template(path, rows=ROWS)
+    assert read_template_rows(path) == ROWS
+
+
+def test_empty_template_has_no_data(tmp_path):
+    pytest.importorskip('pandas')
+    path = str(tmp_path / "template.csv")
+    write_template(path)
+    assert read_template_rows(path) == []
+
+
+def test_csv_without_pandas(tmp_path):
+    path = str(tmp_path / "template.csv")
+    write_template_csv(path, rows=ROWS)
+    assert read_template_rows(path, use_pandas=False) == ROWS
+
+
+def test_gbk_csv(tmp_path):
+    path = tmp_path / "template.csv"
+    lines = [",".join(label for _, label, _ in TEMPLATE_FIELDS), "说明", "示例", "提示", ",".join(ROWS[0])]
+    path.write_bytes("\n".join(lines).encode('gbk'))
+    assert read_template_rows(str(path), use_pandas=False) == [ROWS[0]]
+
+
+def test_short_file_is_rejected(tmp_path):
+    path = tmp_path / "other.csv"
+    path.write_text("a,b\n1,2\n", encoding='utf-8')
+    with pytest.raises(TemplateFormatError):
+        read_template_rows(str(path), use_pandas=False)
@@ -0,0 +1,111 @@
+# welding_gun_manager/test_thumbnail_service.py
+"""缩略图服务测试：按内容哈希缓存、哈希索引复用、文件变化后重新生成"""
+import os
+
+import pytest
+
+pytest.importorskip('PIL')
+
+from PIL import Image
+
+from services import thumbnail_service
+from services.thumbnail_service import THUMBNAIL_SIZES, ThumbnailService
+
+
+def _image(path, size=(2000, 1500), mode='RGB', color=(200, 30, 30)):
+    Image.new(mode, size, color).save(path)
+    return str(path)
+
+
+@pytest.fixture
+def service(tmp_path):
+    service = ThumbnailService(str(tmp_path / "cache"))
+    yield service
+    service.close()
+
+
+@pytest.fixture
+def renders(service, monkeypatch):
+    """记录真正解码原图生成缩略图的次数"""
+    calls = []
+    render = service._render
+
+    def counting_render(path, digest):
+        calls.append(path)
+        return render(path, digest)
+    monkeypatch.setattr(service, '_render', counting_render)
+    return calls
+
+
+def test_generates_all_sizes(service, tmp_path):
+    paths = service.generate(_image(tmp_path / "photo.jpg"))
+    assert set(paths) == set(THUMBNAIL_SIZES)
+    for size, edge in THUMBNAIL_SIZES.items():
+        with Image.open(paths[size]) as thumb:
+            assert max(thumb.size) == edge
+            assert thumb.format == 'JPEG'
+        assert service.get_thumbnail(str(tmp_path / "photo.jpg"), size, generate=False) == paths[size]
+
+
+def test_small_and_transparent_images(service, tmp_path):
+    """小图不放大；带透明通道的图片保存为 PNG"""
+    paths = service.generate(_image(tmp_path / "icon.png", size=(100, 80), mode='RGBA', color=(0, 0, 0, 0)))
+    for path in paths.values():
+        assert path.endswith('.png')
+        with Image.open(path) as thumb:
+            assert thumb.size == (100, 80)
+            assert thumb.mode == 'RGBA'
+
+
+def test_same_content_shares_thumbnails(service, tmp_path, renders):
+    """缓存键是内容哈希：内容相同的两个文件只生成一次"""
+    first = _image(tmp_path / "a.png")
+    second = tmp_path / "b.png"
+    second.write_bytes((tmp_path / "a.png").read_bytes())
+
+    thumb = service.get_thumbnail(first, 'small')
+    assert service.get_thumbnail(str(second), 'small') == thumb
+    assert service.generate(str(second))['small'] == thumb
+    assert renders == [first]
+    assert os.path.basename(thumb).startswith(service.file_digest(first))
+
+
+def test_digest_index_is_reused_until_file_changes(service, tmp_path, monkeypatch, renders):
+    path = _image(tmp_path / "photo.png")
+    hashed = []
+    sha256_file = thumbnail_service.sha256_file
+
+    def counting_sha256(file_path):
+        hashed.append(file_path)
+        return sha256_file(file_path)
+    monkeypatch.setattr(thumbnail_service, 'sha256_file', counting_sha256)
+
+    old = service.get_thumbnail(path, 'medium')
+    assert service.get_thumbnail(path, 'medium') == old
+    # 索引保存在缓存目录中，重新打开服务后也不必重新计算
+    reopened = ThumbnailService(service.cache_dir)
+    try:
+        assert reopened.get_thumbnail(path, 'medium', generate=False) == old
+    finally:
+        reopened.close()
+    assert len(hashed) == 1 and len(renders) == 1
+
+    # 内容和修改时间变化后重新计算哈希并生成新的缩略图
+    _image(tmp_path / "photo.png", color=(10, 200, 10))
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    new = service.get_thumbnail(path, 'medium')
+    assert new != old
+    assert len(hashed) == 2 and len(renders) == 2
+    with Image.open(new) as thumb:
+        assert thumb.getpixel((0, 0))[1] > 150
+
+
+def test_rejects_non_images_and_unknown_sizes(service, tmp_path):
+    drawing = tmp_path / "part.dxf"
+    drawing.write_bytes(b"0\nSECTION\n")
+    assert service.get_thumbnail(str(drawing)) is None
+    assert service.generate(str(drawing)) == {}
+    assert service.generate_async([str(drawing)]) == []
+    with pytest.raises(ValueError):
+        service.get_thumbnail(_image(tmp_path / "photo.jpg"), 'huge')
@@ -0,0 +1,145 @@
+# welding_gun_manager/test_tree_reconciler.py
+"""Treeview 增量刷新测试：随机增删改移后顺序和值正确，只改一行时只调用一次 item()"""
+import random
+from collections import Counter
+
+from views.tree_reconciler import TreeReconciler
+
+
+class FakeTreeview:
+    """只实现 TreeReconciler 用到的 ttk.Treeview 方法，并统计调用次数"""
+
+    def __init__(self):
+        self.children = []
+        self.values = {}
+        self.calls = Counter()
+
+    def get_children(self, parent=''):
+        self.calls['get_children'] += 1
+        return tuple(self.children)
+
+    def insert(self, parent, index, iid=None, values=()):
+        self.calls['insert'] += 1
+        assert iid not in self.values, f"重复插入 {iid}"
+        self.values[iid] = tuple(values)
+        self._attach(iid, index)
+        return iid
+
+    def item(self, iid, values=None):
+        self.calls['item'] += 1
+        assert iid in self.values
+        if values is not None:
+            self.values[iid] = tuple(values)
+        return {'values': list(self.values[iid])}
+
+    def delete(self, *iids):
+        self.calls['delete'] += 1
+        for iid in iids:
+            del self.values[iid]
+            if iid in self.children:
+                self.children.remove(iid)
+
+    def detach(self, *iids):
+        self.calls['detach'] += 1
+        for iid in iids:
+            self.children.remove(iid)
+
+    def move(self, iid, parent, index):
+        self.calls['move'] += 1
+        assert iid in self.values
+        if iid in self.children:
+            self.children.remove(iid)
+        self._attach(iid, index)
+
+    def index(self, iid):
+        self.calls['index'] += 1
+        return self.children.index(iid)
+
+    def _attach(self, iid, index):
+        if index == 'end':
+            self.children.append(iid)
+        else:
+            self.children.insert(max(0, index), iid)
+
+
+def _assert_matches(tree, rows):
+    assert tree.children == [str(row[0]) for row in rows]
+    assert {iid: values for iid, values in tree.values.items()} == {str(row[0]): row for row in rows}
+
+
+def test_random_changes_keep_order_and_values():
+    rng = random.Random(20240611)
+    tree = FakeTreeview()
+    reconciler = TreeReconciler(tree)
+    rows = [(i, f"G{i}", 'active') for i in range(50)]
+    next_id = len(rows)
+    reconciler.reconcile(rows)
+    _assert_matches(tree, rows)
+
+    for _ in range(2000):
+        rows = list(rows)
+        for _ in range(rng.randint(1, 6)):
+            action = rng.random()
+            if action < 0.25 or not rows:
+                rows.insert(rng.randint(0, len(rows)), (next_id, f"G{next_id}", 'active'))
+                next_id += 1
+            elif action < 0.45:
+                del rows[rng.randrange(len(rows))]
+            elif action < 0.7:
+                row = rows.pop(rng.randrange(len(rows)))
+                rows.insert(rng.randint(0, len(rows)), row)
+            elif action < 0.95:
+                i = rng.randrange(len(rows))
+                rows[i] = (rows[i][0], rows[i][1], rng.choice(['active', 'maintenance', 'scrap']))
+            else:
+                # 改变排序方式：大范围重排
+                if rng.random() < 0.5:
+                    rows.sort(key=lambda row: (row[2], -row[0]))
+                else:
+                    rows.sort(key=lambda row: row[1])
+        if rng.random() < 0.05:
+            # 偶尔带重复键，只保留第一行
+            reconciler.reconcile(rows + [rows[0][:2] + ('dup',)] if rows else rows)
+        else:
+            before = Counter(tree.calls)
+            stats = reconciler.reconcile(rows)
+            assert stats['inserted'] == tree.calls['insert'] - before['insert']
+            assert stats['updated'] == tree.calls['item'] - before['item']
+        _assert_matches(tree, rows)
+
+    reconciler.clear()
+    assert tree.children == [] and tree.values == {}
+    reconciler.reconcile(rows[:3])
+    _assert_matches(tree, rows[:3])
+
+
+def test_single_edit_touches_one_row():
+    tree = FakeTreeview()
+    reconciler = TreeReconciler(tree)
+    rows = [(i, f"G{i}", 'active') for i in range(1000)]
+    reconciler.reconcile(rows)
+
+    rows[500] = (500, "G500", 'scrap')
+    tree.calls.clear()
+    stats = reconciler.reconcile(rows)
+    assert stats == {'inserted': 0, 'updated': 1, 'deleted': 0, 'moved': 0}
+    assert tree.calls == Counter({'item': 1, 'get_children': 1})
+    assert tree.values['500'] == (500, "G500", 'scrap')
+
+    # 结果不变时不改动 Treeview
+    tree.calls.clear()
+    assert reconciler.reconcile(rows) == {'inserted': 0, 'updated': 0, 'deleted': 0, 'moved': 0}
+    assert tree.calls == Counter({'get_children': 1})
+
+
+def test_small_move_only_moves_that_row():
+    tree = FakeTreeview()
+    reconciler = TreeReconciler(tree)
+    rows = [(i, f"G{i}") for i in range(100)]
+    reconciler.reconcile(rows)
+
+    rows.insert(10, rows.pop(90))
+    tree.calls.clear()
+    stats = reconciler.reconcile(rows)
+    assert stats['moved'] == 1 and tree.calls['move'] == 1
+    _assert_matches(tree, rows)
@@ -1 +1,284 @@
+# utils/file_utils.py
+"""
+大文件 I/O 工具
+复制优先使用内核内的零拷贝路径（reflink、copy_file_range、sendfile），
+数据不经过 Python 进程；哈希用 mmap 分段映射文件，内存占用与文件大小无关。
+"""
 
+import io
+import os
+import sys
+import mmap
+import stat
+import shutil
+import hashlib
+
+# 缓冲区大小（读取/复制的回退路径），按 mmap 分配粒度对齐
+ALIGNMENT = mmap.ALLOCATIONGRANULARITY
+COPY_BUFFER_SIZE = 8 * 1024 * 1024
+HASH_BUFFER_SIZE = 8 * 1024 * 1024
+# 每次映射的窗口大小，映射完即释放，避免整个文件计入进程内存
+MMAP_WINDOW_SIZE = 16 * 1024 * 1024
+# 小于该大小的文件直接读取，mmap 的建立开销不划算
+MMAP_MIN_SIZE = 1024 * 1024
+
+# Linux FICLONE ioctl（btrfs/XFS 等支持写时复制的文件系统）
+_FICLONE = 0x40049409
+
+
+def _align(size):
+    """向上对齐到分配粒度"""
+    return max(ALIGNMENT, (size + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT)
+
+
+def _try_reflink(src_fd, dst_fd):
+    """尝试写时复制克隆，成功返回 True"""
+    if not sys.platform.startswith('linux'):
+        return False
+    try:
+        import fcntl
+        fcntl.ioctl(dst_fd, _FICLONE, src_fd)
+        return True
+    except (ImportError, OSError):
+        return False
+
+
+def _copy_fd_range(src_fd, dst_fd, length):
+    """
+    在两个文件描述符之间复制 length 字节（从各自当前偏移开始）
+
+    Returns:
+        int: 实际复制的字节数；不支持零拷贝时返回 None
+    """
+    copied = 0
+    # copy_file_range：同一文件系统内可由内核甚至存储设备完成
+    if hasattr(os, 'copy_file_range'):
+        try:
+            while copied < length:
+                n = os.copy_file_range(src_fd, dst_fd, min(length - copied, 1 << 30))
+                if n == 0:
+                    break
+                copied += n
+            return copied
+        except OSError:
+            if copied:
+                raise
+    # sendfile：Linux 2.6.33 起支持普通文件作为目标
+    if hasattr(os, 'sendfile') and sys.platform.startswith('linux'):
+        try:
+            offset = os.lseek(src_fd, 0, os.SEEK_CUR)
+            while copied < length:
+                n = os.sendfile(dst_fd, src_fd, offset + copied, min(length - copied, 1 << 30))
+                if n == 0:
+                    break
+                copied += n
+            os.lseek(src_fd, offset + copied, os.SEEK_SET)
+            return copied
+        except OSError:
+            if copied:
+                raise
+    return None
+
+
+def _copy_buffered(fsrc, fdst, buffer_size=COPY_BUFFER_SIZE):
+    """用一个复用的大缓冲区复制，返回字节数"""
+    buffer = bytearray(_align(buffer_size))
+    view = memoryview(buffer)
+    copied = 0
+    readinto = getattr(fsrc, 'readinto', None)
+    while True:
+        if readinto is not None:
+            n = readinto(view)
+            if not n:
+                break
+            fdst.write(view[:n])
+        else:
+            chunk = fsrc.read(len(buffer))
+            if not chunk:
+                break
+            n = len(chunk)
+            fdst.write(chunk)
+        copied += n
+    return copied
+
+
+def copy_file(src, dst, preserve_metadata=True):
+    """
+    复制文件（替代 shutil.copy2）
+
+    依次尝试 reflink、copy_file_range、sendfile，都不支持时回退到大缓冲区复制。
+
+    Args:
+        src: 源文件路径
+        dst: 目标文件路径或目录
+        preserve_metadata: 是否复制修改时间、权限等元数据
+
+    Returns:
+        str: 目标文件路径
+    """
+    if os.path.isdir(dst):
+        dst = os.path.join(dst, os.path.basename(src))
+    if os.path.exists(dst) and os.path.samefile(src, dst):
+        raise shutil.SameFileError(f"{src} 和 {dst} 是同一个文件")
+
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        src_fd, dst_fd = fsrc.fileno(), fdst.fileno()
+        size = os.fstat(src_fd).st_size
+        if not _try_reflink(src_fd, dst_fd):
+            copied = _copy_fd_range(src_fd, dst_fd, size) if size else 0
+            if copied is None:
+                _copy_buffered(fsrc, fdst)
+            elif copied < size:
+                # 复制过程中文件被截断等情况：剩余部分用普通读写完成
+                _copy_buffered(fsrc, fdst)
+
+    if preserve_metadata:
+        shutil.copystat(src, dst)
+    return dst
+
+
+def copy_stream(fsrc, fdst, buffer_size=COPY_BUFFER_SIZE):
+    """
+    复制文件对象（替代 shutil.copyfileobj）
+
+    两端都是磁盘文件时走零拷贝路径（如已落盘的上传临时文件），否则用复用的大缓冲区。
+
+    Returns:
+        int: 复制的字节数
+    """
+    src_fd = dst_fd = None
+    # 仍在内存中的 SpooledTemporaryFile 调用 fileno() 会先写盘，直接走缓冲复制
+    if getattr(fsrc, '_rolled', True):
+        try:
+            src_fd, dst_fd = fsrc.fileno(), fdst.fileno()
+            if not (stat.S_ISREG(os.fstat(src_fd).st_mode) and stat.S_ISREG(os.fstat(dst_fd).st_mode)):
+                src_fd = dst_fd = None
+        except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+            src_fd = dst_fd = None
+
+    if src_fd is not None:
+        fdst.flush()
+        position = fsrc.tell()
+        # Python 层的读缓冲可能已越过 tell() 位置，先把内核偏移对齐
+        os.lseek(src_fd, position, os.SEEK_SET)
+        remaining = os.fstat(src_fd).st_size - position
+        if remaining <= 0:
+            return 0
+        copied = _copy_fd_range(src_fd, dst_fd, remaining)
+        if copied is not None:
+            fsrc.seek(position + copied)
+            fdst.seek(0, os.SEEK_END)
+            return copied
+    return _copy_buffered(fsrc, fdst, buffer_size)
+
+
+def copy_and_hash(src, dst, algorithm='blake2b', preserve_metadata=True, buffer_size=COPY_BUFFER_SIZE):
+    """
+    复制文件的同时计算目标内容的哈希（只读一遍源文件）
+
+    大文件按窗口映射源文件，同一段映射既写入目标又送入哈希，内存占用与窗口大小相当。
+
+    Returns:
+        tuple: (目标路径, 字节数, 十六进制摘要)
+    """
+    if os.path.isdir(dst):
+        dst = os.path.join(dst, os.path.basename(src))
+    if os.path.exists(dst) and os.path.samefile(src, dst):
+        raise shutil.SameFileError(f"{src} 和 {dst} 是同一个文件")
+
+    digest = hashlib.new(algorithm)
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        size = os.fstat(fsrc.fileno()).st_size
+        if size < MMAP_MIN_SIZE:
+            data = fsrc.read()
+            fdst.write(data)
+            digest.update(data)
+        else:
+            for view in _mapped_windows(fsrc, size, buffer_size):
+                fdst.write(view)
+                digest.update(view)
+
+    if preserve_metadata:
+        shutil.copystat(src, dst)
+    return dst, size, digest.hexdigest()
+
+
+def copy_stream_hashed(fsrc, fdst, algorithm='blake2b', buffer_size=COPY_BUFFER_SIZE):
+    """
+    复制文件对象的同时计算哈希（如保存上传文件）
+
+    Returns:
+        tuple: (字节数, 十六进制摘要)
+    """
+    digest = hashlib.new(algorithm)
+    buffer = bytearray(_align(buffer_size))
+    view = memoryview(buffer)
+    copied = 0
+    readinto = getattr(fsrc, 'readinto', None)
+    while True:
+        if readinto is not None:
+            n = readinto(view)
+            if not n:
+                break
+            chunk = view[:n]
+        else:
+            chunk = fsrc.read(len(buffer))
+            n = len(chunk)
+            if not n:
+                break
+        fdst.write(chunk)
+        digest.update(chunk)
+        copied += n
+    return copied, digest.hexdigest()
+
+
+def _mapped_windows(f, size, buffer_size=HASH_BUFFER_SIZE):
+    """按窗口映射文件，依次产出每段的 memoryview（产出后即失效）"""
+    buffer_size = _align(buffer_size)
+    window = max(_align(MMAP_WINDOW_SIZE), buffer_size)
+    offset = 0
+    while offset < size:
+        length = min(window, size - offset)
+        with mmap.mmap(f.fileno(), length, access=mmap.ACCESS_READ, offset=offset) as mapped:
+            if hasattr(mapped, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+                mapped.madvise(mmap.MADV_SEQUENTIAL)
+            view = memoryview(mapped)
+            try:
+                for start in range(0, length, buffer_size):
+                    part = view[start:start + buffer_size]
+                    try:
+                        yield part
+                    finally:
+                        part.release()
+            finally:
+                view.release()
+        offset += length
+
+
+def hash_file(path, algorithm='sha256', buffer_size=HASH_BUFFER_SIZE):
+    """
+    流式计算文件哈希
+
+    大文件按窗口映射（mmap），哈希直接读取页缓存，不复制到 Python 缓冲区；
+    每个窗口处理完即解除映射，进程内存不随文件大小增长。
+
+    Returns:
+        str: 十六进制摘要
+    """
+    digest = hashlib.new(algorithm)
+    buffer_size = _align(buffer_size)
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < MMAP_MIN_SIZE:
+            for chunk in iter(lambda: f.read(buffer_size), b''):
+                digest.update(chunk)
+            return digest.hexdigest()
+
+        for view in _mapped_windows(f, size, buffer_size):
+            digest.update(view)
+    return digest.hexdigest()
+
+
+def sha256_file(path, buffer_size=HASH_BUFFER_SIZE):
+    """文件内容的 SHA-256"""
+    return hash_file(path, 'sha256', buffer_size)
@@ -0,0 +1,224 @@
+# utils/ignore_matcher.py
+"""
+忽略规则匹配
+兼容 .gitignore 语法（*、?、[...]、**、! 取反、/ 结尾只匹配目录、含 / 的规则相对所在目录），
+规则在加载时编译为正则；没有取反规则时合并为一个正则，一次匹配即可得出结果。
+walk() 遍历目录时先剪掉被忽略的目录，被忽略的文件不会 stat。
+"""
+
+import os
+import re
+
+GITIGNORE_NAME = '.gitignore'
+
+
+def _translate(glob):
+    """把 gitignore 的通配符（不含前后 /）转换为正则"""
+    parts = []
+    i = 0
+    n = len(glob)
+    while i < n:
+        c = glob[i]
+        if c == '*':
+            if glob.startswith('**', i):
+                # "**/" 匹配零个或多个目录，"/**" 匹配其中的全部内容
+                at_start = i == 0 or glob[i - 1] == '/'
+                if at_start and glob.startswith('**/', i):
+                    parts.append('(?:.*/)?')
+                    i += 3
+                    continue
+                if at_start and i + 2 == n:
+                    parts.append('.*')
+                    i += 2
+                    continue
+                parts.append('[^/]*')
+                i += 2
+                continue
+            parts.append('[^/]*')
+        elif c == '?':
+            parts.append('[^/]')
+        elif c == '[':
+            j = glob.find(']', i + 2 if glob.startswith('[!', i) or glob.startswith('[^', i) else i + 1)
+            if j == -1:
+                parts.append(re.escape(c))
+            else:
+                body = glob[i + 1:j]
+                if body[:1] in ('!', '^'):
+                    body = '^' + body[1:]
+                parts.append(f"[{body.replace(chr(92), chr(92) * 2)}]")
+                i = j
+        elif c == '\\' and i + 1 < n:
+            i += 1
+            parts.append(re.escape(glob[i]))
+        else:
+            parts.append(re.escape(c))
+        i += 1
+    return ''.join(parts)
+
+
+class _Rule:
+    """一条编译后的规则"""
+
+    __slots__ = ('pattern', 'negate', 'dir_only', 'regex')
+
+    def __init__(self, pattern, negate, dir_only, regex):
+        self.pattern = pattern
+        self.negate = negate
+        self.dir_only = dir_only
+        self.regex = regex
+
+
+def compile_rule(line, base=''):
+    """
+    编译一行 gitignore 规则
+
+    Args:
+        line: 规则文本
+        base: 规则所在目录（相对根目录，posix 路径，根目录为 ''）
+
+    Returns:
+        _Rule: 空行和注释返回 None
+    """
+    pattern = line.rstrip('\n\r')
+    if not pattern.endswith('\\ '):
+        pattern = pattern.rstrip(' ')
+    if not pattern or pattern.startswith('#'):
+        return None
+
+    negate = pattern.startswith('!')
+    if negate:
+        pattern = pattern[1:]
+    elif pattern.startswith('\\'):
+        pattern = pattern[1:]
+
+    dir_only = pattern.endswith('/')
+    glob = pattern.rstrip('/')
+    if not glob:
+        return None
+
+    # 含 / 的规则相对所在目录，否则匹配任意层级的名称
+    anchored = '/' in glob
+    glob = glob.lstrip('/')
+    prefix = re.escape(base + '/') if base else ''
+    if anchored:
+        regex = f"{prefix}{_translate(glob)}"
+    else:
+        regex = f"{prefix}(?:.*/)?{_translate(glob)}"
+    return _Rule(line.strip(), negate, dir_only, regex)
+
+
+class IgnoreMatcher:
+    """
+    忽略规则集合
+
+    Args:
+        patterns: 根目录的规则列表（gitignore 语法）
+    """
+
+    def __init__(self, patterns=()):
+        self._rules = []
+        self._compiled = None
+        self.add(patterns)
+
+    def add(self, patterns, base=''):
+        """添加规则（base 为规则所在目录，相对根目录）"""
+        for line in patterns:
+            rule = compile_rule(line, base)
+            if rule is not None:
+                self._rules.append(rule)
+        self._compiled = None
+
+    def add_file(self, path, base=''):
+        """读取 .gitignore 文件"""
+        try:
+            with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+                self.add(f.read().splitlines(), base)
+            return True
+        except OSError:
+            return False
+
+    def _compile(self):
+        """
+        编译匹配器
+
+        没有取反规则时文件和目录各合并为一个正则；有取反规则时按倒序逐条匹配（最后匹配的规则生效）
+        """
+        has_negation = any(rule.negate for rule in self._rules)
+        if has_negation:
+            rules = [(re.compile(rule.regex + r'\Z'), rule.negate, rule.dir_only) for rule in reversed(self._rules)]
+            self._compiled = ('rules', rules)
+        else:
+            def combined(rules):
+                return re.compile('(?:' + '|'.join(rule.regex for rule in rules) + r')\Z') if rules else None
+            self._compiled = ('combined',
+                              combined([rule for rule in self._rules if not rule.dir_only]),
+                              combined(self._rules))
+        return self._compiled
+
+    def match(self, rel_path, is_dir=False):
+        """
+        路径本身是否被规则忽略（不检查上级目录）
+
+        Args:
+            rel_path: 相对根目录的 posix 路径
+            is_dir: 是否为目录
+        """
+        compiled = self._compiled or self._compile()
+        if compiled[0] == 'combined':
+            regex = compiled[2] if is_dir else compiled[1]
+            return bool(regex and regex.match(rel_path))
+        for regex, negate, dir_only in compiled[1]:
+            if dir_only and not is_dir:
+                continue
+            if regex.match(rel_path):
+                return not negate
+        return False
+
+    def is_ignored(self, rel_path, is_dir=False):
+        """路径或其任一上级目录是否被忽略（目录被忽略后其中的文件不能再被取反规则包含）"""
+        rel_path = rel_path.replace(os.sep, '/').strip('/')
+        parts = rel_path.split('/')
+        for i in range(1, len(parts)):
+            if self.match('/'.join(parts[:i]), is_dir=True):
+                return True
+        return self.match(rel_path, is_dir)
+
+    def walk(self, root, read_gitignore=True):
+        """
+        遍历目录，跳过被忽略的目录和文件
+
+        Args:
+            root: 根目录
+            read_gitignore: 是否读取各目录中的 .gitignore
+
+        Yields:
+            tuple: (相对目录, 目录中未被忽略的 os.DirEntry 文件列表)，按名称排序
+        """
+        stack = ['']
+        while stack:
+            rel_dir = stack.pop()
+            path = os.path.join(root, rel_dir) if rel_dir else root
+            try:
+                with os.scandir(path) as it:
+                    entries = sorted(it, key=lambda entry: entry.name)
+            except OSError:
+                continue
+
+            if read_gitignore and any(entry.name == GITIGNORE_NAME for entry in entries):
+                self.add_file(os.path.join(path, GITIGNORE_NAME), rel_dir)
+
+            files = []
+            subdirs = []
+            for entry in entries:
+                rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                # DirEntry.is_dir 使用目录项中的类型信息，通常不需要 stat
+                is_dir = entry.is_dir(follow_symlinks=False)
+                if self.match(rel_path, is_dir):
+                    continue
+                if is_dir:
+                    subdirs.append(rel_path)
+                else:
+                    files.append(entry)
+
+            yield rel_dir, files
+            stack.extend(reversed(subdirs))
@@ -0,0 +1,69 @@
+# utils/lazy_import.py
+"""
+延迟导入工具
+重量级第三方库（matplotlib、pandas、PIL）在第一次访问属性时才真正导入，
+缩短程序启动到登录界面的时间。
+"""
+
+import importlib
+import importlib.util
+import threading
+import time
+import types
+
+# 实际导入耗时记录 {模块名: 毫秒}
+IMPORT_TIMES = {}
+
+_import_lock = threading.Lock()
+
+
+class LazyModule(types.ModuleType):
+    """模块代理，首次访问属性时导入真实模块"""
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__['_lazy_name'] = name
+        self.__dict__['_lazy_module'] = None
+
+    def _load(self):
+        module = self.__dict__['_lazy_module']
+        if module is None:
+            with _import_lock:
+                module = self.__dict__['_lazy_module']
+                if module is None:
+                    name = self.__dict__['_lazy_name']
+                    start = time.perf_counter()
+                    module = importlib.import_module(name)
+                    IMPORT_TIMES[name] = (time.perf_counter() - start) * 1000
+                    self.__dict__['_lazy_module'] = module
+        return module
+
+    @property
+    def is_loaded(self):
+        return self.__dict__['_lazy_module'] is not None
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "已加载" if self.is_loaded else "未加载"
+        return f"<LazyModule {self.__dict__['_lazy_name']} ({state})>"
+
+
+def lazy_import(name):
+    """返回延迟导入的模块代理"""
+    return LazyModule(name)
+
+
+def is_available(name):
+    """检查模块是否已安装（不执行导入）"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
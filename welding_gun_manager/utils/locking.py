@@ -1 +1,54 @@
+# utils/locking.py
+"""
+跨进程文件锁
+API 以多个工作进程运行时，校验清单等共享 JSON 文件的"读取-修改-写回"需要在进程之间互斥。
+Windows 使用 msvcrt.locking，其他系统使用 fcntl.flock；锁文件为 <路径>.lock。
+"""
 
+import os
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+
+@contextmanager
+def file_lock(path, timeout=30.0, poll_interval=0.05):
+    """
+    对 path 加独占锁（锁文件 path + '.lock'）
+
+    Args:
+        path: 要保护的文件路径
+        timeout: 等待锁的最长秒数，超时抛出 TimeoutError
+        poll_interval: 锁被占用时重试的间隔秒数
+    """
+    lock_path = path + '.lock'
+    fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        # 非阻塞加锁并轮询（msvcrt 的阻塞模式只重试 10 次，且两种实现都需要超时）
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                else:
+                    msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                break
+            except OSError:
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(f"等待文件锁超时: {lock_path}")
+                time.sleep(poll_interval)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    finally:
+        os.close(fd)
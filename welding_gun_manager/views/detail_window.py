@@ -12,12 +12,18 @@ class DetailWindow:
     """
     用于添加或编辑焊枪详情的窗口。
     """
-    def __init__(self, window, controller, gun_data, mode='add', presets=None):
+    def __init__(self, window, controller, gun_data, mode='add', presets=None, thumbnails=None):
         self.window = window
         self.controller = controller
         self.gun_data = gun_data # 这是一个 WeldingGun 对象或空对象
         self.mode = mode # 'add' or 'edit'
+        # 预设选项字典；也可以传入 PresetController，按当前焊枪类型取详情窗口的选项
+        if presets is not None and hasattr(presets, 'get_detail_options'):
+            presets = presets.get_detail_options(getattr(gun_data, 'gun_type', None))
         self.presets = presets or {} # 预设选项字典
+        # 可选的 ThumbnailService：图片字段旁显示缓存的小缩略图，不在界面线程加载原图
+        self.thumbnails = thumbnails
+        self._thumbnail_task = None
 
         # UI 控件的变量
         self.vars = {}
@@ -126,6 +132,12 @@ class DetailWindow:
 
         file_frame.columnconfigure(1, weight=1) # 使路径显示 Entry 伸缩
 
+        # 图片缩略图预览
+        self.image_preview = ttk.Label(file_frame, text="")
+        self.image_preview.grid(row=0, column=3, rowspan=len(file_fields), sticky=tk.NE, padx=(10, 0))
+        if self.thumbnails is not None:
+            self.file_vars['image_path'].trace_add('write', lambda *args: self.load_image_preview())
+
         # --- 备注区域 ---
         notes_frame = ttk.LabelFrame(main_frame, text="备注", padding="10")
         notes_frame.pack(fill=tk.BOTH, expand=True, pady=(0, 10))
@@ -162,6 +174,39 @@ class DetailWindow:
         self.notes_text.delete(1.0, tk.END) # 清空
         self.notes_text.insert(1.0, getattr(self.gun_data, 'notes', ""))
 
+    def load_image_preview(self):
+        """在后台获取图片字段的缩略图，就绪后显示"""
+        from services.thumbnail_service import is_image_file
+
+        if self._thumbnail_task is not None:
+            self.thumbnails.scheduler.cancel(self._thumbnail_task)
+            self._thumbnail_task = None
+        self.image_preview.image = None
+        path = self.file_vars['image_path'].get()
+        if not path or not is_image_file(path) or not Path(path).is_file():
+            self.image_preview.config(image='', text="")
+            return
+
+        def on_ready(thumb_path):
+            # 窗口已关闭或已换成其它图片
+            if not self.image_preview.winfo_exists() or self.file_vars['image_path'].get() != path:
+                return
+            if not thumb_path:
+                self.image_preview.config(image='', text="无法预览")
+                return
+            from PIL import Image, ImageTk
+            with Image.open(thumb_path) as image:
+                self.image_preview.image = ImageTk.PhotoImage(image)
+            self.image_preview.config(image=self.image_preview.image, text="")
+
+        def on_error(e):
+            if self.image_preview.winfo_exists():
+                self.image_preview.config(image='', text="加载失败")
+            print(f"缩略图加载失败: {e}")
+
+        self.image_preview.config(image='', text="加载中...")
+        self._thumbnail_task = self.thumbnails.request(path, 'small', callback=on_ready, error_callback=on_error)
+
     def browse_file(self, field_name, extensions):
         """打开文件浏览器，让用户选择文件，并更新对应变量。"""
         file_path = filedialog.askopenfilename(
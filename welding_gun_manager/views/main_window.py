@@ -20,6 +20,15 @@ from services.preset_service import PresetService
 from models.database import Database
 from models.entities import WeldingGun
 from views.login_dialog import LoginDialog
+from views.tree_reconciler import TreeReconciler
+from services.permission_service import Permission, MENU_PERMISSIONS
+
+# 工枪列表按钮 -> 所需权限
+BUTTON_PERMISSIONS = {
+    '添加': Permission.ADD_GUN,
+    '编辑': Permission.EDIT_GUN,
+    '删除': Permission.DELETE_GUN,
+}
 
 
 class MainWindow:
@@ -97,7 +106,7 @@ class MainWindow:
     
     def update_ui_by_permission(self):
         """根据权限更新界面状态"""
-        is_admin = self.user_controller.is_admin()
+        allowed = self.user_controller.has_permission
         
         # 更新菜单项状态
         menubar = self.root.children['!menu']
@@ -107,15 +116,15 @@ class MainWindow:
         for item in ['添加工枪', '编辑工枪', '删除工枪']:
             index = edit_menu.index(item)
             if index >= 0:
-                edit_menu.entryconfig(index, state='normal' if is_admin else 'disabled')
+                edit_menu.entryconfig(index, state='normal' if allowed(MENU_PERMISSIONS[item]) else 'disabled')
         
         # 更新按钮状态
         for child in self.gun_frame.winfo_children():
             if isinstance(child, ttk.Frame):
                 for btn in child.winfo_children():
                     if isinstance(btn, ttk.Button):
-                        if btn['text'] in ['添加', '编辑', '删除']:
-                            btn.config(state='normal' if is_admin else 'disabled')
+                        if btn['text'] in BUTTON_PERMISSIONS:
+                            btn.config(state='normal' if allowed(BUTTON_PERMISSIONS[btn['text']]) else 'disabled')
     
     def setup_menu(self):
         """创建菜单栏"""
@@ -176,7 +185,7 @@ class MainWindow:
         user_frame.pack(fill=tk.X, padx=5, pady=10)
         
         current_user = self.user_controller.get_current_user()
-        role_text = "管理员" if current_user.is_admin() else "普通用户"
+        role_text = "管理员" if self.user_controller.is_admin() else "普通用户"
         
         ttk.Label(user_frame, text=f"用户: {current_user.username}", 
                  font=("Arial", 10, "bold")).pack(anchor=tk.W)
@@ -264,6 +273,9 @@ class MainWindow:
         self.gun_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
+        # 按工枪ID增量刷新，保留选中项和滚动位置
+        self.gun_reconciler = TreeReconciler(self.gun_tree, key_index=0)
+        
         # 绑定选择事件
         self.gun_tree.bind('<<TreeviewSelect>>', self.on_gun_select)
         
@@ -299,7 +311,7 @@ class MainWindow:
         self.statusbar.pack(side=tk.BOTTOM, fill=tk.X)
         
         current_user = self.user_controller.get_current_user()
-        role_text = "管理员" if current_user.is_admin() else "普通用户"
+        role_text = "管理员" if self.user_controller.is_admin() else "普通用户"
         
         self.status_label = ttk.Label(self.statusbar, 
                                      text=f"当前用户: {current_user.username} ({role_text})")
@@ -333,7 +345,7 @@ class MainWindow:
             
             # 更新状态栏
             current_user = self.user_controller.get_current_user()
-            role_text = "管理员" if current_user.is_admin() else "普通用户"
+            role_text = "管理员" if self.user_controller.is_admin() else "普通用户"
             self.status_label.config(text=f"当前用户: {current_user.username} ({role_text})")
             
             # 刷新数据
@@ -359,14 +371,11 @@ class MainWindow:
     def refresh_guns(self):
         """刷新工枪列表"""
         try:
-            # 清空现有数据
-            for item in self.gun_tree.get_children():
-                self.gun_tree.delete(item)
-            
             # 从数据库加载数据
             guns = self.gun_controller.get_all_guns()
             
-            # 添加到Treeview
+            # 只更新变化的行
+            rows = []
             for gun in guns:
                 created_at = gun.get('created_at')
                 notes = gun.get('notes', '')
@@ -379,7 +388,7 @@ class MainWindow:
                     else:
                         time_str = str(created_at)[:10]
                 
-                self.gun_tree.insert('', 'end', values=(
+                rows.append((
                     gun.get('id'),
                     gun.get('model'),
                     gun.get('brand'),
@@ -387,6 +396,7 @@ class MainWindow:
                     time_str,
                     notes[:50] + "..." if len(notes) > 50 else notes
                 ))
+            self.gun_reconciler.reconcile(rows)
             
             self.root.title(f"焊接枪管理系统 - 当前用户: {self.user_controller.get_current_user().username}")
             
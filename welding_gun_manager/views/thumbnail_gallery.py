@@ -0,0 +1,151 @@
+# views/thumbnail_gallery.py
+"""
+缩略图浏览窗口
+先按文件数量排好占位格子，缩略图在后台线程从磁盘缓存读取（没有时生成）后逐个填入；
+点击缩略图打开大图预览，同样使用缓存的大尺寸缩略图而不是原始文件。
+"""
+
+import os
+import tkinter as tk
+from tkinter import ttk
+
+
+class ThumbnailGallery(tk.Toplevel):
+    """
+    图片缩略图网格
+
+    Args:
+        parent: 父窗口
+        title: 窗口标题
+        files: (文件类型, 文件路径) 列表
+        thumbnails: ThumbnailService
+    """
+
+    TILE_SIZE = 'small'
+    PREVIEW_SIZE = 'large'
+    TYPE_NAMES = {'image': '图片', '2d': '图纸', 'signature': '会签图'}
+
+    def __init__(self, parent, title, files, thumbnails, columns=5):
+        super().__init__(parent)
+        self.title(title)
+        self.geometry("800x600")
+        self.thumbnails = thumbnails
+        self.files = files
+        self.columns = columns
+
+        # 保留 PhotoImage 引用，否则图片会被回收
+        self._photos = {}
+        self._tasks = []
+        self._preview_photo = None
+
+        self.setup_ui()
+        self.protocol("WM_DELETE_WINDOW", self.close)
+        self.load_thumbnails()
+
+    def setup_ui(self):
+        """创建滚动的网格区域"""
+        tk.Label(self, text=f"共 {len(self.files)} 个文件，点击查看大图",
+                 font=("微软雅黑", 10), fg="#7f8c8d").pack(anchor=tk.W, padx=10, pady=5)
+
+        container = tk.Frame(self)
+        container.pack(fill=tk.BOTH, expand=True)
+
+        self.canvas = tk.Canvas(container, bg="white", highlightthickness=0)
+        scrollbar = ttk.Scrollbar(container, orient=tk.VERTICAL, command=self.canvas.yview)
+        self.canvas.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self.grid_frame = tk.Frame(self.canvas, bg="white")
+        self.canvas.create_window((0, 0), window=self.grid_frame, anchor=tk.NW)
+        self.grid_frame.bind('<Configure>',
+                             lambda e: self.canvas.configure(scrollregion=self.canvas.bbox('all')))
+        # 滚轮只在指针位于本窗口内时接管（Windows 把滚轮事件发给焦点控件，只能 bind_all），
+        # 离开窗口即解除，不影响主窗口等其它窗口的滚动
+        self.bind('<Enter>', self._bind_mousewheel)
+        self.bind('<Leave>', self._unbind_mousewheel)
+
+        self.tiles = []
+        edge = self.thumbnails.sizes[self.TILE_SIZE]
+        for index, (file_type, path) in enumerate(self.files):
+            tile = tk.Frame(self.grid_frame, bg="white", padx=5, pady=5)
+            tile.grid(row=index // self.columns, column=index % self.columns, sticky=tk.N)
+
+            image_label = tk.Label(tile, text="加载中...", bg="#ecf0f1", fg="#95a5a6",
+                                   width=edge // 8, height=edge // 16, cursor="hand2")
+            image_label.pack()
+            image_label.bind('<Button-1>', lambda e, p=path: self.show_preview(p))
+
+            caption = f"[{self.TYPE_NAMES.get(file_type, file_type)}] {os.path.basename(path)}"
+            tk.Label(tile, text=caption[:24], bg="white", font=("微软雅黑", 8)).pack()
+            self.tiles.append(image_label)
+
+    def load_thumbnails(self):
+        """按显示顺序在后台请求缩略图"""
+        for index, (_, path) in enumerate(self.files):
+            task = self.thumbnails.request(
+                path, self.TILE_SIZE,
+                callback=lambda thumb, i=index: self.show_tile(i, thumb),
+                error_callback=lambda e, i=index: self.show_tile_error(i, e)
+            )
+            self._tasks.append(task)
+
+    def show_tile(self, index, thumb_path):
+        """缩略图就绪（界面线程）"""
+        if not self.winfo_exists():
+            return
+        label = self.tiles[index]
+        if not thumb_path:
+            label.config(text="无法预览")
+            return
+        from PIL import Image, ImageTk
+        with Image.open(thumb_path) as image:
+            photo = ImageTk.PhotoImage(image)
+        self._photos[index] = photo
+        label.config(image=photo, text="", width=0, height=0, bg="white")
+
+    def show_tile_error(self, index, error):
+        if self.winfo_exists():
+            self.tiles[index].config(text="加载失败")
+            print(f"缩略图加载失败: {error}")
+
+    def show_preview(self, path):
+        """打开大图预览"""
+        window = tk.Toplevel(self)
+        window.title(os.path.basename(path))
+        label = tk.Label(window, text="加载中...", bg="white", padx=10, pady=10)
+        label.pack(fill=tk.BOTH, expand=True)
+
+        def on_ready(thumb_path):
+            if not label.winfo_exists():
+                return
+            if not thumb_path:
+                label.config(text="无法预览")
+                return
+            from PIL import Image, ImageTk
+            with Image.open(thumb_path) as image:
+                label.image = ImageTk.PhotoImage(image)
+            label.config(image=label.image, text="")
+
+        self.thumbnails.request(
+            path, self.PREVIEW_SIZE, callback=on_ready,
+            error_callback=lambda e: label.winfo_exists() and label.config(text=f"加载失败: {e}")
+        )
+
+    def _bind_mousewheel(self, event=None):
+        self.canvas.bind_all('<MouseWheel>', self._on_mousewheel)
+
+    def _unbind_mousewheel(self, event=None):
+        self.canvas.unbind_all('<MouseWheel>')
+
+    def _on_mousewheel(self, event):
+        if self.winfo_exists():
+            self.canvas.yview_scroll(int(-event.delta / 120) or (-1 if event.delta > 0 else 1), 'units')
+
+    def close(self):
+        """关闭窗口并取消未完成的缩略图任务"""
+        for task in self._tasks:
+            self.thumbnails.scheduler.cancel(task)
+        self._tasks.clear()
+        self._unbind_mousewheel()
+        self.destroy()
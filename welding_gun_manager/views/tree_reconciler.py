@@ -0,0 +1,145 @@
+# views/tree_reconciler.py
+"""
+Treeview 增量刷新
+以行的唯一键（如工枪ID）作为条目 iid，把新结果集与当前条目比较，
+只插入、更新、删除、移动变化的行，选中状态和滚动位置得以保留。
+"""
+
+from bisect import bisect_left
+
+
+def _stable_items(order, position):
+    """
+    最长递增子序列：order 中保持相对顺序不变、不需要移动的条目
+
+    Args:
+        order: 新顺序中已存在的 iid 列表
+        position: {iid: 当前位置}
+    """
+    tails = []        # tails[k] 为长度 k+1 的子序列末尾位置
+    tail_index = []   # tails 对应的 order 下标
+    previous = [-1] * len(order)
+    for i, iid in enumerate(order):
+        pos = position[iid]
+        k = bisect_left(tails, pos)
+        if k == len(tails):
+            tails.append(pos)
+            tail_index.append(i)
+        else:
+            tails[k] = pos
+            tail_index[k] = i
+        previous[i] = tail_index[k - 1] if k > 0 else -1
+
+    stable = set()
+    i = tail_index[-1] if tail_index else -1
+    while i >= 0:
+        stable.add(order[i])
+        i = previous[i]
+    return stable
+
+
+class TreeReconciler:
+    """
+    Treeview 增量刷新器
+
+    用法:
+        reconciler = TreeReconciler(tree, key_index=0)
+        reconciler.reconcile(rows)   # rows 为值元组列表，顺序即显示顺序
+
+    只通过 reconcile 修改的 Treeview 才能保证缓存一致；
+    需要整表重建时调用 clear()。
+    """
+
+    # 需要移动的行超过该比例时，直接按新顺序整体重排
+    REORDER_RATIO = 0.25
+
+    def __init__(self, tree, key_index=0):
+        self.tree = tree
+        self.key_index = key_index
+        # 已写入 Treeview 的值 {iid: 值元组}，避免逐行读取 Treeview 比较
+        self._values = {}
+
+    def reconcile(self, rows):
+        """
+        把 Treeview 更新为 rows
+
+        Returns:
+            dict: inserted / updated / deleted / moved 行数
+        """
+        tree = self.tree
+        stats = {'inserted': 0, 'updated': 0, 'deleted': 0, 'moved': 0}
+
+        new_order = []
+        new_values = {}
+        for row in rows:
+            values = tuple(row)
+            iid = str(values[self.key_index])
+            if iid in new_values:
+                # 重复键只保留第一行
+                continue
+            new_order.append(iid)
+            new_values[iid] = values
+
+        # 删除：一次调用删除所有消失的行
+        removed = [iid for iid in self._values if iid not in new_values]
+        if removed:
+            tree.delete(*removed)
+            for iid in removed:
+                del self._values[iid]
+            stats['deleted'] = len(removed)
+
+        # 更新：只改写值有变化的行
+        for iid, values in new_values.items():
+            old = self._values.get(iid)
+            if old is not None and old != values:
+                tree.item(iid, values=values)
+                self._values[iid] = values
+                stats['updated'] += 1
+
+        # 插入与排序：顺序一致的行不做任何操作
+        current_order = list(tree.get_children(''))
+        if current_order == new_order:
+            return stats
+
+        position = {iid: index for index, iid in enumerate(current_order)}
+        existing = [iid for iid in new_order if iid in position]
+        stable = _stable_items(existing, position)
+
+        if len(existing) - len(stable) > len(new_order) * self.REORDER_RATIO:
+            # 大范围重排（如改变排序）：按新顺序依次移到末尾，每行一次调用
+            for iid in new_order:
+                if iid in self._values:
+                    tree.move(iid, '', 'end')
+                    stats['moved'] += 1
+                else:
+                    tree.insert('', 'end', iid=iid, values=new_values[iid])
+                    self._values[iid] = new_values[iid]
+                    stats['inserted'] += 1
+            return stats
+
+        # 少量变化：稳定行不动，其余行逐个放到新顺序中前一行的后面
+        previous = None
+        for iid in new_order:
+            if iid not in stable:
+                # 先摘下再计算位置，避免自身位置影响目标下标
+                moving = iid in self._values
+                if moving:
+                    tree.detach(iid)
+                index = tree.index(previous) + 1 if previous is not None else 0
+                if moving:
+                    tree.move(iid, '', index)
+                    stats['moved'] += 1
+                else:
+                    tree.insert('', index, iid=iid, values=new_values[iid])
+                    self._values[iid] = new_values[iid]
+                    stats['inserted'] += 1
+            previous = iid
+
+        return stats
+
+    def clear(self):
+        """清空 Treeview 和缓存"""
+        children = self.tree.get_children('')
+        if children:
+            self.tree.delete(*children)
+        self._values.clear()
@@ -0,0 +1,253 @@
+# views/virtual_table.py
+"""
+虚拟表格
+Treeview 中只保留可见行数的条目，滚动时从数据源按需取行并改写这些条目的值，
+控件数量与数据总量无关；排序交给数据源（数据库 ORDER BY）完成。
+"""
+
+import tkinter as tk
+from tkinter import ttk
+
+
+class VirtualTable(ttk.Frame):
+    """
+    虚拟滚动表格
+
+    数据源由两个函数提供：
+        count_rows() -> int
+        fetch_rows(offset, limit, sort_column, descending) -> [tuple, ...]
+    每行元组的顺序与 columns 一致，key_index 指定唯一键（如工枪ID）所在的列，
+    用于在滚动和刷新后保持选中行。
+
+    self.tree 是内部的 Treeview，可以像普通 Treeview 一样绑定事件、读取选中项。
+    """
+
+    def __init__(self, parent, columns, count_rows, fetch_rows, key_index=0,
+                 buffer_rows=20, sort_column=None, descending=False, sort_command=None, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.columns = columns
+        self.count_rows = count_rows
+        self.fetch_rows = fetch_rows
+        self.key_index = key_index
+        self.buffer_rows = buffer_rows
+        self.sort_column = sort_column
+        self.descending = descending
+        # 排序变化时调用；未设置时直接按新排序重新取数
+        self.sort_command = sort_command
+
+        self.total = 0
+        self.offset = 0
+        self.visible_rows = 20
+        self.selected_key = None
+
+        # 缓存的行 {行号: 值元组}，只保存可见窗口加前后缓冲
+        self._cache = {}
+        # 已写入各槽位的值，重绘时只改写变化的槽位
+        self._slot_values = []
+        self._render_pending = None
+
+        self.tree = ttk.Treeview(self, columns=[c[0] for c in columns],
+                                 show='headings', selectmode='browse')
+        for col_id, heading, width in columns:
+            self.tree.heading(col_id, text=heading, command=lambda c=col_id: self.sort_by(c))
+            self.tree.column(col_id, width=width)
+        self._update_headings()
+
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.tree.bind('<Configure>', self._on_configure)
+        self.tree.bind('<MouseWheel>', self._on_mousewheel)
+        self.tree.bind('<Button-4>', lambda e: self._scroll_and_break(-3))
+        self.tree.bind('<Button-5>', lambda e: self._scroll_and_break(3))
+        self.tree.bind('<<TreeviewSelect>>', self._on_select, add='+')
+        self.tree.bind('<Up>', lambda e: self.move_selection(-1))
+        self.tree.bind('<Down>', lambda e: self.move_selection(1))
+        self.tree.bind('<Prior>', lambda e: self.move_selection(-self.visible_rows))
+        self.tree.bind('<Next>', lambda e: self.move_selection(self.visible_rows))
+        self.tree.bind('<Home>', lambda e: self.move_selection(-self.total))
+        self.tree.bind('<End>', lambda e: self.move_selection(self.total))
+
+    # ========== 数据 ==========
+    def reload(self, keep_position=False):
+        """重新统计总行数并刷新可见窗口（数据或过滤条件变化后调用）"""
+        self.total = self.count_rows()
+        self._cache.clear()
+        if not keep_position:
+            self.offset = 0
+        self._render()
+
+    def set_source(self, count_rows, fetch_rows, keep_position=False):
+        """更换数据源"""
+        self.count_rows = count_rows
+        self.fetch_rows = fetch_rows
+        if not keep_position:
+            self.selected_key = None
+        self.reload(keep_position)
+
+    def sort_by(self, column):
+        """按列排序，再次点击同一列切换升序/降序"""
+        if self.sort_column == column:
+            self.descending = not self.descending
+        else:
+            self.sort_column = column
+            self.descending = False
+        self._update_headings()
+        if self.sort_command:
+            self.sort_command(self.sort_column, self.descending)
+        else:
+            self.reload()
+
+    def get_selected_values(self):
+        """返回选中行的值元组，没有选中时返回 None"""
+        selection = self.tree.selection()
+        if not selection:
+            return None
+        return self._cache.get(self.offset + self.tree.index(selection[0]))
+
+    def _ensure_cached(self, start, end):
+        """确保 [start, end) 行已缓存，缺失时连同前后缓冲一次取回"""
+        if all(i in self._cache for i in range(start, end)):
+            return
+        block_start = max(0, start - self.buffer_rows)
+        limit = (end - start) + 2 * self.buffer_rows
+        rows = self.fetch_rows(block_start, limit, self.sort_column, self.descending)
+        self._cache = {block_start + i: tuple(row) for i, row in enumerate(rows)}
+
+    # ========== 绘制 ==========
+    def _render(self):
+        """把当前窗口的行写入 Treeview 的槽位条目"""
+        self._render_pending = None
+        self.offset = max(0, min(self.offset, self.total - self.visible_rows))
+        count = max(0, min(self.visible_rows, self.total - self.offset))
+        self._ensure_cached(self.offset, self.offset + count)
+
+        # 调整槽位数量（只在窗口大小或总行数变化时发生）
+        slots = self.tree.get_children()
+        for i in range(len(slots), count):
+            self.tree.insert('', tk.END, iid=f"slot{i}")
+            self._slot_values.append(None)
+        if len(slots) > count:
+            self.tree.delete(*slots[count:])
+            del self._slot_values[count:]
+
+        selected_slot = None
+        for i in range(count):
+            values = self._cache.get(self.offset + i, ())
+            if self._slot_values[i] != values:
+                self.tree.item(f"slot{i}", values=values)
+                self._slot_values[i] = values
+            if self.selected_key is not None and values and values[self.key_index] == self.selected_key:
+                selected_slot = f"slot{i}"
+
+        selection = self.tree.selection()
+        if selected_slot:
+            if selection != (selected_slot,):
+                self.tree.selection_set(selected_slot)
+        elif selection:
+            self.tree.selection_remove(*selection)
+
+        self.tree.yview_moveto(0)
+        self._update_scrollbar()
+
+    def _schedule_render(self):
+        """合并连续的滚动事件，空闲时只绘制一次"""
+        if self._render_pending is None:
+            self._render_pending = self.after_idle(self._render)
+
+    def _update_scrollbar(self):
+        if self.total <= 0:
+            self.scrollbar.set(0, 1)
+        else:
+            self.scrollbar.set(self.offset / self.total,
+                               min(1.0, (self.offset + self.visible_rows) / self.total))
+
+    def _update_headings(self):
+        for col_id, heading, _ in self.columns:
+            if col_id == self.sort_column:
+                heading = f"{heading} {'▼' if self.descending else '▲'}"
+            self.tree.heading(col_id, text=heading)
+
+    def _row_height(self):
+        try:
+            return int(ttk.Style(self).lookup('Treeview', 'rowheight')) or 20
+        except (tk.TclError, ValueError):
+            return 20
+
+    # ========== 滚动 ==========
+    def scroll_to(self, offset):
+        """滚动到指定行"""
+        offset = max(0, min(offset, self.total - self.visible_rows))
+        if offset != self.offset:
+            self.offset = offset
+            self._update_scrollbar()
+            self._schedule_render()
+
+    def scroll_rows(self, delta):
+        """按行滚动"""
+        self.scroll_to(self.offset + delta)
+
+    def _scroll_and_break(self, delta):
+        self.scroll_rows(delta)
+        return 'break'
+
+    def _on_scrollbar(self, action, *args):
+        if action == 'moveto':
+            self.scroll_to(int(float(args[0]) * self.total))
+        elif action == 'scroll':
+            amount, what = int(args[0]), args[1]
+            step = self.visible_rows if what == 'pages' else 1
+            self.scroll_rows(amount * step)
+
+    def _on_mousewheel(self, event):
+        # Windows 每格 120，macOS 为较小的整数
+        delta = event.delta // 120 if abs(event.delta) >= 120 else event.delta
+        return self._scroll_and_break(-delta * 3)
+
+    def _on_configure(self, event):
+        children = self.tree.get_children()
+        bbox = self.tree.bbox(children[0]) if children else ''
+        if bbox:
+            top, row_height = bbox[1], bbox[3]
+        else:
+            row_height = self._row_height()
+            top = row_height + 4
+        visible_rows = max(1, (event.height - top) // row_height)
+        if visible_rows != self.visible_rows:
+            self.visible_rows = visible_rows
+            self._schedule_render()
+
+    # ========== 选择 ==========
+    def _on_select(self, event=None):
+        values = self.get_selected_values()
+        if values:
+            self.selected_key = values[self.key_index]
+
+    def _selected_index(self):
+        """选中行的绝对行号；选中行不在窗口内时返回 None"""
+        selection = self.tree.selection()
+        if selection:
+            return self.offset + self.tree.index(selection[0])
+        return None
+
+    def move_selection(self, delta):
+        """键盘移动选中行，必要时滚动窗口"""
+        if self.total <= 0:
+            return 'break'
+        index = self._selected_index()
+        if index is None:
+            index = self.offset - 1 if delta > 0 else self.offset + self.visible_rows
+        index = max(0, min(index + delta, self.total - 1))
+
+        if index < self.offset:
+            self.offset = index
+        elif index >= self.offset + self.visible_rows:
+            self.offset = index - self.visible_rows + 1
+        self._ensure_cached(self.offset, min(self.total, self.offset + self.visible_rows))
+        row = self._cache.get(index)
+        if row:
+            self.selected_key = row[self.key_index]
+        self._render()
+        self.tree.focus(f"slot{index - self.offset}")
+        return 'break'
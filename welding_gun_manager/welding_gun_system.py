@@ -11,6 +11,18 @@ import os
 import sys
 import datetime
 from file_operations import GunFileManager
+from utils.file_utils import copy_file
+from services.scheduler import get_scheduler, PRIORITY_HIGH, PRIORITY_LOW
+from services.integrity_service import verify_gun_tree, format_report
+from services.search_service import IncrementalSearch
+from services.thumbnail_service import get_thumbnail_service
+from services.bulk_packager import BulkPackager
+from services.template_service import write_template, write_template_csv, read_template_rows, TemplateFormatError
+from services.storage_tiering import StorageTiering
+from sync.sync_manager import GunFolderWatcher
+from services.auth_service import check_user_password, get_session_manager, hash_password
+from views.virtual_table import VirtualTable
+from views.thumbnail_gallery import ThumbnailGallery
 import json
 import shutil
 
@@ -68,11 +80,23 @@ class Database:
             if not os.path.exists(self.db_path):
                 self.create_tables()
                 self.create_default_data()
+            self.ensure_indexes()
             return True
         except Exception as e:
             print(f"数据库初始化失败: {e}")
             return False
     
+    # 与 GunController.SORTABLE_COLUMNS 对应（id 即 rowid，serial_number 已有 UNIQUE 索引）；
+    # 索引项末尾带 rowid，单列索引即可满足默认的 "ORDER BY name, id" 分页排序
+    INDEXED_GUN_COLUMNS = ('name', 'type', 'model', 'status', 'location', 'last_maintenance', 'created_at')
+    
+    def ensure_indexes(self):
+        """创建工枪表可排序列的索引"""
+        conn = self.connect()
+        for column in self.INDEXED_GUN_COLUMNS:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_guns_{column} ON guns({column})")
+        conn.commit()
+    
     def create_tables(self):
         conn = self.connect()
         cursor = conn.cursor()
@@ -126,11 +150,11 @@ class Database:
         
         current_time = datetime.datetime.now().isoformat()
         
-        # 默认用户
+        # 默认用户（密码只保存哈希）
         users = [
-            ('system', 'manager', 'admin', '系统管理员', 'admin@welding.com', current_time),
+            ('system', hash_password('manager'), 'admin', '系统管理员', 'admin@welding.com', current_time),
             ('administrator', None, 'admin', 'Administrator', '', current_time),
-            ('user', 'user123', 'user', '普通用户', 'user@welding.com', current_time)
+            ('user', hash_password('user123'), 'user', '普通用户', 'user@welding.com', current_time)
         ]
         
         cursor.executemany('''
@@ -176,6 +200,12 @@ class Database:
 
 # 4. 添加 GunController 类
 class GunController:
+    # 允许排序的列（ORDER BY 不能绑定参数，只接受白名单中的列名）
+    SORTABLE_COLUMNS = ('id', 'name', 'type', 'model', 'serial_number', 'status',
+                        'location', 'last_maintenance', 'created_at')
+    # 搜索结果最多显示的行数（结果全部保存在内存中，超过时提示用户缩小条件）
+    SEARCH_RESULT_LIMIT = 1000
+    
     def __init__(self, db):
         self.db = db
     
@@ -194,6 +224,40 @@ class GunController:
         param = f"%{search_term}%"
         return self.db.fetch_all(query, (param, param, param, param))
     
+    def _search_condition(self, search_term):
+        if not search_term:
+            return "", ()
+        param = f"%{search_term}%"
+        return ("WHERE name LIKE ? OR type LIKE ? OR model LIKE ? OR location LIKE ? OR serial_number LIKE ?",
+                (param,) * 5)
+    
+    def search_query(self, search_term, order_by='name', descending=False, limit=None):
+        if order_by not in self.SORTABLE_COLUMNS:
+            order_by = 'name'
+        direction = 'DESC' if descending else 'ASC'
+        where, params = self._search_condition(search_term)
+        query = f"SELECT * FROM guns {where} ORDER BY {order_by} {direction}, id {direction}"
+        if limit is not None:
+            return f"{query} LIMIT ?", params + (limit,)
+        return query, params
+    
+    def count_guns(self, search_term=''):
+        where, params = self._search_condition(search_term)
+        row = self.db.fetch_one(f"SELECT COUNT(*) as count FROM guns {where}", params)
+        return row['count'] if row else 0
+    
+    def get_guns_page(self, offset, limit, search_term='', order_by='name', descending=False):
+        if order_by not in self.SORTABLE_COLUMNS:
+            order_by = 'name'
+        direction = 'DESC' if descending else 'ASC'
+        where, params = self._search_condition(search_term)
+        query = f"""
+        SELECT * FROM guns {where}
+        ORDER BY {order_by} {direction}, id {direction}
+        LIMIT ? OFFSET ?
+        """
+        return self.db.fetch_all(query, params + (limit, offset))
+    
     def get_statistics(self):
         stats = {}
         
@@ -230,16 +294,7 @@ class UserController:
         self.db = db
     
     def authenticate(self, username, password):
-        if username == "administrator":
-            row = self.db.fetch_one(
-                "SELECT * FROM users WHERE username = ? AND password IS NULL",
-                (username,)
-            )
-        else:
-            row = self.db.fetch_one(
-                "SELECT * FROM users WHERE username = ? AND password = ?",
-                (username, password)
-            )
+        row = check_user_password(self.db, username, password, allow_passwordless=True)
         
         if row:
             return {
@@ -250,6 +305,13 @@ class UserController:
             }
         return None
 
+# 文件完整性定期校验间隔（秒）
+INTEGRITY_CHECK_INTERVAL = 24 * 3600
+
+# 分级存储：冷数据归档目录（二级存储）和迁移间隔（秒）
+ARCHIVE_DIR = os.environ.get('GUN_ARCHIVE_DIR', 'archived_guns')
+TIERING_INTERVAL = 24 * 3600
+
 # 6. 添加 WeldingGunSystem 类
 class WeldingGunSystem:
     def __init__(self):
@@ -260,6 +322,11 @@ class WeldingGunSystem:
         # 设置窗口最小尺寸
         self.root.minsize(1000, 700)
         
+        # 后台任务调度器（ZIP打包、列表刷新等在工作线程执行）
+        self.scheduler = get_scheduler()
+        self.scheduler.attach_tk(self.root)
+        self.file_list_task = None
+        
         # 数据库
         self.db = Database()
         if not self.db.initialize():
@@ -270,22 +337,65 @@ class WeldingGunSystem:
         self.gun_ctrl = GunController(self.db)
         self.user_ctrl = UserController(self.db)
         
-        # 添加文件管理器
-        self.file_manager = GunFileManager()
+        # 添加文件管理器（上传图片时在后台生成缩略图）
+        self.thumbnails = get_thumbnail_service()
+        self.file_manager = GunFileManager(thumbnails=self.thumbnails)
+        
+        # 监视焊枪目录：在资源管理器中直接增删文件时同步 gun_info.json 并刷新列表
+        self.gun_watcher = GunFolderWatcher(
+            self.file_manager,
+            on_change=lambda changes: self.scheduler.call_in_ui(self.refresh_file_list)
+        )
+        # 建立目录索引和首次快照可能较慢，在后台启动，不阻塞界面
+        self.scheduler.submit(
+            self.gun_watcher.start,
+            priority=PRIORITY_LOW,
+            name="gun_watcher_start",
+            error_callback=lambda e: print(f"启动焊枪目录监视失败: {e}")
+        )
+        
+        # 定期在后台校验焊枪文件完整性（首次在启动10分钟后）
+        self.integrity_task = self.scheduler.schedule_periodic(
+            INTEGRITY_CHECK_INTERVAL,
+            verify_gun_tree,
+            self.file_manager.base_dir,
+            backfill=True,
+            log_path=os.path.join('logs', 'integrity.log'),
+            initial_delay=600,
+            priority=PRIORITY_LOW,
+            name="integrity_check",
+            callback=self.on_integrity_report,
+            error_callback=lambda e: print(f"文件完整性校验失败: {e}")
+        )
+        
+        # 定期把已报废/停用的焊枪文件归档到二级存储，重新启用的自动恢复
+        self.storage_tiering = StorageTiering(self.file_manager, ARCHIVE_DIR, self.db.db_path)
+        self.tiering_task = self.scheduler.schedule_periodic(
+            TIERING_INTERVAL,
+            self.storage_tiering.run,
+            initial_delay=900,
+            priority=PRIORITY_LOW,
+            name="storage_tiering",
+            callback=self.on_tiering_report,
+            error_callback=lambda e: print(f"分级存储迁移失败: {e}")
+        )
         
         # 添加上传流程状态
         self.current_upload_gun_info = None
         self.current_upload_folder = None
         
-        # 当前用户
+        # 当前用户及会话令牌
         self.current_user = None
+        self.session_token = None
         
         # 文件管理相关变量
         self.file_listbox = None
+        self.file_list_guns = []
         
         # 运行
         self.show_login()
         self.root.mainloop()
+        self.gun_watcher.stop()
     
     def show_login(self):
         """显示登录界面"""
@@ -393,6 +503,7 @@ class WeldingGunSystem:
         user = self.user_ctrl.authenticate(username, password)
         if user:
             self.current_user = user
+            self.session_token = get_session_manager().issue(user)
             # 恢复窗口大小
             self.root.geometry("1200x800")
             self.show_main_interface()
@@ -541,6 +652,8 @@ class WeldingGunSystem:
         response = messagebox.askyesno("确认", "确定要退出系统吗？")
         if response:
             self.current_user = None
+            get_session_manager().revoke(self.session_token)
+            self.session_token = None
             self.show_login()
 
     def show_page(self, page_id):
@@ -587,6 +700,8 @@ class WeldingGunSystem:
         toolbar_buttons = [
             ("📤 上传焊枪", self.upload_file_ui, "#3498db"),
             ("📥 下载文件", self.download_file_ui, "#2ecc71"),
+            ("🖼 图片预览", self.preview_gun_images, "#1abc9c"),
+            ("📦 批量打包", self.show_bulk_package_dialog, "#e67e22"),
             ("📋 模板工具", lambda: self.show_page("templates"), "#9b59b6"),
             ("🔄 刷新列表", self.refresh_file_list, "#f39c12"),
         ]
@@ -622,8 +737,10 @@ class WeldingGunSystem:
                                     font=("微软雅黑", 10),
                                     selectbackground="#3498db",
                                     selectforeground="white",
+                                    selectmode=tk.EXTENDED,
                                     activestyle="none")
         self.file_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.file_listbox.bind('<Double-Button-1>', lambda e: self.preview_gun_images())
         scrollbar.config(command=self.file_listbox.yview)
         
         # 初始加载文件列表
@@ -823,42 +940,65 @@ class WeldingGunSystem:
                                width=30, font=("微软雅黑", 10))
         search_entry.pack(side=tk.LEFT, padx=5)
         
+        # 边输入边搜索：停止输入后在后台查询，回车立即搜索
+        self.search_var.trace_add('write', lambda *args: self.on_gun_search_input())
+        search_entry.bind('<Return>', lambda e: self.search_guns_table())
+        
         search_btn = tk.Button(search_frame, text="🔍 搜索", 
                               bg="#2ecc71", fg="white", font=("微软雅黑", 10),
                               command=self.search_guns_table)
         search_btn.pack(side=tk.LEFT)
         
+        # 搜索结果超出上限时的提示
+        self.gun_search_notice = tk.Label(search_frame, text="", bg="#ecf0f1", fg="#e67e22",
+                                          font=("微软雅黑", 9))
+        self.gun_search_notice.pack(side=tk.LEFT, padx=5)
+        
         # 表格框架
         table_frame = tk.Frame(gun_frame)
         table_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=(0, 20))
         
-        # 创建Treeview
-        self.gun_tree = ttk.Treeview(table_frame, 
-                                    columns=('ID', '名称', '类型', '型号', '状态', '位置', '维护日期'), 
-                                    show='headings', height=20)
-        
+        # 创建虚拟表格（只绘制可见行，点击表头在数据库中排序）
         columns = [
-            ('ID', 60),
-            ('名称', 150),
-            ('类型', 120),
-            ('型号', 120),
-            ('状态', 100),
-            ('位置', 150),
-            ('维护日期', 120)
+            ('id', 'ID', 60),
+            ('name', '名称', 150),
+            ('type', '类型', 120),
+            ('model', '型号', 120),
+            ('status', '状态', 100),
+            ('location', '位置', 150),
+            ('last_maintenance', '维护日期', 120)
         ]
         
-        for col, width in columns:
-            self.gun_tree.heading(col, text=col)
-            self.gun_tree.column(col, width=width)
+        self.gun_search_term = ''
+        self.gun_table = VirtualTable(
+            table_frame, columns,
+            count_rows=lambda: self.gun_ctrl.count_guns(self.gun_search_term),
+            fetch_rows=self.fetch_gun_rows,
+            sort_column='name',
+            sort_command=self.on_gun_sort
+        )
+        self.gun_tree = self.gun_table.tree
+        
+        # 后台增量搜索，结果分批放入 gun_search_rows
+        self.gun_search_rows = []
+        self.gun_search_shown = None
+        self.gun_search = IncrementalSearch(
+            self.root, self.db.db_path,
+            # 多取一行用于判断结果是否超出上限
+            build_query=lambda term: self.gun_ctrl.search_query(
+                term, self.gun_table.sort_column or 'name', self.gun_table.descending,
+                limit=self.gun_ctrl.SEARCH_RESULT_LIMIT + 1),
+            on_results=self.on_gun_search_results,
+            on_error=lambda term, e: print(f"搜索工枪失败: {e}"),
+            map_row=self.gun_row_values
+        )
         
-        # 滚动条
-        v_scrollbar = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=self.gun_tree.yview)
+        # 水平滚动条
         h_scrollbar = ttk.Scrollbar(table_frame, orient=tk.HORIZONTAL, command=self.gun_tree.xview)
-        self.gun_tree.configure(yscrollcommand=v_scrollbar.set, xscrollcommand=h_scrollbar.set)
+        self.gun_tree.configure(xscrollcommand=h_scrollbar.set)
         
-        self.gun_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        v_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         h_scrollbar.pack(side=tk.BOTTOM, fill=tk.X)
+        self.gun_table.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         
         # 加载数据
         self.refresh_gun_table()
@@ -1473,30 +1613,43 @@ class WeldingGunSystem:
         self.complete_upload(dialog)
     
     def complete_upload(self, dialog, skip=False):
-        """完成上传"""
-        try:
-            # 创建ZIP文件
-            zip_path = self.file_manager.create_zip_file(self.current_upload_folder)
+        """完成上传（ZIP打包在后台执行）"""
+        gun_name = self.current_upload_gun_info['name']
+        folder_path = self.current_upload_folder
+        
+        def on_zipped(zip_path):
+            # 打包成功后才清除状态，失败时仍可重试或取消
+            if self.current_upload_folder == folder_path:
+                self.current_upload_gun_info = None
+                self.current_upload_folder = None
             
             # 显示成功信息
             if skip:
-                message = f"焊枪 '{self.current_upload_gun_info['name']}' 已创建，但未上传文件"
+                message = f"焊枪 '{gun_name}' 已创建，但未上传文件"
             else:
-                message = f"焊枪 '{self.current_upload_gun_info['name']}' 上传完成！\nZIP文件: {os.path.basename(zip_path)}"
+                message = f"焊枪 '{gun_name}' 上传完成！\nZIP文件: {os.path.basename(zip_path)}"
             
+            if dialog.winfo_exists():
+                dialog.destroy()
             messagebox.showinfo("成功", message)
             
             # 刷新文件列表
             self.refresh_file_list()
-            
-            # 清除状态
-            self.current_upload_gun_info = None
-            self.current_upload_folder = None
-            
-            dialog.destroy()
-            
-        except Exception as e:
+        
+        def on_error(e):
+            if dialog.winfo_exists():
+                dialog.config(cursor="")
             messagebox.showerror("错误", f"完成上传失败: {str(e)}")
+        
+        dialog.config(cursor="watch")
+        self.scheduler.submit(
+            self.file_manager.create_zip_file,
+            folder_path,
+            priority=PRIORITY_HIGH,
+            name="create_zip",
+            callback=on_zipped,
+            error_callback=on_error
+        )
     
     def cancel_upload(self, dialog):
         """取消上传"""
@@ -1537,20 +1690,6 @@ class WeldingGunSystem:
             messagebox.showerror("错误", f"找不到焊枪: {gun_name}")
             return
         
-        # 检查是否有ZIP文件
-        if not gun_info.get('has_zip', False):
-            response = messagebox.askyesno("提示", 
-                f"焊枪 '{gun_name}' 还没有ZIP文件，是否现在创建？")
-            
-            if response:
-                try:
-                    zip_path = self.file_manager.create_zip_file(gun_info['folder_path'])
-                    gun_info['zip_file'] = zip_path
-                    gun_info['has_zip'] = True
-                except Exception as e:
-                    messagebox.showerror("错误", f"创建ZIP文件失败: {str(e)}")
-                    return
-        
         # 选择保存位置
         save_path = filedialog.asksaveasfilename(
             title="保存焊枪文件",
@@ -1559,32 +1698,74 @@ class WeldingGunSystem:
             filetypes=[("ZIP文件", "*.zip"), ("所有文件", "*.*")]
         )
         
-        if save_path:
-            try:
-                # 复制ZIP文件
-                shutil.copy2(gun_info['zip_file'], save_path)
-                
-                messagebox.showinfo("下载成功", 
-                    f"焊枪文件已保存到:\n{save_path}\n\n包含文件:\n"
-                    f"• 焊枪信息: gun_info.json\n"
-                    f"• 3D模型: {len(gun_info.get('files', {}).get('3d', []))}个\n"
-                    f"• 2D图纸: {len(gun_info.get('files', {}).get('2d', []))}个\n"
-                    f"• 图片: {len(gun_info.get('files', {}).get('image', []))}个")
-                
-            except Exception as e:
-                messagebox.showerror("下载失败", f"下载出错: {str(e)}")
+        if not save_path:
+            return
+        
+        # 检查是否有ZIP文件
+        need_zip = False
+        if not gun_info.get('has_zip', False):
+            need_zip = messagebox.askyesno("提示", 
+                f"焊枪 '{gun_name}' 还没有ZIP文件，是否现在创建？")
+            if not need_zip:
+                return
+        
+        def package_and_copy():
+            # 在工作线程中打包并复制ZIP文件
+            if need_zip:
+                gun_info['zip_file'] = self.file_manager.create_zip_file(gun_info['folder_path'])
+                gun_info['has_zip'] = True
+            copy_file(gun_info['zip_file'], save_path)
+            return save_path
+        
+        def on_saved(path):
+            messagebox.showinfo("下载成功", 
+                f"焊枪文件已保存到:\n{path}\n\n包含文件:\n"
+                f"• 焊枪信息: gun_info.json\n"
+                f"• 3D模型: {len(gun_info.get('files', {}).get('3d', []))}个\n"
+                f"• 2D图纸: {len(gun_info.get('files', {}).get('2d', []))}个\n"
+                f"• 图片: {len(gun_info.get('files', {}).get('image', []))}个")
+            if need_zip:
+                self.refresh_file_list()
+        
+        self.scheduler.submit(
+            package_and_copy,
+            priority=PRIORITY_HIGH,
+            name="download_zip",
+            callback=on_saved,
+            error_callback=lambda e: messagebox.showerror("下载失败", f"下载出错: {str(e)}")
+        )
     
     def refresh_file_list(self):
-        """刷新文件列表 - 修改为显示焊枪列表"""
+        """刷新文件列表 - 修改为显示焊枪列表（目录扫描在后台执行）"""
         if not self.file_listbox:
             return
         
+        # 只保留最新一次刷新
+        if self.file_list_task is not None:
+            self.scheduler.cancel(self.file_list_task)
+        
+        self.file_list_task = self.scheduler.submit(
+            self.file_manager.get_all_guns,
+            name="refresh_file_list",
+            callback=self.populate_file_list,
+            error_callback=self.show_file_list_error
+        )
+    
+    def show_file_list_error(self, error):
+        """显示文件列表加载错误"""
+        if self.file_listbox and self.file_listbox.winfo_exists():
+            self.file_listbox.delete(0, tk.END)
+            self.file_listbox.insert(tk.END, f"获取焊枪列表失败: {str(error)}")
+    
+    def populate_file_list(self, guns):
+        """用扫描结果填充文件列表"""
+        if not self.file_listbox or not self.file_listbox.winfo_exists():
+            return
+        
         self.file_listbox.delete(0, tk.END)
+        self.file_list_guns = list(guns)
         
         try:
-            # 获取所有焊枪
-            guns = self.file_manager.get_all_guns()
-            
             for gun in guns:
                 gun_name = gun['name']
                 gun_type = gun.get('type', '未知类型')
@@ -1593,63 +1774,261 @@ class WeldingGunSystem:
                 display_text = f"{gun_name} ({gun_type}) - {file_count}个文件"
                 if gun.get('has_zip', False):
                     display_text += " 📦"
+                if gun.get('archived'):
+                    display_text += " 🗄 已归档"
                 
                 self.file_listbox.insert(tk.END, display_text)
                 
         except Exception as e:
             self.file_listbox.insert(tk.END, f"获取焊枪列表失败: {str(e)}")
     
+    def show_bulk_package_dialog(self):
+        """批量打包：选中的焊枪或按条件筛选，在后台进程池中打包"""
+        if not self.file_list_guns:
+            messagebox.showwarning("警告", "没有可打包的焊枪")
+            return
+        
+        packager = BulkPackager(self.file_manager)
+        options = packager.filter_options(self.file_list_guns)
+        selected_names = [self.file_list_guns[i]['name'] for i in self.file_listbox.curselection()
+                          if i < len(self.file_list_guns)]
+        
+        dialog = tk.Toplevel(self.root)
+        dialog.title("批量打包")
+        dialog.geometry("460x400")
+        dialog.transient(self.root)
+        
+        main_frame = tk.Frame(dialog, padx=20, pady=15)
+        main_frame.pack(fill=tk.BOTH, expand=True)
+        
+        mode_var = tk.StringVar(value="selected" if selected_names else "filter")
+        tk.Radiobutton(main_frame, text=f"列表中选中的焊枪（{len(selected_names)}个）",
+                       variable=mode_var, value="selected",
+                       state=tk.NORMAL if selected_names else tk.DISABLED,
+                       font=("微软雅黑", 10)).pack(anchor=tk.W)
+        tk.Radiobutton(main_frame, text="按条件筛选", variable=mode_var, value="filter",
+                       font=("微软雅黑", 10)).pack(anchor=tk.W)
+        
+        filter_frame = tk.Frame(main_frame)
+        filter_frame.pack(fill=tk.X, padx=20, pady=5)
+        filter_vars = {}
+        for row, (key, label) in enumerate((('weld_type', "焊接类型"), ('gun_brand', "品牌"), ('gun_model', "型号"))):
+            tk.Label(filter_frame, text=f"{label}:", font=("微软雅黑", 10)).grid(row=row, column=0, sticky=tk.W, pady=3)
+            filter_vars[key] = tk.StringVar(value="全部")
+            ttk.Combobox(filter_frame, textvariable=filter_vars[key], state="readonly", width=25,
+                         values=["全部"] + options[key]).grid(row=row, column=1, sticky=tk.W, padx=10)
+        
+        output_var = tk.StringVar(value=os.path.abspath("packages"))
+        output_frame = tk.Frame(main_frame)
+        output_frame.pack(fill=tk.X, pady=10)
+        tk.Label(output_frame, text="输出目录:", font=("微软雅黑", 10)).pack(side=tk.LEFT)
+        tk.Entry(output_frame, textvariable=output_var, width=28).pack(side=tk.LEFT, padx=5)
+        tk.Button(output_frame, text="浏览",
+                  command=lambda: output_var.set(filedialog.askdirectory(title="选择输出目录") or output_var.get())
+                  ).pack(side=tk.LEFT)
+        
+        progress_bar = ttk.Progressbar(main_frame, mode="determinate")
+        progress_bar.pack(fill=tk.X, pady=(10, 5))
+        status_label = tk.Label(main_frame, text="", font=("微软雅黑", 9), fg="#7f8c8d", anchor=tk.W)
+        status_label.pack(fill=tk.X)
+        
+        def on_progress(done, total, entry):
+            if not dialog.winfo_exists():
+                return
+            progress_bar.config(maximum=total, value=done)
+            state = "失败" if 'error' in entry else "完成"
+            status_label.config(text=f"{done}/{total} {entry['name']} {state}")
+        
+        def on_done(manifest):
+            if dialog.winfo_exists():
+                dialog.destroy()
+            messagebox.showinfo("批量打包完成",
+                                f"成功: {manifest['count']} 个，失败: {manifest['failed']} 个\n"
+                                f"原始大小: {manifest['bytes'] / 1024 / 1024:.1f} MB，"
+                                f"压缩后: {manifest['zip_bytes'] / 1024 / 1024:.1f} MB\n"
+                                f"耗时: {manifest['elapsed_s']:.1f} 秒\n"
+                                f"清单: {os.path.join(output_var.get(), 'manifest.json')}")
+        
+        def on_error(e):
+            if dialog.winfo_exists():
+                start_btn.config(state=tk.NORMAL)
+            messagebox.showerror("批量打包失败", str(e))
+        
+        def start():
+            if mode_var.get() == "selected":
+                guns = packager.select(names=selected_names, guns=self.file_list_guns)
+            else:
+                criteria = {key: (var.get() if var.get() != "全部" else None)
+                            for key, var in filter_vars.items()}
+                guns = packager.select(guns=self.file_list_guns, **criteria)
+            if not guns:
+                messagebox.showwarning("警告", "没有符合条件的焊枪", parent=dialog)
+                return
+            
+            start_btn.config(state=tk.DISABLED)
+            progress_bar.config(maximum=len(guns), value=0)
+            status_label.config(text=f"正在打包 {len(guns)} 把焊枪...")
+            self.scheduler.submit(
+                packager.package,
+                guns,
+                output_var.get(),
+                progress=lambda done, total, entry: self.scheduler.call_in_ui(on_progress, done, total, entry),
+                priority=PRIORITY_HIGH,
+                name="bulk_package",
+                callback=on_done,
+                error_callback=on_error
+            )
+        
+        button_frame = tk.Frame(main_frame)
+        button_frame.pack(pady=10)
+        start_btn = tk.Button(button_frame, text="开始打包", command=start,
+                              bg="#e67e22", fg="white", font=("微软雅黑", 10), padx=15)
+        start_btn.pack(side=tk.LEFT, padx=10)
+        tk.Button(button_frame, text="关闭", command=dialog.destroy,
+                  font=("微软雅黑", 10), padx=15).pack(side=tk.LEFT, padx=10)
+    
+    def on_tiering_report(self, report):
+        """分级存储迁移完成"""
+        if report['archived'] or report['rehydrated']:
+            print(f"分级存储: 归档 {len(report['archived'])} 个，恢复 {len(report['rehydrated'])} 个，"
+                  f"释放 {report['freed_bytes'] / 1024 / 1024:.1f} MB")
+            self.refresh_file_list()
+        for error in report['errors']:
+            print(f"分级存储迁移失败 {error['name']}: {error['error']}")
+    
+    def on_integrity_report(self, report):
+        """定期校验完成：发现损坏或丢失的文件时提醒用户"""
+        print(format_report(report))
+        if not report['healthy']:
+            messagebox.showwarning("文件完整性警告",
+                                   "定期校验发现异常文件：\n\n" + format_report(report))
+    
+    def preview_gun_images(self):
+        """浏览选中焊枪的图片和图纸缩略图"""
+        if not self.file_listbox:
+            return
+        
+        selection = self.file_listbox.curselection()
+        if not selection or selection[0] >= len(self.file_list_guns):
+            messagebox.showwarning("警告", "请先选择一个焊枪")
+            return
+        
+        gun = self.file_list_guns[selection[0]]
+        
+        def on_files(files):
+            if gun.get('archived'):
+                # 已从二级存储恢复
+                self.refresh_file_list()
+            if not files:
+                messagebox.showinfo("提示", f"焊枪 '{gun['name']}' 没有可预览的图片")
+                return
+            ThumbnailGallery(self.root, f"图片预览 - {gun['name']}", files, self.thumbnails)
+        
+        # 已归档的焊枪需要先解压，放到后台执行
+        self.scheduler.submit(
+            self.file_manager.get_preview_files,
+            gun['folder_path'],
+            priority=PRIORITY_HIGH,
+            name="preview_files",
+            callback=on_files,
+            error_callback=lambda e: messagebox.showerror("错误", f"读取焊枪文件失败: {str(e)}")
+        )
+    
     # ========== 工枪管理方法 ==========
+    def fetch_gun_rows(self, offset, limit, sort_column, descending):
+        """虚拟表格的数据源：按当前搜索条件分页取行"""
+        guns = self.gun_ctrl.get_guns_page(offset, limit, self.gun_search_term,
+                                           sort_column or 'name', descending)
+        return [self.gun_row_values(gun) for gun in guns]
+    
+    def gun_row_values(self, gun):
+        """工枪记录转换为表格行"""
+        return (
+            gun['id'],
+            gun['name'],
+            gun['type'] or '未分类',
+            gun['model'] or '-',
+            gun['status'],
+            gun['location'] or '-',
+            gun['last_maintenance'] or '-'
+        )
+    
     def refresh_gun_table(self):
         """刷新工枪表格"""
-        if not hasattr(self, 'gun_tree'):
+        if not hasattr(self, 'gun_table'):
             return
         
-        for item in self.gun_tree.get_children():
-            self.gun_tree.delete(item)
-        
         try:
-            guns = self.gun_ctrl.get_all_guns()
-            for gun in guns:
-                self.gun_tree.insert('', 'end', values=(
-                    gun['id'],
-                    gun['name'],
-                    gun['type'] or '未分类',
-                    gun['model'] or '-',
-                    gun['status'],
-                    gun['location'] or '-',
-                    gun['last_maintenance'] or '-'
-                ))
+            # 条件未变时只刷新当前窗口内变化的行，保留滚动位置和选中项
+            keep_position = self.gun_search_term == ''
+            self.gun_search.cancel()
+            self.gun_search_term = ''
+            self.gun_search_shown = None
+            self.gun_search_notice.config(text="")
+            self.gun_table.set_source(
+                lambda: self.gun_ctrl.count_guns(),
+                self.fetch_gun_rows,
+                keep_position=keep_position
+            )
         except Exception as e:
             print(f"加载工枪数据失败: {e}")
     
     def search_guns_table(self):
-        """搜索工枪"""
-        if not hasattr(self, 'gun_tree') or not hasattr(self, 'search_var'):
+        """搜索工枪（立即在后台执行）"""
+        if not hasattr(self, 'gun_table') or not hasattr(self, 'search_var'):
             return
         
-        search_term = self.search_var.get()
+        search_term = self.search_var.get().strip()
         if not search_term:
             self.refresh_gun_table()
             return
         
-        for item in self.gun_tree.get_children():
-            self.gun_tree.delete(item)
-        
-        try:
-            guns = self.gun_ctrl.search_guns(search_term)
-            for gun in guns:
-                self.gun_tree.insert('', 'end', values=(
-                    gun['id'],
-                    gun['name'],
-                    gun['type'] or '未分类',
-                    gun['model'] or '-',
-                    gun['status'],
-                    gun['location'] or '-',
-                    gun['last_maintenance'] or '-'
-                ))
-        except Exception as e:
-            print(f"搜索工枪失败: {e}")
+        self.gun_search_term = search_term
+        self.gun_search.start(search_term)
+    
+    def on_gun_search_input(self):
+        """搜索框内容变化：清空时立即恢复全部列表，否则去抖后搜索"""
+        search_term = self.search_var.get().strip()
+        if search_term == self.gun_search_term and not self.gun_search.active:
+            return
+        if not search_term:
+            self.refresh_gun_table()
+            return
+        self.gun_search_term = search_term
+        self.gun_search.request(search_term)
+    
+    def on_gun_search_results(self, search_term, rows, first, done):
+        """增量搜索结果到达（界面线程）"""
+        if not self.gun_table.winfo_exists():
+            return
+        if first:
+            keep_position = search_term == self.gun_search_shown
+            self.gun_search_shown = search_term
+            self.gun_search_rows = list(rows)
+            self.gun_table.set_source(
+                lambda: len(self.gun_search_rows),
+                lambda offset, limit, sort_column, descending: self.gun_search_rows[offset:offset + limit],
+                keep_position=keep_position
+            )
+        else:
+            self.gun_search_rows.extend(rows)
+            self.gun_table.reload(keep_position=True)
+        
+        limit = self.gun_ctrl.SEARCH_RESULT_LIMIT
+        if len(self.gun_search_rows) > limit:
+            del self.gun_search_rows[limit:]
+            self.gun_table.reload(keep_position=True)
+            self.gun_search_notice.config(text=f"只显示前 {limit} 条，请输入更精确的条件")
+        elif first:
+            self.gun_search_notice.config(text="")
+    
+    def on_gun_sort(self, sort_column, descending):
+        """点击表头排序：搜索结果重新搜索，否则直接分页重取"""
+        if self.gun_search_term:
+            self.gun_search_shown = None
+            self.gun_search.start(self.gun_search_term)
+        else:
+            self.gun_table.reload()
     
     def on_gun_double_click(self, event):
         """工枪双击事件"""
@@ -1698,23 +2077,6 @@ class WeldingGunSystem:
 
     def export_template(self):
         """导出模板文件 - 主要生成Excel格式"""
-        # 字段定义
-        field_definitions = [
-            ("weld_type", "焊接类型*", "必填，可选值：钢点焊、铝点焊、其他"),
-            ("gun_brand", "焊枪品牌*", "必填，可选值：小原、森德莱、日基"),
-            ("gun_number", "焊枪编号*", "必填，焊枪唯一编号"),
-            ("gun_model", "焊枪型号", "选填，可选值：C型、X型、异型C、异型X、其他"),
-            ("throat_depth", "喉深(mm)", "选填，单位：毫米"),
-            ("throat_width", "喉宽(mm)", "选填，单位：毫米"),
-            ("max_stroke", "最大行程(mm)", "选填，单位：毫米"),
-            ("max_pressure", "最大压力(kN)", "选填，单位：千牛"),
-            ("motor_brand", "电机品牌", "选填，可选值：ABB、安川、川崎、发那科、华数控、库卡、那智、其他"),
-            ("cap_spec", "电极帽规格", "选填"),
-            ("cap_tilt", "电极帽是否倾斜", "选填，可选值：是、否"),
-            ("static_tilt_angle", "静电极帽倾斜角度(°)", "选填，单位：度"),
-            ("dynamic_tilt_angle", "动电极帽倾斜角度(°)", "选填，单位：度"),
-        ]
-        
         # 选择保存位置
         file_path = filedialog.asksaveasfilename(
             title="保存模板文件",
@@ -1732,116 +2094,7 @@ class WeldingGunSystem:
             return
         
         try:
-            import pandas as pd
-            import openpyxl
-            from openpyxl.styles import Font, Alignment
-            
-            # 创建DataFrame
-            data = []
-            
-            # 第一行：字段名称
-            field_names = [f"{label}" for _, label, _ in field_definitions]
-            data.append(field_names)
-            
-            # 第二行：字段说明
-            field_descriptions = [desc for _, _, desc in field_definitions]
-            data.append(field_descriptions)
-            
-            # 第三行：示例数据
-            example_data = [
-                "钢点焊",      # weld_type
-                "小原",        # gun_brand
-                "GUN-001",     # gun_number
-                "C型",         # gun_model
-                "500",         # throat_depth
-                "200",         # throat_width
-                "150",         # max_stroke
-                "4.5",         # max_pressure
-                "库卡",        # motor_brand
-                "R30",         # cap_spec
-                "否",          # cap_tilt
-                "0",           # static_tilt_angle
-                "0"            # dynamic_tilt_angle
-            ]
-            data.append(example_data)
-            
-            # 第四行：开始填写提示
-            data.append(["↓ 请从这一行开始填写您的数据 ↓"] + [""] * 12)
-            
-            # 第五行：空行，用户从这里开始填写
-            data.append([""] * 13)
-            
-            # 创建DataFrame
-            df = pd.DataFrame(data)
-            
-            # 保存文件
-            if file_path.lower().endswith('.xlsx'):
-                # 使用openpyxl引擎保存为xlsx
-                with pd.ExcelWriter(file_path, engine='openpyxl') as writer:
-                    df.to_excel(writer, index=False, header=False)
-                    
-                    # 获取工作表对象进行格式设置
-                    workbook = writer.book
-                    worksheet = writer.sheets['Sheet1']
-                    
-                    # 设置列宽 - 修复：安全地计算最大长度
-                    for i, col in enumerate(df.columns):
-                        max_len = 15  # 默认最小宽度
-                        for j in range(len(df)):
-                            cell_value = df.iloc[j, i]
-                            if pd.notna(cell_value):  # 检查是否为NaN
-                                cell_str = str(cell_value)
-                                try:
-                                    # 尝试计算长度，如果不是字符串则跳过
-                                    cell_len = len(cell_str)
-                                    if cell_len > max_len:
-                                        max_len = cell_len
-                                except:
-                                    pass
-                        
-                        # 限制最大宽度
-                        column_width = min(max_len + 2, 40)
-                        column_letter = openpyxl.utils.get_column_letter(i + 1)
-                        worksheet.column_dimensions[column_letter].width = column_width
-                    
-                    # 设置第一行（字段名）为红色粗体
-                    for col in range(1, 14):  # 13列
-                        cell = worksheet.cell(row=1, column=col)
-                        cell.font = Font(bold=True, color="FF0000")
-                    
-                    # 设置第二行（说明）为蓝色斜体
-                    for col in range(1, 14):
-                        cell = worksheet.cell(row=2, column=col)
-                        cell.font = Font(italic=True, color="0000FF")
-                    
-                    # 设置第三行（示例）为灰色
-                    for col in range(1, 14):
-                        cell = worksheet.cell(row=3, column=col)
-                        cell.font = Font(color="808080")
-                    
-                    # 设置第四行（提示）为粗体居中
-                    for col in range(1, 14):
-                        cell = worksheet.cell(row=4, column=col)
-                        cell.font = Font(bold=True)
-                        cell.alignment = Alignment(horizontal='center')
-                    
-                    # 设置第五行为黄色背景，提示用户从此处开始填写
-                    for col in range(1, 14):
-                        cell = worksheet.cell(row=5, column=col)
-                        from openpyxl.styles import PatternFill
-                        cell.fill = PatternFill(start_color="FFFF00", end_color="FFFF00", fill_type="solid")
-                        cell.font = Font(bold=True)
-                        cell.value = "← 请在此处开始填写"
-                    
-                    # 设置整个工作表的第一列冻结
-                    worksheet.freeze_panes = "A2"
-                    
-            elif file_path.lower().endswith('.xls'):
-                # 使用xlwt引擎保存为xls
-                df.to_excel(file_path, index=False, header=False, engine='xlwt')
-            else:
-                # 保存为CSV
-                df.to_csv(file_path, index=False, header=False, encoding='utf-8-sig')
+            write_template(file_path)
             
             # 提供使用说明
             instructions = """
@@ -1874,41 +2127,17 @@ class WeldingGunSystem:
                                 "将使用简化版本导出。\n\n"
                                 "如需完整功能，请安装：\n"
                                 "pip install pandas openpyxl xlwt")
-            self.export_template_simple(file_path, field_definitions)
+            self.export_template_simple(file_path)
         except Exception as e:
             import traceback
             error_details = traceback.format_exc()
             print(f"导出错误详情:\n{error_details}")
             messagebox.showerror("导出失败", f"导出模板文件失败:\n{str(e)}")
 
-    def export_template_simple(self, file_path, field_definitions):
+    def export_template_simple(self, file_path):
         """简化版导出 - 只生成CSV"""
         try:
-            import csv
-            
-            with open(file_path, 'w', newline='', encoding='utf-8-sig') as csvfile:
-                writer = csv.writer(csvfile)
-                
-                # 写入第一行：字段名称
-                headers = [label for _, label, _ in field_definitions]
-                writer.writerow(headers)
-                
-                # 写入第二行：字段说明
-                descriptions = [desc for _, _, desc in field_definitions]
-                writer.writerow(descriptions)
-                
-                # 写入第三行：示例数据
-                example_data = [
-                    "钢点焊", "小原", "GUN-001", "C型", "500", "200", 
-                    "150", "4.5", "库卡", "R30", "否", "0", "0"
-                ]
-                writer.writerow(example_data)
-                
-                # 写入第四行：提示
-                writer.writerow(["↓ 请从下一行开始填写您的数据 ↓"])
-                
-                # 写入第五行：空行，用户开始填写
-                writer.writerow([""] * 13)
+            write_template_csv(file_path)
             
             # 提供使用说明
             instructions = """
@@ -1952,39 +2181,18 @@ class WeldingGunSystem:
         try:
             # 尝试导入pandas，如果失败则使用csv
             try:
-                import pandas as pd
+                import pandas
                 use_pandas = True
             except ImportError:
                 use_pandas = False
             
-            data = []
-            
             if file_path.lower().endswith(('.xlsx', '.xls')) and use_pandas:
-                # 使用pandas读取Excel
+                # 使用pandas读取Excel（跳过模板的标题、说明、示例、提示）
                 try:
-                    # 读取整个工作表
-                    df = pd.read_excel(file_path, header=None)
-                    
-                    # 检查是否至少有4行（标题、说明、示例、提示）
-                    if len(df) < 4:
-                        messagebox.showerror("格式错误", "文件格式不正确，请使用导出的模板文件")
-                        return
-                    
-                    # 从第4行开始（跳过标题、说明、示例、提示）
-                    for i in range(4, len(df)):
-                        row = df.iloc[i].tolist()
-                        # 转换为字符串并清理
-                        cleaned_row = []
-                        for cell in row:
-                            if pd.isna(cell):
-                                cleaned_row.append('')
-                            else:
-                                cleaned_row.append(str(cell).strip())
-                        
-                        # 检查是否为空行
-                        if any(cell for cell in cleaned_row):
-                            data.append(cleaned_row)
-                            
+                    data = read_template_rows(file_path)
+                except TemplateFormatError as e:
+                    messagebox.showerror("格式错误", str(e))
+                    return
                 except Exception as e:
                     messagebox.showerror("Excel读取错误", 
                                     f"读取Excel文件失败:\n{str(e)}\n\n"
@@ -2001,53 +2209,12 @@ class WeldingGunSystem:
                     if not response:
                         return
                 
-                # 读取CSV文件
+                # 读取CSV文件（依次尝试 UTF-8、GBK、GB2312 编码）
                 try:
-                    if use_pandas:
-                        df = pd.read_csv(file_path, header=None, encoding='utf-8-sig')
-                        # 从第4行开始
-                        for i in range(3, len(df)):
-                            row = df.iloc[i].tolist()
-                            cleaned_row = [str(cell).strip() if not pd.isna(cell) else '' for cell in row]
-                            if any(cell for cell in cleaned_row):
-                                data.append(cleaned_row)
-                    else:
-                        # 使用纯CSV读取
-                        import csv
-                        with open(file_path, 'r', encoding='utf-8-sig') as f:
-                            reader = csv.reader(f)
-                            rows = list(reader)
-                            # 从第4行开始（跳过标题、说明、示例）
-                            for i in range(3, len(rows)):
-                                row = rows[i]
-                                cleaned_row = [cell.strip() for cell in row]
-                                if any(cell for cell in cleaned_row):
-                                    data.append(cleaned_row)
-                except UnicodeDecodeError:
-                    # 尝试其他编码
-                    encodings = ['gbk', 'gb2312', 'utf-8']
-                    for encoding in encodings:
-                        try:
-                            if use_pandas:
-                                df = pd.read_csv(file_path, header=None, encoding=encoding)
-                                for i in range(3, len(df)):
-                                    row = df.iloc[i].tolist()
-                                    cleaned_row = [str(cell).strip() if not pd.isna(cell) else '' for cell in row]
-                                    if any(cell for cell in cleaned_row):
-                                        data.append(cleaned_row)
-                                break
-                            else:
-                                with open(file_path, 'r', encoding=encoding) as f:
-                                    reader = csv.reader(f)
-                                    rows = list(reader)
-                                    for i in range(3, len(rows)):
-                                        row = rows[i]
-                                        cleaned_row = [cell.strip() for cell in row]
-                                        if any(cell for cell in cleaned_row):
-                                            data.append(cleaned_row)
-                                break
-                        except:
-                            continue
+                    data = read_template_rows(file_path, use_pandas=use_pandas)
+                except TemplateFormatError as e:
+                    messagebox.showerror("格式错误", str(e))
+                    return
             
             if not data:
                 messagebox.showwarning("警告", "文件中没有有效数据")